@@ -0,0 +1,166 @@
+"""
+Compile time of the snippets in the test files, per backend, compared against a saved baseline:
+
+    python3 benchmark/bench_compile.py -o results.json [-n 5] [-k gallery]
+    python3 benchmark/bench_compile.py -o new.json --baseline results.json [--threshold 0.2]
+
+Every snippet is compiled n times. The front end (parsing and type checking) and every backend are timed
+separately, median and p95 are written for each. The peak memory of a snippet comes from one more compile
+with tracemalloc on. With a baseline, the snippets and phases whose median grew by more than the threshold
+are listed and the exit status is 1.
+"""
+import sys
+import ast
+import json
+import math
+import time
+import platform
+import argparse
+import resource
+import statistics
+import tracemalloc
+from pathlib import Path
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+from iheartla.la_parser.parser import parse_ir_node, walk_model, create_parser, get_compile_error, ParserTypeEnum
+
+BACKENDS = [ParserTypeEnum.NUMPY, ParserTypeEnum.EIGEN, ParserTypeEnum.LATEX, ParserTypeEnum.MATHJAX,
+            ParserTypeEnum.MATLAB]
+
+
+def load_corpus(test_dir, pattern=None):
+    """
+    la_str snippets of the test methods, the key is file::method (with #index for more than one)
+    :return: dict of key -> source
+    """
+    corpus = {}
+    for test_file in sorted(test_dir.glob('test_*.py')):
+        if pattern is not None and pattern not in test_file.name:
+            continue
+        tree = ast.parse(test_file.read_text())
+        for func in ast.walk(tree):
+            if not isinstance(func, ast.FunctionDef):
+                continue
+            sources = [node.value.value for node in ast.walk(func) if isinstance(node, ast.Assign)
+                       and any(getattr(target, 'id', '') == 'la_str' for target in node.targets)
+                       and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str)]
+            for index, source in enumerate(sources):
+                key = "{}::{}".format(test_file.name, func.name)
+                if index > 0:
+                    key += "#{}".format(index + 1)
+                corpus[key] = source
+    return corpus
+
+
+def percentile(values, fraction):
+    # nearest rank
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def compile_once(source):
+    """
+    :return: dict of phase -> seconds
+    """
+    times = {}
+    start = time.perf_counter()
+    type_walker, start_node = parse_ir_node(source)
+    times['frontend'] = time.perf_counter() - start
+    for backend in BACKENDS:
+        start = time.perf_counter()
+        walk_model(backend, type_walker, start_node)
+        times[backend.name.lower()] = time.perf_counter() - start
+    return times
+
+
+def bench_snippet(source, repeat):
+    try:
+        samples = [compile_once(source) for i in range(repeat)]
+    except Exception as e:
+        message = get_compile_error(e)
+        return {'error': message.splitlines()[0] if message else type(e).__name__}
+    result = {}
+    for phase in samples[0]:
+        values = [sample[phase] for sample in samples]
+        result[phase] = {'median': statistics.median(values), 'p95': percentile(values, 0.95)}
+    tracemalloc.start()
+    compile_once(source)
+    result['peak_kib'] = tracemalloc.get_traced_memory()[1] / 1024
+    tracemalloc.stop()
+    return result
+
+
+def run(corpus, repeat):
+    snippets = {}
+    start = time.perf_counter()
+    for key, source in corpus.items():
+        snippets[key] = bench_snippet(source, repeat)
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return {'python': platform.python_version(),
+            'repeat': repeat,
+            'seconds': time.perf_counter() - start,
+            'max_rss_mib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2 ** 20,
+            'snippets': snippets}
+
+
+def total_median(results, phase):
+    return sum(snippet[phase]['median'] for snippet in results['snippets'].values() if phase in snippet)
+
+
+def compare(results, baseline, threshold, min_seconds):
+    """
+    :param min_seconds: differences below this are noise
+    :return: list of (key, phase, baseline median, new median)
+    """
+    regressions = []
+    for key, snippet in results['snippets'].items():
+        base = baseline['snippets'].get(key)
+        if base is None or 'error' in base or 'error' in snippet:
+            continue
+        for phase, stats in snippet.items():
+            if phase not in base or not isinstance(stats, dict):
+                continue
+            old, new = base[phase]['median'], stats['median']
+            if new > old * (1 + threshold) and new - old > min_seconds:
+                regressions.append((key, phase, old, new))
+    return regressions
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='compile benchmark of the test snippets')
+    arg_parser.add_argument('-n', '--repeat', type=int, default=5)
+    arg_parser.add_argument('-k', '--filter', help='only test files whose name contains this, e.g. gallery')
+    arg_parser.add_argument('-o', '--output', help='file to write the results to (JSON)')
+    arg_parser.add_argument('--baseline', help='results of an earlier run to compare with')
+    arg_parser.add_argument('--threshold', type=float, default=0.2, help='allowed relative slowdown of a median')
+    arg_parser.add_argument('--min-seconds', type=float, default=0.005, help='ignore slowdowns smaller than this')
+    args = arg_parser.parse_args()
+    create_parser()
+    corpus = load_corpus(ROOT_DIR / 'test', args.filter)
+    results = run(corpus, args.repeat)
+    errors = sum(1 for snippet in results['snippets'].values() if 'error' in snippet)
+    print("{} snippets ({} don't compile) x {} in {:.1f}s, max RSS {:.1f} MiB".format(
+        len(corpus), errors, args.repeat, results['seconds'], results['max_rss_mib']))
+    phases = ['frontend'] + [backend.name.lower() for backend in BACKENDS]
+    for phase in phases:
+        print("{:<10} {:>9.3f}s total of the medians".format(phase, total_median(results, phase)))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=1)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for phase in phases:
+            old, new = total_median(baseline, phase), total_median(results, phase)
+            print("{:<10} {:>9.3f}s -> {:>9.3f}s".format(phase, old, new))
+        regressions = compare(results, baseline, args.threshold, args.min_seconds)
+        for key, phase, old, new in sorted(regressions, key=lambda item: item[3] / item[2], reverse=True):
+            print("slower: {} {} {:.4f}s -> {:.4f}s ({:+.0%})".format(key, phase, old, new, new / old - 1))
+        if len(regressions) > 0:
+            print("{} regressions above {:.0%}".format(len(regressions), args.threshold))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Type checking time of the gallery (and other) tests, dimension algebra vs sympy:
+
+    python3 benchmark/bench_dims.py [-n 20]
+"""
+import sys
+import ast
+import time
+import argparse
+from pathlib import Path
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+import iheartla.la_parser.type_walker as type_walker_module
+import iheartla.la_tools.la_helper as la_helper
+from iheartla.la_parser.parser import get_default_parser, get_configured_parser, get_type_walker
+
+
+def load_sources(test_file):
+    tree = ast.parse(test_file.read_text())
+    sources = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign) and any(getattr(target, 'id', '') == 'la_str' for target in node.targets) \
+                and isinstance(node.value, ast.Constant):
+            sources.append(node.value.value)
+    return sources
+
+
+def sympy_is_same_expr(lhs, rhs):
+    if lhs == rhs:
+        return True
+    if isinstance(lhs, int) and isinstance(rhs, int):
+        return False
+    from sympy import sympify
+    return sympify('{} == {}'.format(lhs, rhs))
+
+
+def sympy_mul_dims(lhs, rhs):
+    from sympy import sympify
+    if not isinstance(lhs, str) and not isinstance(rhs, str):
+        return sympify(lhs * rhs)
+    return sympify("{}*{}".format(lhs, rhs))
+
+
+def sympy_simpify_dims(dims):
+    from sympy import sympify
+    return sympify(dims)
+
+
+def type_check_time(models, repeat):
+    type_walker = get_type_walker()
+    start = time.perf_counter()
+    for i in range(repeat):
+        for content, init_model, model in models:
+            type_walker.walk(init_model, pre_walk=True)
+            type_walker.reset_state(content)
+            type_walker.walk(model)
+    return time.perf_counter() - start
+
+
+dims_time = [0.0]
+
+
+def timed(func):
+    def wrapper(*args):
+        start = time.perf_counter()
+        res = func(*args)
+        dims_time[0] += time.perf_counter() - start
+        return res
+    return wrapper
+
+
+def use_sympy(enabled):
+    if enabled:
+        funcs = (sympy_is_same_expr, sympy_mul_dims, sympy_simpify_dims)
+    else:
+        funcs = (la_helper.is_same_expr, la_helper.mul_dims, la_helper.simpify_dims)
+    type_walker_module.is_same_expr, type_walker_module.mul_dims, type_walker_module.simpify_dims = [timed(func) for func in funcs]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='type checking benchmark')
+    arg_parser.add_argument('-n', '--repeat', type=int, default=20)
+    arg_parser.add_argument('tests', nargs='*', default=['gallery', 'dims', 'matrix'],
+                            help='test files to take the sources from, e.g. gallery for test/test_python_gallery.py')
+    arg_parser.add_argument('--arith', type=int, default=50, help='number of blocks in the generated source with arithmetic dimensions')
+    args = arg_parser.parse_args()
+    for test_name in args.tests:
+        bench_sources(test_name, load_sources(ROOT_DIR / 'test' / 'test_python_{}.py'.format(test_name)), args.repeat)
+    if args.arith > 0:
+        bench_sources('arith', [arith_dims_source(args.arith)], args.repeat)
+
+
+def arith_dims_source(count):
+    # block matrices whose sizes only match symbolically, like test_arith_dims
+    lines = []
+    for i in range(1, count + 1):
+        lines += ["w{} ∈ ℝ^(p×k)".format(i),
+                  "x{} = [ w{}".format(i, i),
+                  "      0_{},k ]".format(i),
+                  "a{} = x{} + y{}".format(i, i, i)]
+    lines.append("where")
+    lines += ["y{} ∈ ℝ^((p+{})×k)".format(i, i) for i in range(1, count + 1)]
+    return '\n'.join(lines)
+
+
+def bench_sources(test_name, sources, repeat):
+    models = []
+    for content in sources:
+        # parse up front, only the type walker is timed
+        init_model = get_default_parser().parse(content, parseinfo=True)
+        type_walker = get_type_walker()
+        start_node = type_walker.walk(init_model, pre_walk=True)
+        model = get_configured_parser(type_walker, start_node).parse(content, parseinfo=True)
+        models.append((content, init_model, model))
+    results = []
+    for name, enabled in [('sympy', True), ('dimension algebra', False)]:
+        use_sympy(enabled)
+        type_check_time(models, 1)  # warm up
+        dims_time[0] = 0.0
+        results.append((type_check_time(models, repeat), dims_time[0]))
+        print("{:<8} {:<18} {:>8.3f}s type checking, {:>8.3f}s in dimension checks ({} x {} sources)".format(
+            test_name, name, results[-1][0], results[-1][1], repeat, len(models)))
+    print("{:<8} speedup: {:.2f}x type checking, {:.2f}x dimension checks".format(
+        test_name, results[0][0] / results[1][0], results[0][1] / max(results[1][1], 1e-9)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Memory of the IR and type objects: bytes per object in the IR of a generated program, allocation of many
+nodes, and peak RSS of the whole compile:
+
+    python3 benchmark/bench_memory.py [-n 200]
+"""
+import sys
+import time
+import argparse
+import resource
+import tracemalloc
+from pathlib import Path
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+from iheartla.la_parser.parser import parse_ir_node, walk_model, create_parser, ParserTypeEnum
+from iheartla.la_parser.ir import IRNode, IdNode, AddNode
+from iheartla.la_parser.la_types import LaVarType, MatrixType, NodeInfo
+
+
+def generate_source(count):
+    # chain of matrix-vector statements
+    lines = ["`v1` = A x + b"]
+    for i in range(2, count + 1):
+        lines.append("`v{}` = A `v{}` + b - x".format(i, i - 1))
+    lines += ["where", "A: ℝ^(n×n)", "x: ℝ^n", "b: ℝ^n"]
+    return '\n'.join(lines)
+
+
+def shallow_size(obj):
+    size = sys.getsizeof(obj)
+    if hasattr(obj, '__dict__'):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+
+def collect_objects(root):
+    """
+    IR nodes and types reachable from the start node
+    :return: dict of id -> object
+    """
+    objects = {}
+    stack = [root]
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, (list, tuple)):
+            stack += obj
+            continue
+        if isinstance(obj, dict):
+            stack += obj.values()
+            continue
+        if not isinstance(obj, (IRNode, LaVarType, NodeInfo)) or id(obj) in objects:
+            continue
+        objects[id(obj)] = obj
+        for cls in type(obj).__mro__:
+            for name in getattr(cls, '__slots__', ()):
+                if name not in ('__weakref__', 'parent') and hasattr(obj, name):
+                    stack.append(getattr(obj, name))
+        if hasattr(obj, '__dict__'):
+            stack += [value for key, value in vars(obj).items() if key != 'parent']
+    return objects
+
+
+def allocation(count):
+    tracemalloc.start()
+    start = time.perf_counter()
+    nodes = []
+    for i in range(count):
+        node = AddNode(IdNode('a'), IdNode('b'))
+        node.la_type = MatrixType(rows=i, cols=i)
+        nodes.append(node)
+    seconds = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return seconds, size / (count * 4)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='IR memory benchmark')
+    arg_parser.add_argument('-n', '--statements', type=int, default=200)
+    arg_parser.add_argument('--allocations', type=int, default=100000, help='number of nodes for the allocation test')
+    args = arg_parser.parse_args()
+    seconds, per_object = allocation(args.allocations)
+    print("allocation: {} x (2 IdNode, AddNode, MatrixType) in {:.3f}s, {:.0f} bytes per object".format(
+        args.allocations, seconds, per_object))
+    create_parser()
+    start = time.perf_counter()
+    type_walker, start_node = parse_ir_node(generate_source(args.statements))
+    walk_model(ParserTypeEnum.NUMPY, type_walker, start_node)
+    seconds = time.perf_counter() - start
+    objects = collect_objects([start_node, type_walker.symtable])
+    total = sum(shallow_size(obj) for obj in objects.values())
+    print("{} statements: {} IR and type objects, {:.0f} bytes per object, compiled in {:.2f}s".format(
+        args.statements, len(objects), total / len(objects), seconds))
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    print("peak RSS: {:.1f} MiB".format(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2 ** 20))
+
+
+if __name__ == '__main__':
+    main()
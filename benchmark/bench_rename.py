@@ -0,0 +1,86 @@
+"""
+Renaming of backtick and unicode identifiers in the generated code (IRVisitor.trim_content), one
+str.replace over the whole output per identifier vs a single pass:
+
+    python3 benchmark/bench_rename.py [-n 2000]
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+from iheartla.la_parser.parser import get_codegen, ParserTypeEnum
+from iheartla.la_parser.la_types import ScalarType
+
+GREEK = 'αβγδεζηθικλμνξπρστυφχψω'
+
+
+def generate_names(count):
+    names = []
+    for i in range(count):
+        letter = GREEK[i % len(GREEK)]
+        kind = i % 3
+        if kind == 0:
+            names.append('`{} value {}`'.format(letter, i))
+        elif kind == 1:
+            names.append('`x({}{})`'.format(letter, i))
+        else:
+            names.append('{}{}'.format(letter, i))
+    return names
+
+
+def generate_content(names):
+    # statements of a function body, every identifier used a few times
+    lines = []
+    for i, name in enumerate(names):
+        lines.append("    {} = {} + 2 * {}\n".format(name, names[i - 1], names[i - 2]))
+    lines.append("    return {}\n".format(names[-1]))
+    return ''.join(lines)
+
+
+def replace_content(gen, content):
+    # the former implementation: the whole output is scanned once per identifier
+    res = content
+    ids_list = [x for x in set(gen.symtable.keys()) if x != '*']
+    ids_list.sort(key=len, reverse=True)
+    names_dict = []
+    for special in ids_list:
+        if '`' not in special and gen.parse_type != ParserTypeEnum.MATLAB:
+            continue
+        if special.isnumeric():
+            continue
+        new_str = gen.convert_unicode(special).replace('-', '_')
+        if new_str != special:
+            while new_str in names_dict or new_str in gen.symtable.keys() or gen.is_keyword(new_str):
+                new_str = '_' + new_str
+            names_dict.append(new_str)
+            res = res.replace(special, new_str)
+    return res
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='identifier renaming benchmark')
+    arg_parser.add_argument('-n', '--names', type=int, default=2000, help='number of identifiers')
+    args = arg_parser.parse_args()
+    names = generate_names(args.names)
+    content = generate_content(names)
+    print("{} identifiers, {} KiB of output".format(len(names), len(content) // 1024))
+    for parser_type in [ParserTypeEnum.NUMPY, ParserTypeEnum.EIGEN, ParserTypeEnum.MATLAB]:
+        gen = get_codegen(parser_type)
+        gen.symtable = {name: ScalarType() for name in names}
+        gen.tmp_symtable = {}
+        gen.ids_dict = {}
+        start = time.perf_counter()
+        expected = replace_content(gen, content)
+        replace_time = time.perf_counter() - start
+        start = time.perf_counter()
+        result = gen.trim_content(content)
+        single_time = time.perf_counter() - start
+        assert result == expected, "different output for {}".format(parser_type.name)
+        print("{:<7} str.replace per identifier {:>8.3f}s, single pass {:>8.3f}s".format(
+            parser_type.name, replace_time, single_time))
+
+
+if __name__ == '__main__':
+    main()
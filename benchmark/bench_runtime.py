@@ -0,0 +1,216 @@
+"""
+Run time of the generated NumPy and Eigen code as the free dimensions grow:
+
+    python3 benchmark/bench_runtime.py [-s 16,64,256] [--dims m=3,k=10] [--backends numpy,eigen] [file.la ...]
+
+Without files a few snippets covering the common constructs are used. generateRandomData() of the generated code
+draws the free dimensions (n, m, sequence sizes) at random, the harness sets them to every size in turn instead
+(--dims fixes some of them) and times the generated function. The Eigen code is built once per snippet as a
+shared library (g++ and the Eigen headers are needed) and called through ctypes. The output is one scaling
+curve per snippet and backend: median time per size and the exponent between consecutive sizes.
+"""
+import sys
+import json
+import math
+import time
+import ctypes
+import argparse
+import tempfile
+import statistics
+import subprocess
+from pathlib import Path
+import regex as re
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+from iheartla.la_parser.parser import parse_ir_node, walk_model, create_parser, get_codegen, ParserTypeEnum
+
+SNIPPETS = {
+    'matrix-vector': """y = A x + b
+where
+A: ℝ^(n×n)
+x: ℝ^n
+b: ℝ^n""",
+    'matrix product': """C = A B + A
+where
+A: ℝ^(n×n)
+B: ℝ^(n×n)""",
+    'elementwise definition': """B_ij = A_ij + A_ji
+where
+A: ℝ^(n×n)""",
+    'summation': """s = ∑_i x_i y_i
+where
+x: ℝ^n
+y: ℝ^n""",
+    'sequence': """y_i = A_i x + b_i
+z = ∑_i y_i
+where
+A_i ∈ ℝ^(m×n)
+x ∈ ℝ^n
+b_i ∈ ℝ^m""",
+}
+
+EIGEN_INCLUDES = ['/usr/local/include/eigen3', '/usr/include/eigen3', '/opt/homebrew/include/eigen3']
+
+EIGEN_BENCH = """
+extern "C" double iheartla_bench(const int* dims, int repeat)
+{{
+    for(int i=0; i<{count}; i++){{
+        bench_dims[i] = dims[i];
+    }}
+{declarations}
+    {call_random}
+    double best = 1e100;
+    for(int r=0; r<repeat; r++){{
+        auto start = std::chrono::steady_clock::now();
+        {func_call};
+        std::chrono::duration<double> seconds = std::chrono::steady_clock::now() - start;
+        best = std::min(best, seconds.count());
+    }}
+    return best;
+}}
+"""
+
+
+def free_dims(parser_type):
+    # the dimensions generateRandomData draws at random
+    gen = get_codegen(parser_type)
+    return [key for key in gen.dim_dict if key not in gen.parameters and key not in gen.dim_seq_set]
+
+
+def compile_snippet(source):
+    """
+    :return: dict of backend -> (generated code, free dimensions)
+    """
+    type_walker, start_node = parse_ir_node(source)
+    results = {}
+    for parser_type in [ParserTypeEnum.NUMPY, ParserTypeEnum.EIGEN]:
+        code = walk_model(parser_type, type_walker, start_node)
+        results[parser_type.name.lower()] = (code, free_dims(parser_type))
+    return results
+
+
+class NumpyRunner(object):
+    def __init__(self, code, dims):
+        self.dims = dims
+        for dim in dims:
+            code = re.sub(r"(?m)^    {} = np\.random\.randint\(\d+\)$".format(re.escape(dim)),
+                          "    {} = _bench_dims['{}']".format(dim, dim), code)
+        self.namespace = {'_bench_dims': {}, '__name__': 'iheartla_bench'}
+        exec(code, self.namespace)
+
+    def run(self, sizes, repeat):
+        self.namespace['_bench_dims'].update(sizes)
+        args = self.namespace['generateRandomData']()
+        if not isinstance(args, tuple):
+            args = (args,)
+        func = self.namespace['myExpression']
+        times = []
+        for i in range(repeat):
+            start = time.perf_counter()
+            func(*args)
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+
+class EigenRunner(object):
+    def __init__(self, code, dims, build_dir, eigen_include):
+        self.dims = dims
+        for index, dim in enumerate(dims):
+            code = re.sub(r"(?m)^    const int {} = rand\(\)%\d+;$".format(re.escape(dim)),
+                          "    const int {} = bench_dims[{}];".format(dim, index), code)
+        main_body = code[code.index("int main(int argc"):]
+        lines = main_body.splitlines()
+        call_random = next(line.strip() for line in lines if line.strip().startswith('generateRandomData('))
+        declarations = '\n'.join(lines[lines.index(next(line for line in lines if 'srand(' in line)) + 1:
+                                       lines.index(next(line for line in lines if line.strip() == call_random))])
+        func_call = re.search(r"= (myExpression\(.*\));", main_body).group(1)
+        code = code.replace("int main(int argc", "int iheartla_main(int argc")
+        pos = code.index("void generateRandomData(")
+        code = code[:pos] + "static int bench_dims[{}];\n\n".format(max(1, len(dims))) + code[pos:]
+        code = "#include <chrono>\n#include <algorithm>\n" + code + EIGEN_BENCH.format(
+            count=len(dims), declarations=declarations, call_random=call_random, func_call=func_call)
+        cpp_file = Path(build_dir) / 'bench.cpp'
+        lib_file = Path(build_dir) / 'bench.so'
+        cpp_file.write_text(code)
+        ret = subprocess.run(['g++', '-O2', '-DNDEBUG', '-std=c++17', '-shared', '-fPIC', '-I', eigen_include,
+                              str(cpp_file), '-o', str(lib_file)], capture_output=True, text=True)
+        if ret.returncode != 0:
+            raise RuntimeError("g++ failed:\n{}".format(ret.stderr[:2000]))
+        self.lib = ctypes.CDLL(str(lib_file))
+        self.lib.iheartla_bench.restype = ctypes.c_double
+        self.lib.iheartla_bench.argtypes = [ctypes.POINTER(ctypes.c_int), ctypes.c_int]
+
+    def run(self, sizes, repeat):
+        dims = (ctypes.c_int * max(1, len(self.dims)))(*[sizes[dim] for dim in self.dims])
+        return self.lib.iheartla_bench(dims, repeat)
+
+
+def scaling_curve(runner, sizes, fixed, repeat, samples):
+    """
+    :return: list of (size, median seconds)
+    """
+    curve = []
+    for size in sizes:
+        dim_sizes = {dim: fixed.get(dim, size) for dim in runner.dims}
+        curve.append((size, statistics.median(runner.run(dim_sizes, repeat) for i in range(samples))))
+    return curve
+
+
+def format_curve(name, backend, curve):
+    lines = ["{} [{}]".format(name, backend)]
+    for index, (size, seconds) in enumerate(curve):
+        exponent = ''
+        if index > 0 and curve[index - 1][1] > 0 and seconds > 0:
+            prev_size, prev_seconds = curve[index - 1]
+            exponent = "O(n^{:.2f})".format(math.log(seconds / prev_seconds) / math.log(size / prev_size))
+        lines.append("    {:>8} {:>12.4g}s {:>12}".format(size, seconds, exponent))
+    return '\n'.join(lines)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='run time of the generated code')
+    arg_parser.add_argument('-s', '--sizes', default='16,64,256', help='values of the free dimensions')
+    arg_parser.add_argument('--dims', default='', help='fixed dimensions, e.g. m=3,k=10')
+    arg_parser.add_argument('--backends', default='numpy,eigen', help='numpy, eigen or both')
+    arg_parser.add_argument('-n', '--repeat', type=int, default=3, help='calls per sample, the fastest one counts')
+    arg_parser.add_argument('--samples', type=int, default=3, help='samples per size, the median is reported')
+    arg_parser.add_argument('--eigen-include', help='directory of the Eigen headers')
+    arg_parser.add_argument('-o', '--output', help='file to write the curves to (JSON)')
+    arg_parser.add_argument('files', nargs='*', help='I Heart LA files, the built-in snippets when empty')
+    args = arg_parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(',')]
+    backends = args.backends.split(',')
+    assert set(backends) <= {'numpy', 'eigen'}, "--backends can only be numpy, eigen or both"
+    fixed = {}
+    for item in filter(None, args.dims.split(',')):
+        name, value = item.split('=')
+        fixed[name] = int(value)
+    if args.files:
+        snippets = {file_name: Path(file_name).read_text() for file_name in args.files}
+    else:
+        snippets = SNIPPETS
+    eigen_include = args.eigen_include or next((path for path in EIGEN_INCLUDES if Path(path).is_dir()), None)
+    if 'eigen' in backends and eigen_include is None:
+        print("Eigen headers not found, pass --eigen-include")
+        sys.exit(1)
+    create_parser()
+    results = {}
+    for name, source in snippets.items():
+        generated = compile_snippet(source)
+        with tempfile.TemporaryDirectory() as build_dir:
+            for backend in backends:
+                code, dims = generated[backend]
+                if backend == 'numpy':
+                    runner = NumpyRunner(code, dims)
+                else:
+                    runner = EigenRunner(code, dims, build_dir, eigen_include)
+                curve = scaling_curve(runner, sizes, fixed, args.repeat, args.samples)
+                results.setdefault(name, {})[backend] = {'dims': dims, 'curve': curve}
+                print(format_curve(name, backend, curve))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Construction time of sparse matrices in the generated NumPy code, support iteration vs scanning every (i, j):
+
+    python3 benchmark/bench_sparse.py [-n 100 1000 3000]
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+import numpy as np
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+from iheartla.la_parser.parser import compile_la_content, get_codegen, ParserTypeEnum
+
+# tridiagonal matrix with a few extra entries
+LA_SOURCE = """A_ij = { 2 if i = j
+-1 if i = j + 1
+x_j if j - 1 = i
+3 if ( i , j ) ∈ E
+0 otherwise
+
+where
+x: ℝ ^ n
+A: ℝ ^ (n × n)
+E: { ℤ × ℤ } index"""
+
+
+def gen_numpy_func(scan):
+    gen = get_codegen(ParserTypeEnum.NUMPY)
+    if scan:
+        gen.get_sparse_support = lambda ifs_node, subs: None
+    try:
+        code = compile_la_content(LA_SOURCE, ParserTypeEnum.NUMPY)[0]
+    finally:
+        if scan:
+            del gen.get_sparse_support
+    namespace = {}
+    exec(code, namespace)
+    return namespace['myExpression']
+
+
+def construction_time(func, n, repeat):
+    x = np.random.randn(n)
+    E = [(0, n - 1), (n - 1, 0)]
+    best = float('inf')
+    for i in range(repeat):
+        start = time.perf_counter()
+        func(x, E)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='sparse construction benchmark')
+    arg_parser.add_argument('-n', '--sizes', type=int, nargs='+', default=[100, 1000, 3000])
+    arg_parser.add_argument('-r', '--repeat', type=int, default=3)
+    arg_parser.add_argument('--scan-limit', type=int, default=3000, help='largest size the scanning code is run on')
+    args = arg_parser.parse_args()
+    support_func = gen_numpy_func(False)
+    scan_func = gen_numpy_func(True)
+    for n in args.sizes:
+        support_time = construction_time(support_func, n, args.repeat)
+        if n <= args.scan_limit:
+            scan_time = construction_time(scan_func, n, args.repeat)
+            print("n={:<8} support {:>9.4f}s  scan {:>9.4f}s  speedup {:.1f}x".format(n, support_time, scan_time, scan_time / support_time))
+        else:
+            print("n={:<8} support {:>9.4f}s  scan skipped".format(n, support_time))
+
+
+if __name__ == '__main__':
+    main()
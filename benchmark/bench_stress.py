@@ -0,0 +1,109 @@
+"""
+Synthetic programs that grow in one direction at a time, to find compiler passes that don't scale linearly:
+
+    python3 benchmark/bench_stress.py [-s 50,100,200] [kind ...]
+
+Kinds: params (parameters in the where block), statements, multi (multi-letter identifiers), funcs (function
+parameters), sums (nested summations), literal (literal matrix). For every kind the compile time is printed per
+size together with the exponent between consecutive sizes, 1 is linear.
+"""
+import sys
+import math
+import time
+import argparse
+from pathlib import Path
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+from iheartla.la_parser.parser import compile_backends, create_parser, ParserTypeEnum
+
+
+def gen_params(size):
+    # many parameters, every statement uses a few of them
+    lines = ["s{} = a{} + b{} x{}".format(i, i, i, i) for i in range(size)]
+    lines.append("where")
+    for i in range(size):
+        lines += ["a{}: ℝ".format(i), "b{}: ℝ".format(i), "x{}: ℝ".format(i)]
+    return '\n'.join(lines)
+
+
+def gen_statements(size):
+    # chain of statements over a few parameters
+    lines = ["v0 = A x + b"]
+    lines += ["v{} = A v{} + b".format(i, i - 1) for i in range(1, size)]
+    lines += ["where", "A: ℝ^(n×n)", "x: ℝ^n", "b: ℝ^n"]
+    return '\n'.join(lines)
+
+
+def gen_multi(size):
+    # multi-letter identifiers, they go into the specialized parser
+    names = ["alpha{}beta".format(i) for i in range(size)]
+    lines = ["`r{}` = {} + {}".format(i, names[i], names[i - 1]) for i in range(size)]
+    lines.append("where")
+    lines += ["{}: ℝ".format(name) for name in names]
+    return '\n'.join(lines)
+
+
+def gen_funcs(size):
+    # function parameters, they go into the specialized parser as well
+    lines = ["`r{}` = f{}(x) + f{}(x)".format(i, i, i - 1 if i > 0 else 0) for i in range(size)]
+    lines += ["where", "x: ℝ"]
+    lines += ["f{}: ℝ → ℝ".format(i) for i in range(size)]
+    return '\n'.join(lines)
+
+
+def gen_sums(size):
+    # nested summations, one level deeper every few statements
+    subs = 'ijklpq'
+    lines = []
+    for i in range(size):
+        depth = 1 + i % len(subs)
+        sums = ''.join("∑_{} ".format(sub) for sub in subs[:depth])
+        lines.append("`t{}` = {}{}".format(i, sums, ' '.join("x_{}".format(sub) for sub in subs[:depth])))
+    lines += ["where", "x: ℝ^n"]
+    return '\n'.join(lines)
+
+
+def gen_literal(size):
+    # square literal matrix with size rows
+    rows = [' '.join("{}".format((i * size + j) % 7) for j in range(size)) for i in range(size)]
+    return "A = [" + '\n'.join(rows) + "]\nB = A + C\nwhere\nC: ℝ^({}×{})".format(size, size)
+
+
+GENERATORS = {'params': gen_params, 'statements': gen_statements, 'multi': gen_multi, 'funcs': gen_funcs,
+              'sums': gen_sums, 'literal': gen_literal}
+
+
+def generate_program(kind, size):
+    """
+    :param kind: key of GENERATORS
+    :return: source
+    """
+    return GENERATORS[kind](size)
+
+
+def compile_time(source, parser_type=ParserTypeEnum.NUMPY | ParserTypeEnum.EIGEN):
+    start = time.perf_counter()
+    compile_backends(source, parser_type)
+    return time.perf_counter() - start
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='compile time of synthetic programs')
+    arg_parser.add_argument('-s', '--sizes', default='50,100,200', help='sizes of the programs')
+    arg_parser.add_argument('kinds', nargs='*', default=list(GENERATORS.keys()), help='kinds of programs')
+    args = arg_parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(',')]
+    create_parser()
+    for kind in args.kinds:
+        previous = None
+        for size in sizes:
+            seconds = compile_time(generate_program(kind, size))
+            exponent = ''
+            if previous is not None:
+                exponent = "O(n^{:.2f})".format(math.log(seconds / previous[1]) / math.log(size / previous[0]))
+            print("{:<11} {:>6} {:>9.3f}s {:>12}".format(kind, size, seconds, exponent))
+            previous = (size, seconds)
+
+
+if __name__ == '__main__':
+    main()
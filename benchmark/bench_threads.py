@@ -0,0 +1,64 @@
+"""
+Small compiles (an editor recompiling a short document) while a large document compiles in another thread,
+serialized behind one lock (the shared compiler state) vs one compiler context per thread:
+
+    python3 benchmark/bench_threads.py [--small 10] [--blocks 10]
+
+The GIL still runs one compile at a time, contexts only let the small compiles through instead of waiting.
+"""
+import sys
+import time
+import argparse
+import threading
+from pathlib import Path
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+sys.path.insert(0, str(ROOT_DIR / 'benchmark'))
+from bench_dims import arith_dims_source
+from iheartla.la_parser.parser import compile_backends, create_parser, ParserTypeEnum
+
+SMALL_SOURCE = """y_i = A_i x + b_i
+where
+A_i ∈ ℝ^(m×n)
+x ∈ ℝ^n
+b_i ∈ ℝ^m"""
+
+
+def run(large_source, small_count, serialized):
+    lock = threading.Lock()
+    parser_type = ParserTypeEnum.NUMPY | ParserTypeEnum.EIGEN
+
+    def compile_source(source):
+        if serialized:
+            with lock:
+                compile_backends(source, parser_type)
+        else:
+            compile_backends(source, parser_type)
+    start = time.perf_counter()
+    large_thread = threading.Thread(target=compile_source, args=(large_source,))
+    large_thread.start()
+    time.sleep(0.05)
+    latency = []
+    for i in range(small_count):
+        small_start = time.perf_counter()
+        compile_source(SMALL_SOURCE)
+        latency.append(time.perf_counter() - small_start)
+    large_thread.join()
+    return time.perf_counter() - start, sum(latency) / len(latency), max(latency)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='threaded compile benchmark')
+    arg_parser.add_argument('--small', type=int, default=10, help='number of small compiles')
+    arg_parser.add_argument('--blocks', type=int, default=10, help='blocks in the large source')
+    args = arg_parser.parse_args()
+    create_parser()
+    large_source = arith_dims_source(args.blocks)
+    for name, serialized in [('serialized', True), ('contexts', False)]:
+        wall_time, mean, worst = run(large_source, args.small, serialized)
+        print("{:<11} {:>8.2f}s wall, small compiles: {:>7.3f}s mean latency, {:>7.3f}s worst".format(
+            name, wall_time, mean, worst))
+
+
+if __name__ == '__main__':
+    main()
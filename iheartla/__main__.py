@@ -3,6 +3,15 @@ from iheartla.la_tools.la_helper import DEBUG_MODE
 from iheartla.la_tools.la_logger import LaLogger
 import logging
 import argparse
+import contextlib
+import sys
+
+
+def size_hint(text):
+    dim, sep, size = text.partition('=')
+    if not sep or not dim.strip() or not size.strip().isdigit():
+        raise argparse.ArgumentTypeError("expected DIM=SIZE, e.g. n=1000")
+    return dim.strip(), int(size)
 
 
 if __name__ == '__main__':
@@ -12,7 +21,21 @@ if __name__ == '__main__':
     # arg_parser.add_argument('-i', '--input', help='File name containing I heart LA source code')
     arg_parser.add_argument('--GUI', action='store_true', help='Launch the GUI editor')
     arg_parser.add_argument('--regenerate-grammar', action='store_true', help='Regenerate grammar files')
-    arg_parser.add_argument('input', nargs='*', help='The I Heart LA files to compile.')
+    arg_parser.add_argument('--cache', action='store_true', help='Reuse compiled outputs of unchanged sources')
+    arg_parser.add_argument('--cache-dir', help='Directory of the compile cache')
+    arg_parser.add_argument('--cache-size', type=int, default=64, help='Maximum size of the compile cache in MB')
+    arg_parser.add_argument('--serve', action='store_true', help='Run as a compile server speaking JSON-RPC over stdin/stdout')
+    arg_parser.add_argument('--socket', help='Unix socket path for --serve instead of stdin/stdout')
+    arg_parser.add_argument('-j', '--jobs', type=int, help='Compile the input files across N processes and print a summary')
+    arg_parser.add_argument('--profile', action='store_true', help='Print the time, calls and allocated memory of the compile phases to stderr')
+    arg_parser.add_argument('--profile-format', choices=['table', 'json'], default='table', help='Format of the --profile report')
+    arg_parser.add_argument('--parallel-backends', action='store_true', help='Generate the outputs of every input concurrently, one process per output language')
+    arg_parser.add_argument('--emit-ir', action='store_true', help='Also save the typed IR of every input as .lair, it compiles without parsing again')
+    arg_parser.add_argument('--no-cse', action='store_true', help='Emit repeated subexpressions as written instead of evaluating them once (for debugging)')
+    arg_parser.add_argument('--no-rewrite', action='store_true', help='Emit the operators as written instead of the cheaper equivalent expressions (for debugging)')
+    arg_parser.add_argument('--size-hint', action='append', default=[], type=size_hint, metavar='DIM=SIZE', help='Expected size of a symbolic dimension, it picks the order of matrix products (repeatable)')
+    arg_parser.add_argument('--sparse-format', choices=['coo', 'csr'], help='scipy format of the sparse matrices built by the NumPy output (default coo)')
+    arg_parser.add_argument('input', nargs='*', help='The I Heart LA files (or .lair IR files) to compile.')
     args = arg_parser.parse_args()
     if args.regenerate_grammar:
         la_helper.DEBUG_PARSER = True
@@ -21,7 +44,13 @@ if __name__ == '__main__':
     else:
         from iheartla.compiler import show_gui
         from iheartla.la_parser.parser import compile_la_file, ParserTypeEnum
-        if args.GUI:
+        if args.cache:
+            from iheartla.la_tools.la_cache import CompileCache
+            CompileCache.getInstance().set_enabled(True, args.cache_dir, args.cache_size * 1024 * 1024)
+        if args.serve:
+            from iheartla.server import serve
+            serve(args.socket)
+        elif args.GUI:
             show_gui()
         elif args.input:
             # output all defaults (unless outputs present)
@@ -34,9 +63,48 @@ if __name__ == '__main__':
                 for out in out_list:
                     assert out in out_dict, "Parameters after -o or --output can only be numpy, eigen, latex, or matlab"
                     parser_type = parser_type | out_dict[out]
-            try:
-                for input in args.input: compile_la_file(input, parser_type)
-            except:
-                exit(1)
+            codegen_options = {}
+            if args.no_cse:
+                codegen_options['cse'] = False
+            if args.no_rewrite:
+                codegen_options['rewrite_rules'] = []
+            if args.size_hint:
+                codegen_options['size_hints'] = dict(args.size_hint)
+            if args.sparse_format:
+                codegen_options['sparse_format'] = args.sparse_format
+            if codegen_options:
+                # worker processes and the compile cache pick them up from the code generators
+                from iheartla.la_parser.parser import set_codegen_options
+                set_codegen_options(parser_type, **codegen_options)
+            executor = None
+            if args.parallel_backends and args.jobs is None:
+                from iheartla.batch import backend_pool
+                executor = backend_pool(parser_type)
+            # shuts the worker processes down however the compile ends
+            with executor or contextlib.nullcontext():
+                if args.jobs is not None:
+                    from iheartla.batch import run_batch
+                    assert "-" not in args.input, "Standard input can't be compiled in batch mode"
+                    assert not args.profile, "--profile can't be used with --jobs"
+                    assert not args.emit_ir, "--emit-ir can't be used with --jobs"
+                    assert not args.parallel_backends, "--parallel-backends can't be used with --jobs"
+                    if not run_batch(args.input, parser_type, args.jobs):
+                        exit(1)
+                elif args.profile:
+                    from iheartla.la_tools.la_profiler import LaProfiler
+                    failed = False
+                    with LaProfiler() as profiler:
+                        try:
+                            for input in args.input: compile_la_file(input, parser_type, args.emit_ir, executor)
+                        except:
+                            failed = True
+                    print(profiler.format_json() if args.profile_format == 'json' else profiler.format_table(), file=sys.stderr)
+                    if failed:
+                        exit(1)
+                else:
+                    try:
+                        for input in args.input: compile_la_file(input, parser_type, args.emit_ir, executor)
+                    except:
+                        exit(1)
         else:
             show_gui()
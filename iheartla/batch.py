@@ -0,0 +1,107 @@
+import os
+import sys
+import time
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from .la_parser.parser import compile_backends, get_compile_error, get_file_name, get_codegen_options, \
+    set_codegen_options, ParserTypeEnum
+from .la_tools.la_helper import save_to_file_atomic
+from .la_tools.la_logger import LaLogger
+from .la_tools.la_cache import CompileCache
+
+OUTPUT_SUFFIX = [(ParserTypeEnum.NUMPY, ".py"), (ParserTypeEnum.EIGEN, ".cpp"),
+                 (ParserTypeEnum.LATEX, ".tex"), (ParserTypeEnum.MATLAB, ".m")]
+
+
+class BatchResult(object):
+    def __init__(self, la_file, error=None, seconds=0, outputs=None):
+        self.la_file = la_file
+        self.error = error      # message, None on success
+        self.seconds = seconds
+        self.outputs = outputs if outputs is not None else []
+
+
+def init_worker(log_level, cache_settings, codegen_options=None):
+    # every worker process owns its parser manager, type walker and code generators, configured like the parent's
+    LaLogger.getInstance().set_level(log_level)
+    if cache_settings is not None:
+        CompileCache.getInstance().set_enabled(True, *cache_settings)
+    for cur_type, options in (codegen_options or {}).items():
+        set_codegen_options(cur_type, **options)
+
+
+def compile_file(la_file, parser_type):
+    """
+    Compile one file and write its outputs atomically
+    :return: BatchResult
+    """
+    start = time.time()
+    outputs = []
+    try:
+        with open(la_file, 'r') as f:
+            content = f.read()
+        # mathjax is never written to a file
+        results = compile_backends(content, parser_type & ~ParserTypeEnum.MATHJAX, func_name=get_file_name(la_file))
+        for cur_type, suffix in OUTPUT_SUFFIX:
+            if parser_type & cur_type:
+                out_file = str(Path(la_file).with_suffix(suffix))
+                save_to_file_atomic(results[cur_type], out_file)
+                outputs.append(out_file)
+    except IOError as e:
+        return BatchResult(la_file, "IO Error!:{}".format(e), time.time() - start, outputs)
+    except Exception as e:
+        return BatchResult(la_file, get_compile_error(e), time.time() - start, outputs)
+    return BatchResult(la_file, None, time.time() - start, outputs)
+
+
+def compile_files(la_files, parser_type, jobs=1):
+    """
+    Compile the files across a process pool, a failing file doesn't stop the others
+    :return: list of BatchResult in the order of la_files
+    """
+    if jobs <= 1 or len(la_files) <= 1:
+        return [compile_file(la_file, parser_type) for la_file in la_files]
+    cache = CompileCache.getInstance()
+    cache_settings = (cache.cache_dir, cache.max_size) if cache.enabled else None
+    log_level = LaLogger.getInstance().level
+    with ProcessPoolExecutor(max_workers=min(jobs, len(la_files)), initializer=init_worker,
+                             initargs=(log_level, cache_settings, get_codegen_options(parser_type))) as executor:
+        futures = [executor.submit(compile_file, la_file, parser_type) for la_file in la_files]
+        return [future.result() for future in futures]
+
+
+def backend_pool(parser_type):
+    """
+    Process pool for walk_backends with a worker per backend, at most one per CPU
+    :return: ProcessPoolExecutor, None if it would only have one worker, the backends then run in this process
+    """
+    backends = sum(1 for cur_type, suffix in OUTPUT_SUFFIX if parser_type & cur_type)
+    workers = min(backends, os.cpu_count() or 1)
+    if workers <= 1:
+        return None
+    return ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                               initargs=(LaLogger.getInstance().level, None, get_codegen_options(parser_type)))
+
+
+def print_summary(results, wall_time, out_file=None):
+    out_file = out_file or sys.stdout
+    failed = [result for result in results if result.error is not None]
+    for result in failed:
+        print("{}:\n{}".format(result.la_file, result.error), file=out_file)
+    name_width = max(len(result.la_file) for result in results)
+    for result in results:
+        print("{}  {:>8.2f}s  {}".format(result.la_file.ljust(name_width), result.seconds,
+                                        "FAILED" if result.error is not None else "ok"), file=out_file)
+    print("{} files, {} failed, {:.2f}s compile time, {:.2f}s wall time".format(
+        len(results), len(failed), sum(result.seconds for result in results), wall_time), file=out_file)
+
+
+def run_batch(la_files, parser_type, jobs=1):
+    """
+    used for command line: -j N
+    :return: whether every file compiled
+    """
+    start = time.time()
+    results = compile_files(la_files, parser_type, jobs)
+    print_summary(results, time.time() - start)
+    return all(result.error is None for result in results)
@@ -45,6 +45,12 @@ ARGMIN = /argmin/;
 ARGMAX = /argmax/;
 INT = /int/;
 SPARSE = /sparse/;
+SYMMETRIC = /symmetric/;
+POSITIVE_DEFINITE = /positive definite/ | /SPD/;
+DIAGONAL = /diagonal/;
+LOWER_TRIANGULAR = /lower triangular/;
+UPPER_TRIANGULAR = /upper triangular/;
+BANDED = /banded/;
 IF = /if/;
 OTHERWISE = /otherwise/;
 IN = /∈/;
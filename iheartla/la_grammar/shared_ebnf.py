@@ -22,6 +22,16 @@ matrix_type::MatrixType
 
 matrix_attribute
     = SPARSE
+    | SYMMETRIC
+    | POSITIVE_DEFINITE
+    | DIAGONAL
+    | LOWER_TRIANGULAR
+    | UPPER_TRIANGULAR
+    | banded_attribute
+    ;
+
+banded_attribute
+    = BANDED {hspace} '(' {hspace} width:/[0-9]+/ {hspace} ')'
     ;
 
 vector_type::VectorType
@@ -80,7 +80,9 @@ class grammardefaultParser(Parser):
             **kwargs
         )
         self.new_id_list = []
+        self.new_id_pattern = None
         self.new_func_list = []
+        self.new_func_pattern = None
         self.builtin_list = []
         self.const_e = False
 
@@ -276,6 +278,35 @@ class grammardefaultParser(Parser):
     def _SPARSE_(self):  # noqa
         self._pattern('sparse')
 
+    @tatsumasu()
+    def _SYMMETRIC_(self):  # noqa
+        self._pattern('symmetric')
+
+    @tatsumasu()
+    def _POSITIVE_DEFINITE_(self):  # noqa
+        with self._choice():
+            with self._option():
+                self._pattern('positive definite')
+            with self._option():
+                self._pattern('SPD')
+            self._error('no available options')
+
+    @tatsumasu()
+    def _DIAGONAL_(self):  # noqa
+        self._pattern('diagonal')
+
+    @tatsumasu()
+    def _LOWER_TRIANGULAR_(self):  # noqa
+        self._pattern('lower triangular')
+
+    @tatsumasu()
+    def _UPPER_TRIANGULAR_(self):  # noqa
+        self._pattern('upper triangular')
+
+    @tatsumasu()
+    def _BANDED_(self):  # noqa
+        self._pattern('banded')
+
     @tatsumasu()
     def _IF_(self):  # noqa
         self._pattern('if')
@@ -3571,7 +3602,46 @@ class grammardefaultParser(Parser):
 
     @tatsumasu()
     def _matrix_attribute_(self):  # noqa
-        self._SPARSE_()
+        with self._choice():
+            with self._option():
+                self._SPARSE_()
+            with self._option():
+                self._SYMMETRIC_()
+            with self._option():
+                self._POSITIVE_DEFINITE_()
+            with self._option():
+                self._DIAGONAL_()
+            with self._option():
+                self._LOWER_TRIANGULAR_()
+            with self._option():
+                self._UPPER_TRIANGULAR_()
+            with self._option():
+                self._banded_attribute_()
+            self._error('no available options')
+
+    @tatsumasu()
+    def _banded_attribute_(self):  # noqa
+        self._BANDED_()
+
+        def block0():
+            self._hspace_()
+        self._closure(block0)
+        self._token('(')
+
+        def block1():
+            self._hspace_()
+        self._closure(block1)
+        self._pattern('[0-9]+')
+        self.name_last_node('width')
+
+        def block3():
+            self._hspace_()
+        self._closure(block3)
+        self._token(')')
+        self.ast._define(
+            ['width'],
+            []
+        )
 
     @tatsumasu('VectorType')
     def _vector_type_(self):  # noqa
@@ -4641,9 +4711,8 @@ class grammardefaultParser(Parser):
     def _func_id_(self):  # noqa
         if len(self.new_func_list) > 0:
             with self._choice():
-                for new_id in self.new_func_list:
-                    with self._option():
-                        self._pattern(new_id)
+                with self._option():
+                    self._pattern(self.new_func_pattern)
                 self._error('no available options')
         else:
             # default
@@ -4656,9 +4725,8 @@ class grammardefaultParser(Parser):
                 with self._option():
                     with self._group():
                         with self._choice():
-                            for new_id in self.new_id_list:
-                                with self._option():
-                                    self._pattern(new_id)
+                            with self._option():
+                                self._pattern(self.new_id_pattern)
                             self._error('no available options')
                     self.name_last_node('const')
                 with self._option():
@@ -4670,9 +4738,8 @@ class grammardefaultParser(Parser):
                                         with self._choice():
                                             with self._option():
                                                 self._KEYWORDS_()
-                                            for new_id in self.new_id_list:
-                                                with self._option():
-                                                    self._pattern(new_id)
+                                            with self._option():
+                                                self._pattern(self.new_id_pattern)
                                             self._error('no available options')
                                 self._pattern('[A-Za-z\\p{Ll}\\p{Lu}\\p{Lo}]\\p{M}*')
                                 self.name_last_node('value')
@@ -4775,6 +4842,24 @@ class grammardefaultSemantics(object):
     def SPARSE(self, ast):  # noqa
         return ast
 
+    def SYMMETRIC(self, ast):  # noqa
+        return ast
+
+    def POSITIVE_DEFINITE(self, ast):  # noqa
+        return ast
+
+    def DIAGONAL(self, ast):  # noqa
+        return ast
+
+    def LOWER_TRIANGULAR(self, ast):  # noqa
+        return ast
+
+    def UPPER_TRIANGULAR(self, ast):  # noqa
+        return ast
+
+    def BANDED(self, ast):  # noqa
+        return ast
+
     def IF(self, ast):  # noqa
         return ast
 
@@ -5201,6 +5286,9 @@ class grammardefaultSemantics(object):
     def matrix_attribute(self, ast):  # noqa
         return ast
 
+    def banded_attribute(self, ast):  # noqa
+        return ast
+
     def vector_type(self, ast):  # noqa
         return ast
 
@@ -272,6 +272,35 @@ class grammarinitParser(Parser):
     def _SPARSE_(self):  # noqa
         self._pattern('sparse')
 
+    @tatsumasu()
+    def _SYMMETRIC_(self):  # noqa
+        self._pattern('symmetric')
+
+    @tatsumasu()
+    def _POSITIVE_DEFINITE_(self):  # noqa
+        with self._choice():
+            with self._option():
+                self._pattern('positive definite')
+            with self._option():
+                self._pattern('SPD')
+            self._error('no available options')
+
+    @tatsumasu()
+    def _DIAGONAL_(self):  # noqa
+        self._pattern('diagonal')
+
+    @tatsumasu()
+    def _LOWER_TRIANGULAR_(self):  # noqa
+        self._pattern('lower triangular')
+
+    @tatsumasu()
+    def _UPPER_TRIANGULAR_(self):  # noqa
+        self._pattern('upper triangular')
+
+    @tatsumasu()
+    def _BANDED_(self):  # noqa
+        self._pattern('banded')
+
     @tatsumasu()
     def _IF_(self):  # noqa
         self._pattern('if')
@@ -3567,7 +3596,46 @@ class grammarinitParser(Parser):
 
     @tatsumasu()
     def _matrix_attribute_(self):  # noqa
-        self._SPARSE_()
+        with self._choice():
+            with self._option():
+                self._SPARSE_()
+            with self._option():
+                self._SYMMETRIC_()
+            with self._option():
+                self._POSITIVE_DEFINITE_()
+            with self._option():
+                self._DIAGONAL_()
+            with self._option():
+                self._LOWER_TRIANGULAR_()
+            with self._option():
+                self._UPPER_TRIANGULAR_()
+            with self._option():
+                self._banded_attribute_()
+            self._error('no available options')
+
+    @tatsumasu()
+    def _banded_attribute_(self):  # noqa
+        self._BANDED_()
+
+        def block0():
+            self._hspace_()
+        self._closure(block0)
+        self._token('(')
+
+        def block1():
+            self._hspace_()
+        self._closure(block1)
+        self._pattern('[0-9]+')
+        self.name_last_node('width')
+
+        def block3():
+            self._hspace_()
+        self._closure(block3)
+        self._token(')')
+        self.ast._define(
+            ['width'],
+            []
+        )
 
     @tatsumasu('VectorType')
     def _vector_type_(self):  # noqa
@@ -4699,6 +4767,24 @@ class grammarinitSemantics(object):
     def SPARSE(self, ast):  # noqa
         return ast
 
+    def SYMMETRIC(self, ast):  # noqa
+        return ast
+
+    def POSITIVE_DEFINITE(self, ast):  # noqa
+        return ast
+
+    def DIAGONAL(self, ast):  # noqa
+        return ast
+
+    def LOWER_TRIANGULAR(self, ast):  # noqa
+        return ast
+
+    def UPPER_TRIANGULAR(self, ast):  # noqa
+        return ast
+
+    def BANDED(self, ast):  # noqa
+        return ast
+
     def IF(self, ast):  # noqa
         return ast
 
@@ -5125,6 +5211,9 @@ class grammarinitSemantics(object):
     def matrix_attribute(self, ast):  # noqa
         return ast
 
+    def banded_attribute(self, ast):  # noqa
+        return ast
+
     def vector_type(self, ast):  # noqa
         return ast
 
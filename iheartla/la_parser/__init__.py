@@ -3,8 +3,12 @@ __all__ = ["codegen",
            "codegen_latex",
            "codegen_numpy",
            "ir",
+           "ir_archive",
+           "ir_chain",
+           "ir_cse",
            "ir_mutator",
            "ir_printer",
+           "ir_rewriter",
            "ir_visitor",
            "la_types",
            "parser",
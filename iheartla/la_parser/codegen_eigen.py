@@ -1,10 +1,15 @@
 from .codegen import *
 from .type_walker import *
+from .ir_rewriter import DEFAULT_RULES
 
 
 class CodeGenEigen(CodeGen):
     def __init__(self):
         super().__init__(ParserTypeEnum.EIGEN)
+        self.cse = True
+        self.cse_buffers = True
+        self.reorder_products = True
+        self.rewrite_rules = list(DEFAULT_RULES)
 
     def init_type(self, type_walker, func_name):
         super().init_type(type_walker, func_name)
@@ -15,6 +20,18 @@ class CodeGenEigen(CodeGen):
             self.pre_str += '#include <unsupported/Eigen/MatrixFunctions>\n'
         self.pre_str += '\n'
 
+    def get_cse_assignment(self, name, content, la_type):
+        return "    {} {} = {};\n".format(self.get_ctype(la_type), name, content)
+
+    def get_buffer_declaration(self, name, la_type):
+        return "std::vector<{}> {};\n".format(self.get_ctype(la_type), name)
+
+    def get_buffer_append(self, name, content):
+        return "    {}.push_back({});\n".format(name, content)
+
+    def get_buffer_item(self, name, index):
+        return "{}.at({}-1)".format(name, index)
+
     def get_dim_check_str(self):
         check_list = []
         if len(self.same_dim_list) > 0:
@@ -107,6 +124,15 @@ class CodeGenEigen(CodeGen):
             type_str = "std::function<{}({})>".format(self.get_ctype(la_type.ret), self.get_func_params_str(la_type))
         return type_str
 
+    def get_param_ctype(self, parameter):
+        """
+        :return: C++ type of the parameter, a diagonal matrix is passed as the vector on its diagonal
+        """
+        la_type = self.symtable[parameter]
+        if parameter in self.diagonal_params:
+            la_type = VectorType(rows=la_type.rows, element_type=la_type.element_type)
+        return self.get_ctype(la_type)
+
     def get_rand_test_str(self, la_type, rand_int_max):
         rand_test = ''
         if la_type.is_matrix():
@@ -303,6 +329,10 @@ class CodeGenEigen(CodeGen):
         dim_content = ""
         dim_defined_dict = {}
         dim_defined_list = []
+        self.init_diagonal_params(node)
+        # the dense matrix keeps the name of an expanded diagonal parameter
+        diagonal_names = {parameter: self.generate_var_name("{}_diagonal".format(parameter)) for parameter in self.parameters
+                          if parameter in self.expanded_params}
         if self.dim_dict:
             for key, target_dict in self.dim_dict.items():
                 if key in self.parameters:
@@ -343,6 +373,8 @@ class CodeGenEigen(CodeGen):
                         dim_content += "    const long {} = {}[0].rows();\n".format(key, target)
                     elif target_dict[target] == 2:
                         dim_content += "    const long {} = {}[0].cols();\n".format(key, target)
+                elif target in self.diagonal_params:
+                    dim_content += "    const long {} = {}.size();\n".format(key, diagonal_names.get(target, target))
                 elif self.symtable[target].is_matrix():
                     if target_dict[target] == 0:
                         dim_content += "    const long {} = {}.rows();\n".format(key, target)
@@ -357,12 +389,12 @@ class CodeGenEigen(CodeGen):
         par_des_list = []
         test_par_list = []
         for parameter in self.parameters:
-            main_declaration.append("    {} {};".format(self.get_ctype(self.symtable[parameter]), parameter))
-            par_des_list.append("const {} & {}".format(self.get_ctype(self.symtable[parameter]), parameter))
-            test_par_list.append("{} & {}".format(self.get_ctype(self.symtable[parameter]), parameter))
-            if self.symtable[parameter].desc:
+            main_declaration.append("    {} {};".format(self.get_param_ctype(parameter), parameter))
+            par_des_list.append("const {} & {}".format(self.get_param_ctype(parameter), diagonal_names.get(parameter, parameter)))
+            test_par_list.append("{} & {}".format(self.get_param_ctype(parameter), parameter))
+            if self.desc_dict.get(parameter):
                 show_doc = True
-                doc.append('@param {} {}'.format(parameter, self.symtable[parameter].desc))
+                doc.append('@param {} {}'.format(parameter, self.desc_dict[parameter]))
             if self.symtable[parameter].is_sequence():
                 ele_type = self.symtable[parameter].element_type
                 data_type = ele_type.element_type
@@ -414,6 +446,15 @@ class CodeGenEigen(CodeGen):
                     test_content += set_content
                 if parameter not in test_generated_sym_set:
                     test_content.append('    }')
+            elif parameter in self.diagonal_params:
+                element_type = self.symtable[parameter].element_type
+                if isinstance(element_type, LaVarType) and element_type.is_scalar() and element_type.is_int:
+                    test_content.append('    {} = Eigen::VectorXi::Random({});'.format(parameter, self.symtable[parameter].rows))
+                else:
+                    test_content.append('    {} = Eigen::VectorXd::Random({});'.format(parameter, self.symtable[parameter].rows))
+                # the vector on the diagonal, it is square
+                if not self.symtable[parameter].is_dim_constant() and parameter not in dim_defined_dict:
+                    type_checks.append('    assert( {}.size() == {} );'.format(diagonal_names.get(parameter, parameter), self.symtable[parameter].rows))
             elif self.symtable[parameter].is_matrix():
                 element_type = self.symtable[parameter].element_type
                 sparse_view = ''
@@ -432,6 +473,7 @@ class CodeGenEigen(CodeGen):
                     test_content.append(
                         '    {} = Eigen::MatrixXd::Random({}, {}){};'.format(parameter, self.symtable[parameter].rows,
                                                                            self.symtable[parameter].cols,sparse_view))
+                test_content += self.get_structured_test_list(parameter, self.symtable[parameter])
                 if not self.symtable[parameter].is_dim_constant() or self.symtable[parameter].sparse:
                     if not (parameter in dim_defined_dict and dim_defined_dict[parameter] == 0):
                         type_checks.append(
@@ -481,6 +523,8 @@ class CodeGenEigen(CodeGen):
         content += dim_content
         type_checks += self.get_dim_check_str()
         type_checks += self.get_arith_dim_check_str()
+        type_checks += ['    const {} {} = {}.asDiagonal();'.format(self.get_ctype(self.symtable[parameter]), parameter, name)
+                        for parameter, name in diagonal_names.items()]
         if len(type_checks) > 0:
             content += '\n'.join(type_checks) + '\n\n'
         # statements
@@ -529,7 +573,7 @@ class CodeGenEigen(CodeGen):
         sub = self.visit(node.id).content
         # name convention
         name_convention = {}
-        for var in node.symbols:
+        for var in sorted(node.symbols):
             if self.contain_subscript(var):
                 var_ids = self.get_all_ids(var)
                 var_subs = var_ids[1]
@@ -550,9 +594,9 @@ class CodeGenEigen(CodeGen):
             cond_info = self.visit(node.cond, **kwargs)
             cond_content = "if(" + cond_info.content + "){\n"
         kwargs[WALK_TYPE] = WalkTypeEnum.RETRIEVE_EXPRESSION
-        content = []
         exp_info = self.visit(node.exp)
         exp_str = exp_info.content
+        content = self.get_buffer_declarations(node)
         if self.symtable[assign_id].is_matrix():
             if self.symtable[assign_id].sparse:
                 content.append("{} {}({}, {});\n".format(self.get_ctype(self.symtable[assign_id]), assign_id, self.symtable[
@@ -644,7 +688,10 @@ class CodeGenEigen(CodeGen):
                 else:
                     content = "sqrt(({}).transpose()*{}*({}))".format(value, sub_info.content, value)
         elif type_info.la_type.is_matrix():
-            if node.norm_type == NormType.NormDet:
+            structured = self.get_structured_content(node, node.value, value, pre_list)
+            if structured is not None:
+                content = structured
+            elif node.norm_type == NormType.NormDet:
                 content = "({}).determinant()".format(value)
             elif node.norm_type == NormType.NormFrobenius:
                 content = "({}).norm()".format(value)
@@ -681,6 +728,9 @@ class CodeGenEigen(CodeGen):
                     pre_list.append("    {} {}({}, {});\n".format(self.get_ctype(node.base.la_type), identity_name, node.base.la_type.rows, node.base.la_type.cols))
                     pre_list.append("    {}.setIdentity();\n".format(identity_name))
                     base_info.content = "{}.solve({})".format(solver_name, identity_name)
+                elif self.get_structure(node.base) is not None:
+                    structured = self.get_structured_content(node, node.base, base_info.content, pre_list)
+                    base_info.content = structured if structured is not None else "{}.inverse()".format(base_info.content)
                 else:
                     base_info.content = "{}.inverse()".format(base_info.content)
         else:
@@ -707,26 +757,199 @@ class CodeGenEigen(CodeGen):
             pre_list.append("    {}.compute({});\n".format(solver_name, left_info.content))
             left_info.content = "{}.solve({})".format(solver_name, right_info.content)
         else:
+            right_content = right_info.content
             if node.right.la_type.is_matrix() and node.right.la_type.sparse:
-                left_info.content = "{}.colPivHouseholderQr().solve(({}).toDense())".format(left_info.content, right_info.content)
+                right_content = "({}).toDense()".format(right_content)
+            structured = self.get_structured_solve(node.left, left_info.content, right_content)
+            if structured is not None:
+                left_info.content = structured
             else:
-                left_info.content = "{}.colPivHouseholderQr().solve({})".format(left_info.content, right_info.content)
+                left_info.content = "{}.colPivHouseholderQr().solve({})".format(left_info.content, right_content)
         left_info.pre_list += pre_list
         return left_info
 
+    def get_structured_test_list(self, parameter, la_type):
+        """
+        :return: statements giving the random matrix its structure
+        """
+        test_list = []
+        if la_type.is_diagonal_structure():
+            test_list.append('    {} = Eigen::MatrixXd({}.diagonal().asDiagonal());'.format(parameter, parameter))
+        elif la_type.is_triangular():
+            test_list.append('    {} = Eigen::MatrixXd({}.triangularView<{}>());'.format(parameter, parameter, self.get_triangle(la_type)))
+        if la_type.has_structure(MatrixStructureEnum.STRUCT_POSITIVE_DEFINITE):
+            # diagonally dominant
+            test_list.append('    {} = ({} + {}.transpose()).eval() + 2 * {} * Eigen::MatrixXd::Identity({}, {});'.format(
+                parameter, parameter, parameter, la_type.rows, la_type.rows, la_type.rows))
+        elif la_type.has_structure(MatrixStructureEnum.STRUCT_SYMMETRIC) and not la_type.is_diagonal_structure():
+            test_list.append('    {} = ({} + {}.transpose()).eval();'.format(parameter, parameter, parameter))
+        return test_list
+
+    def get_structured_solve(self, left, left_content, right_content):
+        """
+        :return: code of the solver for the structure of its left side, None if the structure doesn't help
+        """
+        la_type = self.get_structure(left)
+        if la_type is None:
+            return None
+        if la_type.is_diagonal_structure():
+            if not re.fullmatch(r'\w+', right_content):
+                right_content = "({})".format(right_content)
+            return "{}.asDiagonal().inverse() * {}".format(self.get_diagonal_content(left, left_content), right_content)
+        if la_type.is_triangular():
+            return "{}.triangularView<{}>().solve({})".format(left_content, self.get_triangle(la_type), right_content)
+        if la_type.has_structure(MatrixStructureEnum.STRUCT_POSITIVE_DEFINITE):
+            return "{}.llt().solve({})".format(left_content, right_content)
+        if la_type.has_structure(MatrixStructureEnum.STRUCT_SYMMETRIC):
+            return "{}.ldlt().solve({})".format(left_content, right_content)
+        return None
+
+    def get_structured_content(self, node, operand, content, pre_list):
+        """
+        Kernel of node for the structure of its matrix operand
+        :param content: code of the operand
+        :return: code of node, None if the structure doesn't help
+        """
+        la_type = self.get_structure(operand)
+        if la_type is None:
+            return None
+        diagonal = self.get_diagonal_content(operand, content) if la_type.is_diagonal_structure() else None
+        if (node.is_node(IRNodeType.Power) and node.r) or (node.is_node(IRNodeType.MathFunc) and node.func_type == MathFuncType.MathFuncInv):
+            if diagonal is not None:
+                return "{}.cwiseInverse().asDiagonal().toDenseMatrix()".format(diagonal)
+            identity = "Eigen::MatrixXd::Identity({}, {})".format(la_type.rows, la_type.rows)
+            if la_type.is_triangular():
+                return "{}.triangularView<{}>().solve({})".format(content, self.get_triangle(la_type), identity)
+            if la_type.has_structure(MatrixStructureEnum.STRUCT_POSITIVE_DEFINITE):
+                return "{}.llt().solve({})".format(content, identity)
+        elif (node.is_node(IRNodeType.Norm) and node.norm_type == NormType.NormDet) or (node.is_node(IRNodeType.MathFunc) and node.func_type == MathFuncType.MathFuncDet):
+            if diagonal is not None:
+                return "{}.prod()".format(diagonal)
+            if la_type.is_triangular():
+                return "({}).diagonal().prod()".format(content)
+        elif node.is_node(IRNodeType.Norm) and node.norm_type == NormType.NormFrobenius:
+            if diagonal is not None:
+                return "{}.norm()".format(diagonal)
+        elif node.is_node(IRNodeType.Norm) and node.norm_type == NormType.NormNuclear:
+            if diagonal is not None:
+                return "{}.cwiseAbs().sum()".format(diagonal)
+            if la_type.has_structure(MatrixStructureEnum.STRUCT_POSITIVE_DEFINITE):
+                return "({}).trace()".format(content)
+            if la_type.has_structure(MatrixStructureEnum.STRUCT_SYMMETRIC):
+                # the singular values are the absolute eigenvalues
+                eigen_name = self.generate_var_name("eigen")
+                pre_list.append("    Eigen::SelfAdjointEigenSolver<Eigen::MatrixXd> {}({}, Eigen::EigenvaluesOnly);\n".format(eigen_name, content))
+                return "{}.eigenvalues().cwiseAbs().sum()".format(eigen_name)
+        elif node.is_node(IRNodeType.MathFunc) and diagonal is not None:
+            if node.func_type == MathFuncType.MathFuncTrace:
+                return "{}.sum()".format(diagonal)
+            if node.func_type == MathFuncType.MathFuncDiag:
+                return diagonal
+        return None
+
+    def get_diagonal_content(self, node, content):
+        """
+        :param content: code of the diagonal matrix node
+        :return: code of the vector on the diagonal
+        """
+        compact = self.get_compact_diagonal(node)
+        if compact is not None and compact.main_id not in self.expanded_params:
+            # the transpose has the same diagonal
+            return self.visit(compact).content
+        if not re.fullmatch(r'\w+', content):
+            content = "({})".format(content)
+        return "{}.diagonal()".format(content)
+
+    def get_diagonal_operands(self, node):
+        operands = super().get_diagonal_operands(node)
+        if node.is_node(IRNodeType.Mul) and node not in self.chain_dict:
+            operands += [operand for operand, other in [(node.left, node.right), (node.right, node.left)]
+                         if self.is_diagonal_operand(operand, other)]
+        return operands
+
+    def get_triangle(self, la_type):
+        return "Eigen::Lower" if la_type.has_structure(MatrixStructureEnum.STRUCT_LOWER_TRIANGULAR) else "Eigen::Upper"
+
     def visit_sparse_matrix(self, node, **kwargs):
         assign_node = node.get_ancestor(IRNodeType.Assignment)
         type_info = node
         cur_m_id = type_info.symbol
         pre_list = []
-        if_info = self.visit(node.ifs, **kwargs)
-        pre_list += if_info.content
+        support_content = None
+        support = self.get_sparse_support(node.ifs, assign_node.left.subs)
+        if support is not None:
+            support_content = self.get_sparse_support_content(node, support, **kwargs)
+        if support_content is not None:
+            pre_list += support_content
+        else:
+            if_info = self.visit(node.ifs, **kwargs)
+            pre_list += if_info.content
         pre_list.append(
             '    {}.setFromTriplets(tripletList_{}.begin(), tripletList_{}.end());\n'.format(assign_node.left.get_main_id(),
                                                                                              assign_node.left.get_main_id(),
                                                                                              assign_node.left.get_main_id()))
         return CodeNodeInfo(cur_m_id, pre_list)
 
+    def get_sparse_support_content(self, node, support, **kwargs):
+        """
+        Push triplets by iterating over the support only, not over every (i, j)
+        :return: list of lines, None if the support can't be bounded
+        """
+        assign_node = node.get_ancestor(IRNodeType.Assignment)
+        subs = assign_node.left.subs
+        triplet_list = "tripletList_{}".format(assign_node.left.get_main_id())
+        counts = []
+        loops = []
+        for index, (sparse_if, kind, value) in enumerate(support):
+            guards = self.get_sparse_guards(support, index)
+            if guards is None:
+                continue
+            if kind == 'diagonal':
+                bounds = self.get_diagonal_bounds(node.la_type, value, 'std::min<long>', 'std::max<long>')
+                if bounds is None:
+                    return None
+                start, stop, count = bounds
+                loop = ["    for( int {}={}; {}<{}; {}++){{\n".format(subs[0], start, subs[0], stop, subs[0])]
+                if value == 0:
+                    loop.append("        int {} = {};\n".format(subs[1], subs[0]))
+                else:
+                    loop.append("        int {} = {} {} {};\n".format(subs[1], subs[0], '+' if value > 0 else '-', abs(value)))
+            else:
+                loop_flag = value.loop
+                value.loop = True
+                in_info = self.visit(value, **kwargs)
+                value.loop = loop_flag
+                loop = in_info.pre_list + [self.update_prelist_str([in_info.content], '    ')]
+                count = "{}.size()".format(self.visit(value.set, **kwargs).content)
+            counts.append(count)
+            stat_info = self.get_sparse_stat(sparse_if, subs, **kwargs)
+            body = stat_info.pre_list
+            body.append('{}.push_back(Eigen::Triplet<double>({}-1, {}-1, {}));\n'.format(triplet_list, subs[0], subs[1], stat_info.content))
+            if len(guards) > 0:
+                guard_list = []
+                for guard in guards:
+                    cond_info = self.visit(guard.cond, **kwargs)
+                    loop += cond_info.pre_list
+                    guard_list.append("({})".format(cond_info.content))
+                loop.append("        if(!({})){{\n".format(' || '.join(guard_list)))
+                loop.append(self.update_prelist_str(body, '            '))
+                loop.append("        }\n")
+            else:
+                loop.append(self.update_prelist_str(body, '        '))
+            loop.append("    }\n")
+            loops += loop
+        content = ["    {}.reserve({}.size() + {});\n".format(triplet_list, triplet_list, ' + '.join(counts) if len(counts) > 0 else '0')]
+        content += loops
+        return content
+
+    def get_sparse_stat(self, node, subs, **kwargs):
+        self.convert_matrix = True
+        stat_info = self.visit(node.stat, **kwargs)
+        self.convert_matrix = False
+        # replace '_ij' with '(i,j)'
+        stat_info.content = stat_info.content.replace('_{}{}'.format(subs[0], subs[1]), '({}, {})'.format(subs[0], subs[1]))
+        return stat_info
+
     def visit_sparse_ifs(self, node, **kwargs):
         pre_list = []
         if node.in_cond_only:
@@ -1052,12 +1275,25 @@ class CodeGenEigen(CodeGen):
         return CodeNodeInfo(content)
 
     def visit_mul(self, node, **kwargs):
+        if node in self.chain_dict:
+            return self.visit_mul_chain(node, ' * ', **kwargs)
         left_info = self.visit(node.left, **kwargs)
         right_info = self.visit(node.right, **kwargs)
+        if self.is_diagonal_operand(node.left, node.right):
+            left_info.content = "{}.asDiagonal()".format(self.get_diagonal_content(node.left, left_info.content))
+        if self.is_diagonal_operand(node.right, node.left):
+            right_info.content = "{}.asDiagonal()".format(self.get_diagonal_content(node.right, right_info.content))
         left_info.content = left_info.content + ' * ' + right_info.content
         left_info.pre_list += right_info.pre_list
         return left_info
 
+    def is_diagonal_operand(self, node, other):
+        """
+        :return: whether node is a diagonal matrix scaling the rows or columns of the array other
+        """
+        la_type = self.get_structure(node)
+        return la_type is not None and la_type.is_diagonal_structure() and not other.la_type.is_scalar()
+
     def visit_div(self, node, **kwargs):
         left_info = self.visit(node.left, **kwargs)
         right_info = self.visit(node.right, **kwargs)
@@ -1141,7 +1377,7 @@ class CodeGenEigen(CodeGen):
                     content += "        {}({}-1, {}-1) = {};\n".format(sequence, left_subs[0], left_subs[0], right_info.content)
                     content += "    }"
                 else:
-                    for right_var in type_info.symbols:
+                    for right_var in sorted(type_info.symbols):
                         if sub_strs in right_var:
                             var_ids = self.get_all_ids(right_var)
                             right_info.content = right_info.content.replace(right_var, "{}({}, {})".format(var_ids[0], var_ids[1][0], var_ids[1][1]))
@@ -1170,7 +1406,7 @@ class CodeGenEigen(CodeGen):
             elif len(left_subs) == 1:  # sequence only
                 sequence = left_ids[0]  # y left_subs[0]
                 # replace sequence
-                for right_var in type_info.symbols:
+                for right_var in sorted(type_info.symbols):
                     if self.contain_subscript(right_var):
                         var_ids = self.get_all_ids(right_var)
                         right_info.content = right_info.content.replace(right_var,
@@ -1381,13 +1617,11 @@ class CodeGenEigen(CodeGen):
         index_j = self.generate_var_name('j')
         kronecker = self.generate_var_name('kron')
         pre_list = left_info.pre_list + right_info.pre_list
-        sparse = node.la_type.sparse
-        node.la_type.sparse = False
-        if node.la_type.is_dim_constant():
-            pre_list.append("    {} {};\n".format(self.get_ctype(node.la_type), kronecker))
+        dense_type = node.la_type.replace(sparse=False)
+        if dense_type.is_dim_constant():
+            pre_list.append("    {} {};\n".format(self.get_ctype(dense_type), kronecker))
         else:
-            pre_list.append("    {} {}({}, {});\n".format(self.get_ctype(node.la_type), kronecker, node.la_type.rows, node.la_type.cols))
-        node.la_type.sparse = sparse
+            pre_list.append("    {} {}({}, {});\n".format(self.get_ctype(dense_type), kronecker, dense_type.rows, dense_type.cols))
         pre_list.append("    for( int {}=0; {}<{}; {}++){{\n".format(index_i, index_i, node.left.la_type.rows, index_i))
         pre_list.append("        for( int {}=0; {}<{}; {}++){{\n".format(index_j, index_j, node.left.la_type.cols, index_j))
         if node.left.la_type.is_sparse_matrix():
@@ -1473,7 +1707,12 @@ class CodeGenEigen(CodeGen):
                     content = "{}.unaryExpr<double(*)(double)>(&std::sin).cwiseInverse()".format(params_content)
         else:
             # linear algebra
-            if node.func_type == MathFuncType.MathFuncTrace:
+            structured = None
+            if node.func_type in (MathFuncType.MathFuncTrace, MathFuncType.MathFuncDiag):
+                structured = self.get_structured_content(node, node.param, params_content, pre_list)
+            if structured is not None:
+                content = structured
+            elif node.func_type == MathFuncType.MathFuncTrace:
                 content = "({}).trace()".format(params_content)
             elif node.func_type == MathFuncType.MathFuncDiag:
                 if node.param.la_type.is_vector():
@@ -1485,7 +1724,9 @@ class CodeGenEigen(CodeGen):
                 content = '{}'.format(vec_name)
                 pre_list.append('    Eigen::VectorXd {}(Eigen::Map<Eigen::VectorXd>(((Eigen::MatrixXd)({})).data(), ({}).cols()*({}).rows()));;\n'.format(vec_name,params_content,params_content,params_content))
             elif node.func_type == MathFuncType.MathFuncDet:
-                content = "({}).determinant()".format(params_content)
+                content = self.get_structured_content(node, node.param, params_content, pre_list)
+                if content is None:
+                    content = "({}).determinant()".format(params_content)
             elif node.func_type == MathFuncType.MathFuncRank:
                 rank_name = self.generate_var_name("rank")
                 content = '{}.rank()'.format(rank_name)
@@ -1497,7 +1738,9 @@ class CodeGenEigen(CodeGen):
             elif node.func_type == MathFuncType.MathFuncOrth:
                 content = 'orth'
             elif node.func_type == MathFuncType.MathFuncInv:
-                content = "({}).inverse()".format(params_content)
+                content = self.get_structured_content(node, node.param, params_content, pre_list)
+                if content is None:
+                    content = "({}).inverse()".format(params_content)
         return CodeNodeInfo(content, pre_list=pre_list)
 
     def visit_fraction(self, node, **kwargs):
@@ -205,10 +205,28 @@ class CodeGenLatex(CodeGen):
         content = "{}^{{ {} \\times {} }}".format(type_str, id1, id2)
         if node.la_type.sparse:
             content += " \\mathit{ sparse}"
+        for name in self.get_structure_names(node.la_type):
+            content += " \\mathit{{ {}}}".format(name)
         if node.la_type.index_type:
             content += " \\mathit{ index}"
         return content
 
+    def get_structure_names(self, la_type):
+        if la_type.is_diagonal_structure():
+            return ['diagonal']
+        names = []
+        if la_type.has_structure(MatrixStructureEnum.STRUCT_POSITIVE_DEFINITE):
+            names.append('positive\\ definite')
+        elif la_type.has_structure(MatrixStructureEnum.STRUCT_SYMMETRIC):
+            names.append('symmetric')
+        if la_type.has_structure(MatrixStructureEnum.STRUCT_LOWER_TRIANGULAR):
+            names.append('lower\\ triangular')
+        elif la_type.has_structure(MatrixStructureEnum.STRUCT_UPPER_TRIANGULAR):
+            names.append('upper\\ triangular')
+        if la_type.has_structure(MatrixStructureEnum.STRUCT_BANDED):
+            names.append('banded({})'.format(la_type.bandwidth))
+        return names
+
     def visit_vector_type(self, node, **kwargs):
         id1 = self.visit(node.id1, **kwargs)
         type_str = '\\mathbb{R}'
@@ -1,11 +1,15 @@
 from .codegen import *
 from .type_walker import *
+from .ir_rewriter import DEFAULT_RULES, DIAGONAL_RULES
 import keyword
 
 
 class CodeGenMatlab(CodeGen):
     def __init__(self):
         super().__init__(ParserTypeEnum.MATLAB)
+        self.cse = True
+        self.reorder_products = True
+        self.rewrite_rules = DEFAULT_RULES + DIAGONAL_RULES
 
     def init_type(self, type_walker, func_name):
         super().init_type(type_walker, func_name)
@@ -14,6 +18,9 @@ class CodeGenMatlab(CodeGen):
         #self.pre_str += "\n\n"
         self.post_str = ''''''
 
+    def get_cse_assignment(self, name, content, la_type):
+        return "    {} = {};\n".format(name, content)
+
     def get_dim_check_str(self):
         check_list = []
         if len(self.same_dim_list) > 0:
@@ -217,6 +224,7 @@ class CodeGenMatlab(CodeGen):
         rand_int_max = 10
         dim_content = ""
         dim_defined_list = []
+        self.init_diagonal_params(node)
         if self.dim_dict:
             for key, target_dict in self.dim_dict.items():
                 if key in self.parameters or key in self.dim_seq_set:
@@ -252,15 +260,17 @@ class CodeGenMatlab(CodeGen):
                         dim_content += "    {} = size({}, 1);\n".format(key, target)
                     else:
                         dim_content += "    {} = size({}{{1}}, {});\n".format(key, target, target_dict[target])
+                elif target in self.diagonal_params:
+                    dim_content += "    {} = size({}, 1);\n".format(key, target)
                 else:
                     dim_content += "    {} = size({}, {});\n".format(key, target, target_dict[target]+1)
         # Handle sequences first
         test_generated_sym_set, seq_test_list = self.gen_same_seq_test()
         test_content += seq_test_list
         for parameter in self.parameters:
-            if self.symtable[parameter].desc:
+            if self.desc_dict.get(parameter):
                 show_doc = True
-                doc.append('    :param :{} :{}'.format(parameter, self.symtable[parameter].desc))
+                doc.append('    :param :{} :{}'.format(parameter, self.desc_dict[parameter]))
             if self.symtable[parameter].is_sequence():
                 ele_type = self.symtable[parameter].element_type
                 data_type = ele_type.element_type
@@ -358,6 +368,15 @@ class CodeGenMatlab(CodeGen):
                         else:
                             #type_declare.append('    {} = np.asarray({}, dtype={})'.format(parameter, parameter, "np.integer" if ele_type.is_integer_element() else "np.float64"))
                             test_content.append('        {} = {};'.format(parameter, self.randn_str(sizes)))
+            elif parameter in self.diagonal_params:
+                element_type = self.symtable[parameter].element_type
+                type_declare.append('    {} = reshape({},[],1);'.format(parameter, parameter))
+                if isinstance(element_type, LaVarType) and element_type.is_scalar() and element_type.is_int:
+                    test_content.append(test_indent+'    {} = randi({}, {}, 1);'.format(parameter, rand_int_max, self.symtable[parameter].rows))
+                else:
+                    test_content.append(test_indent+'    {} = randn({},1);'.format(parameter, self.symtable[parameter].rows))
+                # the vector on the diagonal, it is square
+                type_checks.append('    assert( numel({}) == {} );'.format(parameter, self.symtable[parameter].rows))
             elif self.symtable[parameter].is_matrix():
                 element_type = self.symtable[parameter].element_type
                 if isinstance(element_type, LaVarType):
@@ -390,6 +409,7 @@ class CodeGenMatlab(CodeGen):
                     else:
                         type_checks.append('    {} = np.asarray({})'.format(parameter, parameter))
                         test_content.append(test_indent+'    {} = randn({}, {});'.format(parameter, self.symtable[parameter].rows, self.symtable[parameter].cols))
+                test_content += [test_indent + line for line in self.get_structured_test_list(parameter, self.symtable[parameter])]
                 type_checks.append('    assert( isequal(size({}), [{}, {}]) );'.format(parameter, self.symtable[parameter].rows, self.symtable[parameter].cols))
             elif self.symtable[parameter].is_vector():
                 element_type = self.symtable[parameter].element_type
@@ -478,6 +498,7 @@ class CodeGenMatlab(CodeGen):
         content += dim_content
         type_checks += self.get_dim_check_str()
         type_checks += self.get_arith_dim_check_str()
+        type_checks += ['    {} = diag({});'.format(parameter, parameter) for parameter in self.parameters if parameter in self.expanded_params]
         if len(type_checks) > 0:
             content += '\n'.join(type_checks) + '\n\n'
         #
@@ -515,7 +536,7 @@ class CodeGenMatlab(CodeGen):
         sub = self.visit(node.id).content
         # name convention
         name_convention = {}
-        for var in node.symbols:
+        for var in sorted(node.symbols):
             if self.contain_subscript(var):
                 var_ids = self.get_all_ids(var)
                 var_subs = var_ids[1]
@@ -614,7 +635,10 @@ class CodeGenMatlab(CodeGen):
                 else:
                     content = "sqrt(({})' * {} * ({}))".format(value, sub_info.content, value)
         elif type_info.la_type.is_matrix():
-            if node.norm_type == NormType.NormDet:
+            structured = self.get_structured_content(node, node.value, value)
+            if structured is not None:
+                content = structured
+            elif node.norm_type == NormType.NormDet:
                 content = "det({})".format(value)
             elif node.norm_type == NormType.NormFrobenius:
                 content = "norm({}, 'fro')".format(value)
@@ -641,8 +665,11 @@ class CodeGenMatlab(CodeGen):
         if node.t:
             base_info.content = "{}'".format(base_info.content)
         elif node.r:
+            structured = self.get_structured_content(node, node.base, base_info.content)
             if node.la_type.is_scalar():
                 base_info.content = "1 / ({})".format(base_info.content)
+            elif structured is not None:
+                base_info.content = structured
             else:
                 base_info.content = "inv({})".format(base_info.content)
         else:
@@ -657,12 +684,101 @@ class CodeGenMatlab(CodeGen):
         left_info = self.visit(node.left, **kwargs)
         right_info = self.visit(node.right, **kwargs)
         left_info.pre_list += right_info.pre_list
-        # parenthesis are important! we're replacing a "power" (higher
-        # precedence than multiplication) with a "division" (equal precedence
-        # with multiplication)
-        left_info.content = "({}\{})".format(left_info.content, right_info.content)
+        la_type = self.get_structure(node.left)
+        if la_type is not None and la_type.is_diagonal_structure():
+            left_info.content = "({} ./ {})".format(right_info.content, self.get_diagonal_content(node.left, left_info.content))
+        elif la_type is not None and self.get_linsolve_opts(la_type) is not None and not (node.right.la_type.is_matrix() and node.right.la_type.sparse):
+            left_info.content = "linsolve({}, {}, {})".format(left_info.content, right_info.content, self.get_linsolve_opts(la_type))
+        else:
+            # parenthesis are important! we're replacing a "power" (higher
+            # precedence than multiplication) with a "division" (equal precedence
+            # with multiplication)
+            left_info.content = "({}\{})".format(left_info.content, right_info.content)
         return left_info
 
+    def get_structured_test_list(self, parameter, la_type):
+        """
+        :return: statements giving the random matrix its structure
+        """
+        test_list = []
+        if la_type.is_diagonal_structure():
+            return ['    {} = diag(diag({}));'.format(parameter, parameter)]
+        if la_type.has_structure(MatrixStructureEnum.STRUCT_BANDED):
+            test_list.append('    {} = triu(tril({}, {}), -{});'.format(parameter, parameter, la_type.bandwidth, la_type.bandwidth))
+        if la_type.has_structure(MatrixStructureEnum.STRUCT_LOWER_TRIANGULAR):
+            test_list.append('    {} = tril({});'.format(parameter, parameter))
+        elif la_type.has_structure(MatrixStructureEnum.STRUCT_UPPER_TRIANGULAR):
+            test_list.append('    {} = triu({});'.format(parameter, parameter))
+        if la_type.has_structure(MatrixStructureEnum.STRUCT_POSITIVE_DEFINITE):
+            # diagonally dominant
+            test_list.append("    {} = {} + {}' + 2 * {} * eye({});".format(parameter, parameter, parameter, la_type.rows, la_type.rows))
+        elif la_type.has_structure(MatrixStructureEnum.STRUCT_SYMMETRIC):
+            test_list.append("    {} = {} + {}';".format(parameter, parameter, parameter))
+        return test_list
+
+    def get_linsolve_opts(self, la_type):
+        """
+        :return: options of linsolve skipping the structure checks of the backslash, None for the other structures
+        """
+        if la_type.has_structure(MatrixStructureEnum.STRUCT_LOWER_TRIANGULAR):
+            return "struct('LT', true)"
+        if la_type.has_structure(MatrixStructureEnum.STRUCT_UPPER_TRIANGULAR):
+            return "struct('UT', true)"
+        if la_type.has_structure(MatrixStructureEnum.STRUCT_POSITIVE_DEFINITE):
+            return "struct('SYM', true, 'POSDEF', true)"
+        if la_type.has_structure(MatrixStructureEnum.STRUCT_SYMMETRIC):
+            return "struct('SYM', true)"
+        return None
+
+    def get_structured_content(self, node, operand, content):
+        """
+        Kernel of node for the structure of its matrix operand
+        :param content: code of the operand
+        :return: code of node, None if the structure doesn't help
+        """
+        la_type = self.get_structure(operand)
+        if la_type is None:
+            return None
+        diagonal = self.get_diagonal_content(operand, content) if la_type.is_diagonal_structure() else None
+        if (node.is_node(IRNodeType.Power) and node.r) or (node.is_node(IRNodeType.MathFunc) and node.func_type == MathFuncType.MathFuncInv):
+            if diagonal is not None:
+                return "diag(1 ./ {})".format(diagonal)
+            if la_type.is_triangular() or la_type.has_structure(MatrixStructureEnum.STRUCT_POSITIVE_DEFINITE):
+                return "linsolve({}, eye({}), {})".format(content, la_type.rows, self.get_linsolve_opts(la_type))
+        elif (node.is_node(IRNodeType.Norm) and node.norm_type == NormType.NormDet) or (node.is_node(IRNodeType.MathFunc) and node.func_type == MathFuncType.MathFuncDet):
+            if diagonal is not None:
+                return "prod({})".format(diagonal)
+            if la_type.is_triangular():
+                return "prod(diag({}))".format(content)
+        elif node.is_node(IRNodeType.Norm) and node.norm_type == NormType.NormFrobenius:
+            if diagonal is not None:
+                return "norm({})".format(diagonal)
+        elif node.is_node(IRNodeType.Norm) and node.norm_type == NormType.NormNuclear:
+            if diagonal is not None:
+                return "sum(abs({}))".format(diagonal)
+            if la_type.has_structure(MatrixStructureEnum.STRUCT_POSITIVE_DEFINITE):
+                return "trace({})".format(content)
+            if la_type.has_structure(MatrixStructureEnum.STRUCT_SYMMETRIC):
+                # the singular values are the absolute eigenvalues
+                return "sum(abs(eig({})))".format(content)
+        elif node.is_node(IRNodeType.MathFunc) and diagonal is not None:
+            if node.func_type == MathFuncType.MathFuncTrace:
+                return "sum({})".format(diagonal)
+            if node.func_type == MathFuncType.MathFuncDiag:
+                return diagonal
+        return None
+
+    def get_diagonal_content(self, node, content):
+        """
+        :param content: code of the diagonal matrix node
+        :return: code of the vector on the diagonal
+        """
+        compact = self.get_compact_diagonal(node)
+        if compact is not None and compact.main_id not in self.expanded_params:
+            # the transpose has the same diagonal
+            return self.visit(compact).content
+        return "diag({})".format(content)
+
     def visit_sparse_matrix(self, node, **kwargs):
         op_type = kwargs[ASSIGN_TYPE]
         lhs = kwargs[LHS]
@@ -970,6 +1086,8 @@ class CodeGenMatlab(CodeGen):
         return left_info
 
     def visit_mul(self, node, **kwargs):
+        if node in self.chain_dict:
+            return self.visit_mul_chain(node, ' * ', **kwargs)
         left_info = self.visit(node.left, **kwargs)
         right_info = self.visit(node.right, **kwargs)
         l_info = node.left
@@ -1053,7 +1171,7 @@ class CodeGenMatlab(CodeGen):
                     content += "        {}({}, {}) = {};\n".format(sequence, left_subs[0], left_subs[0], right_info.content)
                     content += "    end\n"
                 else:
-                    for right_var in type_info.symbols:
+                    for right_var in sorted(type_info.symbols):
                         if sub_strs in right_var:
                             var_ids = self.get_all_ids(right_var)
                             right_info.content = right_info.content.replace(right_var, "{}({}, {})".format(var_ids[0], var_ids[1][0], var_ids[1][1]))
@@ -1075,7 +1193,7 @@ class CodeGenMatlab(CodeGen):
             elif len(left_subs) == 1: # sequence only
                 sequence = left_ids[0]  # y left_subs[0]
                 # replace sequence
-                for right_var in type_info.symbols:
+                for right_var in sorted(type_info.symbols):
                     if self.contain_subscript(right_var):
                         var_ids = self.get_all_ids(right_var)
                         right_info.content = right_info.content.replace(right_var, "{}[{}]".format(var_ids[0], var_ids[1][0]))
@@ -1367,7 +1485,15 @@ class CodeGenMatlab(CodeGen):
     def visit_fro_product(self, node, **kwargs):
         left_info = self.visit(node.left, **kwargs)
         right_info = self.visit(node.right, **kwargs)
-        return CodeNodeInfo("sum({}(:).*{}(:))".format(left_info.content, right_info.content), pre_list=left_info.pre_list+right_info.pre_list)
+        return CodeNodeInfo("sum({}.*{})".format(self.get_column_content(left_info.content), self.get_column_content(right_info.content)), pre_list=left_info.pre_list+right_info.pre_list)
+
+    def get_column_content(self, content):
+        """
+        :return: elements of the matrix in content as a column
+        """
+        if re.fullmatch(r'\w+', content):
+            return "{}(:)".format(content)
+        return "reshape({}, [], 1)".format(content)
 
     def visit_hadamard_product(self, node, **kwargs):
         left_info = self.visit(node.left, **kwargs)
@@ -1441,13 +1567,17 @@ class CodeGenMatlab(CodeGen):
             content = 'log'
         elif node.func_type == MathFuncType.MathFuncSqrt:
             content = 'sqrt'
-        elif node.func_type == MathFuncType.MathFuncTrace:
-            content = 'trace'
-        elif node.func_type == MathFuncType.MathFuncDiag:
-            content = 'diag'
+        elif node.func_type == MathFuncType.MathFuncTrace or node.func_type == MathFuncType.MathFuncDiag:
+            structured = self.get_structured_content(node, node.param, params_content)
+            if structured is not None:
+                return CodeNodeInfo(structured, pre_list=pre_list)
+            content = 'trace' if node.func_type == MathFuncType.MathFuncTrace else 'diag'
         elif node.func_type == MathFuncType.MathFuncVec:
             return CodeNodeInfo("reshape({},[],1)".format(params_content))  # column-major
         elif node.func_type == MathFuncType.MathFuncDet:
+            structured = self.get_structured_content(node, node.param, params_content)
+            if structured is not None:
+                return CodeNodeInfo(structured, pre_list=pre_list)
             content = 'det'
         elif node.func_type == MathFuncType.MathFuncRank:
             content = 'rank'
@@ -1456,6 +1586,9 @@ class CodeGenMatlab(CodeGen):
         elif node.func_type == MathFuncType.MathFuncOrth:
             content = 'orth'
         elif node.func_type == MathFuncType.MathFuncInv:
+            structured = self.get_structured_content(node, node.param, params_content)
+            if structured is not None:
+                return CodeNodeInfo(structured, pre_list=pre_list)
             content = 'inv'
         return CodeNodeInfo("{}({})".format(content, params_content), pre_list=pre_list)
 
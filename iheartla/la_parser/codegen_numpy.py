@@ -1,11 +1,30 @@
 from .codegen import *
 from .type_walker import *
+from .ir_rewriter import DEFAULT_RULES, DIAGONAL_RULES, strip
 import keyword
 
+VECTORIZE_SUB = "vectorize_sub"
+# scalar nodes numpy evaluates elementwise when the operands are whole arrays
+ELEMENTWISE_NODES = {IRNodeType.Id, IRNodeType.Integer, IRNodeType.Double, IRNodeType.Fraction, IRNodeType.Constant,
+                     IRNodeType.Factor, IRNodeType.Expression, IRNodeType.Subexpression, IRNodeType.Add, IRNodeType.Sub,
+                     IRNodeType.Mul, IRNodeType.Div, IRNodeType.Power, IRNodeType.Squareroot, IRNodeType.MathFunc,
+                     IRNodeType.Norm, IRNodeType.SequenceIndex, IRNodeType.VectorIndex, IRNodeType.MatrixIndex}
+
 
 class CodeGenNumpy(CodeGen):
     def __init__(self):
         super().__init__(ParserTypeEnum.NUMPY)
+        self.vectorize = True  # emit array expressions instead of loops where possible
+        self.cse = True
+        self.cse_buffers = True
+        self.reorder_products = True
+        self.rewrite_rules = DEFAULT_RULES + DIAGONAL_RULES
+        self.sparse_format = 'coo'  # scipy format of the sparse matrices built in the generated code, coo or csr
+
+    def get_options(self):
+        options = super().get_options()
+        options.update({'vectorize': self.vectorize, 'sparse_format': self.sparse_format})
+        return options
 
     def init_type(self, type_walker, func_name):
         super().init_type(type_walker, func_name)
@@ -96,6 +115,8 @@ class CodeGenNumpy(CodeGen):
         return test_content
 
     def visit_id(self, node, **kwargs):
+        if VECTORIZE_SUB in kwargs and self.get_grid_sub(node, kwargs[VECTORIZE_SUB]) is not None:
+            return CodeNodeInfo(self.get_grid_sub(node, kwargs[VECTORIZE_SUB]))
         content = node.get_name()
         content = self.filter_symbol(content)
         if content in self.name_convention_dict:
@@ -180,6 +201,7 @@ class CodeGenNumpy(CodeGen):
         doc = []
         show_doc = False
         rand_func_name = "generateRandomData"
+        self.init_diagonal_params(node)
         test_content = []
         test_function = ["def " + rand_func_name + "():"]
         rand_int_max = 10
@@ -224,15 +246,17 @@ class CodeGenNumpy(CodeGen):
                         dim_content += "    {} = {}.shape[0]\n".format(key, target)
                     else:
                         dim_content += "    {} = {}[0].shape[{}]\n".format(key, target, target_dict[target]-1)
+                elif target in self.diagonal_params:
+                    dim_content += "    {} = {}.shape[0]\n".format(key, target)
                 else:
                     dim_content += "    {} = {}.shape[{}]\n".format(key, target, target_dict[target])
         # Handle sequences first
         test_generated_sym_set, seq_test_list = self.gen_same_seq_test()
         test_content += seq_test_list
         for parameter in self.parameters:
-            if self.symtable[parameter].desc:
+            if self.desc_dict.get(parameter):
                 show_doc = True
-                doc.append('    :param :{} :{}'.format(parameter, self.symtable[parameter].desc))
+                doc.append('    :param :{} :{}'.format(parameter, self.desc_dict[parameter]))
             if self.symtable[parameter].is_sequence():
                 ele_type = self.symtable[parameter].element_type
                 data_type = ele_type.element_type
@@ -324,6 +348,16 @@ class CodeGenNumpy(CodeGen):
                                 type_declare.append('    {} = np.asarray({}, dtype={})'.format(parameter, parameter,
                                                                                                "np.integer" if ele_type.is_integer_element() else "np.float64"))
                             test_content.append('    {} = np.random.randn({})'.format(parameter, size_str))
+            elif parameter in self.diagonal_params:
+                element_type = self.symtable[parameter].element_type
+                if isinstance(element_type, LaVarType) and element_type.is_scalar() and element_type.is_int:
+                    type_declare.append('    {} = np.asarray({}, dtype=np.integer)'.format(parameter, parameter))
+                    test_content.append('    {} = np.random.randint({}, size=({}))'.format(parameter, rand_int_max, self.symtable[parameter].rows))
+                else:
+                    type_declare.append('    {} = np.asarray({}, dtype=np.float64)'.format(parameter, parameter))
+                    test_content.append('    {} = np.random.randn({})'.format(parameter, self.symtable[parameter].rows))
+                # the vector on the diagonal, it is square
+                type_checks.append('    assert {}.shape == ({},)'.format(parameter, self.symtable[parameter].rows))
             elif self.symtable[parameter].is_matrix():
                 element_type = self.symtable[parameter].element_type
                 if isinstance(element_type, LaVarType):
@@ -352,6 +386,7 @@ class CodeGenNumpy(CodeGen):
                     else:
                         type_checks.append('    {} = np.asarray({})'.format(parameter, parameter))
                         test_content.append('    {} = np.random.randn({}, {})'.format(parameter, self.symtable[parameter].rows, self.symtable[parameter].cols))
+                test_content += self.get_structured_test_list(parameter, self.symtable[parameter])
                 type_checks.append('    assert {}.shape == ({}, {})'.format(parameter, self.symtable[parameter].rows, self.symtable[parameter].cols))
             elif self.symtable[parameter].is_vector():
                 element_type = self.symtable[parameter].element_type
@@ -394,6 +429,7 @@ class CodeGenNumpy(CodeGen):
         content += dim_content
         type_checks += self.get_dim_check_str()
         type_checks += self.get_arith_dim_check_str()
+        type_checks += ['    {} = np.diag({})'.format(parameter, parameter) for parameter in self.parameters if parameter in self.expanded_params]
         if len(type_checks) > 0:
             content += '\n'.join(type_checks) + '\n\n'
         #
@@ -427,12 +463,359 @@ class CodeGenNumpy(CodeGen):
         content = self.trim_content(content)
         return content
 
+    def get_structured_test_list(self, parameter, la_type):
+        """
+        :return: statements giving the random matrix its structure
+        """
+        test_list = []
+        if la_type.has_structure(MatrixStructureEnum.STRUCT_BANDED):
+            test_list.append('    {} = np.triu(np.tril({}, {}), -{})'.format(parameter, parameter, la_type.bandwidth, la_type.bandwidth))
+        if la_type.has_structure(MatrixStructureEnum.STRUCT_LOWER_TRIANGULAR):
+            test_list.append('    {} = np.tril({})'.format(parameter, parameter))
+        elif la_type.has_structure(MatrixStructureEnum.STRUCT_UPPER_TRIANGULAR):
+            test_list.append('    {} = np.triu({})'.format(parameter, parameter))
+        if la_type.has_structure(MatrixStructureEnum.STRUCT_POSITIVE_DEFINITE):
+            # diagonally dominant
+            test_list.append('    {} = {} + {}.T + 2 * {} * np.eye({})'.format(parameter, parameter, parameter, la_type.rows, la_type.rows))
+        elif la_type.has_structure(MatrixStructureEnum.STRUCT_SYMMETRIC):
+            test_list.append('    {} = {} + {}.T'.format(parameter, parameter, parameter))
+        return test_list
+
+    def get_diagonal_content(self, node, content):
+        """
+        :param content: code of the diagonal matrix node
+        :return: code of the vector on the diagonal
+        """
+        compact = self.get_compact_diagonal(node)
+        if compact is not None and compact.main_id not in self.expanded_params:
+            # the transpose of the vector is the vector itself
+            return content
+        return "np.diagonal({})".format(content)
+
+    def depend_on_subs(self, node, subs):
+        if node.is_node(IRNodeType.Id):
+            return node.main_id in subs or (node.contain_subscript() and any(sub in node.subs for sub in subs))
+        for child in self.get_ir_children(node):
+            if self.depend_on_subs(child, subs):
+                return True
+        return False
+
+    def get_rank(self, la_type):
+        # number of array dimensions of a single element
+        if la_type is None:
+            return None
+        if la_type.is_scalar():
+            return 0
+        if la_type.is_vector():
+            return 1
+        if la_type.is_matrix() and not la_type.sparse:
+            return 2
+        return None
+
+    def get_grid_index(self, node, grid):
+        """
+        Whole-array form of x_i or A_ij whose indices are the grid subscripts
+        :param grid: list of (subscript, size), the size is None for summations
+        :return: content, None if node isn't indexed by the grid
+        """
+        subs = [sub for sub, size in grid]
+        def get_axis(index, size):
+            if not index.is_node(IRNodeType.Id) or (index.la_type is not None and index.la_type.index_type) or index.get_name() not in subs:
+                return None
+            axis = subs.index(index.get_name())
+            if grid[axis][1] is not None and not is_same_expr(size, grid[axis][1]):
+                return None
+            return axis
+        la_type = node.main.la_type if isinstance(node.main, IRNode) else None
+        if la_type is None:
+            return None
+        main = self.visit(node.main).content
+        if node.is_node(IRNodeType.MatrixIndex):
+            if node.row_index is None or node.col_index is None or not la_type.is_matrix() or la_type.sparse:
+                return None
+            axes = (get_axis(node.row_index, la_type.rows), get_axis(node.col_index, la_type.cols))
+            if len(grid) == 1 and axes == (0, 0):
+                return "np.diagonal({})".format(main)
+            if len(grid) == 2 and axes == (0, 1):
+                return main
+            if len(grid) == 2 and axes == (1, 0):
+                return "{}.T".format(main)
+            return None
+        if node.is_node(IRNodeType.SequenceIndex):
+            if node.row_index is not None or node.col_index is not None or node.slice_matrix or la_type.is_dynamic():
+                return None
+            if len(grid) > 1 and not la_type.element_type.is_scalar():
+                return None
+            axis = get_axis(node.main_index, la_type.size)
+        elif node.is_node(IRNodeType.VectorIndex):
+            if not la_type.is_vector():
+                return None
+            axis = get_axis(node.row_index, la_type.rows)
+        else:
+            return None
+        if axis is None:
+            return None
+        if len(grid) == 1:
+            return main
+        return "{}[{}]".format(main, ':, np.newaxis' if axis == 0 else 'np.newaxis, :')
+
+    def get_grid_sub(self, node, grid):
+        # i itself as a value: 1, 2, ..., size along its axis
+        for axis, (sub, size) in enumerate(grid):
+            if node.get_name() == sub and size is not None:
+                content = "np.arange(1, {}+1)".format(size)
+                if len(grid) > 1:
+                    content += "[{}]".format(':, np.newaxis' if axis == 0 else 'np.newaxis, :')
+                return content
+        return None
+
+    def is_elementwise(self, node, grid):
+        subs = [sub for sub, size in grid]
+        if node.node_type not in ELEMENTWISE_NODES or node.la_type is None or not node.la_type.is_scalar():
+            return False
+        if node.is_node(IRNodeType.Id):
+            return not self.depend_on_subs(node, subs) or self.get_grid_sub(node, grid) is not None
+        if node.node_type in (IRNodeType.SequenceIndex, IRNodeType.VectorIndex, IRNodeType.MatrixIndex):
+            return self.get_grid_index(node, grid) is not None or not self.depend_on_subs(node, subs)
+        for child in self.get_ir_children(node):
+            if child.is_node(IRNodeType.Id) and child.la_type is not None and not child.la_type.is_scalar():
+                # norm subscripts and the like
+                if self.depend_on_subs(child, subs):
+                    return False
+            elif not self.is_elementwise(child, grid):
+                return False
+        return True
+
+    def expand_scalar(self, content, rank):
+        # (N,) -> (N, 1) or (N, 1, 1) so it broadcasts against stacked vectors and matrices
+        return "{}[{}]".format(self.wrap_operand(content), ', '.join([':'] + ['np.newaxis'] * rank))
+
+    def wrap_operand(self, content):
+        if re.fullmatch(r'\w+', content):
+            return content
+        if content.startswith('('):
+            # already wrapped when the first parenthesis closes at the end
+            depth = 0
+            for index, c in enumerate(content):
+                depth += 1 if c == '(' else -1 if c == ')' else 0
+                if depth == 0:
+                    if index == len(content) - 1:
+                        return content
+                    break
+        return "({})".format(content)
+
+    def vectorize_exp(self, node, sub):
+        """
+        Render the body of a summation over all subscripts at once
+        :return: (content, rank of a single element, whether it's stacked along the subscript), None if not supported
+        """
+        if not self.depend_on_subs(node, [sub]):
+            node_info = self.visit(node)
+            rank = self.get_rank(node.la_type)
+            if len(node_info.pre_list) > 0 or rank is None:
+                return None
+            return node_info.content, rank, False
+        if self.is_elementwise(node, [(sub, None)]):
+            # x_i renders as x, numpy evaluates the whole expression elementwise
+            node_info = self.visit(node, **{VECTORIZE_SUB: [(sub, None)]})
+            if len(node_info.pre_list) > 0:
+                return None
+            return node_info.content, 0, True
+        if node.is_node(IRNodeType.SequenceIndex):
+            content = self.get_grid_index(node, [(sub, None)])
+            rank = self.get_rank(node.la_type)
+            if content is None or rank is None:
+                return None
+            return content, rank, True
+        if node.is_node(IRNodeType.Factor):
+            child = node.id or node.num or node.sub or node.m or node.v or node.nm or node.op or node.c
+            return self.vectorize_exp(child, sub)
+        if node.is_node(IRNodeType.Expression) or node.is_node(IRNodeType.Subexpression):
+            value = self.vectorize_exp(node.value, sub)
+            if value is None:
+                return None
+            content, rank, stacked = value
+            if node.is_node(IRNodeType.Subexpression):
+                content = "({})".format(content)
+            elif node.sign:
+                content = '-' + content
+            return content, rank, stacked
+        if node.is_node(IRNodeType.ToMatrix):
+            item = self.vectorize_exp(node.item, sub)
+            if item is None or item[1] != 1:
+                return None
+            return "{}[:, :, np.newaxis]".format(self.wrap_operand(item[0])), 2, True
+        if node.is_node(IRNodeType.Transpose) or (node.is_node(IRNodeType.Power) and node.t):
+            f = self.vectorize_exp(node.f if node.is_node(IRNodeType.Transpose) else node.base, sub)
+            if f is None:
+                return None
+            if f[1] == 1:
+                return "{}[:, np.newaxis, :]".format(self.wrap_operand(f[0])), 2, True
+            if f[1] == 2:
+                return "np.swapaxes({}, -1, -2)".format(f[0]), 2, True
+            return None
+        if node.is_node(IRNodeType.Power):
+            base = self.vectorize_exp(node.base, sub)
+            if base is None or base[1] != 2:
+                return None
+            if node.r:
+                return "np.linalg.inv({})".format(base[0]), 2, True
+            power = self.vectorize_exp(node.power, sub)
+            if power is None or power[2]:
+                return None
+            return "np.linalg.matrix_power({}, {})".format(base[0], power[0]), 2, True
+        if node.is_node(IRNodeType.Norm):
+            value = self.vectorize_exp(node.value, sub)
+            if value is None:
+                return None
+            if value[1] == 1 and node.norm_type == NormType.NormInteger:
+                return "np.linalg.norm({}, {}, axis=-1)".format(value[0], node.sub), 0, True
+            if value[1] == 1 and node.norm_type == NormType.NormMax:
+                return "np.linalg.norm({}, np.inf, axis=-1)".format(value[0]), 0, True
+            if value[1] == 2 and node.norm_type == NormType.NormFrobenius:
+                return "np.linalg.norm({}, 'fro', axis=(-2, -1))".format(value[0]), 0, True
+            return None
+        if node.node_type in (IRNodeType.Add, IRNodeType.Sub, IRNodeType.Mul, IRNodeType.Div, IRNodeType.HadamardProduct):
+            left = self.vectorize_exp(node.left, sub)
+            right = self.vectorize_exp(node.right, sub)
+            if left is None or right is None:
+                return None
+            return self.vectorize_binary(node, left, right)
+        return None
+
+    def vectorize_binary(self, node, left, right):
+        l_content, l_rank, l_stacked = left
+        r_content, r_rank, r_stacked = right
+        if node.is_node(IRNodeType.Add) or node.is_node(IRNodeType.Sub):
+            if l_rank != r_rank:
+                return None
+            op = ' + ' if node.is_node(IRNodeType.Add) else ' - '
+            return l_content + op + r_content, l_rank, True
+        if node.is_node(IRNodeType.HadamardProduct):
+            if l_rank != r_rank:
+                return None
+            return "np.multiply({}, {})".format(l_content, r_content), l_rank, True
+        if node.is_node(IRNodeType.Div):
+            if r_rank != 0:
+                return None
+            if r_stacked and l_rank > 0:
+                r_content = self.expand_scalar(r_content, l_rank)
+            return l_content + ' / ' + r_content, l_rank, True
+        # mul
+        if l_rank == 0 or r_rank == 0:
+            if l_stacked and l_rank == 0 and r_rank > 0:
+                l_content = self.expand_scalar(l_content, r_rank)
+            if r_stacked and r_rank == 0 and l_rank > 0:
+                r_content = self.expand_scalar(r_content, l_rank)
+            rank = max(l_rank, r_rank)
+            content = l_content + ' * ' + r_content
+        elif l_rank == 2 and r_rank == 2:
+            rank = 2
+            content = l_content + ' @ ' + r_content
+        elif l_rank == 2 and r_rank == 1:
+            rank = 1
+            content = "np.einsum('...ij,...j->...i', {}, {})".format(l_content, r_content)
+        elif l_rank == 1 and r_rank == 2:
+            rank = 1
+            content = "np.einsum('...i,...ij->...j', {}, {})".format(l_content, r_content)
+        else:
+            return None
+        if rank != self.get_rank(node.la_type):
+            return None
+        return content, rank, True
+
+    def vectorize_assignment(self, node, sequence, left_subs):
+        """
+        Lower A_ij = f(i, j) and L_ii = f(i) over the whole matrix at once
+        :return: content, None if the loop is needed
+        """
+        la_type = self.symtable[sequence]
+        if not self.vectorize or node.op != '=' or not la_type.is_matrix() or la_type.sparse:
+            return None
+        if left_subs[0] == left_subs[1]:
+            if not is_same_expr(la_type.rows, la_type.cols):
+                return None
+            grid = [(left_subs[0], la_type.rows)]
+        else:
+            grid = [(left_subs[0], la_type.rows), (left_subs[1], la_type.cols)]
+        right_content = self.vectorize_right(node, sequence, grid)
+        if right_content is None:
+            return None
+        if len(grid) == 1:
+            return "    np.fill_diagonal({}, {})".format(sequence, right_content)
+        content = ""
+        if sequence not in self.declared_symbols:
+            content += "    {} = np.zeros(({}, {}))\n".format(sequence, la_type.rows, la_type.cols)
+        content += "    {}[:, :] = {}".format(sequence, right_content)
+        return content
+
+    def vectorize_sparse_diagonal(self, node, sequence, sub):
+        """
+        Values of a sparse L_ii = f(i) computed for the whole diagonal at once
+        :return: content, None if the loop is needed
+        """
+        la_type = self.symtable[sequence]
+        if not self.vectorize or not is_same_expr(la_type.rows, la_type.cols):
+            return None
+        right_content = self.vectorize_right(node, sequence, [(sub, la_type.rows)])
+        if right_content is None:
+            return None
+        return "    {}[:] = {}\n".format(la_type.value_var, right_content)
+
+    def vectorize_right(self, node, sequence, grid):
+        """
+        :param grid: list of (subscript, size) of the assigned elements
+        :return: whole-array content of the right-hand side, None if it needs the loop
+        """
+        if self.depend_on_symbol(node.right, sequence):
+            # later elements would read updated values
+            return None
+        if not self.is_elementwise(node.right, grid):
+            return None
+        with self.pause_cse():
+            right_info = self.visit(node.right, **{VECTORIZE_SUB: grid})
+        if len(right_info.pre_list) > 0:
+            return None
+        return right_info.content
+
+    def depend_on_symbol(self, node, symbol):
+        if node.is_node(IRNodeType.Id):
+            return node.main_id == symbol
+        for child in self.get_ir_children(node):
+            if self.depend_on_symbol(child, symbol):
+                return True
+        return False
+
+    def vectorize_summation(self, node):
+        """
+        Sum of a whole-array expression when the body is elementwise or broadcastable in the subscript
+        :return: CodeNodeInfo, None if the loop is needed
+        """
+        if not self.vectorize or node.cond:
+            return None
+        sub = self.visit(node.id).content
+        with self.pause_cse():
+            exp = self.vectorize_exp(node.exp, sub)
+        if exp is None:
+            return None
+        content, rank, stacked = exp
+        if not stacked or rank != self.get_rank(self.symtable[node.symbol]):
+            return None
+        if rank == 0:
+            content = "np.sum({})".format(content)
+        else:
+            content = "np.sum({}, axis=0)".format(content)
+        return CodeNodeInfo(node.symbol, pre_list=["    {} = {}\n".format(node.symbol, content)])
+
     def visit_summation(self, node, **kwargs):
+        vectorized_info = self.vectorize_summation(node)
+        if vectorized_info is not None:
+            return vectorized_info
         target_var = []
         sub = self.visit(node.id).content
         # name convention
         name_convention = {}
-        for var in node.symbols:
+        for var in sorted(node.symbols):
             if self.contain_subscript(var):
                 var_ids = self.get_all_ids(var)
                 var_subs = var_ids[1]
@@ -453,9 +836,9 @@ class CodeGenNumpy(CodeGen):
             cond_info = self.visit(node.cond, **kwargs)
             cond_content = "if(" + cond_info.content + "):\n"
         kwargs[WALK_TYPE] = WalkTypeEnum.RETRIEVE_EXPRESSION
-        content = []
         exp_info = self.visit(node.exp)
         exp_str = exp_info.content
+        content = self.get_buffer_declarations(node)
         if self.symtable[assign_id].is_matrix():
             content.append("{} = np.zeros(({}, {}))\n".format(assign_id, self.symtable[assign_id].rows, self.symtable[assign_id].cols))
         elif self.symtable[assign_id].is_vector():
@@ -533,7 +916,10 @@ class CodeGenNumpy(CodeGen):
                 else:
                     content = "np.sqrt(({}).T @ {} @ ({}))".format(value, sub_info.content, value)
         elif type_info.la_type.is_matrix():
-            if node.norm_type == NormType.NormDet:
+            structured = self.get_structured_content(node, node.value, value)
+            if structured is not None:
+                content = structured
+            elif node.norm_type == NormType.NormDet:
                 content = "scipy.linalg.det({})".format(value)
             elif node.norm_type == NormType.NormFrobenius:
                 content = "np.linalg.norm({}, 'fro')".format(value)
@@ -541,6 +927,75 @@ class CodeGenNumpy(CodeGen):
                 content = "np.linalg.norm({}, 'nuc')".format(value)
         return CodeNodeInfo(content, pre_list)
 
+    def get_structured_content(self, node, operand, content):
+        """
+        Kernel of node for the structure of its matrix operand
+        :param content: code of the operand
+        :return: code of node, None if the structure doesn't help
+        """
+        la_type = self.get_structure(operand)
+        if la_type is None:
+            return None
+        diagonal = self.get_diagonal_content(operand, content) if la_type.is_diagonal_structure() else None
+        if (node.is_node(IRNodeType.Power) and node.r) or (node.is_node(IRNodeType.MathFunc) and node.func_type == MathFuncType.MathFuncInv):
+            if diagonal is not None:
+                return "np.diag(1 / {})".format(self.wrap_operand(diagonal))
+            identity = "np.eye({})".format(la_type.rows)
+            if la_type.is_triangular():
+                return "scipy.linalg.solve_triangular({}, {}, lower={})".format(content, identity, self.is_lower(la_type))
+            if la_type.has_structure(MatrixStructureEnum.STRUCT_POSITIVE_DEFINITE):
+                return "scipy.linalg.cho_solve(scipy.linalg.cho_factor({}), {})".format(content, identity)
+        elif (node.is_node(IRNodeType.Norm) and node.norm_type == NormType.NormDet) or (node.is_node(IRNodeType.MathFunc) and node.func_type == MathFuncType.MathFuncDet):
+            if diagonal is not None:
+                return "np.prod({})".format(diagonal)
+            if la_type.is_triangular():
+                return "np.prod(np.diagonal({}))".format(content)
+            if la_type.has_structure(MatrixStructureEnum.STRUCT_POSITIVE_DEFINITE):
+                return "np.prod(np.diagonal(scipy.linalg.cholesky({}))) ** 2".format(content)
+        elif node.is_node(IRNodeType.Norm):
+            if node.norm_type == NormType.NormFrobenius and diagonal is not None:
+                return "np.linalg.norm({})".format(diagonal)
+            if node.norm_type == NormType.NormNuclear:
+                if diagonal is not None:
+                    return "np.sum(np.absolute({}))".format(diagonal)
+                if la_type.has_structure(MatrixStructureEnum.STRUCT_POSITIVE_DEFINITE):
+                    return "np.trace({})".format(content)
+                if la_type.has_structure(MatrixStructureEnum.STRUCT_SYMMETRIC):
+                    # the singular values are the absolute eigenvalues
+                    return "np.sum(np.absolute(np.linalg.eigvalsh({})))".format(content)
+        elif node.is_node(IRNodeType.MathFunc) and diagonal is not None:
+            if node.func_type == MathFuncType.MathFuncTrace:
+                return "np.sum({})".format(diagonal)
+            if node.func_type == MathFuncType.MathFuncDiag:
+                return diagonal
+        return None
+
+    def get_structured_solve(self, node, left_content, right_content):
+        """
+        :return: code of the solver node for the structure of its left side
+        """
+        la_type = node.left.la_type
+        if la_type.is_diagonal_structure():
+            diagonal = self.get_diagonal_content(node.left, left_content)
+            if node.right.la_type.is_vector():
+                return "{} / {}".format(self.wrap_operand(right_content), self.wrap_operand(diagonal))
+            return "{} / {}[:, np.newaxis]".format(self.wrap_operand(right_content), self.wrap_operand(diagonal))
+        if la_type.has_structure(MatrixStructureEnum.STRUCT_BANDED):
+            lower = 0 if la_type.has_structure(MatrixStructureEnum.STRUCT_UPPER_TRIANGULAR) else la_type.bandwidth
+            upper = 0 if la_type.has_structure(MatrixStructureEnum.STRUCT_LOWER_TRIANGULAR) else la_type.bandwidth
+            # diagonal ordered form, the superdiagonals first
+            band = "np.array([np.pad(np.diagonal({}, offset), (max(offset, 0), max(-offset, 0))) for offset in range({}, {}, -1)])".format(
+                left_content, upper, -lower - 1)
+            return "scipy.linalg.solve_banded(({}, {}), {}, {})".format(lower, upper, band, right_content)
+        if la_type.is_triangular():
+            return "scipy.linalg.solve_triangular({}, {}, lower={})".format(left_content, right_content, self.is_lower(la_type))
+        if la_type.has_structure(MatrixStructureEnum.STRUCT_POSITIVE_DEFINITE):
+            return "scipy.linalg.cho_solve(scipy.linalg.cho_factor({}), {})".format(left_content, right_content)
+        return "scipy.linalg.solve({}, {}, assume_a='sym')".format(left_content, right_content)
+
+    def is_lower(self, la_type):
+        return la_type.has_structure(MatrixStructureEnum.STRUCT_LOWER_TRIANGULAR)
+
     def visit_transpose(self, node, **kwargs):
         f_info = self.visit(node.f, **kwargs)
         if node.f.la_type.is_vector():
@@ -562,8 +1017,11 @@ class CodeGenNumpy(CodeGen):
             if node.la_type.is_scalar():
                 base_info.content = "1 / ({})".format(base_info.content)
             else:
+                structured = self.get_structured_content(node, node.base, base_info.content)
                 if node.base.la_type.is_matrix() and node.base.la_type.sparse:
                     base_info.content = "sparse.linalg.inv({})".format(base_info.content)
+                elif structured is not None:
+                    base_info.content = structured
                 else:
                     base_info.content = "np.linalg.inv({})".format(base_info.content)
         else:
@@ -580,6 +1038,8 @@ class CodeGenNumpy(CodeGen):
         left_info.pre_list += right_info.pre_list
         if (node.left.la_type.is_matrix() and node.left.la_type.sparse) or (node.right.la_type.is_matrix() and node.right.la_type.sparse):
             left_info.content = "sparse.linalg.spsolve({}, {})".format(left_info.content, right_info.content)
+        elif self.get_structure(node.left) is not None:
+            left_info.content = self.get_structured_solve(node, left_info.content, right_info.content)
         else:
             left_info.content = "np.linalg.solve({}, {})".format(left_info.content, right_info.content)
         return left_info
@@ -592,27 +1052,114 @@ class CodeGenNumpy(CodeGen):
         pre_list = []
         index_var = type_info.la_type.index_var
         value_var = type_info.la_type.value_var
-        pre_list.append("    {} = []\n".format(index_var))
-        pre_list.append("    {} = []\n".format(value_var))
-        if_info = self.visit(node.ifs, **kwargs)
-        pre_list += if_info.content
+        assign_node = node.get_ancestor(IRNodeType.Assignment)
+        support_content = None
+        support = self.get_sparse_support(node.ifs, assign_node.left.subs)
+        if support is not None:
+            support_content = self.get_sparse_support_content(node, support, **kwargs)
+        if support_content is not None:
+            pre_list += support_content
+            index_content = index_var
+        else:
+            # the number of nonzeros isn't bounded, collect them in lists
+            pre_list.append("    {} = []\n".format(index_var))
+            pre_list.append("    {} = []\n".format(value_var))
+            if_info = self.visit(node.ifs, **kwargs)
+            pre_list += if_info.content
+            index_content = self.get_index_list_str(index_var)
+        sparse_content = self.get_sparse_str(value_var, index_content, self.symtable[cur_m_id].rows, self.symtable[cur_m_id].cols)
         # assignment
         if op_type == '=':
-            pre_list.append("    {} = scipy.sparse.coo_matrix(({}, np.asarray({}).T), shape=({}, {}))\n".format(cur_m_id, value_var, index_var, self.symtable[cur_m_id].rows,
-                                                          self.symtable[cur_m_id].cols))
+            pre_list.append("    {} = {}\n".format(cur_m_id, sparse_content))
         elif op_type == '+=':
-            # left_ids = self.get_all_ids(lhs)
-            # left_subs = left_ids[1]
-            pre_list.append(
-                "    {} = scipy.sparse.coo_matrix(({}+{}.data.tolist(), np.hstack((np.asarray({}).T, np.asarray(({}.row, {}.col))))), shape=({}, {}))\n".format(cur_m_id, value_var, cur_m_id,
-                                                                                                    index_var, cur_m_id, cur_m_id,
-                                                                                                    self.symtable[
-                                                                                                        cur_m_id].rows,
-                                                                                                    self.symtable[
-                                                                                                        cur_m_id].cols))
+            # duplicate entries are summed
+            pre_list.append("    {} = ({} + {}).asformat('{}')\n".format(cur_m_id, cur_m_id, sparse_content, self.sparse_format))
 
         return CodeNodeInfo(cur_m_id, pre_list)
 
+    def get_sparse_str(self, value_var, index_content, rows, cols):
+        """
+        Sparse matrix from values and a 2×nnz array of 0-based (row, col) indices
+        :return: string
+        """
+        return "scipy.sparse.{}_matrix(({}, {}), shape=({}, {}))".format(self.sparse_format, value_var, index_content, rows, cols)
+
+    def get_index_list_str(self, index_var):
+        # list of (row, col) tuples as a 2×nnz array, also when it's empty
+        return "np.asarray({}, dtype=int).reshape(-1, 2).T".format(index_var)
+
+    def get_sparse_support_content(self, node, support, **kwargs):
+        """
+        Fill preallocated index and value arrays by iterating over the support only, not over every (i, j)
+        :return: list of lines, None if the support can't be bounded
+        """
+        assign_node = node.get_ancestor(IRNodeType.Assignment)
+        subs = assign_node.left.subs
+        index_var = node.la_type.index_var
+        value_var = node.la_type.value_var
+        pos_var = self.generate_var_name('pos')
+        counts = []
+        loops = []
+        guarded = False
+        for index, (sparse_if, kind, value) in enumerate(support):
+            guards = self.get_sparse_guards(support, index)
+            if guards is None:
+                continue
+            if kind == 'diagonal':
+                bounds = self.get_diagonal_bounds(node.la_type, value)
+                if bounds is None:
+                    return None
+                start, stop, count = bounds
+                loop = ["    for {} in range({}, {}):\n".format(subs[0], start, stop)]
+                if value == 0:
+                    loop.append("        {} = {}\n".format(subs[1], subs[0]))
+                else:
+                    loop.append("        {} = {} {} {}\n".format(subs[1], subs[0], '+' if value > 0 else '-', abs(value)))
+            else:
+                loop_flag = value.loop
+                value.loop = True
+                in_info = self.visit(value, **kwargs)
+                value.loop = loop_flag
+                loop = in_info.pre_list + [self.update_prelist_str([in_info.content], '    ')]
+                count = "len({})".format(self.visit(value.set, **kwargs).content)
+            counts.append(count)
+            stat_info = self.get_sparse_stat(sparse_if, subs, **kwargs)
+            body = stat_info.pre_list
+            body += ["{}[:, {}] = ({}-1, {}-1)\n".format(index_var, pos_var, subs[0], subs[1]),
+                     "{}[{}] = {}\n".format(value_var, pos_var, stat_info.content),
+                     "{} += 1\n".format(pos_var)]
+            if len(guards) > 0:
+                guarded = True
+                guard_list = []
+                for guard in guards:
+                    cond_info = self.visit(guard.cond, **kwargs)
+                    loop += cond_info.pre_list
+                    guard_list.append("({})".format(cond_info.content))
+                loop.append("        if not ({}):\n".format(' or '.join(guard_list)))
+                loop.append(self.update_prelist_str(body, '            '))
+            else:
+                loop.append(self.update_prelist_str(body, '        '))
+            loops += loop
+        count_var = self.generate_var_name('nnz')
+        content = ["    {} = {}\n".format(count_var, ' + '.join(counts) if len(counts) > 0 else '0'),
+                   "    {} = np.zeros((2, {}), dtype=int)\n".format(index_var, count_var),
+                   "    {} = np.zeros({})\n".format(value_var, count_var),
+                   "    {} = 0\n".format(pos_var)]
+        content += loops
+        if guarded:
+            # skipped elements leave unused room at the end
+            content.append("    {} = {}[:, :{}]\n".format(index_var, index_var, pos_var))
+            content.append("    {} = {}[:{}]\n".format(value_var, value_var, pos_var))
+        return content
+
+    def get_sparse_stat(self, node, subs, **kwargs):
+        self.convert_matrix = True
+        stat_info = self.visit(node.stat, **kwargs)
+        self.convert_matrix = False
+        # replace '_ij' with '(i,j)'
+        stat_info.content = stat_info.content.replace('_{}{}'.format(subs[0], subs[1]), '[{}][{}]'.format(subs[0], subs[1]))
+        return stat_info
+
     def visit_sparse_ifs(self, node, **kwargs):
         assign_node = node.get_ancestor(IRNodeType.Assignment)
         sparse_node = node.get_ancestor(IRNodeType.SparseMatrix)
@@ -780,6 +1327,8 @@ class CodeGenNumpy(CodeGen):
         return node_info
 
     def visit_matrix_index(self, node, **kwargs):
+        if VECTORIZE_SUB in kwargs and self.get_grid_index(node, kwargs[VECTORIZE_SUB]) is not None:
+            return CodeNodeInfo(self.get_grid_index(node, kwargs[VECTORIZE_SUB]))
         main_info = self.visit(node.main, **kwargs)
         if node.row_index is not None:
             row_info = self.visit(node.row_index, **kwargs)
@@ -808,6 +1357,8 @@ class CodeGenNumpy(CodeGen):
         return CodeNodeInfo(content)
 
     def visit_vector_index(self, node, **kwargs):
+        if VECTORIZE_SUB in kwargs and self.get_grid_index(node, kwargs[VECTORIZE_SUB]) is not None:
+            return CodeNodeInfo(self.get_grid_index(node, kwargs[VECTORIZE_SUB]))
         main_info = self.visit(node.main, **kwargs)
         index_info = self.visit(node.row_index, **kwargs)
         if node.row_index.la_type.index_type:
@@ -816,6 +1367,8 @@ class CodeGenNumpy(CodeGen):
             return CodeNodeInfo("{}[{}-1]".format(main_info.content, index_info.content))
 
     def visit_sequence_index(self, node, **kwargs):
+        if VECTORIZE_SUB in kwargs and self.get_grid_index(node, kwargs[VECTORIZE_SUB]) is not None:
+            return CodeNodeInfo(self.get_grid_index(node, kwargs[VECTORIZE_SUB]))
         main_info = self.visit(node.main, **kwargs)
         main_index_info = self.visit(node.main_index, **kwargs)
         if node.main_index.la_type.index_type:
@@ -871,6 +1424,8 @@ class CodeGenNumpy(CodeGen):
         return CodeNodeInfo(content)
 
     def visit_mul(self, node, **kwargs):
+        if node in self.chain_dict:
+            return self.visit_mul_chain(node, ' @ ', **kwargs)
         left_info = self.visit(node.left, **kwargs)
         right_info = self.visit(node.right, **kwargs)
         l_info = node.left
@@ -916,26 +1471,30 @@ class CodeGenNumpy(CodeGen):
             if len(left_subs) == 2: # matrix only
                 sequence = left_ids[0]  # y left_subs[0]
                 sub_strs = left_subs[0] + left_subs[1]
-                if self.symtable[sequence].is_matrix() and self.symtable[sequence].sparse:
+                vectorized = self.vectorize_assignment(node, sequence, left_subs)
+                if vectorized is not None:
+                    content = vectorized
+                elif self.symtable[sequence].is_matrix() and self.symtable[sequence].sparse:
                     if left_subs[0] == left_subs[1]:  # L_ii
                         content = ""
-                        if self.symtable[sequence].diagonal:
-                            # add definition
-                            if sequence not in self.declared_symbols:
-                                content += "    {} = []\n".format(self.symtable[sequence].index_var)
-                                content += "    {} = []\n".format(self.symtable[sequence].value_var)
-                        content += "    for {} in range(1, {}+1):\n".format(left_subs[0], self.symtable[sequence].rows)
-                        if right_info.pre_list:
-                            content += self.update_prelist_str(right_info.pre_list, "    ")
-                        content += "        {}.append(({} - 1, {} - 1))\n".format(self.symtable[sequence].index_var, left_subs[0], left_subs[0])
-                        content += "        {}.append({})\n".format(self.symtable[sequence].value_var, right_info.content)
-                        content += "    {} = scipy.sparse.coo_matrix(({}, np.asarray({}).T), shape=({}, {}))\n".format(sequence,
-                                                                                                            self.symtable[sequence].value_var,
-                                                                                                            self.symtable[sequence].index_var,
-                                                                                                            self.symtable[
-                                                                                                                sequence].rows,
-                                                                                                            self.symtable[
-                                                                                                                sequence].cols)
+                        la_type = self.symtable[sequence]
+                        # one value per row, indices are known up front
+                        content += "    {} = np.zeros({})\n".format(la_type.value_var, la_type.rows)
+                        vectorized = self.vectorize_sparse_diagonal(node, sequence, left_subs[0])
+                        if vectorized is not None:
+                            content += vectorized
+                        else:
+                            content += "    for {} in range(1, {}+1):\n".format(left_subs[0], la_type.rows)
+                            if right_info.pre_list:
+                                content += self.update_prelist_str(right_info.pre_list, "    ")
+                            content += "        {}[{}-1] = {}\n".format(la_type.value_var, left_subs[0], right_info.content)
+                        content += "    {} = np.tile(np.arange({}), (2, 1))\n".format(la_type.index_var, la_type.rows)
+                        sparse_content = self.get_sparse_str(la_type.value_var, la_type.index_var, la_type.rows, la_type.cols)
+                        if sequence in self.declared_symbols:
+                            # the diagonal is added to the existing entries
+                            content += "    {} = ({} + {}).asformat('{}')\n".format(sequence, sequence, sparse_content, self.sparse_format)
+                        else:
+                            content += "    {} = {}\n".format(sequence, sparse_content)
                     else:  # L_ij
                         if right_info.pre_list:
                             content += "".join(right_info.pre_list)
@@ -950,7 +1509,7 @@ class CodeGenNumpy(CodeGen):
                         content += self.update_prelist_str(right_info.pre_list, "    ")
                     content += "        {}[{}-1][{}-1] = {}".format(sequence, left_subs[0], left_subs[0], right_info.content)
                 else:
-                    for right_var in type_info.symbols:
+                    for right_var in sorted(type_info.symbols):
                         if sub_strs in right_var:
                             var_ids = self.get_all_ids(right_var)
                             right_info.content = right_info.content.replace(right_var, "{}[{}][{}]".format(var_ids[0], var_ids[1][0], var_ids[1][1]))
@@ -971,7 +1530,7 @@ class CodeGenNumpy(CodeGen):
             elif len(left_subs) == 1: # sequence only
                 sequence = left_ids[0]  # y left_subs[0]
                 # replace sequence
-                for right_var in type_info.symbols:
+                for right_var in sorted(type_info.symbols):
                     if self.contain_subscript(right_var):
                         var_ids = self.get_all_ids(right_var)
                         right_info.content = right_info.content.replace(right_var, "{}[{}]".format(var_ids[0], var_ids[1][0]))
@@ -1285,6 +1844,10 @@ class CodeGenNumpy(CodeGen):
         param_info = self.visit(node.param, **kwargs)
         params_content = param_info.content
         pre_list = param_info.pre_list
+        if node.func_type in STRUCTURED_FUNCS:
+            structured = self.get_structured_content(node, node.param, params_content)
+            if structured is not None:
+                return CodeNodeInfo(structured, pre_list=pre_list)
         if node.func_type == MathFuncType.MathFuncSin:
             content = 'np.sin'
         elif node.func_type == MathFuncType.MathFuncAsin:
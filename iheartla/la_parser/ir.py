@@ -1,4 +1,5 @@
 from .la_types import *
+import copy
 import weakref
 
 
@@ -85,7 +86,13 @@ class IRNodeType(Enum):
     Import = 500
 
 
+_slot_names = {}  # class -> names of the slots, including the base classes
+
+
 class IRNode(object):
+    # nodes keep their attributes in slots, there are many of them
+    __slots__ = ('la_type', 'node_type', 'parent', 'parse_info', 'raw_text', '__weakref__')
+
     def __init__(self, node_type=None, parent=None, parse_info=None, raw_text=None):
         super().__init__()
         self.node_type = node_type
@@ -115,23 +122,60 @@ class IRNode(object):
     def get_child(self, node_type):
         return None
 
+    def get_attrs(self):
+        """
+        Replaces vars(node), nodes have no __dict__
+        :return: list of (name, value) of the attributes that are set
+        """
+        cls = type(self)
+        if cls not in _slot_names:
+            _slot_names[cls] = [name for base in reversed(cls.__mro__) for name in base.__dict__.get('__slots__', ())
+                                if name != '__weakref__']
+        return [(name, getattr(self, name)) for name in _slot_names[cls] if hasattr(self, name)]
+
+    def replace_node(self, old_node, new_node):
+        """
+        Only the nodes on the path to old_node are copied, the other subtrees are shared
+        :return: the tree with old_node replaced by new_node, self if old_node isn't in it
+        """
+        if self is old_node:
+            return new_node
+        for name, value in self.get_attrs():
+            if isinstance(value, IRNode):
+                replaced = value.replace_node(old_node, new_node)
+                if replaced is not value:
+                    node = copy.copy(self)
+                    setattr(node, name, replaced)
+                    replaced.set_parent(node)
+                    return node
+        return self
+
+
 class StmtNode(IRNode):
+    __slots__ = ()
+
     def __init__(self, node_type=None, parse_info=None, raw_text=None):
         super().__init__(node_type, parse_info=parse_info, raw_text=raw_text)
 
 
 class ExprNode(IRNode):
+    __slots__ = ()
+
     def __init__(self, node_type=None, parse_info=None, raw_text=None):
         super().__init__(node_type, parse_info=parse_info, raw_text=raw_text)
 
 
 class LhsNode(ExprNode):
+    __slots__ = ('lhs_sub_dict',)
+
     def __init__(self, node_type=IRNodeType.INVALID, parse_info=None, raw_text=None):
         super().__init__(node_type=node_type, parse_info=parse_info, raw_text=raw_text)
         self.lhs_sub_dict = {}  # dict of the same subscript symbol from rhs as the subscript of lhs
 
 
 class StartNode(StmtNode):
+    __slots__ = ('cond', 'directives', 'given_cond', 'stat', 'vblock')
+
     def __init__(self, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.Start, parse_info=parse_info, raw_text=raw_text)
         self.cond = None
@@ -165,6 +209,8 @@ class StartNode(StmtNode):
 
 
 class ParamsBlockNode(StmtNode):
+    __slots__ = ('annotation', 'conds')
+
     def __init__(self, parse_info=None, raw_text=None, annotation=None, conds=None):
         super().__init__(IRNodeType.ParamsBlock, parse_info=parse_info, raw_text=raw_text)
         self.annotation = annotation
@@ -172,12 +218,16 @@ class ParamsBlockNode(StmtNode):
 
 
 class WhereConditionsNode(StmtNode):
+    __slots__ = ('value',)
+
     def __init__(self, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.WhereConditions, parse_info=parse_info, raw_text=raw_text)
         self.value = []
 
 
 class WhereConditionNode(StmtNode):
+    __slots__ = ('desc', 'id', 'type')
+
     def __init__(self, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.WhereCondition, parse_info=parse_info, raw_text=raw_text)
         self.id = []
@@ -186,6 +236,8 @@ class WhereConditionNode(StmtNode):
 
 
 class SetTypeNode(ExprNode):
+    __slots__ = ('cnt', 'type', 'type1', 'type2')
+
     def __init__(self, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.SetType, parse_info=parse_info, raw_text=raw_text)
         self.type = None
@@ -195,6 +247,8 @@ class SetTypeNode(ExprNode):
 
 
 class MatrixTypeNode(ExprNode):
+    __slots__ = ('id1', 'id2', 'type')
+
     def __init__(self, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.MatrixType, parse_info=parse_info, raw_text=raw_text)
         self.id1 = None
@@ -203,6 +257,8 @@ class MatrixTypeNode(ExprNode):
 
 
 class VectorTypeNode(ExprNode):
+    __slots__ = ('id1', 'type')
+
     def __init__(self, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.VectorType, parse_info=parse_info, raw_text=raw_text)
         self.id1 = None
@@ -210,12 +266,16 @@ class VectorTypeNode(ExprNode):
 
 
 class ScalarTypeNode(ExprNode):
+    __slots__ = ('is_int',)
+
     def __init__(self, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.ScalarType, parse_info=parse_info, raw_text=raw_text)
         self.is_int = False
 
 
 class FunctionTypeNode(ExprNode):
+    __slots__ = ('empty', 'params', 'ret', 'separators')
+
     def __init__(self, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.FunctionType, parse_info=parse_info, raw_text=raw_text)
         self.empty = None
@@ -225,6 +285,8 @@ class FunctionTypeNode(ExprNode):
 
 
 class ImportNode(StmtNode):
+    __slots__ = ('names', 'package')
+
     def __init__(self, package=None, names=None, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.Import, parse_info=parse_info, raw_text=raw_text)
         self.package = package
@@ -232,6 +294,8 @@ class ImportNode(StmtNode):
 
 
 class BlockNode(StmtNode):
+    __slots__ = ('stmts',)
+
     def __init__(self, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.Block, parse_info=parse_info, raw_text=raw_text)
         self.stmts = []
@@ -244,6 +308,8 @@ class BlockNode(StmtNode):
 
 
 class AssignNode(StmtNode):
+    __slots__ = ('left', 'lhs_sub_dict', 'op', 'right', 'symbols')
+
     def __init__(self, left=None, right=None, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.Assignment, parse_info=parse_info, raw_text=raw_text)
         self.left = left   # IdNode,MatrixIndexNode,VectorIndexNode,VectorIndexNode
@@ -254,6 +320,8 @@ class AssignNode(StmtNode):
 
 
 class IfNode(StmtNode):
+    __slots__ = ('cond', 'loop')
+
     def __init__(self, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.If, parse_info=parse_info, raw_text=raw_text)
         self.cond = None
@@ -278,6 +346,8 @@ class ConditionType(IntEnum):
 
 
 class ConditionNode(StmtNode):
+    __slots__ = ('cond_list', 'cond_type', 'tex_node')
+
     def __init__(self, parse_info=None, raw_text=None, cond_type=ConditionType.ConditionAnd):
         super().__init__(IRNodeType.Condition, parse_info=parse_info, raw_text=raw_text)
         self.cond_list = []
@@ -286,6 +356,8 @@ class ConditionNode(StmtNode):
 
 
 class InNode(StmtNode):
+    __slots__ = ('items', 'loop', 'set')
+
     def __init__(self, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.In, parse_info=parse_info, raw_text=raw_text)
         self.items = []
@@ -300,6 +372,8 @@ class InNode(StmtNode):
 
 
 class NotInNode(StmtNode):
+    __slots__ = ('items', 'set')
+
     def __init__(self, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.NotIn, parse_info=parse_info, raw_text=raw_text)
         self.items = []
@@ -307,6 +381,8 @@ class NotInNode(StmtNode):
 
 
 class BinCompNode(StmtNode):
+    __slots__ = ('comp_type', 'left', 'op', 'right')
+
     def __init__(self, comp_type=IRNodeType.INVALID, left=None, right=None, parse_info=None, raw_text=None, op=None):
         super().__init__(IRNodeType.BinComp, parse_info=parse_info, raw_text=raw_text)
         self.comp_type = comp_type
@@ -330,6 +406,8 @@ class BinCompNode(StmtNode):
 
 
 class ExpressionNode(ExprNode):
+    __slots__ = ('sign', 'value')
+
     def __init__(self, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.Expression, parse_info=parse_info, raw_text=raw_text)
         self.value = None
@@ -344,6 +422,8 @@ class ExpressionNode(ExprNode):
 
 
 class CastNode(ExprNode):
+    __slots__ = ('value',)
+
     def __init__(self, parse_info=None, raw_text=None, value=None):
         super().__init__(IRNodeType.Cast, parse_info=parse_info, raw_text=raw_text)
         # current: 1x1 matrix -> scalar
@@ -355,6 +435,8 @@ class CastNode(ExprNode):
 
 
 class IdNode(ExprNode):
+    __slots__ = ('main_id', 'name', 'subs')
+
     def __init__(self, main_id='', subs=None, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.Id, parse_info=parse_info, raw_text=raw_text)
         self.name = None
@@ -392,6 +474,8 @@ class IdNode(ExprNode):
 
 
 class AddNode(ExprNode):
+    __slots__ = ('left', 'right')
+
     def __init__(self, left=None, right=None, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.Add, parse_info=parse_info, raw_text=raw_text)
         self.left = left
@@ -410,6 +494,8 @@ class AddNode(ExprNode):
 
 
 class SubNode(ExprNode):
+    __slots__ = ('left', 'right')
+
     def __init__(self, left=None, right=None, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.Sub, parse_info=parse_info, raw_text=raw_text)
         self.left = left
@@ -428,6 +514,8 @@ class SubNode(ExprNode):
 
 
 class AddSubNode(ExprNode):
+    __slots__ = ('left', 'op', 'right')
+
     def __init__(self, left=None, right=None, parse_info=None, raw_text=None, op='+-'):
         super().__init__(IRNodeType.AddSub, parse_info=parse_info, raw_text=raw_text)
         self.left = left
@@ -459,6 +547,8 @@ class MulOpType(Enum):
 
 
 class MulNode(ExprNode):
+    __slots__ = ('left', 'op', 'right')
+
     def __init__(self, left=None, right=None, parse_info=None, raw_text=None, op=MulOpType.MulOpInvalid):
         super().__init__(IRNodeType.Mul, parse_info=parse_info, raw_text=raw_text)
         self.left = left
@@ -473,6 +563,8 @@ class DivOpType(Enum):
 
 
 class DivNode(ExprNode):
+    __slots__ = ('left', 'op', 'right')
+
     def __init__(self, left=None, right=None, parse_info=None, raw_text=None, op=DivOpType.DivOpSlash):
         super().__init__(IRNodeType.Div, parse_info=parse_info, raw_text=raw_text)
         self.left = left
@@ -481,6 +573,8 @@ class DivNode(ExprNode):
 
 
 class MatrixNode(ExprNode):
+    __slots__ = ('items', 'symbol', 'value')
+
     def __init__(self, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.Matrix, parse_info=parse_info, raw_text=raw_text)
         self.items = None
@@ -489,6 +583,8 @@ class MatrixNode(ExprNode):
 
 
 class VectorNode(ExprNode):
+    __slots__ = ('items', 'symbol')
+
     def __init__(self, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.Vector, parse_info=parse_info, raw_text=raw_text)
         self.items = []
@@ -496,12 +592,16 @@ class VectorNode(ExprNode):
 
 
 class ToMatrixNode(ExprNode):
+    __slots__ = ('item',)
+
     def __init__(self, parse_info=None, raw_text=None, item=None):
         super().__init__(IRNodeType.ToMatrix, parse_info=parse_info, raw_text=raw_text)
         self.item = item
 
 
 class MatrixRowsNode(ExprNode):
+    __slots__ = ('r', 'rs')
+
     def __init__(self, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.MatrixRows, parse_info=parse_info, raw_text=raw_text)
         self.rs = None
@@ -509,6 +609,8 @@ class MatrixRowsNode(ExprNode):
 
 
 class MatrixRowNode(ExprNode):
+    __slots__ = ('exp', 'rc')
+
     def __init__(self, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.MatrixRow, parse_info=parse_info, raw_text=raw_text)
         self.rc = None
@@ -516,6 +618,8 @@ class MatrixRowNode(ExprNode):
 
 
 class MatrixRowCommasNode(ExprNode):
+    __slots__ = ('exp', 'value')
+
     def __init__(self, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.MatrixRowCommas, parse_info=parse_info, raw_text=raw_text)
         self.value = None
@@ -523,6 +627,8 @@ class MatrixRowCommasNode(ExprNode):
 
 
 class SummationNode(ExprNode):
+    __slots__ = ('cond', 'content', 'exp', 'id', 'sub', 'sym_dict', 'symbol', 'symbols')
+
     def __init__(self, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.Summation, parse_info=parse_info, raw_text=raw_text)
         self.sub = None
@@ -544,6 +650,8 @@ class OptimizeType(Enum):
 
 
 class OptimizeNode(ExprNode):
+    __slots__ = ('base', 'base_type', 'cond_list', 'exp', 'opt_type')
+
     def __init__(self, opt_type=OptimizeType.OptimizeInvalid, cond_list=[], exp=None, base=None, base_type=None, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.Optimize, parse_info=parse_info, raw_text=raw_text)
         self.opt_type = opt_type
@@ -554,6 +662,8 @@ class OptimizeNode(ExprNode):
 
 
 class DomainNode(ExprNode):
+    __slots__ = ('lower', 'upper')
+
     def __init__(self, lower=None, upper=None, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.Domain, parse_info=parse_info, raw_text=raw_text)
         self.upper = upper
@@ -561,6 +671,8 @@ class DomainNode(ExprNode):
 
 
 class IntegralNode(ExprNode):
+    __slots__ = ('base', 'domain', 'exp')
+
     def __init__(self, domain=None, exp=None, base=None, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.Integral, parse_info=parse_info, raw_text=raw_text)
         self.domain = domain
@@ -569,6 +681,8 @@ class IntegralNode(ExprNode):
 
 
 class InnerProductNode(ExprNode):
+    __slots__ = ('left', 'right', 'sub')
+
     def __init__(self, left=None, right=None, sub=None, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.InnerProduct, parse_info=parse_info, raw_text=raw_text)
         self.left = left
@@ -577,6 +691,8 @@ class InnerProductNode(ExprNode):
 
 
 class FroProductNode(ExprNode):
+    __slots__ = ('left', 'right')
+
     def __init__(self, left=None, right=None, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.FroProduct, parse_info=parse_info, raw_text=raw_text)
         self.left = left
@@ -584,6 +700,8 @@ class FroProductNode(ExprNode):
 
 
 class HadamardProductNode(ExprNode):
+    __slots__ = ('left', 'right')
+
     def __init__(self, left=None, right=None, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.HadamardProduct, parse_info=parse_info, raw_text=raw_text)
         self.left = left
@@ -591,6 +709,8 @@ class HadamardProductNode(ExprNode):
 
 
 class CrossProductNode(ExprNode):
+    __slots__ = ('left', 'right')
+
     def __init__(self, left=None, right=None, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.CrossProduct, parse_info=parse_info, raw_text=raw_text)
         self.left = left
@@ -598,6 +718,8 @@ class CrossProductNode(ExprNode):
 
 
 class KroneckerProductNode(ExprNode):
+    __slots__ = ('left', 'right')
+
     def __init__(self, left=None, right=None, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.KroneckerProduct, parse_info=parse_info, raw_text=raw_text)
         self.left = left
@@ -605,6 +727,8 @@ class KroneckerProductNode(ExprNode):
 
 
 class DotProductNode(ExprNode):
+    __slots__ = ('left', 'right')
+
     def __init__(self, left=None, right=None, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.DotProduct, parse_info=parse_info, raw_text=raw_text)
         self.left = left
@@ -622,6 +746,8 @@ class NormType(Enum):
 
 
 class NormNode(ExprNode):
+    __slots__ = ('norm_type', 'sub', 'value')
+
     def __init__(self, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.Norm, parse_info=parse_info, raw_text=raw_text)
         self.value = None
@@ -630,18 +756,24 @@ class NormNode(ExprNode):
 
 
 class TransposeNode(ExprNode):
+    __slots__ = ('f',)
+
     def __init__(self, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.Transpose, parse_info=parse_info, raw_text=raw_text)
         self.f = None
 
 
 class SquarerootNode(ExprNode):
+    __slots__ = ('value',)
+
     def __init__(self, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.Squareroot, parse_info=parse_info, raw_text=raw_text)
         self.value = None
 
 
 class PowerNode(ExprNode):
+    __slots__ = ('base', 'func_name', 'power', 'r', 't')
+
     def __init__(self, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.Power, parse_info=parse_info, raw_text=raw_text)
         self.base = None
@@ -651,6 +783,8 @@ class PowerNode(ExprNode):
 
 
 class SolverNode(ExprNode):
+    __slots__ = ('left', 'pow', 'right')
+
     def __init__(self, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.Solver, parse_info=parse_info, raw_text=raw_text)
         self.left = None
@@ -659,6 +793,8 @@ class SolverNode(ExprNode):
 
 
 class SparseMatrixNode(ExprNode):
+    __slots__ = ('id1', 'id2', 'ifs', 'other', 'symbol')
+
     def __init__(self, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.SparseMatrix, parse_info=parse_info, raw_text=raw_text)
         self.ifs = None
@@ -668,6 +804,8 @@ class SparseMatrixNode(ExprNode):
 
 
 class SparseIfNode(ExprNode):
+    __slots__ = ('cond', 'first_in_list', 'id0', 'id1', 'id2', 'loop', 'stat')
+
     def __init__(self, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.SparseIf, parse_info=parse_info, raw_text=raw_text)
         self.stat = None
@@ -685,6 +823,8 @@ class SparseIfNode(ExprNode):
 
 
 class SparseIfsNode(ExprNode):
+    __slots__ = ('cond_list', 'in_cond_only')
+
     def __init__(self, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.SparseIfs, parse_info=parse_info, raw_text=raw_text)
         self.cond_list = []
@@ -698,11 +838,15 @@ class SparseIfsNode(ExprNode):
 
 
 class SparseOtherNode(ExprNode):
+    __slots__ = ()
+
     def __init__(self, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.SparseOther, parse_info=parse_info, raw_text=raw_text)
 
 
 class ExpInMatrixNode(ExprNode):
+    __slots__ = ('sign', 'value')
+
     def __init__(self, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.ExpInMatrix, parse_info=parse_info, raw_text=raw_text)
         self.value = None
@@ -710,6 +854,8 @@ class ExpInMatrixNode(ExprNode):
 
 
 class NumMatrixNode(ExprNode):
+    __slots__ = ('id', 'id1', 'id2', 'left')
+
     def __init__(self, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.NumMatrix, parse_info=parse_info, raw_text=raw_text)
         self.id = None
@@ -719,6 +865,8 @@ class NumMatrixNode(ExprNode):
 
 
 class IndexNode(ExprNode):
+    __slots__ = ()
+
     def __init__(self, node_type=IRNodeType.INVALID, parse_info=None, raw_text=None):
         super().__init__(node_type, parse_info=parse_info, raw_text=raw_text)
 
@@ -735,6 +883,8 @@ class IndexNode(ExprNode):
 
 
 class MatrixIndexNode(IndexNode):
+    __slots__ = ('col_index', 'main', 'row_index', 'subs')
+
     def __init__(self, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.MatrixIndex, parse_info=parse_info, raw_text=raw_text)
         self.main = None
@@ -770,6 +920,8 @@ class MatrixIndexNode(IndexNode):
 
 
 class VectorIndexNode(IndexNode):
+    __slots__ = ('main', 'row_index')
+
     def __init__(self, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.VectorIndex, parse_info=parse_info, raw_text=raw_text)
         self.main = None
@@ -791,6 +943,8 @@ class VectorIndexNode(IndexNode):
 
 
 class SequenceIndexNode(IndexNode):
+    __slots__ = ('col_index', 'main', 'main_index', 'row_index', 'slice_matrix')
+
     def __init__(self, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.SequenceIndex, parse_info=parse_info, raw_text=raw_text)
         self.main = None
@@ -837,6 +991,8 @@ class SequenceIndexNode(IndexNode):
 
 
 class SeqDimIndexNode(IndexNode):
+    __slots__ = ('dim_index', 'main', 'main_index', 'real_symbol')
+
     def __init__(self, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.SeqDimIndex, parse_info=parse_info, raw_text=raw_text)
         self.main = None
@@ -857,6 +1013,8 @@ class SeqDimIndexNode(IndexNode):
 
 
 class SubexpressionNode(ExprNode):
+    __slots__ = ('value',)
+
     def __init__(self, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.Subexpression, parse_info=parse_info, raw_text=raw_text)
         self.value = None
@@ -869,12 +1027,16 @@ class ConstantType(Enum):
 
 
 class ConstantNode(ExprNode):
+    __slots__ = ('c_type',)
+
     def __init__(self, c_type=ConstantType.ConstantInvalid, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.Constant, parse_info=parse_info, raw_text=raw_text)
         self.c_type = c_type
 
 
 class DerivativeNode(ExprNode):
+    __slots__ = ('value',)
+
     def __init__(self, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.Derivative, parse_info=parse_info, raw_text=raw_text)
         self.value = None
@@ -917,6 +1079,8 @@ class MathFuncType(IntEnum):
 
 
 class MathFuncNode(ExprNode):
+    __slots__ = ('func_name', 'func_type', 'param', 'remain_params', 'separator')
+
     def __init__(self, param=None, func_type=MathFuncType.MathFuncInvalid, remain_params=[], func_name=None, separator=None, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.MathFunc, parse_info=parse_info, raw_text=raw_text)
         self.param = param   # first param
@@ -929,6 +1093,8 @@ class MathFuncNode(ExprNode):
 
 
 class FactorNode(ExprNode):
+    __slots__ = ('c', 'id', 'm', 'nm', 'num', 'op', 's', 'sub', 'v')
+
     def __init__(self, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.Factor, parse_info=parse_info, raw_text=raw_text)
         self.op = None
@@ -942,12 +1108,16 @@ class FactorNode(ExprNode):
 
 
 class DoubleNode(ExprNode):
+    __slots__ = ('value',)
+
     def __init__(self, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.Double, parse_info=parse_info, raw_text=raw_text)
         self.value = None
 
 
 class FractionNode(ExprNode):
+    __slots__ = ('denominator', 'numerator', 'unicode')
+
     def __init__(self, parse_info=None, raw_text=None, numerator=None, denominator=None):
         super().__init__(IRNodeType.Fraction, parse_info=parse_info, raw_text=raw_text)
         self.denominator = denominator
@@ -956,12 +1126,16 @@ class FractionNode(ExprNode):
 
 
 class IntegerNode(ExprNode):
+    __slots__ = ('value',)
+
     def __init__(self, parse_info=None, raw_text=None, value=None):
         super().__init__(IRNodeType.Integer, parse_info=parse_info, raw_text=raw_text)
         self.value = value
 
 
 class FunctionNode(ExprNode):
+    __slots__ = ('name', 'params', 'ret', 'separators')
+
     def __init__(self, parse_info=None, raw_text=None):
         super().__init__(IRNodeType.Function, parse_info=parse_info, raw_text=raw_text)
         self.params = []
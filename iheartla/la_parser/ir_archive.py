@@ -0,0 +1,117 @@
+import io
+import zlib
+import pickle
+import struct
+import weakref
+import copyreg
+import inspect
+from fractions import Fraction
+from tatsu.infos import ParseInfo
+from ..la_tools.la_cache import CompileCache
+from ..la_tools.la_dims import DimExpr
+from . import ir, la_types
+
+IR_MAGIC = b'LAIR'
+IR_FORMAT_VERSION = 2
+IR_SUFFIX = '.lair'
+# type walker attributes the code generators read in init_type
+WALKER_STATE = ['symtable', 'tmp_symtable', 'parameters', 'subscripts', 'dim_dict', 'seq_dim_dict', 'ids_dict',
+                'dim_seq_set', 'sub_name_dict', 'name_cnt_dict', 'ret_symbol', 'unofficial_method', 'lhs_list',
+                'la_content', 'same_dim_list', 'arith_dim_list', 'desc_dict']
+
+
+class IRArchiveError(Exception):
+    pass
+
+
+class IRUnpickler(pickle.Unpickler):
+    """
+    Unpickler that only creates the IR and type classes, an IR file can't run other code when it is loaded.
+    The allow-list limits what a crafted file can do, IR files should still come from a trusted source.
+    """
+    # modules whose classes make up the IR, by name
+    IR_MODULES = {module.__name__: module for module in [ir, la_types]}
+
+    def find_class(self, module, name):
+        if module in self.IR_MODULES:
+            cls = getattr(self.IR_MODULES[module], name, None)
+            if inspect.isclass(cls) and cls.__module__ == module:
+                return cls
+        elif (module, name) in ALLOWED_GLOBALS:
+            return ALLOWED_GLOBALS[(module, name)]
+        raise IRArchiveError("The IR file refers to {}.{}, which isn't part of the IR".format(module, name))
+
+
+class WalkerState(object):
+    """
+    What the code generators need from the type walker, passed to walk_model in its place
+    """
+    __slots__ = WALKER_STATE
+
+    def __init__(self, state):
+        for name in WALKER_STATE:
+            setattr(self, name, state[name])
+
+
+def _none():
+    return None
+
+
+def _reduce_ref(ref):
+    # parents are weak references, the tree keeps them alive
+    target = ref()
+    if target is None:
+        return _none, ()
+    return weakref.ref, (target,)
+
+
+def _reduce_parse_info(parse_info):
+    # positions point into the parser buffer, only the type walker reports errors with them
+    return _none, ()
+
+
+# globals besides the IR classes that dump_ir writes
+ALLOWED_GLOBALS = {(obj.__module__, obj.__qualname__): obj for obj in [_none, weakref.ref, Fraction, DimExpr]}
+
+
+def _header(fingerprint):
+    return IR_MAGIC + struct.pack('<H', IR_FORMAT_VERSION) + fingerprint.encode()
+
+
+def dump_ir(type_walker, start_node):
+    """
+    Serialize the typed IR of parse_ir_node together with the type walker state
+    :return: bytes, valid for the same compiler version only
+    """
+    buffer = io.BytesIO()
+    pickler = pickle.Pickler(buffer, pickle.HIGHEST_PROTOCOL)
+    pickler.dispatch_table = copyreg.dispatch_table.copy()
+    pickler.dispatch_table[weakref.ReferenceType] = _reduce_ref
+    pickler.dispatch_table[ParseInfo] = _reduce_parse_info
+    pickler.dump(({name: getattr(type_walker, name) for name in WALKER_STATE}, start_node))
+    return _header(CompileCache.getInstance().get_fingerprint()) + zlib.compress(buffer.getvalue())
+
+
+def load_ir(data):
+    """
+    Only load IR files from a trusted source, see IRUnpickler
+    :param data: result of dump_ir
+    :return: (WalkerState, start node), arguments of walk_model
+    """
+    header = _header(CompileCache.getInstance().get_fingerprint())
+    if not data.startswith(IR_MAGIC):
+        raise IRArchiveError("Not an I Heart LA IR file")
+    if not data.startswith(header):
+        raise IRArchiveError("The IR file was written by a different version of the compiler, compile the source again")
+    state, start_node = IRUnpickler(io.BytesIO(zlib.decompress(data[len(header):]))).load()
+    return WalkerState(state), start_node
+
+
+def save_ir_file(ir_file, type_walker, start_node):
+    with open(ir_file, 'wb') as f:
+        f.write(dump_ir(type_walker, start_node))
+
+
+def load_ir_file(ir_file):
+    with open(ir_file, 'rb') as f:
+        return load_ir(f.read())
@@ -0,0 +1,169 @@
+from .ir import *
+from ..la_tools.la_dims import DimExpr, to_dim_expr
+
+DEFAULT_DIM_SIZE = 100  # symbolic dimensions without a size hint are assumed to be large
+
+
+class MatrixChain(object):
+    """
+    Product of matrices and vectors, evaluated in the cheapest order
+    """
+    __slots__ = ('operands', 'order', 'cost', 'written_cost')
+
+    def __init__(self, operands, order, cost, written_cost):
+        self.operands = operands  # nodes multiplied, from left to right
+        self.order = order  # index of an operand or (left order, right order)
+        self.cost = cost
+        self.written_cost = written_cost
+
+
+def get_dim_size(dim, size_hints):
+    """
+    :param dim: rows or cols of a la_type, an int or the symbolic size
+    :return: number used for the cost
+    """
+    if isinstance(dim, int):
+        return dim
+    # symbolic sizes go through the dimension parser, Python's ast differs between versions
+    dim = to_dim_expr(dim) if isinstance(dim, str) else dim
+    if not isinstance(dim, DimExpr):
+        return DEFAULT_DIM_SIZE
+    size = 0
+    try:
+        for monomial, coeff in dim.terms:
+            for symbol, exponent in monomial:
+                coeff *= size_hints.get(symbol, DEFAULT_DIM_SIZE) ** exponent
+            size += coeff
+    except ZeroDivisionError:
+        return DEFAULT_DIM_SIZE
+    return size
+
+
+def get_dims(la_type, size_hints):
+    """
+    :return: (rows, cols) used for the cost, vectors are columns
+    """
+    if la_type.is_scalar():
+        return 1, 1
+    rows = DEFAULT_DIM_SIZE if la_type.is_dynamic_row() else get_dim_size(la_type.rows, size_hints)
+    if la_type.is_vector():
+        return rows, 1
+    cols = DEFAULT_DIM_SIZE if la_type.is_dynamic_col() else get_dim_size(la_type.cols, size_hints)
+    return rows, cols
+
+
+def is_array(node):
+    return node.la_type is not None and (node.la_type.is_matrix() or node.la_type.is_vector())
+
+
+def is_array_mul(node):
+    return node.is_node(IRNodeType.Mul) and is_array(node.left) and is_array(node.right)
+
+
+def unwrap(node):
+    """
+    Parentheses of the source don't change the product
+    :return: the product inside the parentheses, the node itself otherwise
+    """
+    inner = node
+    while True:
+        if inner.is_node(IRNodeType.Factor) and inner.sub is not None:
+            inner = inner.sub
+        elif inner.is_node(IRNodeType.Subexpression) or (inner.is_node(IRNodeType.Expression) and not inner.sign):
+            inner = inner.value
+        else:
+            break
+    return inner if is_array_mul(inner) else node
+
+
+class MatrixChainFinder(object):
+    def __init__(self, size_hints):
+        self.size_hints = size_hints
+        self.products = set()  # Mul nodes inside a chain
+        self.walked = set()
+
+    def flatten(self, node, operands):
+        """
+        :return: order of the product as written
+        """
+        node = unwrap(node)
+        if is_array_mul(node):
+            self.products.add(node)
+            return self.flatten(node.left, operands), self.flatten(node.right, operands)
+        operands.append(node)
+        return len(operands) - 1
+
+    def get_cost(self, order, dims):
+        """
+        :return: (rows, cols, multiplications)
+        """
+        if isinstance(order, int):
+            return dims[order][0], dims[order][1], 0
+        l_rows, l_cols, l_cost = self.get_cost(order[0], dims)
+        r_rows, r_cols, r_cost = self.get_cost(order[1], dims)
+        return l_rows, r_cols, l_cost + r_cost + l_rows * l_cols * r_cols
+
+    def get_cheapest_order(self, dims):
+        count = len(dims)
+        cost = [[0] * count for _ in range(count)]
+        order = [[index if start == index else None for index in range(count)] for start in range(count)]
+        for length in range(2, count + 1):
+            for start in range(count - length + 1):
+                end = start + length - 1
+                best = None
+                for split in range(start, end):
+                    cur = cost[start][split] + cost[split + 1][end] + dims[start][0] * dims[split][1] * dims[end][1]
+                    if best is None or cur < best:
+                        best = cur
+                        order[start][end] = (order[start][split], order[split + 1][end])
+                cost[start][end] = best
+        return order[0][count - 1], cost[0][count - 1]
+
+    def get_chain(self, node):
+        operands = []
+        written_order = self.flatten(node, operands)
+        if len(operands) < 3:
+            return None
+        dims = []
+        for index, operand in enumerate(operands):
+            la_type = operand.la_type
+            if not is_array(operand) or la_type.sparse or (la_type.is_vector() and index != len(operands) - 1):
+                return None
+            if la_type.is_matrix() and la_type.is_diagonal_structure():
+                # scaling by a diagonal matrix isn't a matrix product
+                return None
+            dims.append(get_dims(la_type, self.size_hints))
+        order, cost = self.get_cheapest_order(dims)
+        written_cost = self.get_cost(written_order, dims)[2]
+        if cost >= written_cost:
+            return None
+        return MatrixChain(operands, order, cost, written_cost)
+
+    def walk(self, node, chain_dict):
+        if node in self.walked:
+            return
+        self.walked.add(node)
+        if is_array_mul(node) and node not in self.products:
+            chain = self.get_chain(node)
+            if chain is not None:
+                chain_dict[node] = chain
+        for name, value in node.get_attrs():
+            if name == 'parent':
+                continue
+            if isinstance(value, IRNode):
+                self.walk(value, chain_dict)
+            elif isinstance(value, list):
+                for item in value:
+                    if isinstance(item, IRNode):
+                        self.walk(item, chain_dict)
+
+
+def find_matrix_chains(node, size_hints=None):
+    """
+    Matrix chain ordering for the products of three or more matrices and vectors
+    :param size_hints: dict of symbolic dimension -> expected size
+    :return: dict of the outermost Mul node -> MatrixChain, for the products cheaper in another order
+    """
+    chain_dict = {}
+    MatrixChainFinder(size_hints or {}).walk(node, chain_dict)
+    return chain_dict
@@ -0,0 +1,217 @@
+from .ir import *
+from enum import Enum
+
+# nodes without side effects whose output only depends on their attributes and children
+PURE_NODES = {IRNodeType.Id, IRNodeType.Double, IRNodeType.Fraction, IRNodeType.Integer, IRNodeType.Constant,
+              IRNodeType.Factor, IRNodeType.Expression, IRNodeType.Subexpression, IRNodeType.Cast, IRNodeType.Add,
+              IRNodeType.Sub, IRNodeType.Mul, IRNodeType.Div, IRNodeType.Norm, IRNodeType.Transpose, IRNodeType.Power,
+              IRNodeType.Solver, IRNodeType.MathFunc, IRNodeType.InnerProduct, IRNodeType.FroProduct,
+              IRNodeType.HadamardProduct, IRNodeType.CrossProduct, IRNodeType.KroneckerProduct, IRNodeType.DotProduct,
+              IRNodeType.Squareroot, IRNodeType.MatrixIndex, IRNodeType.VectorIndex, IRNodeType.SequenceIndex,
+              IRNodeType.ToMatrix}
+# operations worth a temporary, the other pure nodes are as cheap as reading a temporary
+CSE_NODES = {IRNodeType.Add, IRNodeType.Sub, IRNodeType.Mul, IRNodeType.Div, IRNodeType.Norm, IRNodeType.Power,
+             IRNodeType.Solver, IRNodeType.MathFunc, IRNodeType.InnerProduct, IRNodeType.FroProduct,
+             IRNodeType.HadamardProduct, IRNodeType.CrossProduct, IRNodeType.KroneckerProduct, IRNodeType.DotProduct,
+             IRNodeType.Squareroot}
+# nodes between a subexpression and its scope, all of them evaluate every child and keep the pre_list of the children
+TRANSPARENT_NODES = PURE_NODES | {IRNodeType.Matrix, IRNodeType.MatrixRows, IRNodeType.MatrixRow,
+                                  IRNodeType.MatrixRowCommas, IRNodeType.ExpInMatrix}
+# node type -> attribute evaluated once per statement or loop iteration, where the temporaries are defined
+SCOPE_ATTRS = {IRNodeType.Assignment: 'right', IRNodeType.Summation: 'exp', IRNodeType.Optimize: 'exp'}
+# attributes that don't change the generated code
+IGNORED_ATTRS = {'la_type', 'node_type', 'parent', 'parse_info', 'raw_text'}
+
+
+class CommonSubexpr(object):
+    """
+    Structurally identical subtrees of one scope, the code generators evaluate them once into a temporary.
+    Subtrees shared by summations over the same index and range are kept in a buffer with one element per
+    index instead, filled by the summation visited first.
+    """
+    __slots__ = ('nodes', 'first', 'name', 'summations', 'declared')
+
+    def __init__(self, nodes, summations=None):
+        self.nodes = nodes
+        self.first = None  # node visited first, it defines the temporary
+        self.name = None
+        self.summations = summations  # node -> its summation for a buffer, None for a temporary
+        self.declared = False  # the buffer is declared before the loop of its first summation
+
+
+class CommonSubexprFinder(object):
+    def __init__(self, symtable=None):
+        self.symtable = symtable  # without it summations don't share buffers
+        self.keys = {}  # node -> id of its structure, None if it can't be shared
+        self.ids = {}  # structure -> id, hash-consing of the subtrees
+        self.sizes = {}  # node -> number of nodes in the subtree
+        self.scopes = {}  # (scope, id) -> nodes in pre-order
+        self.ranges = {}  # summation directly in a statement -> (statement scope, index, size of the range)
+        self.walked = set()  # some nodes are reachable from two attributes of their parent
+
+    def get_children(self, node):
+        children = []
+        for name, value in node.get_attrs():
+            if name in IGNORED_ATTRS:
+                continue
+            if isinstance(value, IRNode):
+                children.append(value)
+            elif isinstance(value, list):
+                children += [item for item in value if isinstance(item, IRNode)]
+        return children
+
+    def get_key(self, node):
+        """
+        :return: id shared by the structurally identical subtrees, None if the subtree isn't pure
+        """
+        if node in self.keys:
+            return self.keys[node]
+        key = None
+        size = 1
+        if node.node_type in PURE_NODES:
+            attrs = [node.node_type]
+            for name, value in node.get_attrs():
+                if name in IGNORED_ATTRS:
+                    continue
+                value = self.get_value_key(value)
+                if value is None:
+                    attrs = None
+                    break
+                attrs.append((name, value))
+            if attrs is not None:
+                attrs = tuple(attrs)
+                if attrs not in self.ids:
+                    self.ids[attrs] = len(self.ids)
+                key = self.ids[attrs]
+                size += sum(self.sizes[child] for child in self.get_children(node))
+        self.keys[node] = key
+        self.sizes[node] = size
+        return key
+
+    def get_value_key(self, value):
+        if isinstance(value, IRNode):
+            key = self.get_key(value)
+            return None if key is None else ('node', key)
+        if isinstance(value, (list, tuple)):
+            items = tuple(self.get_value_key(item) for item in value)
+            return None if None in items else ('list', items)
+        if value is None or isinstance(value, (str, int, float, bool, Enum)):
+            return ('value', value)
+        return None
+
+    def is_candidate(self, node):
+        if node.node_type not in CSE_NODES or (node.is_node(IRNodeType.Power) and node.t):
+            return False
+        la_type = node.la_type
+        if la_type is None or not (la_type.is_scalar() or la_type.is_vector() or la_type.is_matrix()):
+            return False
+        return not (la_type.is_matrix() and la_type.sparse) and self.get_key(node) is not None
+
+    def walk(self, node, scope=None, shared=False):
+        """
+        :param scope: innermost node of SCOPE_ATTRS
+        :param shared: every node from the scope down to this one is transparent
+        """
+        if node in self.walked:
+            return
+        self.walked.add(node)
+        if node.node_type in SCOPE_ATTRS:
+            if node.is_node(IRNodeType.Summation) and shared and not scope.is_node(IRNodeType.Summation):
+                size = self.get_index_range(node)
+                if size is not None:
+                    self.ranges[node] = (scope, node.content, size)
+            scope_child = getattr(node, SCOPE_ATTRS[node.node_type])
+            for child in self.get_children(node):
+                if child is scope_child:
+                    self.walk(child, node, True)
+                else:
+                    self.walk(child)
+            return
+        if shared and self.is_candidate(node):
+            self.scopes.setdefault((scope, self.get_key(node)), []).append(node)
+        shared = shared and node.node_type in TRANSPARENT_NODES
+        for child in self.get_children(node):
+            self.walk(child, scope, shared)
+
+    def get_index_range(self, node):
+        """
+        :return: size of the range the index of the summation runs over, None if it isn't known
+        """
+        if self.symtable is None or node.cond is not None:
+            return None
+        sizes = set()
+        for sym, subs in node.sym_dict.items():
+            if sym not in self.symtable:
+                return None
+            for cur_index, sub in enumerate(subs):
+                if sub == node.content:
+                    sizes.add(self.symtable[sym].get_dim_size(cur_index))
+        return sizes.pop() if len(sizes) == 1 else None
+
+    def uses_index(self, node, index):
+        if node.is_node(IRNodeType.Id) and node.main_id == index:
+            return True
+        return any(self.uses_index(child, index) for child in self.get_children(node))
+
+    def get_buffer_groups(self):
+        """
+        Subtrees repeated in different summations over the same index and range of one statement
+        :return: list of CommonSubexpr, the nodes are removed from self.scopes
+        """
+        summation_dict = {}  # (range, id) -> summations in pre-order
+        for (scope, key), nodes in self.scopes.items():
+            if scope in self.ranges and self.uses_index(nodes[0], scope.content):
+                summation_dict.setdefault((self.ranges[scope], key), []).append(scope)
+        groups = []
+        for (index_range, key), summations in summation_dict.items():
+            if len(summations) < 2:
+                continue
+            nodes = []
+            summation_of = {}
+            for summation in summations:
+                for cur in self.scopes.pop((summation, key)):
+                    nodes.append(cur)
+                    summation_of[cur] = summation
+            groups.append(CommonSubexpr(nodes, summation_of))
+        return groups
+
+    def get_descendants(self, node, descendants):
+        for child in self.get_children(node):
+            if child not in descendants:
+                descendants.add(child)
+                self.get_descendants(child, descendants)
+        return descendants
+
+    def find(self, node):
+        self.walk(node)
+        groups = self.get_buffer_groups()
+        groups += [CommonSubexpr(nodes) for nodes in self.scopes.values() if len(nodes) > 1]
+        # larger subtrees first, the copies inside a reused subtree are never evaluated
+        groups.sort(key=lambda group: -self.sizes[group.nodes[0]])
+        skipped = set()
+        cse_dict = {}
+        for group in groups:
+            nodes = [cur for cur in group.nodes if cur not in skipped]
+            if len(nodes) < 2:
+                continue
+            summations = None
+            if group.summations is not None:
+                summations = {cur: group.summations[cur] for cur in nodes}
+                if len(set(summations.values())) < 2:
+                    summations = None  # left in one summation, a temporary is enough
+            group = CommonSubexpr(nodes, summations)
+            for cur in nodes:
+                cse_dict[cur] = group
+            for cur in nodes[1:]:
+                self.get_descendants(cur, skipped)
+        return cse_dict
+
+
+def find_common_subexprs(node, symtable=None):
+    """
+    Hash-cons the side-effect free subtrees below the statements, summations and optimizations
+    :param symtable: symbol table of the compile, the summations of a statement over the same index and range
+    share the subtrees that depend on the index
+    :return: dict of node -> CommonSubexpr, for the subtrees repeated in the same scope
+    """
+    return CommonSubexprFinder(symtable).find(node)
@@ -0,0 +1,358 @@
+from .ir import *
+from .ir_chain import MatrixChainFinder, get_dims, is_array, is_array_mul
+import copy
+
+# attributes that aren't subtrees
+IGNORED_ATTRS = {'la_type', 'node_type', 'parent', 'parse_info', 'raw_text'}
+# nodes that are only a name, a number or a copy of their operand in the generated code
+FREE_NODES = {IRNodeType.Id, IRNodeType.Double, IRNodeType.Fraction, IRNodeType.Integer, IRNodeType.Constant,
+              IRNodeType.Factor, IRNodeType.Expression, IRNodeType.Subexpression, IRNodeType.Transpose,
+              IRNodeType.ToMatrix}
+
+
+def strip(node):
+    """
+    :return: the operation inside the factors and parentheses of node
+    """
+    while True:
+        if node.is_node(IRNodeType.Factor) and (node.op is not None or node.sub is not None):
+            node = node.op if node.op is not None else node.sub
+        elif node.is_node(IRNodeType.Subexpression) or (node.is_node(IRNodeType.Expression) and not node.sign):
+            node = node.value
+        else:
+            return node
+
+
+def is_dense(node):
+    return is_array(node) and not (node.la_type.is_matrix() and node.la_type.sparse)
+
+
+class RewriteRule(object):
+    """
+    Algebraic identity, the rewriter keeps the equivalent subtree if the cost model finds it cheaper
+    """
+    node_types = ()
+
+    def rewrite(self, node, rewriter):
+        """
+        :param node: subtree of one of node_types, its children are already rewritten
+        :return: the equivalent subtree, None if the identity doesn't apply
+        """
+        raise NotImplementedError
+
+
+class InverseProductRule(RewriteRule):
+    """
+    (A⁻¹)B as the solution of A X = B, (A⁻¹B)c as A⁻¹(Bc)
+    """
+    node_types = (IRNodeType.Mul,)
+
+    def rewrite(self, node, rewriter):
+        left = strip(node.left)
+        if not is_dense(node.right) or not is_dense(left) or not left.la_type.is_matrix():
+            return None
+        if left.is_node(IRNodeType.Power) and left.r and is_dense(left.base):
+            return rewriter.create_solver(node, left.base, node.right)
+        if left.is_node(IRNodeType.Solver) and is_dense(left.left) and is_dense(left.right):
+            return rewriter.create_solver(node, left.left, rewriter.create_mul(node, left.right, node.right))
+        return None
+
+
+class TraceProductRule(RewriteRule):
+    """
+    tr(AB) as the sum of the elements of A ∘ Bᵀ, without the off-diagonal elements of AB
+    """
+    node_types = (IRNodeType.MathFunc,)
+
+    def rewrite(self, node, rewriter):
+        param = strip(node.param)
+        if node.func_type != MathFuncType.MathFuncTrace or not is_array_mul(param):
+            return None
+        if not (param.left.la_type.is_matrix() and param.right.la_type.is_matrix()):
+            return None
+        if not (is_dense(param.left) and is_dense(param.right)):
+            return None
+        left = strip(param.left)
+        if left.is_node(IRNodeType.Transpose) and left.f.la_type.is_matrix():
+            # tr(AᵀB) = A : B
+            return rewriter.create(FroProductNode, node, node.la_type, left=left.f, right=param.right)
+        return rewriter.create(FroProductNode, node, node.la_type, left=param.left,
+                               right=rewriter.transpose(param.right))
+
+
+class SquaredNormRule(RewriteRule):
+    """
+    ‖x‖² as xᵀx and ‖A‖_F² as A : A, without the square root
+    """
+    node_types = (IRNodeType.Power,)
+
+    def rewrite(self, node, rewriter):
+        if node.t or node.r:
+            return None
+        power = node.power
+        if power.is_node(IRNodeType.Factor) and power.num is not None:
+            power = power.num
+        if not power.is_node(IRNodeType.Integer) or power.value != 2:
+            return None
+        base = strip(node.base)
+        if not base.is_node(IRNodeType.Norm) or not is_dense(base.value):
+            return None
+        if base.value.la_type.is_vector() and base.norm_type == NormType.NormInteger and base.sub == 2:
+            return rewriter.create(DotProductNode, node, node.la_type, left=base.value, right=base.value)
+        if base.value.la_type.is_matrix() and base.norm_type == NormType.NormFrobenius:
+            return rewriter.create(FroProductNode, node, node.la_type, left=base.value, right=base.value)
+        return None
+
+
+class DiagonalProductRule(RewriteRule):
+    """
+    diag(v)A and A diag(v) as the rows or columns of A scaled by v, the same for a diagonal matrix and its diagonal
+    """
+    node_types = (IRNodeType.Mul,)
+
+    def rewrite(self, node, rewriter):
+        if not (is_dense(node.left) and is_dense(node.right)):
+            return None
+        left = self.get_scale(node.left, rewriter)
+        if left is not None:
+            if node.right.la_type.is_vector():
+                scale = left
+            else:
+                scale = rewriter.create(ToMatrixNode, left, MatrixType(rows=left.la_type.rows, cols=1), item=left)
+            return rewriter.create(HadamardProductNode, node, node.la_type, left=scale, right=node.right)
+        right = self.get_scale(node.right, rewriter)
+        if right is not None and node.left.la_type.is_matrix():
+            return rewriter.create(HadamardProductNode, node, node.la_type, left=node.left,
+                                   right=rewriter.transpose(right))
+        return None
+
+    def get_scale(self, node, rewriter):
+        """
+        :return: vector on the diagonal if node is a diagonal matrix, None otherwise
+        """
+        inner = strip(node)
+        if inner.is_node(IRNodeType.MathFunc) and inner.func_type == MathFuncType.MathFuncDiag and \
+                inner.param.la_type.is_vector():
+            return inner.param
+        if node.la_type.is_matrix() and node.la_type.is_diagonal_structure():
+            return rewriter.create(MathFuncNode, node, VectorType(rows=node.la_type.rows), param=node,
+                                   func_type=MathFuncType.MathFuncDiag, remain_params=[])
+        return None
+
+
+class TransposedProductRule(RewriteRule):
+    """
+    (AB)ᵀ as BᵀAᵀ inside a product, the matrix chain ordering can then avoid forming AB
+    """
+    node_types = (IRNodeType.Mul,)
+
+    def rewrite(self, node, rewriter):
+        if not is_array_mul(node):
+            return None
+        operands = []
+        order = MatrixChainFinder(rewriter.size_hints).flatten(node, operands)
+        changed = False
+        for index, operand in enumerate(operands):
+            inner = strip(operand)
+            if inner.is_node(IRNodeType.Transpose) and is_array_mul(strip(inner.f)) and is_dense(inner.f):
+                operands[index] = rewriter.transpose(inner.f)
+                changed = True
+        return rewriter.create_product(node, order, operands) if changed else None
+
+
+DEFAULT_RULES = [InverseProductRule(), TraceProductRule(), SquaredNormRule(), TransposedProductRule()]
+# rules for the backends without a diagonal matrix view
+DIAGONAL_RULES = [DiagonalProductRule()]
+
+
+class IRRewriter(object):
+    def __init__(self, rules, size_hints):
+        self.rules = rules
+        self.size_hints = size_hints
+        self.rewritten = {}  # original node -> rewritten node, the node itself if nothing changed
+        self.costs = {}
+
+    def rewrite(self, node):
+        """
+        Copy on write, the nodes above a rewritten subtree are copied and the original tree is kept
+        """
+        if node in self.rewritten:
+            return self.rewritten[node]
+        changes = {}
+        for name, value in node.get_attrs():
+            if name in IGNORED_ATTRS:
+                continue
+            if isinstance(value, IRNode):
+                new_value = self.rewrite(value)
+                if new_value is not value:
+                    changes[name] = new_value
+            elif isinstance(value, list):
+                new_value = [self.rewrite(item) if isinstance(item, IRNode) else item for item in value]
+                if any(new_item is not item for new_item, item in zip(new_value, value)):
+                    changes[name] = new_value
+        cur = node
+        if changes:
+            cur = copy.copy(node)
+            for name, value in changes.items():
+                setattr(cur, name, value)
+        if cur.la_type is not None:
+            for rule in self.rules:
+                if cur.node_type in rule.node_types:
+                    new_node = rule.rewrite(cur, self)
+                    if new_node is not None and self.get_cost(new_node) < self.get_cost(cur):
+                        cur = new_node
+        self.rewritten[node] = cur
+        return cur
+
+    def get_children(self, node):
+        children = []
+        for name, value in node.get_attrs():
+            if name in IGNORED_ATTRS:
+                continue
+            if isinstance(value, IRNode):
+                children.append(value)
+            elif isinstance(value, list):
+                children += [item for item in value if isinstance(item, IRNode)]
+        return children
+
+    def get_cost(self, node):
+        """
+        :return: estimated number of multiplications to evaluate node
+        """
+        if node in self.costs:
+            return self.costs[node]
+        if is_array_mul(node):
+            # products are evaluated in the cheapest order
+            operands = []
+            finder = MatrixChainFinder(self.size_hints)
+            finder.flatten(node, operands)
+            dims = [get_dims(operand.la_type, self.size_hints) for operand in operands]
+            cost = finder.get_cheapest_order(dims)[1] + sum(self.get_cost(operand) for operand in operands)
+        else:
+            cost = self.get_own_cost(node) + sum(self.get_cost(child) for child in self.get_children(node))
+        self.costs[node] = cost
+        return cost
+
+    def get_own_cost(self, node):
+        if node.node_type in FREE_NODES or node.la_type is None:
+            return 0
+        rows, cols = get_dims(node.la_type, self.size_hints)
+        if node.is_node(IRNodeType.Power) and node.r and node.base.la_type.is_matrix():
+            if node.base.la_type.is_structured():
+                return self.get_solve_cost(node.base.la_type, rows, cols)
+            # LU factorization and a solve for each column of the identity
+            return rows ** 3
+        if node.is_node(IRNodeType.Solver):
+            size = get_dims(node.left.la_type, self.size_hints)[0]
+            if node.left.la_type.is_matrix() and node.left.la_type.is_structured():
+                return self.get_solve_cost(node.left.la_type, size, cols)
+            return size ** 3 // 3 + size * size * cols
+        if node.is_node(IRNodeType.Norm):
+            return self.get_size(node.value)
+        if node.is_node(IRNodeType.MathFunc) and node.func_type == MathFuncType.MathFuncDiag and \
+                node.param.la_type.is_vector():
+            # dense diagonal matrix
+            return rows * cols
+        if node.node_type in (IRNodeType.DotProduct, IRNodeType.FroProduct):
+            return self.get_size(node.left)
+        if node.is_node(IRNodeType.MathFunc) and node.func_type == MathFuncType.MathFuncTrace:
+            return get_dims(node.param.la_type, self.size_hints)[0]
+        return rows * cols
+
+    def get_solve_cost(self, la_type, size, cols):
+        """
+        :param la_type: structured matrix of the system
+        :return: factorization and substitutions for cols right-hand sides
+        """
+        if la_type.has_structure(MatrixStructureEnum.STRUCT_BANDED):
+            band = la_type.bandwidth + 1
+            return size * band * band + 2 * size * band * cols
+        if la_type.is_triangular():
+            return size * size * cols // 2
+        if la_type.has_structure(MatrixStructureEnum.STRUCT_POSITIVE_DEFINITE):
+            # Cholesky
+            return size ** 3 // 6 + size * size * cols
+        return size ** 3 // 3 + size * size * cols
+
+    def get_size(self, node):
+        rows, cols = get_dims(node.la_type, self.size_hints)
+        return rows * cols
+
+    def create(self, node_class, origin, la_type, **attrs):
+        """
+        :param origin: node replaced by the new one, it provides the parent and the position in the source
+        """
+        new_node = node_class(parse_info=origin.parse_info)
+        for name, value in attrs.items():
+            setattr(new_node, name, value)
+        new_node.la_type = la_type
+        if origin.parent is not None:
+            new_node.set_parent(origin.parent())
+        return new_node
+
+    def parenthesize(self, node):
+        """
+        :return: factor of node, a single operand in the generated code
+        """
+        if node.is_node(IRNodeType.Expression) and not node.sign and node.value.is_node(IRNodeType.Factor):
+            node = node.value
+        if node.is_node(IRNodeType.ToMatrix):
+            return node
+        if node.is_node(IRNodeType.Factor) and (node.id is not None or node.sub is not None or (
+                node.op is not None and node.op.node_type in (IRNodeType.Transpose, IRNodeType.Solver,
+                                                              IRNodeType.MathFunc))):
+            return node
+        sub = self.create(SubexpressionNode, node, node.la_type, value=node)
+        return self.create(FactorNode, node, node.la_type, sub=sub)
+
+    def transpose(self, node):
+        """
+        :return: factor of the transpose of node, pushed into the products
+        """
+        inner = strip(node)
+        if inner.is_node(IRNodeType.Transpose) and inner.f.la_type.is_matrix():
+            return inner.f
+        if is_array_mul(inner) and is_dense(inner):
+            return self.create_mul(inner, self.transpose(inner.right), self.transpose(inner.left), True)
+        la_type = node.la_type
+        if la_type.is_vector():
+            t_type = MatrixType(rows=1, cols=la_type.rows)
+        else:
+            t_type = MatrixType(rows=la_type.cols, cols=la_type.rows, sparse=la_type.sparse,
+                                structure=la_type.get_transposed_structure(), bandwidth=la_type.bandwidth)
+            if la_type.is_dynamic_row():
+                t_type = t_type.replace(dynamic=DynamicTypeEnum.DYN_COL)
+            if la_type.is_dynamic_col():
+                t_type = t_type.replace(dynamic=DynamicTypeEnum.DYN_ROW)
+        t_node = self.create(TransposeNode, node, t_type, f=self.parenthesize(node))
+        return self.create(FactorNode, node, t_type, op=t_node)
+
+    def create_mul(self, origin, left, right, parenthesized=False):
+        if right.la_type.is_vector():
+            la_type = VectorType(rows=left.la_type.rows)
+        else:
+            la_type = MatrixType(rows=left.la_type.rows, cols=right.la_type.cols)
+        mul = self.create(MulNode, origin, la_type, left=left, right=self.parenthesize(right), op=MulOpType.MulOpInvalid)
+        return self.parenthesize(mul) if parenthesized else mul
+
+    def create_product(self, origin, order, operands):
+        """
+        :param order: index of an operand or (left order, right order)
+        """
+        if isinstance(order, int):
+            return operands[order]
+        return self.create_mul(origin, self.create_product(origin, order[0], operands),
+                               self.create_product(origin, order[1], operands))
+
+    def create_solver(self, origin, left, right):
+        solver = self.create(SolverNode, origin, origin.la_type, left=left, right=self.parenthesize(right), pow='⁻¹')
+        return self.create(FactorNode, origin, origin.la_type, op=solver)
+
+
+def rewrite_ir(node, rules, size_hints=None):
+    """
+    Apply the algebraic identities of rules where the cost model finds them cheaper
+    :param size_hints: dict of symbolic dimension -> expected size
+    :return: the rewritten tree, node itself is never changed
+    """
+    return IRRewriter(rules, size_hints or {}).rewrite(node)
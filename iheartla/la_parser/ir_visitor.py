@@ -1,8 +1,17 @@
 from .ir import *
 from ..la_tools.la_logger import *
 from ..la_tools.la_helper import *
+from ..la_tools.la_profiler import get_profiler
+from .ir_cse import find_common_subexprs
+from .ir_chain import find_matrix_chains
+from .ir_rewriter import rewrite_ir, strip
+from contextlib import contextmanager
 import unicodedata
 
+# operations with a kernel for every structure of a diagonal matrix
+STRUCTURED_FUNCS = {MathFuncType.MathFuncInv, MathFuncType.MathFuncDet, MathFuncType.MathFuncTrace, MathFuncType.MathFuncDiag}
+STRUCTURED_NORMS = {NormType.NormDet, NormType.NormFrobenius, NormType.NormNuclear}
+
 
 class IRVisitor(object):
     def __init__(self, parse_type=None):
@@ -11,6 +20,7 @@ class IRVisitor(object):
         self.post_str = ''
         self.symtable = {}
         self.tmp_symtable = {}
+        self.desc_dict = {}
         self.def_dict = {}
         self.parameters = set()
         self.subscripts = {}
@@ -35,6 +45,15 @@ class IRVisitor(object):
         self.pattern = re.compile("[A-Za-z]+")
         self.la_content = ''
         self.new_id_prefix = ''  # _
+        self.cse = False  # evaluate repeated subexpressions once, see ir_cse
+        self.cse_dict = {}  # node -> CommonSubexpr of the current compile
+        self.cse_buffers = False  # summations over the same index share subexpressions through a buffer
+        self.reorder_products = False  # multiply chains of matrices in the cheapest order, see ir_chain
+        self.size_hints = {}  # symbolic dimension -> expected size, for the order of the products
+        self.chain_dict = {}  # Mul node -> MatrixChain of the current compile
+        self.rewrite_rules = []  # RewriteRule list applied where cheaper, see ir_rewriter
+        self.diagonal_params = set()  # diagonal matrices passed as the vector on the diagonal
+        self.expanded_params = set()  # diagonal matrices also used as dense matrices
         self.uni_num_dict = {'₀': '0', '₁': '1', '₂': '2', '₃': '3', '₄': '4', '₅': '5', '₆': '6', '₇': '7', '₈': '8', '₉': '9',
                              '⁰': '0', '¹': '1', '²': '2', '³': '3', '⁴': '4', '⁵': '5', '⁶': '6', '⁷': '7', '⁸': '8', '⁹': '9'}
         # These are especially important in targets like MATLAB which have a very restrictive (≈ASCII) character set for variable names:
@@ -170,6 +189,7 @@ class IRVisitor(object):
     def init_type(self, type_walker, func_name):
         self.symtable = type_walker.symtable
         self.tmp_symtable = type_walker.tmp_symtable
+        self.desc_dict = type_walker.desc_dict
         for key in self.symtable.keys():
             self.def_dict[key] = False
         self.parameters = type_walker.parameters
@@ -179,20 +199,37 @@ class IRVisitor(object):
         self.ids_dict = type_walker.ids_dict
         self.dim_seq_set = type_walker.dim_seq_set
         self.sub_name_dict = type_walker.sub_name_dict
-        self.name_cnt_dict = type_walker.name_cnt_dict
+        self.name_cnt_dict = type_walker.name_cnt_dict.copy()  # temporaries of one backend stay out of the others
         self.ret_symbol = type_walker.ret_symbol
         self.unofficial_method = type_walker.unofficial_method
         self.lhs_list = type_walker.lhs_list
         self.la_content = type_walker.la_content
         self.same_dim_list = type_walker.same_dim_list
         self.arith_dim_list = type_walker.arith_dim_list
-        if func_name is not None:
-            self.func_name = func_name
+        # the code generators are shared, a name from an earlier compile mustn't stick
+        self.func_name = func_name if func_name is not None else 'myExpression'
         # self.print_symbols()
         self.declared_symbols.clear()
 
+    def get_options(self):
+        """
+        :return: dict of the settings that change the generated code, the compile cache keys on them
+        """
+        return {'cse': self.cse, 'reorder_products': self.reorder_products, 'size_hints': dict(self.size_hints),
+                'rewrite_rules': list(self.rewrite_rules)}
+
+    def set_options(self, options):
+        # names this code generator doesn't have are for other backends
+        for name, value in options.items():
+            if name in self.get_options():
+                setattr(self, name, value)
+
     def visit_code(self, node, **kwargs):
         self.content = ''
+        if self.rewrite_rules:
+            node = rewrite_ir(node, self.rewrite_rules, self.size_hints)
+        self.chain_dict = find_matrix_chains(node, self.size_hints) if self.reorder_products else {}
+        self.cse_dict = find_common_subexprs(node, self.symtable if self.cse_buffers else None) if self.cse else {}
         self.content = self.pre_str + self.visit(node) + self.post_str
 
     def visit(self, node, **kwargs):
@@ -272,11 +309,187 @@ class IRVisitor(object):
             IRNodeType.Import: "visit_import",
         }
         func = getattr(self, type_func[node.node_type], None)
+        if func and node in self.cse_dict:
+            return self.visit_common_subexpr(node, func, **kwargs)
         if func:
+            profiler = get_profiler()
+            if profiler is not None:
+                return profiler.call('{}.{}'.format(type(self).__name__, func.__name__), func, node, **kwargs)
             return func(node, **kwargs)
         else:
             print("invalid node type")
 
+    def visit_common_subexpr(self, node, func, **kwargs):
+        group = self.cse_dict[node]
+        if group.first is None:
+            group.first = node
+            group.name = self.generate_var_name("cse")
+        if group.summations is not None:
+            # one element per index, appended by the loop of the first summation
+            item = self.get_buffer_item(group.name, self.visit(group.summations[node].id).content)
+            if node is not group.first:
+                return CodeNodeInfo(item)
+            node_info = func(node, **kwargs)
+            node_info.pre_list.append(self.get_buffer_append(group.name, node_info.content))
+            node_info.content = item
+            return node_info
+        if node is not group.first:
+            return CodeNodeInfo(group.name)
+        node_info = func(node, **kwargs)
+        node_info.pre_list.append(self.get_cse_assignment(group.name, node_info.content, node.la_type))
+        node_info.content = group.name
+        return node_info
+
+    def get_buffer_declarations(self, node):
+        """
+        Statements declaring the buffers filled by the loop of the summation node, called after its expression
+        is visited and placed before the loop
+        """
+        declarations = []
+        for group in set(self.cse_dict.values()):
+            if group.summations is not None and not group.declared and group.first is not None \
+                    and group.summations[group.first] is node:
+                group.declared = True
+                declarations.append(self.get_buffer_declaration(group.name, group.first.la_type))
+        return sorted(declarations)
+
+    def get_buffer_declaration(self, name, la_type):
+        return "{} = []\n".format(name)
+
+    def get_buffer_append(self, name, content):
+        return "    {}.append({})\n".format(name, content)
+
+    def get_buffer_item(self, name, index):
+        return "{}[{}-1]".format(name, index)
+
+    def get_cse_assignment(self, name, content, la_type):
+        """
+        Statement defining a temporary, appended to the pre_list
+        """
+        return "    {} = {}\n".format(name, content)
+
+    def visit_mul_chain(self, node, op, **kwargs):
+        """
+        Product of the operands of chain_dict[node] in its cheapest order
+        :param op: matrix multiplication operator of the backend
+        """
+        chain = self.chain_dict[node]
+        pre_list = []
+        operands = []
+        for operand in chain.operands:
+            operand_info = self.visit(operand, **kwargs)
+            pre_list += operand_info.pre_list
+            if operand.node_type in (IRNodeType.Factor, IRNodeType.ToMatrix):
+                operands.append(operand_info.content)
+            else:
+                # e.g. the scalar product 2 A, it may end up on the right of the operator
+                operands.append("({})".format(operand_info.content))
+        return CodeNodeInfo(self.get_chain_content(chain.order, operands, op), pre_list=pre_list)
+
+    def get_chain_content(self, order, operands, op):
+        if isinstance(order, int):
+            return operands[order]
+        right = self.get_chain_content(order[1], operands, op)
+        if not isinstance(order[1], int):
+            right = "({})".format(right)
+        return self.get_chain_content(order[0], operands, op) + op + right
+
+    def get_structure(self, node):
+        """
+        :return: la_type of node if it is a matrix with a structure attribute, None otherwise
+        """
+        la_type = node.la_type
+        if la_type is not None and la_type.is_matrix() and la_type.is_structured():
+            return la_type
+        return None
+
+    def init_diagonal_params(self, node):
+        """
+        Find the diagonal parameters of the block node and the ones its code needs as dense matrices
+        """
+        self.diagonal_params = {parameter for parameter in self.parameters if self.symtable[parameter].is_matrix() and
+                                self.symtable[parameter].is_diagonal_structure()}
+        consumed = set()
+        uses = []
+        self.collect_diagonal_uses(node, consumed, uses)
+        self.expanded_params = {use.main_id for use in uses if use not in consumed}
+
+    def collect_diagonal_uses(self, node, consumed, uses):
+        for operand in self.get_diagonal_operands(node):
+            compact = self.get_compact_diagonal(operand)
+            if compact is not None:
+                consumed.add(compact)
+        if node.is_node(IRNodeType.Id) and node.main_id in self.diagonal_params:
+            uses.append(node)
+        # the operands of a chain are multiplied as they are
+        children = self.chain_dict[node].operands if node in self.chain_dict else self.get_ir_children(node)
+        for child in children:
+            self.collect_diagonal_uses(child, consumed, uses)
+
+    def get_diagonal_operands(self, node):
+        """
+        :return: operands of node whose code only needs the vector on their diagonal
+        """
+        operand = self.get_structured_operand(node)
+        return [operand] if operand is not None else []
+
+    def get_structured_operand(self, node):
+        """
+        :return: the structured matrix a kernel of node is specialized on, None otherwise
+        """
+        operand = None
+        if node.is_node(IRNodeType.Solver):
+            if not (node.right.la_type.is_matrix() and node.right.la_type.sparse):
+                operand = node.left
+        elif node.is_node(IRNodeType.Power):
+            if node.r:
+                operand = node.base
+        elif node.is_node(IRNodeType.MathFunc):
+            if node.func_type in STRUCTURED_FUNCS:
+                operand = node.param
+        elif node.is_node(IRNodeType.Norm):
+            if node.norm_type in STRUCTURED_NORMS:
+                operand = node.value
+        if operand is None or self.get_structure(operand) is None:
+            return None
+        return operand
+
+    def get_compact_diagonal(self, node):
+        """
+        :return: the diagonal parameter if node is it or its transpose, None otherwise
+        """
+        node = strip(node)
+        while node.is_node(IRNodeType.Transpose) or (node.is_node(IRNodeType.Power) and node.t):
+            node = strip(node.f if node.is_node(IRNodeType.Transpose) else node.base)
+        if node.is_node(IRNodeType.Factor) and node.id is not None:
+            node = node.id
+        if node.is_node(IRNodeType.Id) and not node.contain_subscript() and node.main_id in self.diagonal_params:
+            return node
+        return None
+
+    def get_ir_children(self, node):
+        children = []
+        for key, value in node.get_attrs():
+            if key == 'parent':
+                continue
+            if isinstance(value, IRNode):
+                children.append(value)
+            elif isinstance(value, list):
+                children += [item for item in value if isinstance(item, IRNode)]
+        return children
+
+    @contextmanager
+    def pause_cse(self):
+        """
+        For speculative visits, their output may be thrown away together with the temporaries
+        """
+        cse_dict = self.cse_dict
+        self.cse_dict = {}
+        try:
+            yield
+        finally:
+            self.cse_dict = cse_dict
+
     def visit_id(self, node, **kwargs):
         pass
 
@@ -552,6 +765,108 @@ class IRVisitor(object):
                     lines.append(split)
         return prefix + "\n{}".format(prefix).join(lines) + '\n'
 
+    def get_linear_form(self, node, subs):
+        """
+        Integer linear form of an index expression like j + 1 or 2 - i
+        :return: dict of coefficients keyed by subscript, '' for the constant; None if not linear
+        """
+        if node.is_node(IRNodeType.Expression):
+            form = self.get_linear_form(node.value, subs)
+            if form is not None and node.sign:
+                form = {key: -value for key, value in form.items()}
+            return form
+        if node.is_node(IRNodeType.Factor):
+            child = node.id or node.num or node.sub
+            return self.get_linear_form(child, subs) if child is not None else None
+        if node.is_node(IRNodeType.Subexpression):
+            return self.get_linear_form(node.value, subs)
+        if node.is_node(IRNodeType.Integer):
+            return {'': node.value}
+        if node.is_node(IRNodeType.Id):
+            if node.contain_subscript() or node.get_name() not in subs:
+                return None
+            return {node.get_name(): 1}
+        if node.is_node(IRNodeType.Add) or node.is_node(IRNodeType.Sub):
+            left = self.get_linear_form(node.left, subs)
+            right = self.get_linear_form(node.right, subs)
+            if left is None or right is None:
+                return None
+            sign = 1 if node.is_node(IRNodeType.Add) else -1
+            for key, value in right.items():
+                left[key] = left.get(key, 0) + sign * value
+            return left
+        return None
+
+    def get_sparse_support(self, ifs_node, subs):
+        """
+        Nonzero support of a sparse definition derived from its if-conditions: i = j + k is the diagonal j = i - k,
+        (i, j) ∈ E is the set E
+        :return: list of (sparse if node, 'diagonal' or 'set', offset or in node); None if a condition is unknown
+        """
+        support = []
+        for sparse_if in ifs_node.cond_list:
+            cond = sparse_if.cond.cond
+            if cond.is_node(IRNodeType.In):
+                if not cond.same_subs(subs) or cond.set.la_type is None or not cond.set.la_type.is_set():
+                    return None
+                support.append((sparse_if, 'set', cond))
+                continue
+            if not cond.is_node(IRNodeType.BinComp) or cond.comp_type != IRNodeType.Eq:
+                return None
+            left = self.get_linear_form(cond.left, subs)
+            right = self.get_linear_form(cond.right, subs)
+            if left is None or right is None:
+                return None
+            for key, value in right.items():
+                left[key] = left.get(key, 0) - value
+            # a*i - a*j + c = 0, so j = i + c/a
+            row_coef, col_coef, const = left.get(subs[0], 0), left.get(subs[1], 0), left.get('', 0)
+            if row_coef == 0 or row_coef != -col_coef or const % row_coef != 0:
+                return None
+            support.append((sparse_if, 'diagonal', const // row_coef))
+        return support
+
+    def get_sparse_guards(self, support, index):
+        """
+        Earlier branches that may claim elements of support[index], the first matching branch wins
+        :return: list of sparse if nodes, None if the branch is completely shadowed
+        """
+        guards = []
+        cur_if, cur_kind, cur_value = support[index]
+        for sparse_if, kind, value in support[:index]:
+            if cur_kind == 'diagonal' and kind == 'diagonal':
+                if value == cur_value:
+                    return None
+                # different diagonals never overlap
+                continue
+            guards.append(sparse_if)
+        return guards
+
+    def get_diagonal_bounds(self, la_type, offset, min_func='min', max_func='max'):
+        """
+        Range of the row index on the diagonal j = i + offset inside the matrix
+        :param min_func: name of min/max in the target language
+        :return: (start, stop, element count) as strings, rows in [start, stop); None if the dimensions are unknown
+        """
+        rows = to_dim_expr(la_type.rows)
+        cols = to_dim_expr(la_type.cols)
+        if rows is None or cols is None:
+            return None
+        def min_expr(lhs, rhs, extra):
+            diff = lhs - rhs
+            if diff.is_constant():
+                return str((lhs if diff.constant_value() <= 0 else rhs) + extra)
+            return "{}({}, {}){}".format(min_func, lhs, rhs, '' if extra == 0 else "{:+d}".format(extra))
+        start = str(max(1, 1 - offset))
+        stop = min_expr(rows, cols - offset, 1)
+        count = min_expr(rows, cols - offset, 0) if offset >= 0 else min_expr(rows + offset, cols, 0)
+        count_expr = to_dim_expr(count)
+        if count_expr is not None and count_expr.is_constant():
+            count = str(max(0, int(count_expr.constant_value())))
+        elif offset != 0:
+            count = "{}(0, {})".format(max_func, count)
+        return start, stop, count
+
     def convert_bound_symbol(self, name):
         if name in self.dim_seq_set:
             main_dict = self.dim_dict[name]
@@ -596,19 +911,18 @@ class IRVisitor(object):
 
     def trim_content(self, content):
         # convert special string in identifiers
-        res = content
         ids_list = list(self.symtable.keys()) + list(self.tmp_symtable.keys())
         for ids in self.ids_dict.keys():
             all_ids = self.get_all_ids(ids)
             # these can contain asterisks from vector/matrix slicing 
             ids_list += all_ids[1]
-        names_dict = []
+        names_set = set()
         # purge asterisks (and make unique, why not)
         ids_list = [x for x in list(set(ids_list))  if x != '*']
-        # This is conducting the replacements at the output string level rather
-        # than the variable name level. If one name appears in another (e.g., φ
-        # in `x(φ)` then this leads to clashes, hence the awkward sort.
+        # If one name appears in another (e.g., φ in `x(φ)`), the longer one wins when renaming. Longer
+        # names also keep the plain new name when new names clash.
         ids_list.sort(key=len,reverse=True)
+        rename_dict = {}
         for special in ids_list:
             if '`' not in special and self.parse_type != ParserTypeEnum.MATLAB:
                 continue
@@ -618,11 +932,11 @@ class IRVisitor(object):
             new_str = self.convert_unicode(special)
             new_str = new_str.replace('-', '_')
             if new_str != special:
-                while new_str in names_dict or new_str in self.symtable.keys() or self.is_keyword(new_str):
+                while new_str in names_set or new_str in self.symtable or self.is_keyword(new_str):
                     new_str = '_' + new_str
-                names_dict.append(new_str)
-                res = res.replace(special, new_str)
-        return res
+                names_set.add(new_str)
+                rename_dict[special] = new_str
+        return replace_names(content, rename_dict)
 
     def filter_symbol(self, symbol):
         if '`' in symbol:
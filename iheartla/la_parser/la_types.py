@@ -1,4 +1,6 @@
 from enum import Enum, IntEnum, IntFlag
+import weakref
+from ..la_tools.la_dims import to_dim_expr
 
 
 class VarTypeEnum(Enum):
@@ -20,16 +22,89 @@ class DynamicTypeEnum(IntFlag):
     DYN_DIM = 4
 
 
-class LaVarType(object):
-    def __init__(self, var_type, desc=None, element_type=None, symbol=None, index_type=False, dynamic=DynamicTypeEnum.DYN_INVALID):
+class MatrixStructureEnum(IntFlag):
+    STRUCT_GENERAL = 0
+    STRUCT_SYMMETRIC = 1
+    STRUCT_POSITIVE_DEFINITE = 2
+    STRUCT_LOWER_TRIANGULAR = 4
+    STRUCT_UPPER_TRIANGULAR = 8
+    STRUCT_BANDED = 16
+    STRUCT_DIAGONAL = STRUCT_SYMMETRIC | STRUCT_LOWER_TRIANGULAR | STRUCT_UPPER_TRIANGULAR | STRUCT_BANDED
+
+
+_slot_names = {}  # class -> names of the attributes making up the type, including the base classes
+_unset = object()
+
+
+def get_slot_names(cls):
+    if cls not in _slot_names:
+        _slot_names[cls] = [name for base in reversed(cls.__mro__) for name in base.__dict__.get('__slots__', ())
+                            if name not in ('key', '__weakref__')]
+    return _slot_names[cls]
+
+
+class InternedType(type):
+    """
+    Metaclass of the types, a constructor returns the interned type equal to the one it built
+    """
+    def __call__(cls, *args, **kwargs):
+        return super().__call__(*args, **kwargs).intern()
+
+
+class LaVarType(object, metaclass=InternedType):
+    """
+    Types are immutable and hash-consed like DimExpr: structurally equal types are the same object,
+    replace() returns a changed type. The symbol and description of a declaration aren't part of the type.
+    """
+    __slots__ = ('dynamic', 'element_type', 'index_type', 'var_type', 'key', '__weakref__')
+    _instances = weakref.WeakValueDictionary()
+
+    def __init__(self, var_type, element_type=None, index_type=False, dynamic=DynamicTypeEnum.DYN_INVALID):
         super().__init__()
         self.var_type = var_type
-        self.desc = desc   # only parameters need description
         self.element_type = element_type
-        self.symbol = symbol
         self.index_type = index_type
         self.dynamic = dynamic  # related to type inference, no need to check if True
 
+    def __setattr__(self, name, value):
+        if hasattr(self, 'key'):
+            raise AttributeError("{} is interned, use replace() to change it".format(type(self).__name__))
+        object.__setattr__(self, name, value)
+
+    def intern(self):
+        """
+        :return: the type structurally equal to self, self if there is none yet
+        """
+        key = (type(self),) + tuple(freeze_attr(getattr(self, name, _unset)) for name in get_slot_names(type(self)))
+        object.__setattr__(self, 'key', key)
+        return LaVarType._instances.setdefault(key, self)
+
+    def replace(self, **changes):
+        """
+        :return: the type with the attributes in changes set to new values
+        """
+        new_type = object.__new__(type(self))
+        for name in get_slot_names(type(self)):
+            value = changes.get(name, getattr(self, name, _unset))
+            if value is not _unset:
+                object.__setattr__(new_type, name, value)
+        return new_type.intern()
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in get_slot_names(type(self)) if hasattr(self, name)}
+
+    def __setstate__(self, state):
+        # an equal type alive before the IR was loaded stays a separate instance, is_same_type compares shapes
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+        self.intern()
+
     def is_integer_element(self):
         return False
 
@@ -45,14 +120,13 @@ class LaVarType(object):
     def is_dynamic_dim(self):
         return self.dynamic & DynamicTypeEnum.DYN_DIM
 
-    def set_dynamic_type(self, dynamic_type):
-        self.dynamic = dynamic_type
-
-    def add_dynamic_type(self, dynamic_type):
+    def with_dynamic_type(self, dynamic_type):
+        """
+        :return: the type with dynamic_type added, DYN_INVALID makes it static
+        """
         if dynamic_type == DynamicTypeEnum.DYN_INVALID:
-            self.dynamic = dynamic_type
-        else:
-            self.dynamic |= dynamic_type
+            return self.replace(dynamic=dynamic_type)
+        return self.replace(dynamic=self.dynamic | dynamic_type)
 
     def get_dim_size(self, dim_index):
         dim_size = 0
@@ -121,25 +195,43 @@ class LaVarType(object):
         return self.var_type == VarTypeEnum.FUNCTION
 
     def is_same_type(self, other):
-        same = False
-        if self.var_type == other.var_type:
-            if self.var_type == VarTypeEnum.SEQUENCE:
-                same = self.size == other.size and self.element_type.is_same_type(other.element_type)
-            elif self.var_type == VarTypeEnum.MATRIX:
-                same = self.rows == other.rows and self.cols == other.cols
-            elif self.var_type == VarTypeEnum.VECTOR:
-                same = self.rows == other.rows
-            else:
-                same = True
-        return same
+        return self.get_shape() is other.get_shape()
+
+    def get_shape(self):
+        """
+        :return: the type of the same kind and dimensions with default attributes, the types of one shape share it
+        """
+        return LaVarType(self.var_type)
 
     def get_signature(self):
         return ''
 
 
+def freeze_attr(value):
+    """
+    Hashable form of an attribute in the key of a type: types and IR nodes by identity, containers by their items,
+    the other values by class and value (3 and DimExpr(3) are equal but different dimensions)
+    """
+    if isinstance(value, LaVarType) or value is _unset:
+        return value
+    if isinstance(value, (list, tuple)):
+        return type(value), tuple(freeze_attr(item) for item in value)
+    if isinstance(value, dict):
+        return dict, tuple((key, freeze_attr(item)) for key, item in value.items())
+    return type(value), value
+
+
+def get_shape_dim(dim):
+    # the dimension algebra makes equal dimensions one object
+    dim_expr = to_dim_expr(dim)
+    return dim_expr if dim_expr is not None else dim
+
+
 class ScalarType(LaVarType):
-    def __init__(self, is_int=False, desc=None, element_type=None, symbol=None, index_type=False, is_constant=False, dynamic=DynamicTypeEnum.DYN_INVALID):
-        LaVarType.__init__(self, VarTypeEnum.SCALAR, desc, element_type, symbol, index_type=index_type, dynamic=dynamic)
+    __slots__ = ('is_constant', 'is_int')
+
+    def __init__(self, is_int=False, element_type=None, index_type=False, is_constant=False, dynamic=DynamicTypeEnum.DYN_INVALID):
+        LaVarType.__init__(self, VarTypeEnum.SCALAR, element_type, index_type=index_type, dynamic=dynamic)
         self.is_int = is_int
         self.is_constant = is_constant  # constant number
 
@@ -153,10 +245,15 @@ class ScalarType(LaVarType):
 
 
 class SequenceType(LaVarType):
-    def __init__(self, size=0, desc=None, element_type=None, symbol=None, dynamic=False):
-        LaVarType.__init__(self, VarTypeEnum.SEQUENCE, desc, element_type, symbol, dynamic=dynamic)
+    __slots__ = ('size',)
+
+    def __init__(self, size=0, element_type=None, dynamic=False):
+        LaVarType.__init__(self, VarTypeEnum.SEQUENCE, element_type, dynamic=dynamic)
         self.size = size
 
+    def get_shape(self):
+        return SequenceType(size=get_shape_dim(self.size), element_type=self.element_type.get_shape())
+
     def get_signature(self):
         return "sequence,ele_type:{}".format(self.element_type.get_signature())
 
@@ -168,8 +265,10 @@ class SequenceType(LaVarType):
 
 
 class MatrixType(LaVarType):
-    def __init__(self, rows=0, cols=0, desc=None, element_type=ScalarType(), symbol=None, need_exp=False, diagonal=False, sparse=False, block=False, subs=None, list_dim=None, index_var=None, value_var=None, item_types=None, dynamic=DynamicTypeEnum.DYN_INVALID,rows_ir=None,cols_ir=None):
-        LaVarType.__init__(self, VarTypeEnum.MATRIX, desc, element_type, symbol, dynamic=dynamic)
+    __slots__ = ('bandwidth', 'block', 'cols', 'cols_ir', 'diagonal', 'index_var', 'is_int', 'item_types', 'list_dim', 'need_exp', 'rows', 'rows_ir', 'sparse', 'structure', 'subs', 'value_var')
+
+    def __init__(self, rows=0, cols=0, element_type=ScalarType(), need_exp=False, diagonal=False, sparse=False, block=False, subs=None, list_dim=None, index_var=None, value_var=None, item_types=None, dynamic=DynamicTypeEnum.DYN_INVALID,rows_ir=None,cols_ir=None, structure=MatrixStructureEnum.STRUCT_GENERAL, bandwidth=None):
+        LaVarType.__init__(self, VarTypeEnum.MATRIX, element_type, dynamic=dynamic)
         self.rows = rows
         self.cols = cols
         self.rows_ir = rows_ir
@@ -186,6 +285,51 @@ class MatrixType(LaVarType):
         self.sparse = sparse
         self.index_var = index_var    # used by sparse mat
         self.value_var = value_var    # used by sparse mat
+        # structure of a square matrix, from the attributes in the where block
+        self.structure = structure
+        self.bandwidth = bandwidth    # nonzero diagonals above and below the main one
+
+    def has_structure(self, structure):
+        return structure != MatrixStructureEnum.STRUCT_GENERAL and self.structure & structure == structure
+
+    def is_structured(self):
+        return self.structure != MatrixStructureEnum.STRUCT_GENERAL
+
+    def is_diagonal_structure(self):
+        return self.has_structure(MatrixStructureEnum.STRUCT_DIAGONAL)
+
+    def is_triangular(self):
+        return self.has_structure(MatrixStructureEnum.STRUCT_LOWER_TRIANGULAR) or self.has_structure(MatrixStructureEnum.STRUCT_UPPER_TRIANGULAR)
+
+    def with_structure(self, structure, bandwidth=None):
+        """
+        Implied structures are added as well: SPD is symmetric, lower and upper triangular is diagonal
+        :return: the type with structure added
+        """
+        if structure & MatrixStructureEnum.STRUCT_POSITIVE_DEFINITE:
+            structure |= MatrixStructureEnum.STRUCT_SYMMETRIC
+        structure |= self.structure
+        triangles = MatrixStructureEnum.STRUCT_LOWER_TRIANGULAR | MatrixStructureEnum.STRUCT_UPPER_TRIANGULAR
+        if structure & triangles == triangles:
+            structure |= MatrixStructureEnum.STRUCT_DIAGONAL
+            bandwidth = 0
+        if bandwidth is not None and self.bandwidth is not None:
+            bandwidth = min(self.bandwidth, bandwidth)
+        return self.replace(structure=structure, bandwidth=bandwidth if bandwidth is not None else self.bandwidth)
+
+    def get_transposed_structure(self):
+        """
+        :return: structure of the transpose, the triangles are swapped
+        """
+        structure = self.structure & ~(MatrixStructureEnum.STRUCT_LOWER_TRIANGULAR | MatrixStructureEnum.STRUCT_UPPER_TRIANGULAR)
+        if self.structure & MatrixStructureEnum.STRUCT_LOWER_TRIANGULAR:
+            structure |= MatrixStructureEnum.STRUCT_UPPER_TRIANGULAR
+        if self.structure & MatrixStructureEnum.STRUCT_UPPER_TRIANGULAR:
+            structure |= MatrixStructureEnum.STRUCT_LOWER_TRIANGULAR
+        return structure
+
+    def get_shape(self):
+        return MatrixType(rows=get_shape_dim(self.rows), cols=get_shape_dim(self.cols))
 
     def get_signature(self):
         if self.element_type:
@@ -198,13 +342,18 @@ class MatrixType(LaVarType):
 
 
 class VectorType(LaVarType):
-    def __init__(self, rows=0, desc=None, element_type=ScalarType(), symbol=None, dynamic=DynamicTypeEnum.DYN_INVALID, rows_ir=None):
-        LaVarType.__init__(self, VarTypeEnum.VECTOR, desc, element_type, symbol, dynamic=dynamic)
+    __slots__ = ('cols', 'is_int', 'rows', 'rows_ir', 'sparse')
+
+    def __init__(self, rows=0, element_type=ScalarType(), dynamic=DynamicTypeEnum.DYN_INVALID, rows_ir=None):
+        LaVarType.__init__(self, VarTypeEnum.VECTOR, element_type, dynamic=dynamic)
         self.rows = rows
         self.rows_ir = rows_ir
         self.cols = 1
         self.sparse = False
 
+    def get_shape(self):
+        return VectorType(rows=get_shape_dim(self.rows))
+
     def get_signature(self):
         if self.element_type:
             return "vector,rows:{},ele_type:{}".format(self.rows, self.element_type.get_signature())
@@ -216,8 +365,10 @@ class VectorType(LaVarType):
 
 
 class SetType(LaVarType):
-    def __init__(self, size=0, desc=None, element_type=None, symbol=None, int_list=None, dynamic=DynamicTypeEnum.DYN_INVALID):
-        LaVarType.__init__(self, VarTypeEnum.SET, desc, element_type, symbol, dynamic=dynamic)
+    __slots__ = ('int_list', 'size')
+
+    def __init__(self, size=0, element_type=None, int_list=None, dynamic=DynamicTypeEnum.DYN_INVALID):
+        LaVarType.__init__(self, VarTypeEnum.SET, element_type, dynamic=dynamic)
         self.size = size
         self.int_list = int_list     # whether the element is real number or integer
 
@@ -232,13 +383,17 @@ class SetType(LaVarType):
 
 
 class IndexType(LaVarType):
-    def __init__(self, desc=None, symbol=None):
-        LaVarType.__init__(self, VarTypeEnum.INDEX, desc, symbol)
+    __slots__ = ()
+
+    def __init__(self):
+        LaVarType.__init__(self, VarTypeEnum.INDEX)
 
 
 class FunctionType(LaVarType):
-    def __init__(self, desc=None, symbol=None, params=None, ret=None, template_symbols=None, ret_symbols=None):
-        LaVarType.__init__(self, VarTypeEnum.FUNCTION, desc, symbol)
+    __slots__ = ('params', 'ret', 'ret_symbols', 'template_symbols')
+
+    def __init__(self, params=None, ret=None, template_symbols=None, ret_symbols=None):
+        LaVarType.__init__(self, VarTypeEnum.FUNCTION)
         self.params = params or []
         self.ret = ret
         self.template_symbols = template_symbols or {}  # symbol: index of params
@@ -256,6 +411,8 @@ class FunctionType(LaVarType):
 
 
 class SummationAttrs(object):
+    __slots__ = ('subs', 'var_list')
+
     def __init__(self, subs=None, var_list=None):
         super().__init__()
         self.subs = subs
@@ -263,6 +420,8 @@ class SummationAttrs(object):
 
 
 class NodeInfo(object):
+    __slots__ = ('content', 'ir', 'la_type', 'symbol', 'symbols')
+
     def __init__(self, la_type=None, content=None, symbols=None, ir=None):
         super().__init__()
         self.la_type = la_type
@@ -272,6 +431,8 @@ class NodeInfo(object):
 
 
 class CodeNodeInfo(object):
+    __slots__ = ('content', 'pre_list')
+
     def __init__(self, content=None, pre_list=None):
         super().__init__()
         self.content = content
@@ -279,6 +440,8 @@ class CodeNodeInfo(object):
 
 
 class Identifier(object):
+    __slots__ = ('main_id', 'subs')
+
     def __init__(self, main_id='', subs=None):
         super().__init__()
         self.main_id = main_id
@@ -18,29 +18,22 @@ from tatsu.exceptions import (
     OptionSucceeded
 )
 from enum import Enum
-from .codegen_numpy import CodeGenNumpy
-from .codegen_eigen import CodeGenEigen
-from .codegen_latex import CodeGenLatex
-from .codegen_mathjax import CodeGenMathjax
-from .codegen_matlab import CodeGenMatlab
 from .type_walker import *
 from .ir import *
 from .ir_visitor import *
+from .prescan import prescan, match_prescan
+from .ir_archive import IR_SUFFIX, dump_ir, load_ir, save_ir_file, load_ir_file
 from ..la_tools.la_msg import *
 from ..la_tools.la_helper import *
 from ..la_tools.parser_manager import ParserManager
+from ..la_tools.la_cache import CompileCache
+from ..la_tools.la_profiler import profile_phase
 import subprocess
 import threading
+import weakref
 import regex as re
 from ..la_grammar import *
 
-## We don't need wx to run in command-line mode. This makes it optional.
-try:
-    import wx
-except ImportError:
-    class wx(object): pass
-    wx.CallAfter = lambda o, *x, **y: None
-
 import sys
 import traceback
 import os.path
@@ -50,32 +43,148 @@ import io
 
 _id_pattern = re.compile("[A-Za-z\p{Ll}\p{Lu}\p{Lo}]\p{M}*")
 _backtick_pattern = re.compile("`[^`]*`")
-_codegen_dict = {}
+_edit_session = None
+
+
+def call_after(func, *args):
+    ## We don't need wx to run in command-line mode. This makes it optional.
+    try:
+        import wx
+    except ImportError:
+        return
+    wx.CallAfter(func, *args)
+
+
+class CompilerContext(object):
+    """
+    Parsers, type walker and code generators used by one compile at a time. Every thread compiles with its own
+    context (see get_context), so compiles don't share any state and can run in different threads.
+    Parsers come from a pool in the parser manager and go back to it when the context is closed or collected.
+    """
+    def __init__(self):
+        self.parsers = {}       # 'init'/'default' -> parser owned by this context
+        self.type_walker = None
+        self.codegens = {}      # ParserTypeEnum -> code generator
+        self.parser_key = None  # configuration of the last parser returned by get_compiled_parser
+        self.finalizer = weakref.finalize(self, release_parsers, self.parsers)
+
+    def __enter__(self):
+        if not hasattr(_local, 'stack'):
+            _local.stack = []
+        _local.stack.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _local.stack.pop()
+
+    def close(self):
+        self.finalizer()
+
+    def get_codegen(self, parser_type):
+        # code generators are only imported for the backends in use
+        if parser_type not in self.codegens:
+            if parser_type == ParserTypeEnum.LATEX:
+                from .codegen_latex import CodeGenLatex
+                gen = CodeGenLatex()
+            elif parser_type == ParserTypeEnum.NUMPY:
+                from .codegen_numpy import CodeGenNumpy
+                gen = CodeGenNumpy()
+            elif parser_type == ParserTypeEnum.EIGEN:
+                from .codegen_eigen import CodeGenEigen
+                gen = CodeGenEigen()
+            elif parser_type == ParserTypeEnum.MATHJAX:
+                from .codegen_mathjax import CodeGenMathjax
+                gen = CodeGenMathjax()
+            elif parser_type == ParserTypeEnum.MATLAB:
+                from .codegen_matlab import CodeGenMatlab
+                gen = CodeGenMatlab()
+            self.codegens[parser_type] = gen
+        return self.codegens[parser_type]
+
+    def get_type_walker(self):
+        if self.type_walker:
+            self.type_walker.reset()
+        else:
+            self.type_walker = TypeWalker()
+        return self.type_walker
+
+    def get_compiled_parser(self, grammar, keys='init', extra_dict={}):
+        log_la("keys:" + keys)
+        manager = get_parser_manager()
+        kind = 'init' if keys == 'init' else _default_key
+        if kind != 'init':
+            self.parser_key = keys
+        if kind not in self.parsers:
+            parser = manager.acquire_parser(kind)
+            if parser is None:
+                # parsers generated from the grammar files are shared
+                return manager.get_parser(keys, grammar, extra_dict)
+            self.parsers[kind] = parser
+        if kind != 'init':
+            manager.configure_parser(self.parsers[kind], extra_dict)
+        return self.parsers[kind]
+
+    def compile(self, content, parser_type, func_name=None):
+        """
+        compile_backends with this context
+        :return: dict of ParserTypeEnum -> generated content
+        """
+        with self:
+            return compile_backends(content, parser_type, func_name=func_name)
+
+
+def release_parsers(parsers):
+    # parsers can only be given back once the manager exists
+    if _parser_manager is not None:
+        for kind, parser in parsers.items():
+            _parser_manager.release_parser(kind, parser)
+    parsers.clear()
+
+
+_local = threading.local()
+
+
+def get_context():
+    """
+    :return: CompilerContext entered in this thread with a with statement, otherwise the thread's own context
+    """
+    stack = getattr(_local, 'stack', None)
+    if stack:
+        return stack[-1]
+    if getattr(_local, 'context', None) is None:
+        _local.context = CompilerContext()
+    return _local.context
 
 
 def get_codegen(parser_type):
-    if parser_type not in _codegen_dict:
-        if parser_type == ParserTypeEnum.LATEX:
-            gen = CodeGenLatex()
-        elif parser_type == ParserTypeEnum.NUMPY:
-            gen = CodeGenNumpy()
-        elif parser_type == ParserTypeEnum.EIGEN:
-            gen = CodeGenEigen()
-        elif parser_type == ParserTypeEnum.MATHJAX:
-            gen = CodeGenMathjax()
-        elif parser_type == ParserTypeEnum.MATLAB:
-            gen = CodeGenMatlab()
-        _codegen_dict[parser_type] = gen
-    return _codegen_dict[parser_type]
+    return get_context().get_codegen(parser_type)
+
+
+def get_codegen_options(parser_type):
+    """
+    :return: dict of ParserTypeEnum -> options of this thread's code generator, see IRVisitor.get_options
+    """
+    return {cur_type: get_codegen(cur_type).get_options() for cur_type in _backend_order if parser_type & cur_type}
+
+
+def set_codegen_options(parser_type, **options):
+    """
+    Change the options of this thread's code generators for the backends in parser_type,
+    e.g. set_codegen_options(ParserTypeEnum.NUMPY, cse=False)
+    """
+    for cur_type in _backend_order:
+        if parser_type & cur_type:
+            get_codegen(cur_type).set_options(options)
 
 
 def walk_model(parser_type, type_walker, node_info, func_name=None):
-    gen = get_codegen(parser_type)
-    #
-    gen.init_type(type_walker, func_name)
-    gen.visit_code(node_info)
-    if parser_type != ParserTypeEnum.LATEX:  # print once
-        gen.print_symbols()
+    with profile_phase("codegen {}".format(parser_type.name.lower())):
+        gen = get_codegen(parser_type)
+        #
+        gen.init_type(type_walker, func_name)
+        gen.visit_code(node_info)
+        if parser_type != ParserTypeEnum.LATEX:  # print once
+            gen.print_symbols()
     return gen.content
 
 
@@ -89,24 +198,25 @@ else:
 
 _grammar_content = None  # content in file
 _default_key = 'default'
-_parser_manager = ParserManager(GRAMMAR_DIR)
+_parser_manager = None
+_parser_manager_lock = threading.Lock()
 
 
-def get_compiled_parser(grammar, keys='init', extra_dict={}):
-    log_la("keys:" + keys)
-    return _parser_manager.get_parser(keys, grammar, extra_dict)
+def get_parser_manager():
+    # the generated parsers are large, load them on first use
+    global _parser_manager
+    with _parser_manager_lock:
+        if _parser_manager is None:
+            _parser_manager = ParserManager(GRAMMAR_DIR)
+    return _parser_manager
 
 
-_type_walker = None
+def get_compiled_parser(grammar, keys='init', extra_dict={}):
+    return get_context().get_compiled_parser(grammar, keys, extra_dict)
 
 
 def get_type_walker():
-    global _type_walker
-    if _type_walker:
-        _type_walker.reset()
-    else:
-        _type_walker = TypeWalker()
-    return _type_walker
+    return get_context().get_type_walker()
 
 
 def log_la(content):
@@ -176,7 +286,7 @@ def generate_latex_code(type_walker, node_info, frame):
     with tempfile.TemporaryDirectory() as tmpdir:
         if DEBUG_MODE:
             tex_content, show_pdf = get_pdf(tmpdir)
-            wx.CallAfter(frame.UpdateTexPanel, tex_content, show_pdf)
+            call_after(frame.UpdateTexPanel, tex_content, show_pdf)
         else:
             try:
                 tex_content, show_pdf = get_pdf(tmpdir)
@@ -192,15 +302,15 @@ def generate_latex_code(type_walker, node_info, frame):
                 traceback.print_exc()
                 tex_content = str(exc_info[2])
             finally:
-                wx.CallAfter(frame.UpdateTexPanel, tex_content, show_pdf)
+                call_after(frame.UpdateTexPanel, tex_content, show_pdf)
 
 
-def parse_ir_node(content, model):
+def get_configured_parser(type_walker, start_node):
+    """
+    Get the default parser with the multi-letter identifiers, functions and packages found by the pre walk
+    """
     global _grammar_content
     current_content = _grammar_content
-    # type walker
-    type_walker = get_type_walker()
-    start_node = type_walker.walk(model, pre_walk=True)
     # deal with function
     func_dict = type_walker.get_func_symbols()
     multi_list = []
@@ -240,6 +350,7 @@ def parse_ir_node(content, model):
                 extra_list.append('`{}`'.format(key))
         key_list += extra_list
         key_list = [re.escape(item).replace('/', '\\/') for item in key_list]
+        key_list = sorted(key_list, key=len, reverse=True)
         func_rule = "/" + "/|/".join(key_list) + "/"
         extra_dict['funcs'] = key_list
         log_la("func_rule:" + func_rule)
@@ -273,25 +384,84 @@ def parse_ir_node(content, model):
             parse_key += ';'.join(key_names)
         extra_dict['pkg'] = package_name_list
     # get new parser
-    parser = get_compiled_parser(current_content, parse_key, extra_dict)
-    model = parser.parse(content, parseinfo=True)
+    return get_compiled_parser(current_content, parse_key, extra_dict)
+
+
+def parse_single_pass(content):
+    """
+    Collect the declarations with the prescan so that the full grammar only parses the content once
+    :return: type_walker, start_node, or None if the prescan doesn't agree with the full parse
+    """
+    try:
+        with profile_phase("prescan"):
+            info = prescan(content, get_default_parser())
+        if info is None:
+            return None
+        type_walker = get_type_walker()
+        with profile_phase("pre walk"):
+            start_node = type_walker.walk_prescan(info)
+        with profile_phase("parser lookup"):
+            parser = get_configured_parser(type_walker, start_node)
+        with profile_phase("parse"):
+            model = parser.parse(content, parseinfo=True)
+        if not match_prescan(info, model):
+            log_la("prescan mismatch, fall back to the init parser")
+            return None
+    except Exception as e:
+        log_la("prescan failed:{}".format(e))
+        return None
+    with profile_phase("walk"):
+        type_walker.reset_state(content)  # reset
+        start_node = type_walker.walk(model)
+    return type_walker, start_node
+
+
+def parse_ir_node(content, model=None):
+    """
+    :param model: result of the init parser; when it's None the prescan is tried first
+    """
+    if model is None:
+        result = parse_single_pass(content)
+        if result is not None:
+            return result
+        with profile_phase("init parse"):
+            model = get_default_parser().parse(content, parseinfo=True)
+    # type walker
+    type_walker = get_type_walker()
+    with profile_phase("pre walk"):
+        start_node = type_walker.walk(model, pre_walk=True)
+    with profile_phase("parser lookup"):
+        parser = get_configured_parser(type_walker, start_node)
+    with profile_phase("parse"):
+        model = parser.parse(content, parseinfo=True)
     # second parsing
-    type_walker.reset_state(content)  # reset
-    start_node = type_walker.walk(model)
+    with profile_phase("walk"):
+        type_walker.reset_state(content)  # reset
+        start_node = type_walker.walk(model)
     return type_walker, start_node
 
 
+def get_edit_session():
+    """
+    Session of the document being edited in the GUI
+    :return: CompileSession
+    """
+    global _edit_session
+    if _edit_session is None:
+        from .session import CompileSession
+        _edit_session = CompileSession()
+    return _edit_session
+
+
 def clean_parsers():
-    _parser_manager.clean_parsers()
+    get_parser_manager().clean_parsers()
 
 
 def parse_and_translate(content, frame, parser_type=None, func_name=None):
     start_time = time.time()
     def get_parse_result(parser_type):
-        parser = get_default_parser()
-        model = parser.parse(content, parseinfo=True)
-        # type walker
-        type_walker, start_node = parse_ir_node(content, model)
+        # type walker, only the edited blocks are parsed again
+        type_walker, start_node = get_edit_session().parse_ir_node(content)
         # parsing Latex at the same time
         latex_thread = threading.Thread(target=generate_latex_code, args=(type_walker, start_node, frame,))
         latex_thread.start()
@@ -302,7 +472,7 @@ def parse_and_translate(content, frame, parser_type=None, func_name=None):
         return res, 0
     if DEBUG_MODE:
         result = get_parse_result(parser_type)
-        wx.CallAfter(frame.UpdateMidPanel, result)
+        call_after(frame.UpdateMidPanel, result)
         print("------------ %.2f seconds ------------" % (time.time() - start_time))
     else:
         try:
@@ -324,7 +494,7 @@ def parse_and_translate(content, frame, parser_type=None, func_name=None):
             tex = str(sys.exc_info()[0])
             result = (tex, 1)
         finally:
-            wx.CallAfter(frame.UpdateMidPanel, result)
+            call_after(frame.UpdateMidPanel, result)
             print("------------ %.2f seconds ------------" % (time.time() - start_time))
             if result[1] != 0:
                 print(result[0])
@@ -335,28 +505,88 @@ def get_file_name(path_name):
     return Path(path_name).stem
 
 
+_backend_order = [ParserTypeEnum.NUMPY, ParserTypeEnum.EIGEN, ParserTypeEnum.LATEX, ParserTypeEnum.MATHJAX, ParserTypeEnum.MATLAB]
+SPARSE_FORMATS = ['coo', 'csr']  # sparse_format of the NumPy code generator
+
+
+def compile_backends(content, parser_type, func_name=None, executor=None):
+    """
+    Compile the content for every backend in parser_type, consulting the compile cache first
+    :param executor: see walk_backends
+    :return: dict of ParserTypeEnum -> generated content
+    """
+    cache = CompileCache.getInstance()
+    if cache.enabled:
+        options = get_codegen_options(parser_type)
+        results = cache.get(content, parser_type, func_name, options)
+        if results is not None:
+            return results
+    type_walker, start_node = parse_ir_node(content)
+    results = walk_backends(parser_type, type_walker, start_node, func_name, executor)
+    if cache.enabled:
+        cache.put(content, parser_type, results, func_name, options)
+    return results
+
+
+def walk_backends(parser_type, type_walker, start_node, func_name=None, executor=None):
+    """
+    :param type_walker: TypeWalker after parse_ir_node, or the WalkerState of a loaded IR file
+    :param executor: concurrent.futures executor (thread or process pool) to generate the backends concurrently
+    :return: dict of ParserTypeEnum -> generated content
+    """
+    backends = [cur_type for cur_type in _backend_order if parser_type & cur_type]
+    if executor is None or len(backends) <= 1:
+        return {cur_type: walk_model(cur_type, type_walker, start_node, func_name=func_name) for cur_type in backends}
+    # every backend starts from its own copy of the IR, the workers use the options of this thread's code generators
+    ir_data = dump_ir(type_walker, start_node)
+    options = get_codegen_options(parser_type)
+    futures = [(cur_type, executor.submit(emit_backend, cur_type, ir_data, func_name, options[cur_type]))
+               for cur_type in backends]
+    return {cur_type: future.result() for cur_type, future in futures}
+
+
+def emit_backend(parser_type, ir_data, func_name=None, options=None):
+    """
+    Generate one backend from the result of dump_ir, runs in the workers of walk_backends
+    :param options: code generator options for this backend, see get_codegen_options
+    """
+    type_walker, start_node = load_ir(ir_data)
+    if options is None:
+        return walk_model(parser_type, type_walker, start_node, func_name=func_name)
+    old_options = get_codegen(parser_type).get_options()
+    set_codegen_options(parser_type, **options)
+    try:
+        return walk_model(parser_type, type_walker, start_node, func_name=func_name)
+    finally:
+        set_codegen_options(parser_type, **old_options)
+
+
+def get_compile_error(e):
+    """
+    :return: message shown to the user for an exception raised while compiling
+    """
+    if isinstance(e, FailedParse):
+        return LaMsg.getInstance().get_parse_error(e)
+    elif isinstance(e, FailedCut):
+        return "FailedCut: {}".format(str(e))
+    elif isinstance(e, AssertionError):
+        return "{}".format(e.args[0] if e.args else e)
+    return "Exception: {}".format(str(e))
+
+
 def compile_la_content(la_content,
-                       parser_type=ParserTypeEnum.NUMPY | ParserTypeEnum.EIGEN | ParserTypeEnum.LATEX | ParserTypeEnum.MATHJAX | ParserTypeEnum.MATLAB):
-    parser = get_default_parser()
+                       parser_type=ParserTypeEnum.NUMPY | ParserTypeEnum.EIGEN | ParserTypeEnum.LATEX | ParserTypeEnum.MATHJAX | ParserTypeEnum.MATLAB,
+                       sparse_format=None):
+    """
+    :param sparse_format: scipy format of the sparse matrices built by the NumPy code, 'coo' or 'csr', for this compile only
+    """
+    old_options = get_codegen_options(ParserTypeEnum.NUMPY) if sparse_format is not None else {}
     try:
-        model = parser.parse(la_content, parseinfo=True)
-        type_walker, start_node = parse_ir_node(la_content, model)
-        ret = []
-        if parser_type & ParserTypeEnum.NUMPY:
-            numpy_content = walk_model(ParserTypeEnum.NUMPY, type_walker, start_node)
-            ret.append(numpy_content)
-        if parser_type & ParserTypeEnum.EIGEN:
-            eigen_content = walk_model(ParserTypeEnum.EIGEN, type_walker, start_node)
-            ret.append(eigen_content)
-        if parser_type & ParserTypeEnum.LATEX:
-            tex_content = walk_model(ParserTypeEnum.LATEX, type_walker, start_node)
-            ret.append(tex_content)
-        if parser_type & ParserTypeEnum.MATHJAX:
-            tex_content = walk_model(ParserTypeEnum.MATHJAX, type_walker, start_node)
-            ret.append(tex_content)
-        if parser_type & ParserTypeEnum.MATLAB:
-            tex_content = walk_model(ParserTypeEnum.MATLAB, type_walker, start_node)
-            ret.append(tex_content)
+        if sparse_format is not None:
+            assert sparse_format in SPARSE_FORMATS, "The sparse format can only be {}".format(" or ".join(SPARSE_FORMATS))
+            set_codegen_options(ParserTypeEnum.NUMPY, sparse_format=sparse_format)
+        results = compile_backends(la_content, parser_type)
+        ret = [results[cur_type] for cur_type in _backend_order if cur_type in results]
     except FailedParse as e:
         ret = LaMsg.getInstance().get_parse_error(e)
     except FailedCut as e:
@@ -368,23 +598,30 @@ def compile_la_content(la_content,
     except:
         ret = str(sys.exc_info()[0])
     finally:
+        for cur_type, options in old_options.items():
+            set_codegen_options(cur_type, **options)
         return ret
 
 
-def compile_la_file(la_file, parser_type=ParserTypeEnum.NUMPY | ParserTypeEnum.EIGEN | ParserTypeEnum.LATEX):
+def compile_la_file(la_file, parser_type=ParserTypeEnum.NUMPY | ParserTypeEnum.EIGEN | ParserTypeEnum.LATEX, emit_ir=False,
+                    executor=None):
     """
     used for command line
+    :param emit_ir: also save the typed IR next to the file, the backends can be generated from it later
+    :param executor: see walk_backends
     """
     # Alec: maybe this compile_la_file should just call compile_la_content after
     # reading the content?
     if la_file == "-":
         content = "\n".join(sys.stdin.readlines())
         base_name = "iheartla"
+    elif la_file.endswith(IR_SUFFIX):
+        content = None  # typed IR saved by an earlier compile
+        base_name = get_file_name(la_file)
     else:
         content = read_from_file(la_file)
         base_name = get_file_name(la_file)
     # print("head:", head, ", name:", name, "parser_type", parser_type, ", base_name:", base_name)
-    parser = get_default_parser()
     try:
         def write_output(content, file_name):
             if la_file == "-":
@@ -392,21 +629,28 @@ def compile_la_file(la_file, parser_type=ParserTypeEnum.NUMPY | ParserTypeEnum.E
                 print("\n")
             else:
                 save_to_file(content,file_name)
-        model = parser.parse(content, parseinfo=True)
-        type_walker, start_node = parse_ir_node(content, model)
+        # mathjax is never written to a file
+        if content is None:
+            type_walker, start_node = load_ir_file(la_file)
+            results = walk_backends(parser_type & ~ParserTypeEnum.MATHJAX, type_walker, start_node, base_name, executor)
+        elif emit_ir:
+            assert la_file != "-", "The IR of the standard input can't be saved"
+            type_walker, start_node = parse_ir_node(content)
+            save_ir_file(Path(la_file).with_suffix(IR_SUFFIX), type_walker, start_node)
+            results = walk_backends(parser_type & ~ParserTypeEnum.MATHJAX, type_walker, start_node, base_name, executor)
+        else:
+            results = compile_backends(content, parser_type & ~ParserTypeEnum.MATHJAX, func_name=base_name,
+                                       executor=executor)
         # Alec: maybe this should be a loop/case statement
         if parser_type & ParserTypeEnum.NUMPY:
             numpy_file = Path(la_file).with_suffix(".py")
-            numpy_content = walk_model(ParserTypeEnum.NUMPY, type_walker, start_node, func_name=base_name)
-            write_output(numpy_content, numpy_file)
+            write_output(results[ParserTypeEnum.NUMPY], numpy_file)
         if parser_type & ParserTypeEnum.EIGEN:
             eigen_file = Path(la_file).with_suffix(".cpp")
-            eigen_content = walk_model(ParserTypeEnum.EIGEN, type_walker, start_node, func_name=base_name)
-            write_output(eigen_content, eigen_file)
+            write_output(results[ParserTypeEnum.EIGEN], eigen_file)
         if parser_type & ParserTypeEnum.LATEX:
             tex_file = Path(la_file).with_suffix(".tex")
-            tex_content = walk_model(ParserTypeEnum.LATEX, type_walker, start_node, func_name=base_name)
-            write_output(tex_content, tex_file)
+            write_output(results[ParserTypeEnum.LATEX], tex_file)
         if parser_type & ParserTypeEnum.MATLAB:
             # Alec: in matlab a .m file can either be a "script" or a "function". 
             #
@@ -421,8 +665,7 @@ def compile_la_file(la_file, parser_type=ParserTypeEnum.NUMPY | ParserTypeEnum.E
             # generateRandomData. When called with no arguments (nargin == 0),
             # it will issue a warning and run with random data.
             m_file = Path(la_file).with_suffix(".m")
-            m_content = walk_model(ParserTypeEnum.MATLAB, type_walker, start_node, func_name=base_name)
-            write_output(m_content, m_file)
+            write_output(results[ParserTypeEnum.MATLAB], m_file)
     except FailedParse as e:
         print(LaMsg.getInstance().get_parse_error(e))
         raise
@@ -443,10 +686,8 @@ def parse_la(content, parser_type):
     """
     used for testing
     """
-    _parser_manager.set_test_mode()
-    parser = get_default_parser()
-    model = parser.parse(content, parseinfo=True)
-    type_walker, node_info = parse_ir_node(content, model)
+    get_parser_manager().set_test_mode()
+    type_walker, node_info = parse_ir_node(content)
     res = walk_model(parser_type, type_walker, node_info)
     return res
 
@@ -0,0 +1,203 @@
+import regex as re
+from tatsu.exceptions import FailedParse
+
+# separator rule in base_ebnf
+SEPARATORS = '\n\r\f;'
+OPEN_BRACKETS = '([{⎡'
+CLOSE_BRACKETS = ')]}⎦'
+ANNOTATIONS = ['where', 'given']
+SUBJECT_TO = ['s.t.', 'subject to']
+_directive_pattern = re.compile(r"from[ \t]+")
+# a where condition starts with identifiers followed by ':' or '∈'
+_id_pattern = r"(?:`[^`]*`|[^\s,:;=`∈()\[\]{}])+"
+_cond_pattern = re.compile(_id_pattern + r"(?:[ \t]*,[ \t]*" + _id_pattern + r")*[ \t]*(?::|∈)")
+# lines continuing a sparse matrix or the constraints after s.t.
+_sparse_row_pattern = re.compile(r"\bif\b|∈.*:|\botherwise\b")
+_constraint_pattern = re.compile(r"[<>≤≥≠∈∉]")
+
+
+class PrescanInfo(object):
+    def __init__(self):
+        self.directives = []  # Import models
+        self.params = []      # ParamsBlock models
+        self.stats = []       # (lhs model or None, rhs text, statement model or None)
+        self.blocks = []      # ('ParamsBlock', None) or ('Statements', lhs text or None), in source order
+        self.spans = []       # (rule, start, end) of every directive and block in content, in source order
+
+
+def strip_span(content, start, end):
+    # leading blanks only, descriptions keep their trailing ones
+    while start < end and content[start] in ' \t\r\f':
+        start += 1
+    return start, end
+
+
+def find_line_end(content, pos):
+    end = content.find('\n', pos)
+    return len(content) if end == -1 else end
+
+
+def find_statement_end(content, pos):
+    """
+    Find where the statement starting at pos ends: the first separator outside brackets and backticks
+    that doesn't continue an assignment, a sparse matrix or an optimization
+    """
+    stack = []
+    index = pos
+    length = len(content)
+    while index < length:
+        c = content[index]
+        if c == '`':
+            index = content.find('`', index + 1)
+            if index == -1:
+                return None
+        elif c in OPEN_BRACKETS:
+            stack.append(c)
+        elif c in CLOSE_BRACKETS:
+            if len(stack) == 0:
+                return None
+            stack.pop()
+        elif c in SEPARATORS and len(stack) <= 1:
+            next_line = content[index+1:find_line_end(content, index+1)]
+            if stack == ['{']:
+                # sparse matrix has no closing bracket
+                if _sparse_row_pattern.search(next_line):
+                    index += 1
+                    continue
+                stack.pop()
+            if len(stack) == 0:
+                cur_text = content[pos:index].rstrip(' \t')
+                next_text = content[index+1:].lstrip(' \t' + SEPARATORS)
+                if cur_text.endswith('=') or any(cur_text.endswith(key) or next_text.startswith(key) for key in SUBJECT_TO):
+                    pass
+                elif any(key in cur_text for key in SUBJECT_TO) and _constraint_pattern.search(next_line):
+                    pass
+                else:
+                    return index
+        index += 1
+    return length if len(stack) == 0 or stack == ['{'] else None
+
+
+def find_assign_op(text):
+    """
+    :return: index of the top level '=' or '+=' in the statement, -1 if it's not an assignment
+    """
+    depth = 0
+    index = 0
+    while index < len(text):
+        c = text[index]
+        if c == '`':
+            index = text.find('`', index + 1)
+            if index == -1:
+                return -1
+        elif c in OPEN_BRACKETS:
+            depth += 1
+        elif c in CLOSE_BRACKETS:
+            depth -= 1
+        elif c == '=' and depth == 0:
+            if (index > 0 and text[index-1] in '<>!=') or text[index+1:index+2] == '=':
+                return -1
+            return index - 1 if index > 0 and text[index-1] == '+' else index
+        index += 1
+    return -1
+
+
+def parse_fully(parser, text, rule_name):
+    # the rule has to consume the whole text
+    try:
+        model = parser.parse(text, rule_name=rule_name, parseinfo=True)
+    except FailedParse:
+        return None
+    if model is None or model.parseinfo is None or model.parseinfo.endpos != len(text):
+        return None
+    return model
+
+
+def prescan(content, parser):
+    """
+    Collect the directives, where blocks and assignment targets without parsing the expressions.
+    Only small pieces of the source are parsed with the given (init) parser.
+    :return: PrescanInfo, or None when the layout isn't recognized
+    """
+    info = PrescanInfo()
+    pos = 0
+    length = len(content)
+    allow_directive = True
+    while pos < length:
+        end = find_line_end(content, pos)
+        line = content[pos:end].strip(' \t\r\f')
+        if line == '':
+            pos = end + 1
+            continue
+        if allow_directive and _directive_pattern.match(line):
+            directive = parse_fully(parser, line, 'import')
+            if directive is None:
+                return None
+            info.directives.append(directive)
+            info.spans.append(('import',) + strip_span(content, pos, end))
+            pos = end + 1
+            continue
+        allow_directive = False
+        if line in ANNOTATIONS or _cond_pattern.match(line):
+            # params block: optional annotation followed by condition lines
+            start = pos
+            block_end = None if line in ANNOTATIONS else end
+            pos = end + 1
+            while pos < length:
+                end = find_line_end(content, pos)
+                line = content[pos:end].strip(' \t\r\f')
+                if line != '':
+                    if not _cond_pattern.match(line):
+                        break
+                    block_end = end
+                pos = end + 1
+            if block_end is None:
+                return None
+            params = parse_fully(parser, content[start:block_end].strip(' \t\r\f'), 'params_block')
+            if params is None:
+                return None
+            info.params.append(params)
+            info.blocks.append(('ParamsBlock', None))
+            info.spans.append(('params_block',) + strip_span(content, start, block_end))
+            continue
+        # statement
+        end = find_statement_end(content, pos)
+        if end is None:
+            return None
+        text = content[pos:end].strip(' \t\r\f')
+        info.spans.append(('statements',) + strip_span(content, pos, end))
+        pos = end + 1
+        op_index = find_assign_op(text)
+        lhs = None
+        if op_index > 0:
+            lhs = parse_fully(parser, text[:op_index].rstrip(' \t'), 'identifier')
+        if lhs is None:
+            info.stats.append((None, text, None))
+            info.blocks.append(('Statements', None))
+            continue
+        rhs_text = text[op_index + (2 if text[op_index] == '+' else 1):].strip()
+        stat = None
+        if parse_fully(parser, rhs_text, 'identifier') is not None:
+            # lhs = symbol, may be a function assignment
+            stat = parse_fully(parser, text, 'statement')
+        info.stats.append((lhs, rhs_text, stat))
+        info.blocks.append(('Statements', text[:op_index].rstrip(' \t')))
+    return info
+
+
+def match_prescan(info, model):
+    """
+    Check that the full parse found the same blocks as the prescan
+    """
+    if len(info.directives) != len(model.directive or []) or len(info.blocks) != len(model.vblock):
+        return False
+    for (block_type, lhs_text), vblock in zip(info.blocks, model.vblock):
+        if type(vblock).__name__ != block_type:
+            return False
+        if block_type == 'Statements':
+            is_assignment = type(vblock.stat).__name__ == 'Assignment'
+            if is_assignment != (lhs_text is not None):
+                return False
+            if is_assignment and vblock.stat.left.text.strip() != lhs_text:
+                return False
+    return True
@@ -0,0 +1,206 @@
+import copy
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from tatsu.objectmodel import Node
+from .parser import get_default_parser, get_configured_parser, get_type_walker, get_context, parse_ir_node, \
+    walk_model, get_codegen_options, log_la, _backend_order
+from .prescan import prescan, parse_fully
+from ..la_tools.la_helper import get_parse_info_buffer
+from ..la_tools.la_profiler import profile_phase
+from ..la_tools.la_cache import CompileCache
+
+
+class Start(Node):
+    # the start model assembled from the pieces, walked like the parsed one
+    pass
+
+
+class CachedParser(object):
+    """
+    Parser wrapper remembering the models of the pieces it has parsed
+    """
+    def __init__(self, parser, cache, key):
+        self.parser = parser
+        self.cache = cache
+        self.key = key
+
+    def parse(self, text, rule_name=None, **kwargs):
+        key = (self.key, rule_name, text)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            entry = self.cache[key]
+            if isinstance(entry, Exception):
+                raise entry
+            return entry
+        try:
+            model = self.parser.parse(text, rule_name=rule_name, **kwargs)
+        except Exception as e:
+            self.cache[key] = e
+            raise
+        self.cache[key] = model
+        return model
+
+
+class CompileSession(object):
+    """
+    Incremental compiler for one document that is edited and compiled again and again (GUI, compile server).
+    The source is split into directives, where blocks and statements by the prescan, and the parsed model
+    of every piece is kept: after an edit only new or changed pieces are parsed. The typed IR and the backends
+    are still rebuilt for the whole document, the symbol types of one statement depend on all the blocks before it.
+    """
+    def __init__(self, max_pieces=4096):
+        self.lock = threading.RLock()
+        self.max_pieces = max_pieces
+        self.models = OrderedDict()  # (parser key, rule, text) -> model or parse exception, least recently used first
+        self.content = None
+        self.results = {}            # (parser_type, func_name, options digest) -> results for self.content
+        self.parsed = 0              # pieces parsed in the last compile
+        self.reused = 0              # pieces taken from the cache in the last compile
+
+    def compile(self, content, parser_type, func_name=None):
+        """
+        Same as compile_backends, reusing what is left from the previous compiles
+        :return: dict of ParserTypeEnum -> generated content
+        """
+        with self.lock:
+            if content != self.content:
+                self.content = content
+                self.results.clear()
+            key = (parser_type, func_name, CompileCache.getInstance().get_options_digest(get_codegen_options(parser_type)))
+            if key not in self.results:
+                type_walker, start_node = self.parse_ir_node(content)
+                results = {}
+                for cur_type in _backend_order:
+                    if parser_type & cur_type:
+                        results[cur_type] = walk_model(cur_type, type_walker, start_node, func_name=func_name)
+                self.results[key] = results
+            return dict(self.results[key])
+
+    def parse_ir_node(self, content):
+        """
+        Same as parser.parse_ir_node, parsing only the pieces that changed
+        :return: type_walker, start_node
+        """
+        with self.lock:
+            self.parsed = 0
+            self.reused = 0
+            try:
+                with profile_phase("prescan"):
+                    info = prescan(content, CachedParser(get_default_parser(), self.models, None))
+                model = None
+                if info is not None and len(info.spans) > 0:
+                    type_walker = get_type_walker()
+                    with profile_phase("pre walk"):
+                        start_node = type_walker.walk_prescan(info)
+                    with profile_phase("parser lookup"):
+                        parser = get_configured_parser(type_walker, start_node)
+                    with profile_phase("parse"):
+                        model = self.assemble_model(content, info, parser, get_context().parser_key)
+            except Exception as e:
+                # the pieces report errors at their own positions
+                log_la("session prescan failed:{}".format(e))
+                model = None
+            finally:
+                self.trim_cache()
+            if model is None:
+                # layout not recognized or a piece doesn't parse alone, the full parse reports the errors
+                return parse_ir_node(content)
+            with profile_phase("walk"):
+                type_walker.reset_state(content)
+                start_node = type_walker.walk(model)
+            return type_walker, start_node
+
+    def assemble_model(self, content, info, parser, parser_key):
+        """
+        Parse every piece (or take it from the cache) and move it to its place in content
+        :param parser_key: configuration of the parser, the same parser object is configured for every source
+        :return: Start model, None if a piece can't be parsed on its own
+        """
+        directives = []
+        vblocks = []
+        buffer = None
+        placed = set()  # ids of the models placed in content
+        for rule, start, end in info.spans:
+            text = content[start:end]
+            key = (parser_key, rule, text)
+            if key in self.models:
+                self.models.move_to_end(key)
+                model = self.models[key]
+                self.reused += 1
+            else:
+                try:
+                    model = parse_fully(parser, text, rule)
+                except Exception:
+                    model = None
+                self.models[key] = model
+                self.parsed += 1
+            if model is None:
+                return None
+            if id(model) in placed:
+                # the same text appears again, every occurrence needs its own parse info
+                model = copy_model(model)
+            placed.add(id(model))
+            if buffer is None:
+                buffer = type(get_parse_info_buffer(model.parseinfo))(content)
+            relocate_model(model, buffer, start, content.count('\n', 0, start))
+            if rule == 'import':
+                directives.append(model)
+            else:
+                vblocks.append(model)
+        parse_info = vblocks[0].parseinfo if len(vblocks) > 0 else directives[0].parseinfo
+        parse_info = parse_info._replace(rule='start', pos=0, endpos=len(content), line=0,
+                                         endline=content.count('\n'))
+        return Start(directive=directives, vblock=vblocks, parseinfo=parse_info)
+
+    def trim_cache(self):
+        while len(self.models) > self.max_pieces:
+            self.models.popitem(last=False)
+
+
+def copy_model(model):
+    """
+    Copy of a piece model, the parse infos keep pointing into the same buffer
+    """
+    buffer = get_parse_info_buffer(model.parseinfo)
+    return copy.deepcopy(model, {id(buffer): buffer})
+
+
+def relocate_model(model, buffer, offset, line_offset):
+    """
+    Point the parse info of a piece model into buffer, where the piece starts at offset
+    """
+    # the model remembers where it was placed last time
+    old_offset, old_line_offset = getattr(model, '_piece_offset', (0, 0))
+    delta = offset - old_offset
+    line_delta = line_offset - old_line_offset
+    seen = set()
+
+    def relocate_info(parse_info):
+        return parse_info._replace(**{parse_info._fields[0]: buffer,
+                                      'pos': parse_info.pos + delta, 'endpos': parse_info.endpos + delta,
+                                      'line': parse_info.line + line_delta, 'endline': parse_info.endline + line_delta})
+
+    def relocate(node):
+        if id(node) in seen:
+            return
+        if isinstance(node, Node):
+            seen.add(id(node))
+            if node.parseinfo is not None:
+                node._parseinfo = relocate_info(node.parseinfo)
+            for key, value in vars(node).items():
+                if not key.startswith('_'):
+                    relocate(value)
+        elif isinstance(node, Mapping):
+            seen.add(id(node))
+            parse_info = node.get('parseinfo')
+            if parse_info is not None and hasattr(parse_info, '_replace'):
+                dict.__setitem__(node, 'parseinfo', relocate_info(parse_info))
+            for key, value in node.items():
+                if key != 'parseinfo':
+                    relocate(value)
+        elif isinstance(node, (list, tuple)):
+            for item in node:
+                relocate(item)
+    relocate(model)
+    model._piece_offset = (offset, line_offset)
@@ -1,10 +1,10 @@
-import copy
 from tatsu.model import NodeWalker
 from tatsu.objectmodel import Node
 from .la_types import *
 from ..la_tools.la_logger import *
 from ..la_tools.la_msg import *
 from ..la_tools.la_helper import *
+from ..la_tools.la_profiler import get_profiler
 import regex as re
 
 ## Make the visualizer
@@ -42,6 +42,13 @@ INSIDE_SUMMATION = "inside_summation"
 IF_COND = "if_condition"
 SET_RET_SYMBOL = "set_ret_symbol"
 PARAM_INDEX = "param_index"
+# matrix attributes of the where block
+MATRIX_STRUCTURE_DICT = {'symmetric': MatrixStructureEnum.STRUCT_SYMMETRIC,
+                         'positive definite': MatrixStructureEnum.STRUCT_POSITIVE_DEFINITE,
+                         'SPD': MatrixStructureEnum.STRUCT_POSITIVE_DEFINITE,
+                         'diagonal': MatrixStructureEnum.STRUCT_DIAGONAL,
+                         'lower triangular': MatrixStructureEnum.STRUCT_LOWER_TRIANGULAR,
+                         'upper triangular': MatrixStructureEnum.STRUCT_UPPER_TRIANGULAR}
 
 
 def la_is_inside_matrix(**kwargs):
@@ -68,8 +75,11 @@ def la_remove_key(keys, **kwargs):
 class TypeWalker(NodeWalker):
     def __init__(self):
         super().__init__()
+        # tatsu keeps the bound walk methods in a class attribute, every walker needs its own
+        self._walker_cache = {}
         self.symtable = {}
         self.tmp_symtable = {}
+        self.desc_dict = {}   # parameter: description in the where block
         self.parameters = []
         self.subscripts = {}
         self.sub_name_dict = {}  # only for parameter checker
@@ -109,6 +119,14 @@ class TypeWalker(NodeWalker):
         self.dependency_set = set()
         self.dependency_dim_dict = {}
 
+    def walk(self, node, *args, **kwargs):
+        walker = self._find_walker(node)
+        if callable(walker):
+            profiler = get_profiler()
+            if profiler is None:
+                return walker(node, *args, **kwargs)
+            return profiler.call('TypeWalker.' + walker.__name__, walker, node, *args, **kwargs)
+
     def filter_symbol(self, symbol):
         if '`' in symbol:
             new_symbol = symbol.replace('`', '')
@@ -127,6 +145,7 @@ class TypeWalker(NodeWalker):
     def reset_state(self, la_content=''):
         self.symtable.clear()
         self.tmp_symtable.clear()
+        self.desc_dict.clear()
         self.parameters.clear()
         self.subscripts.clear()
         self.sub_name_dict.clear()
@@ -319,14 +338,7 @@ class TypeWalker(NodeWalker):
             vblock_list.append(vblock_info)
             if isinstance(vblock_info, list) and len(vblock_info) > 0:  # statement list with single statement
                 if type(vblock_info[0]).__name__ == 'Assignment':
-                    if type(vblock_info[0].left).__name__ == 'IdentifierSubscript':
-                        lhs_sym = self.walk(vblock_info[0].left.left).ir.get_main_id()
-                    else:
-                        lhs_sym = self.walk(vblock_info[0].left).ir.get_main_id()
-                    if lhs_sym not in self.lhs_list:
-                        self.lhs_list.append(lhs_sym)
-                    if len(lhs_sym) > 1:
-                        multi_lhs_list.append(lhs_sym)
+                    self.add_lhs_symbol(vblock_info[0].left, multi_lhs_list)
                     self.rhs_raw_str_list.append(vblock_info[0].right.text)
                 else:
                     self.rhs_raw_str_list.append(vblock_info[0].text)
@@ -335,20 +347,7 @@ class TypeWalker(NodeWalker):
         # check function assignment
         if self.pre_walk:
             for index in range(len(stat_list)):
-                if type(stat_list[index]).__name__ == 'Assignment':
-                    # check whether rhs is function type
-                    if type(stat_list[index].right).__name__ == 'Expression' and type(stat_list[index].right.value).__name__ == 'Factor' and stat_list[index].right.value.id0:
-                        # specific stat: lhs = id_subs
-                        try:
-                            assign_node = self.walk(stat_list[index], **kwargs).ir
-                            lhs_id_node = assign_node.left
-                            rhs_id_node = assign_node.right.value.id
-                            if rhs_id_node.la_type.is_function():
-                                if lhs_id_node.contain_subscript():
-                                    assert lhs_id_node.node_type == IRNodeType.SequenceIndex, self.get_err_msg_info(lhs_id_node.parseinfo, "Invalid assignment for function")
-                        except AssertionError as e:
-                            # lhs = symbol
-                            continue
+                self.check_func_assignment(stat_list[index], **kwargs)
         #
         self.multi_lhs_list = multi_lhs_list
         if self.pre_walk:
@@ -373,6 +372,54 @@ class TypeWalker(NodeWalker):
         ir_node.stat = block_node
         return ir_node
 
+    def add_lhs_symbol(self, lhs, multi_lhs_list):
+        if type(lhs).__name__ == 'IdentifierSubscript':
+            lhs_sym = self.walk(lhs.left).ir.get_main_id()
+        else:
+            lhs_sym = self.walk(lhs).ir.get_main_id()
+        if lhs_sym not in self.lhs_list:
+            self.lhs_list.append(lhs_sym)
+        if len(lhs_sym) > 1:
+            multi_lhs_list.append(lhs_sym)
+
+    def check_func_assignment(self, stat, **kwargs):
+        if type(stat).__name__ == 'Assignment':
+            # check whether rhs is function type
+            if type(stat.right).__name__ == 'Expression' and type(stat.right.value).__name__ == 'Factor' and stat.right.value.id0:
+                # specific stat: lhs = id_subs
+                try:
+                    assign_node = self.walk(stat, **kwargs).ir
+                    lhs_id_node = assign_node.left
+                    rhs_id_node = assign_node.right.value.id
+                    if rhs_id_node.la_type.is_function():
+                        if lhs_id_node.contain_subscript():
+                            assert lhs_id_node.node_type == IRNodeType.SequenceIndex, self.get_err_msg_info(lhs_id_node.parseinfo, "Invalid assignment for function")
+                except AssertionError as e:
+                    # lhs = symbol
+                    pass
+
+    def walk_prescan(self, info):
+        """
+        Same as the pre walk of walk_Start, but on the blocks collected by the prescan instead of a full parse
+        """
+        self.pre_walk = True
+        self.symtable.clear()
+        ir_node = StartNode()
+        for directive in info.directives:
+            ir_node.directives.append(self.walk(directive, pre_walk=True))
+        multi_lhs_list = []
+        self.rhs_raw_str_list.clear()
+        ir_node.vblock = self.extract_all_params(info.params)
+        for lhs, rhs_text, stat in info.stats:
+            if lhs is not None:
+                self.add_lhs_symbol(lhs, multi_lhs_list)
+            self.rhs_raw_str_list.append(rhs_text)
+        for lhs, rhs_text, stat in info.stats:
+            if stat is not None:
+                self.check_func_assignment(stat, pre_walk=True)
+        self.multi_lhs_list = multi_lhs_list
+        return ir_node
+
     ###################################################################
     def extract_all_params(self, raw_param_list, **kwargs):
         self.is_param_block = True
@@ -496,15 +543,16 @@ class TypeWalker(NodeWalker):
         if node.index:
             # check index type condition
             assert type_node.la_type.is_integer_element(), self.get_err_msg_info(node.id[0].parseinfo, "Invalid index type: element must be integer")
-            type_node.la_type.index_type = True
-            if not type_node.la_type.is_scalar():
-                type_node.la_type.element_type.index_type = True
+            if type_node.la_type.is_scalar():
+                type_node.la_type = type_node.la_type.replace(index_type=True)
+            else:
+                type_node.la_type = type_node.la_type.replace(index_type=True, element_type=type_node.la_type.element_type.replace(index_type=True))
         type_node.parse_info = node.parseinfo
-        type_node.la_type.desc = desc
         for id_index in range(len(node.id)):
             id0_info = self.walk(node.id[id_index], **kwargs)
             ir_node.id.append(id0_info.ir)
             id0 = id0_info.content
+            self.desc_dict[self.get_main_id(id0)] = desc
             self.handle_identifier(id0, id0_info.ir, type_node)
             # self.logger.debug("param index:{}".format(kwargs[PARAM_INDEX]))
             self.update_parameters(id0, kwargs[PARAM_INDEX]+id_index)
@@ -607,13 +655,23 @@ class TypeWalker(NodeWalker):
         # if ir_node.id1.is_node(IRNodeType.Id) and ir_node.id1.contain_subscript():
         if dyn_rows:
             # assert len(ir_node.id1.subs) == 1, self.get_err_msg_info(ir_node.id1.parse_info, "Invalid dimension for matrix")
-            la_type.add_dynamic_type(DynamicTypeEnum.DYN_ROW)
+            la_type = la_type.with_dynamic_type(DynamicTypeEnum.DYN_ROW)
         # if ir_node.id2.is_node(IRNodeType.Id) and ir_node.id2.contain_subscript():
         if dyn_cols:
-            la_type.add_dynamic_type(DynamicTypeEnum.DYN_COL)
+            la_type = la_type.with_dynamic_type(DynamicTypeEnum.DYN_COL)
             # assert len(ir_node.id2.subs) == 1, self.get_err_msg_info(ir_node.id2.parse_info, "Invalid dimension for matrix")
         if node.attr and 'sparse' in node.attr:
-            la_type.sparse = True
+            la_type = la_type.replace(sparse=True)
+        if node.attr:
+            for attr in node.attr:
+                if isinstance(attr, str):
+                    if attr in MATRIX_STRUCTURE_DICT:
+                        la_type = la_type.with_structure(MATRIX_STRUCTURE_DICT[attr])
+                else:
+                    la_type = la_type.with_structure(MatrixStructureEnum.STRUCT_BANDED, int(attr.width))
+            if la_type.is_structured():
+                assert not la_type.sparse, self.get_err_msg_info(node.parseinfo, "Structured matrix can not be sparse")
+                assert is_same_expr(la_type.rows, la_type.cols), self.get_err_msg_info(node.parseinfo, "Structured matrix must be square")
         ir_node.la_type = la_type
         return ir_node
 
@@ -644,7 +702,7 @@ class TypeWalker(NodeWalker):
         # if ir_node.id1.is_node(IRNodeType.Id) and ir_node.id1.contain_subscript():
         if self.dyn_dim:
             # assert len(ir_node.id1.subs) == 1, self.get_err_msg_info(ir_node.id1.parse_info, "Invalid dimension for vector")
-            la_type.add_dynamic_type(DynamicTypeEnum.DYN_ROW)
+            la_type = la_type.with_dynamic_type(DynamicTypeEnum.DYN_ROW)
         ir_node.la_type = la_type
         return ir_node
 
@@ -789,6 +847,9 @@ class TypeWalker(NodeWalker):
         value_info = self.walk(node.value, **kwargs)
         ir_node = ExpressionNode(parse_info=node.parseinfo, raw_text=node.text)
         value_info.ir.set_parent(ir_node)
+        if node.sign and value_info.la_type.is_matrix() and value_info.la_type.is_structured():
+            # -A is negative definite
+            value_info.la_type = value_info.la_type.replace(structure=value_info.la_type.structure & ~MatrixStructureEnum.STRUCT_POSITIVE_DEFINITE)
         ir_node.la_type = value_info.la_type
         ir_node.value = value_info.ir
         ir_node.sign = node.sign
@@ -847,11 +908,6 @@ class TypeWalker(NodeWalker):
     def make_mul_info(self, left_info, right_info, op=MulOpType.MulOpInvalid, parse_info=None):
         ret_type, need_cast = self.type_inference(TypeInferenceEnum.INF_MUL, left_info, right_info)
         sym_set = left_info.symbols.union(right_info.symbols)
-        # I in block matrix
-        if ret_type is not None:
-            ret_type.symbol = ""
-            for sym in sym_set:
-                ret_type.symbol += sym
         ret_info = NodeInfo(ret_type, symbols=sym_set)
         ir_node = MulNode(left_info.ir, right_info.ir, parse_info=left_info.ir.parse_info if parse_info is None else parse_info, op=op)
         ir_node.la_type = ret_type
@@ -1319,7 +1375,7 @@ class TypeWalker(NodeWalker):
         assert right_info.la_type.is_vector() or right_info.la_type.is_matrix(), self.get_err_msg_info(right_info.ir.parse_info, "Kronecker product error. Parameter {} must be vector or matrix".format(node.right.text))
         ir_node.la_type = MatrixType(rows=mul_dims(left_info.la_type.rows, right_info.la_type.rows), cols=mul_dims(left_info.la_type.cols, right_info.la_type.cols))
         if left_info.la_type.is_sparse_matrix() or right_info.la_type.is_sparse_matrix():
-            ir_node.la_type.sparse = True
+            ir_node.la_type = ir_node.la_type.replace(sparse=True)
         return NodeInfo(ir_node.la_type, ir=ir_node, symbols=left_info.symbols.union(right_info.symbols))
 
     def walk_DotProduct(self, node, **kwargs):
@@ -1344,6 +1400,10 @@ class TypeWalker(NodeWalker):
             assert is_same_expr(base.la_type.rows, base.la_type.cols), self.get_err_msg_info(base.parse_info, "Power error. Rows must be the same as columns")
             self.unofficial_method = True
             power_node.la_type = base.la_type
+            if not power_node.la_type.is_diagonal_structure():
+                # powers widen the band, and the exponent may be anything
+                power_node.la_type = power_node.la_type.replace(structure=power_node.la_type.structure & ~(MatrixStructureEnum.STRUCT_BANDED | MatrixStructureEnum.STRUCT_POSITIVE_DEFINITE),
+                                                                bandwidth=None)
         return power_node
 
     def walk_Power(self, node, **kwargs):
@@ -1408,11 +1468,12 @@ class TypeWalker(NodeWalker):
         ir_node.f = f_info.ir
         assert f_info.la_type.is_matrix() or f_info.la_type.is_vector(), self.get_err_msg_info(f_info.ir.parse_info,"Transpose error. The base must be a matrix or vector")
         if f_info.la_type.is_matrix():
-            node_type = MatrixType(rows=f_info.la_type.cols, cols=f_info.la_type.rows, sparse=f_info.la_type.sparse)
+            node_type = MatrixType(rows=f_info.la_type.cols, cols=f_info.la_type.rows, sparse=f_info.la_type.sparse,
+                                   structure=f_info.la_type.get_transposed_structure(), bandwidth=f_info.la_type.bandwidth)
             if f_info.la_type.is_dynamic_row():
-                node_type.set_dynamic_type(DynamicTypeEnum.DYN_COL)
+                node_type = node_type.replace(dynamic=DynamicTypeEnum.DYN_COL)
             if f_info.la_type.is_dynamic_col():
-                node_type.set_dynamic_type(DynamicTypeEnum.DYN_ROW)
+                node_type = node_type.replace(dynamic=DynamicTypeEnum.DYN_ROW)
         elif f_info.la_type.is_vector():
             node_type = MatrixType(rows=1, cols=f_info.la_type.rows)
         node_info = NodeInfo(node_type, symbols=f_info.symbols)
@@ -1451,8 +1512,7 @@ class TypeWalker(NodeWalker):
                 ir_node.process_subs_dict(self.lhs_sub_dict)
             else:
                 ir_node = IdNode(node.name, parse_info=node.parseinfo)
-                node.name = self.filter_symbol(node.name)
-                ir_node.la_type = self.symtable[node.name]
+                ir_node.la_type = self.symtable[self.filter_symbol(node.name)]
             name_info = NodeInfo(ir_node.la_type, ir=ir_node)
         else:
             name_info = self.walk(node.name, **kwargs)
@@ -1501,18 +1561,15 @@ class TypeWalker(NodeWalker):
                 pass
             elif name_type.ret.is_vector():
                 if name_type.ret.rows in name_type.template_symbols:
-                    ret_type = VectorType()
-                    ret_type.rows = convertion_dict[name_type.ret.rows]
+                    ret_type = VectorType(rows=convertion_dict[name_type.ret.rows])
             elif name_type.ret.is_matrix():
-                ret_type = MatrixType()
-                if name_type.ret.rows in name_type.template_symbols:
-                    ret_type.rows = convertion_dict[name_type.ret.rows]
-                else:
-                    ret_type.rows = name_type.ret.rows
-                if name_type.ret.cols in name_type.template_symbols:
-                    ret_type.cols = convertion_dict[name_type.ret.cols]
-                else:
-                    ret_type.cols = name_type.ret.cols
+                rows = name_type.ret.rows
+                if rows in name_type.template_symbols:
+                    rows = convertion_dict[rows]
+                cols = name_type.ret.cols
+                if cols in name_type.template_symbols:
+                    cols = convertion_dict[cols]
+                ret_type = MatrixType(rows=rows, cols=cols)
             elif name_type.ret.is_set():
                 ret_type = SetType(size=name_type.ret.size, int_list=name_type.ret.int_list)
             node_info = NodeInfo(ret_type, symbols=symbols)
@@ -1532,19 +1589,12 @@ class TypeWalker(NodeWalker):
         # check special nodes
         add_sub_node = ir_node.get_child(IRNodeType.AddSub)
         if add_sub_node is not None:
-            copy_node = copy.deepcopy(node_info.ir)
             assert add_sub_node.get_child(IRNodeType.AddSub) is None, self.get_err_msg_info(add_sub_node.parse_info, "Multiple +- symbols in a single expression")
             new_nodes = add_sub_node.split_node()
-            add_sub_node.parent().value = new_nodes[0]
-            #
-            sec_node = copy.deepcopy(node_info.ir)
-            add_node = sec_node.get_child(IRNodeType.Add)
-            add_node.parent().value = new_nodes[1]
-            #
             condition_node = ConditionNode(cond_type=ConditionType.ConditionOr)
-            condition_node.cond_list.append(node_info.ir)
-            condition_node.cond_list.append(sec_node)
-            condition_node.tex_node = copy_node
+            condition_node.cond_list.append(node_info.ir.replace_node(add_sub_node, new_nodes[0]))
+            condition_node.cond_list.append(node_info.ir.replace_node(add_sub_node, new_nodes[1]))
+            condition_node.tex_node = node_info.ir
             ir_node.cond = condition_node
         node_info.ir = ir_node
         return node_info
@@ -1639,7 +1689,7 @@ class TypeWalker(NodeWalker):
                 cur_dict = sub_sym_list[sub_index]
                 if main_sym in cur_dict:
                     # merge same subscript
-                    old_right_list = copy.deepcopy(cur_dict[main_sym])
+                    old_right_list = list(cur_dict[main_sym])
                     # assert len(old_right_list) == len(right_sym_list), "Internal error, please report a bug"
                     if len(old_right_list) == len(right_sym_list):
                         for old_index in range(len(old_right_list)):
@@ -1647,7 +1697,7 @@ class TypeWalker(NodeWalker):
                                 old_right_list[old_index] = right_sym_list[old_index]
                         cur_dict[main_sym] = old_right_list
                     elif len(old_right_list) < len(right_sym_list):
-                        new_right_list = copy.deepcopy(right_sym_list)
+                        new_right_list = list(right_sym_list)
                         for old_index in range(len(old_right_list)):
                             if sub_sym == old_right_list[old_index]:
                                 new_right_list[old_index] = sub_sym
@@ -1839,7 +1889,7 @@ class TypeWalker(NodeWalker):
 
     def create_id_node_info(self, left_content, right_content, parse_info=None):
         content = left_content + '_' + ''.join(right_content)
-        node_type = LaVarType(VarTypeEnum.INVALID, symbol=content)
+        node_type = LaVarType(VarTypeEnum.INVALID)
         if left_content in self.symtable:
             node_type = self.symtable[left_content].element_type
         #
@@ -1862,7 +1912,6 @@ class TypeWalker(NodeWalker):
         ir_node = IdNode(value, parse_info=node.parseinfo)
         if value in self.symtable:
             node_type = self.symtable[value]
-        node_type.symbol = value
         ir_node.la_type = node_type
         node_info = NodeInfo(node_type, value, {value}, ir_node)
         return node_info
@@ -2146,7 +2195,7 @@ class TypeWalker(NodeWalker):
         list_dim = None
         if block:
             # check block mat
-            valid, undef_list, type_array, real_dims = self.check_bmat_validity(type_array, None)
+            valid, undef_list, type_array, real_dims = self.check_bmat_validity(type_array, None, node_info.content)
             assert valid, self.get_err_msg_info(node.parseinfo,  "Block matrix error. Invalid dimensions")
             rows = real_dims[0]
             cols = real_dims[1]
@@ -2285,7 +2334,10 @@ class TypeWalker(NodeWalker):
 
     def create_math_node_info(self, func_type, param_info, remains=[]):
         param = param_info.ir
-        ret_type = copy.deepcopy(param.la_type)
+        ret_type = param.la_type
+        if ret_type.is_matrix():
+            # elementwise functions don't keep the structure
+            ret_type = ret_type.replace(structure=MatrixStructureEnum.STRUCT_GENERAL, bandwidth=None)
         symbols = param_info.symbols
         remain_list = []
         if MathFuncType.MathFuncInvalid < func_type < MathFuncType.MathFuncAtan2:
@@ -2586,10 +2638,11 @@ class TypeWalker(NodeWalker):
             sum_value = '+'.join(str_list)
         return simpify_dims(sum_value)
 
-    def check_bmat_validity(self, type_array, mat_size):
+    def check_bmat_validity(self, type_array, mat_size, ir_array):
         """
         check the validity of block matrix
         :param type_array: 2d array containing element types
+        :param ir_array: 2d array containing element IR nodes
         :param mat_size: the dimensions of the block matrix may be given in future
         :return: valid, index to be changed, modified type_array, dims
         """
@@ -2619,7 +2672,7 @@ class TypeWalker(NodeWalker):
                         valid = False
                         break
                 else:
-                    if type_array[i][j].symbol is not None and 'I' in type_array[i][j].symbol:
+                    if ir_array[i][j].raw_text is not None and 'I' in ir_array[i][j].raw_text:
                         if 'I' not in self.symtable:  # identity matrix
                             identity_list.append((i, j))
                     undef_list.append((i, j))
@@ -2722,43 +2775,42 @@ class TypeWalker(NodeWalker):
             error_msg += raw_text
             error_msg += self.la_msg.get_pos_marker(left_line.col)
             return error_msg
+        def with_int_element(la_type):
+            # the elements are integers only if the elements of both operands are
+            return la_type.replace(element_type=la_type.element_type.replace(is_int=left_type.is_integer_element() and right_type.is_integer_element()))
         ret_type = None
         if op == TypeInferenceEnum.INF_ADD or op == TypeInferenceEnum.INF_SUB:
-            ret_type = copy.deepcopy(left_type)  # default type
+            ret_type = left_type  # default type
             if left_type.is_scalar():
                 assert right_type.is_scalar(), get_err_msg()
-                ret_type.is_int = left_type.is_integer_element() and right_type.is_integer_element()
+                ret_type = ret_type.replace(is_int=left_type.is_integer_element() and right_type.is_integer_element())
             elif left_type.is_matrix():
                 assert right_type.is_matrix(), get_err_msg()
                 # assert right_type.is_matrix() or right_type.is_vector(), error_msg
                 if left_type.is_dynamic() or right_type.is_dynamic():
                     if left_type.is_dynamic() and right_type.is_dynamic():
                         if left_type.is_dynamic_row() and left_type.is_dynamic_col():
-                            ret_type = copy.deepcopy(right_type)
+                            ret_type = right_type
                         elif left_type.is_dynamic_row():
                             if right_type.is_dynamic_row() and right_type.is_dynamic_col():
-                                ret_type = copy.deepcopy(left_type)
+                                ret_type = left_type
                             elif right_type.is_dynamic_row():
                                 assert is_same_expr(left_type.cols, right_type.cols), get_err_msg()
-                                ret_type = copy.deepcopy(left_type)
+                                ret_type = left_type
                             elif right_type.is_dynamic_col():
-                                ret_type = copy.deepcopy(left_type)
-                                ret_type.rows = right_type.rows
-                                ret_type.set_dynamic_type(DynamicTypeEnum.DYN_INVALID)  # change to static type
+                                ret_type = left_type.replace(rows=right_type.rows, dynamic=DynamicTypeEnum.DYN_INVALID)  # change to static type
                         elif left_type.is_dynamic_col():
                             if right_type.is_dynamic_row() and right_type.is_dynamic_col():
-                                ret_type = copy.deepcopy(left_type)
+                                ret_type = left_type
                             elif right_type.is_dynamic_row():
-                                ret_type = copy.deepcopy(left_type)
-                                ret_type.cols = right_type.cols
-                                ret_type.set_dynamic_type(DynamicTypeEnum.DYN_INVALID)  # change to static type
+                                ret_type = left_type.replace(cols=right_type.cols, dynamic=DynamicTypeEnum.DYN_INVALID)  # change to static type
                             elif right_type.is_dynamic_col():
                                 assert is_same_expr(left_type.rows, right_type.rows), get_err_msg()
-                                ret_type = copy.deepcopy(left_type)
+                                ret_type = left_type
                     else:
                         if left_type.is_dynamic():
                             if left_type.is_dynamic_row() and left_type.is_dynamic_col():
-                                ret_type = copy.deepcopy(right_type)
+                                ret_type = right_type
                             else:
                                 if left_type.is_dynamic_row():
                                     assert is_same_expr(left_type.cols, right_type.cols), get_err_msg()
@@ -2766,7 +2818,7 @@ class TypeWalker(NodeWalker):
                                     assert is_same_expr(left_type.rows, right_type.rows), get_err_msg()
                         else:
                             if right_type.is_dynamic_row() and right_type.is_dynamic_col():
-                                ret_type = copy.deepcopy(left_type)
+                                ret_type = left_type
                             else:
                                 if right_type.is_dynamic_row():
                                     assert is_same_expr(left_type.cols, right_type.cols), get_err_msg()
@@ -2775,87 +2827,105 @@ class TypeWalker(NodeWalker):
                 else:
                     # static
                     assert is_same_expr(left_type.rows, right_type.rows) and is_same_expr(left_type.cols, right_type.cols), get_err_msg()
-                    if left_type.sparse and right_type.sparse:
-                        ret_type.sparse = True
-                    else:
-                        ret_type.sparse = False
-                ret_type.element_type.is_int = left_type.is_integer_element() and right_type.is_integer_element()
+                    ret_type = ret_type.replace(sparse=left_type.sparse and right_type.sparse)
+                ret_type = with_int_element(ret_type)
             elif left_type.is_vector():
                 assert right_type.is_vector(), get_err_msg()
                 assert is_same_expr(left_type.rows, right_type.rows), get_err_msg()
                 # assert right_type.is_matrix() or right_type.is_vector(), error_msg
                 # assert left_type.rows == right_type.rows and left_type.cols == right_type.cols, error_msg
                 if right_type.is_matrix():
-                    ret_type = copy.deepcopy(right_type)
-                ret_type.element_type.is_int = left_type.is_integer_element() and right_type.is_integer_element()
+                    ret_type = right_type
+                ret_type = with_int_element(ret_type)
             else:
                 # sequence et al.
                 assert left_type.var_type == right_type.var_type, get_err_msg()
             # index type checking
             if left_type.index_type or right_type.index_type:
                 assert left_type.is_integer_element() and right_type.is_integer_element(), get_err_msg("Operand must be integer.")
-                ret_type.index_type = True
                 if op == TypeInferenceEnum.INF_ADD:
                     assert not (left_type.index_type and right_type.index_type), get_err_msg("They are both index types.")
-                else:
-                    if left_type.index_type and right_type.index_type:
-                        ret_type.index_type = False
+                ret_type = ret_type.replace(index_type=not (left_type.index_type and right_type.index_type))
         elif op == TypeInferenceEnum.INF_MUL:
             assert left_type.var_type != VarTypeEnum.SEQUENCE and right_type.var_type != VarTypeEnum.SEQUENCE, 'error: sequence can not be operated'
             assert not left_type.index_type and not right_type.index_type, get_err_msg()
             if left_type.is_scalar():
-                ret_type = copy.deepcopy(right_type)
-                ret_type.is_int = left_type.is_integer_element() and right_type.is_integer_element()
+                ret_type = right_type
+                ret_type = ret_type.replace(is_int=left_type.is_integer_element() and right_type.is_integer_element())
             elif left_type.is_matrix():
                 if right_type.is_scalar():
-                    ret_type = copy.deepcopy(left_type)
+                    ret_type = left_type
                 elif right_type.is_matrix():
                     assert is_same_expr(left_type.cols, right_type.rows), get_err_msg()
-                    ret_type = MatrixType(rows=left_type.rows, cols=right_type.cols)
-                    if left_type.sparse and right_type.sparse:
-                        ret_type.sparse = True
+                    ret_type = MatrixType(rows=left_type.rows, cols=right_type.cols, sparse=left_type.sparse and right_type.sparse)
                     # if left_type.rows == 1 and right_type.cols == 1:
                     #     ret_type = ScalarType()
-                    ret_type.element_type.is_int = left_type.is_integer_element() and right_type.is_integer_element()
+                    ret_type = with_int_element(ret_type)
                 elif right_type.is_vector():
                     assert is_same_expr(left_type.cols, right_type.rows), get_err_msg()
                     if left_type.rows == 1:
                         # scalar
                         ret_type = ScalarType()
                         need_cast = True
-                        ret_type.is_int = left_type.is_integer_element() and right_type.is_integer_element()
+                        ret_type = ret_type.replace(is_int=left_type.is_integer_element() and right_type.is_integer_element())
                     else:
                         ret_type = VectorType(rows=left_type.rows)
-                        ret_type.element_type.is_int = left_type.is_integer_element() and right_type.is_integer_element()
+                        ret_type = with_int_element(ret_type)
             elif left_type.is_vector():
                 if right_type.is_scalar():
-                    ret_type = copy.deepcopy(left_type)
-                    ret_type.element_type.is_int = left_type.is_integer_element() and right_type.is_integer_element()
+                    ret_type = left_type
+                    ret_type = with_int_element(ret_type)
                 elif right_type.is_matrix():
                     assert 1 == right_type.rows, get_err_msg()
                     ret_type = MatrixType(rows=left_type.rows, cols=right_type.cols)
                     new_node = ToMatrixNode(parse_info=left_info.ir.parse_info, item=left_info.ir)
                     new_node.la_type = MatrixType(rows=left_type.rows, cols=1)
                     left_info.ir = new_node
-                    ret_type.element_type.is_int = left_type.is_integer_element() and right_type.is_integer_element()
+                    ret_type = with_int_element(ret_type)
                 elif right_type.is_vector():
                     assert is_same_expr(left_type.cols, right_type.rows), get_err_msg()
-                    ret_type.element_type.is_int = left_type.is_integer_element() and right_type.is_integer_element()
+                    ret_type = with_int_element(ret_type)
         elif op == TypeInferenceEnum.INF_DIV:
             # assert left_type.is_scalar() and right_type.is_scalar(), error_msg
             assert left_type.is_scalar() or left_type.is_vector() or left_type.is_matrix(), get_err_msg()
             assert right_type.is_scalar(), get_err_msg()
             assert not left_type.index_type and not right_type.index_type, get_err_msg()
-            ret_type = copy.deepcopy(left_type)
+            ret_type = left_type
             if left_type.is_scalar():
-                ret_type.is_int = left_type.is_integer_element() and right_type.is_integer_element()
+                ret_type = ret_type.replace(is_int=left_type.is_integer_element() and right_type.is_integer_element())
             else:
-                ret_type.element_type.is_int = left_type.is_integer_element() and right_type.is_integer_element()
+                ret_type = with_int_element(ret_type)
         elif op == TypeInferenceEnum.INF_MATRIX_ROW:
             # assert left_type.var_type == right_type.var_type
-            ret_type = copy.deepcopy(left_type)
+            ret_type = left_type
+        if ret_type is not None and ret_type.is_matrix():
+            structure, bandwidth = self.get_derived_structure(op, left_type, right_type)
+            ret_type = ret_type.replace(structure=structure, bandwidth=bandwidth)
         return ret_type, need_cast
 
+    def get_derived_structure(self, op, left_type, right_type):
+        """
+        Structure of the matrix computed by op, only kept where every such matrix has it
+        :return: (structure, bandwidth)
+        """
+        structure = MatrixStructureEnum.STRUCT_GENERAL
+        if op == TypeInferenceEnum.INF_ADD or op == TypeInferenceEnum.INF_SUB:
+            if left_type.is_matrix() and right_type.is_matrix():
+                structure = left_type.structure & right_type.structure
+                if op == TypeInferenceEnum.INF_SUB:
+                    # A - B is indefinite in general
+                    structure &= ~MatrixStructureEnum.STRUCT_POSITIVE_DEFINITE
+        elif op == TypeInferenceEnum.INF_MUL or op == TypeInferenceEnum.INF_DIV:
+            # scaling, a negative scalar flips the definiteness
+            if left_type.is_matrix() and right_type.is_scalar():
+                structure = left_type.structure & ~MatrixStructureEnum.STRUCT_POSITIVE_DEFINITE
+            elif left_type.is_scalar() and right_type.is_matrix():
+                structure = right_type.structure & ~MatrixStructureEnum.STRUCT_POSITIVE_DEFINITE
+        if not structure & MatrixStructureEnum.STRUCT_BANDED:
+            return structure, None
+        bandwidths = [la_type.bandwidth for la_type in (left_type, right_type) if la_type.is_matrix() and la_type.bandwidth is not None]
+        return structure, max(bandwidths)
+
     def contain_subscript(self, identifier):
         if identifier in self.ids_dict:
             return self.ids_dict[identifier].contain_subscript()
@@ -2904,7 +2974,7 @@ class TypeWalker(NodeWalker):
                 if id_type.is_dynamic_row():
                     if id_node.id1.is_node(IRNodeType.SeqDimIndex):
                         assert id_node.id1.main_index.get_name() == val, self.get_err_msg_info(id_node.id1.parse_info, "Dimension {} has different subscript".format(id_node.id1.main.get_name()))
-                        row_seq_type = SequenceType(size=new_var_name, element_type=ScalarType(is_int=True), symbol=id_node.id1.get_main_id())
+                        row_seq_type = SequenceType(size=new_var_name, element_type=ScalarType(is_int=True))
                         if id_node.id1.get_main_id() in self.symtable:
                             assert self.symtable[id_node.id1.get_main_id()].is_same_type(row_seq_type), self.get_err_msg_info(id_node.id1.parse_info,
                                                                                      "{} has already been defined as different type".format(
@@ -2916,8 +2986,7 @@ class TypeWalker(NodeWalker):
                 if id_type.is_dynamic_row():
                     if id_node.id1.is_node(IRNodeType.SeqDimIndex):
                         assert id_node.id1.main_index.get_name() == val, self.get_err_msg_info(id_node.id1.parse_info, "Dimension {} has different subscript".format(id_node.id1.main.get_name()))
-                        row_seq_type = SequenceType(size=new_var_name, element_type=ScalarType(is_int=True),
-                                                    symbol=id_node.id1.get_main_id())
+                        row_seq_type = SequenceType(size=new_var_name, element_type=ScalarType(is_int=True))
                         if id_node.id1.get_main_id() in self.symtable:
                             assert self.symtable[id_node.id1.get_main_id()].is_same_type(
                                 row_seq_type), self.get_err_msg_info(id_node.id1.parse_info,
@@ -2929,8 +2998,7 @@ class TypeWalker(NodeWalker):
                 if id_type.is_dynamic_col():
                     if id_node.id2.is_node(IRNodeType.SeqDimIndex):
                         assert id_node.id1.main_index.get_name() == val, self.get_err_msg_info(id_node.id2.parse_info, "Dimension {} has different subscript".format(id_node.id2.main.get_name()))
-                        col_seq_type = SequenceType(size=new_var_name, element_type=ScalarType(is_int=True),
-                                                    symbol=id_node.id1.get_main_id())
+                        col_seq_type = SequenceType(size=new_var_name, element_type=ScalarType(is_int=True))
                         if id_node.id2.get_main_id() in self.symtable:
                             assert self.symtable[id_node.id2.get_main_id()].is_same_type(
                                 col_seq_type), self.get_err_msg_info(id_node.id2.parse_info,
@@ -2939,8 +3007,7 @@ class TypeWalker(NodeWalker):
                         else:
                             self.symtable[id_node.id2.get_main_id()] = col_seq_type
                             self.dim_seq_set.add(id_node.id2.get_main_id())
-            self.symtable[arr[0]] = SequenceType(size=new_var_name, element_type=id_type, desc=id_type.desc, symbol=arr[0])
+            self.symtable[arr[0]] = SequenceType(size=new_var_name, element_type=id_type)
         else:
-            id_type.symbol = identifier
             assert identifier not in self.symtable, self.get_err_msg_info(id_node.parse_info, "Parameter {} has been defined.".format(identifier))
             self.symtable[identifier] = id_type
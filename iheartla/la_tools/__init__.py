@@ -1,5 +1,7 @@
-__all__ = ["la_helper",
+__all__ = ["la_cache",
+           "la_helper",
            "la_logger",
            "la_msg",
+           "la_profiler",
            "la_visualizer",
            "parser_manager"]
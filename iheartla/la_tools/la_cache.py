@@ -0,0 +1,167 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from appdirs import user_cache_dir
+from tatsu._version import __version__ as tatsu_version
+from .la_logger import *
+from .la_helper import save_to_file_atomic
+
+
+class CompileCache(object):
+    """
+    On-disk content-addressed cache for compiled outputs.
+    Entries are keyed on the source text, the requested backends, the function name, the options of the code
+    generators and a fingerprint of the compiler itself, so editing the grammar or any code generator invalidates
+    old entries.
+    """
+    __instance = None
+    @staticmethod
+    def getInstance():
+        if CompileCache.__instance is None:
+            CompileCache()
+        return CompileCache.__instance
+
+    def __init__(self):
+        if CompileCache.__instance is not None:
+            raise Exception("Class CompileCache is a singleton!")
+        else:
+            self.enabled = False
+            self.cache_dir = os.path.join(user_cache_dir(), "iheartla", "compiled")
+            self.max_size = 64 * 1024 * 1024  # bytes
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.fingerprint = None
+            self.index = None  # key -> size, ordered from least to most recently used
+            self.total_size = 0
+            self.lock = threading.RLock()
+            self.logger = LaLogger.getInstance().get_logger(LoggerTypeEnum.DEFAULT)
+            CompileCache.__instance = self
+
+    def set_enabled(self, enabled=True, cache_dir=None, max_size=None):
+        with self.lock:
+            self.enabled = enabled
+            if cache_dir is not None and cache_dir != self.cache_dir:
+                self.cache_dir = cache_dir
+                self.index = None
+            if max_size is not None:
+                self.max_size = max_size
+
+    def get_fingerprint(self):
+        # hash of the grammar, parsers and code generators that produced the cached content
+        if self.fingerprint is None:
+            hash_obj = hashlib.sha256("tatsu:{}".format(tatsu_version).encode())
+            package_dir = Path(__file__).resolve().parent.parent
+            for sub_dir in ['la_grammar', 'la_local_parsers', 'la_parser', 'la_tools']:
+                for f in sorted((package_dir / sub_dir).glob('*.py')):
+                    hash_obj.update(f.name.encode())
+                    hash_obj.update(f.read_bytes())
+            self.fingerprint = hash_obj.hexdigest()
+        return self.fingerprint
+
+    def get_options_digest(self, options):
+        # rewrite rules are identified by their class
+        return json.dumps({str(int(k)): v for k, v in options.items()}, sort_keys=True,
+                          default=lambda o: type(o).__name__) if options else ''
+
+    def get_key(self, content, parser_type, func_name=None, options=None):
+        """
+        :param options: dict of ParserTypeEnum -> options of the code generator, see get_codegen_options
+        """
+        hash_obj = hashlib.sha256(self.get_fingerprint().encode())
+        for item in [str(int(parser_type)), func_name or '', self.get_options_digest(options), content]:
+            hash_obj.update(b'\0')
+            hash_obj.update(item.encode())
+        return hash_obj.hexdigest()
+
+    def get_entry_file(self, key):
+        return os.path.join(self.cache_dir, "{}.json".format(key))
+
+    def load_index(self):
+        if self.index is not None:
+            return
+        Path(self.cache_dir).mkdir(parents=True, exist_ok=True)
+        entries = []
+        for f in os.scandir(self.cache_dir):
+            if f.name.endswith('.json'):
+                stat = f.stat()
+                entries.append((stat.st_mtime, f.name[:-len('.json')], stat.st_size))
+        entries.sort()
+        self.index = OrderedDict()
+        self.total_size = 0
+        for mtime, key, size in entries:
+            self.index[key] = size
+            self.total_size += size
+
+    def get(self, content, parser_type, func_name=None, options=None):
+        """
+        :return: dict of ParserTypeEnum -> generated content, or None on a miss
+        """
+        with self.lock:
+            self.load_index()
+            key = self.get_key(content, parser_type, func_name, options)
+            entry_file = self.get_entry_file(key)
+            try:
+                with open(entry_file, 'r') as f:
+                    data = json.load(f)
+                os.utime(entry_file)
+            except (IOError, ValueError):
+                self.misses += 1
+                self.logger.debug("compile cache miss:{}".format(key))
+                return None
+            if key in self.index:
+                self.index.move_to_end(key)
+            self.hits += 1
+            self.logger.debug("compile cache hit:{}".format(key))
+            return {int(k): v for k, v in data.items()}
+
+    def put(self, content, parser_type, results, func_name=None, options=None):
+        """
+        :param results: dict of ParserTypeEnum -> generated content
+        """
+        with self.lock:
+            self.load_index()
+            key = self.get_key(content, parser_type, func_name, options)
+            data = json.dumps({str(int(k)): v for k, v in results.items()})
+            # write to a temporary file first so concurrent readers never see a partial entry
+            try:
+                save_to_file_atomic(data, self.get_entry_file(key))
+            except IOError as e:
+                print("IO Error!:{}".format(e))
+                return
+            size = os.path.getsize(self.get_entry_file(key))
+            if key in self.index:
+                self.total_size -= self.index[key]
+            self.index[key] = size
+            self.index.move_to_end(key)
+            self.total_size += size
+            self.evict()
+
+    def evict(self):
+        # drop least recently used entries until the cache fits
+        while self.total_size > self.max_size and len(self.index) > 1:
+            key, size = self.index.popitem(last=False)
+            self.total_size -= size
+            self.evictions += 1
+            try:
+                os.remove(self.get_entry_file(key))
+            except OSError:
+                pass
+
+    def clear(self):
+        with self.lock:
+            self.load_index()
+            for key in list(self.index.keys()):
+                try:
+                    os.remove(self.get_entry_file(key))
+                except OSError:
+                    pass
+            self.index.clear()
+            self.total_size = 0
+
+    def get_stats(self):
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "entries": len(self.index) if self.index is not None else 0, "size": self.total_size}
@@ -0,0 +1,305 @@
+from fractions import Fraction
+from functools import lru_cache
+import sys
+import weakref
+import regex as re
+
+# integers, identifiers (also backticked with subscripts) and operators, sympify accepts ^ as power
+_token_pattern = re.compile(r"\s*(?:(\d+)|([^\W\d]\w*|`[^`]*`(?:_\w+)?)|(\*\*|[-+*/^()]))")
+
+
+class DimParseError(Exception):
+    pass
+
+
+class DimExpr(object):
+    """
+    Dimension expression in canonical form: a sum of monomials with rational coefficients.
+    Monomials are sorted tuples of (symbol, exponent), symbols are interned strings.
+    Instances are hash-consed, so equal expressions are the same object.
+    """
+    __slots__ = ('terms', 'hash_value', '__weakref__')
+    _instances = weakref.WeakValueDictionary()
+
+    def __new__(cls, terms):
+        # terms: tuple of (monomial, coefficient) sorted by monomial, without zero coefficients
+        instance = cls._instances.get(terms)
+        if instance is None:
+            instance = object.__new__(cls)
+            instance.terms = terms
+            # constants hash like the plain numbers, same as sympy numbers do
+            instance.hash_value = hash(terms[0][1] if len(terms) == 1 and terms[0][0] == () else
+                                       (0 if len(terms) == 0 else terms))
+            cls._instances[terms] = instance
+        return instance
+
+    def __reduce__(self):
+        return DimExpr, (self.terms,)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    @staticmethod
+    def from_dict(term_dict):
+        return DimExpr(tuple(sorted((monomial, coeff) for monomial, coeff in term_dict.items() if coeff != 0)))
+
+    @staticmethod
+    def constant(value):
+        return DimExpr.from_dict({(): Fraction(value)})
+
+    @staticmethod
+    def symbol(name):
+        monomial = ((sys.intern(name), 1),)
+        return DimExpr(((monomial, Fraction(1)),))
+
+    def is_constant(self):
+        return len(self.terms) == 0 or (len(self.terms) == 1 and self.terms[0][0] == ())
+
+    def constant_value(self):
+        if len(self.terms) == 0:
+            return Fraction(0)
+        return self.terms[0][1]
+
+    def __hash__(self):
+        return self.hash_value
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if isinstance(other, DimExpr):
+            return self.terms == other.terms
+        if isinstance(other, (int, Fraction)):
+            return self.is_constant() and self.constant_value() == other
+        return NotImplemented
+
+    def __add__(self, other):
+        other = to_dim_expr(other)
+        if other is None:
+            return NotImplemented
+        term_dict = dict(self.terms)
+        for monomial, coeff in other.terms:
+            term_dict[monomial] = term_dict.get(monomial, 0) + coeff
+        return DimExpr.from_dict(term_dict)
+
+    __radd__ = __add__
+
+    def __neg__(self):
+        return DimExpr(tuple((monomial, -coeff) for monomial, coeff in self.terms))
+
+    def __sub__(self, other):
+        other = to_dim_expr(other)
+        if other is None:
+            return NotImplemented
+        return self + (-other)
+
+    def __rsub__(self, other):
+        return (-self) + other
+
+    def __mul__(self, other):
+        other = to_dim_expr(other)
+        if other is None:
+            return NotImplemented
+        term_dict = {}
+        for l_monomial, l_coeff in self.terms:
+            for r_monomial, r_coeff in other.terms:
+                monomial = mul_monomial(l_monomial, r_monomial)
+                term_dict[monomial] = term_dict.get(monomial, 0) + l_coeff * r_coeff
+        return DimExpr.from_dict(term_dict)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        other = to_dim_expr(other)
+        if other is None:
+            return NotImplemented
+        # only monomial divisors keep the canonical form
+        if len(other.terms) != 1:
+            raise DimParseError("division by {}".format(other))
+        monomial, coeff = other.terms[0]
+        inverse = DimExpr(((tuple((name, -exp) for name, exp in monomial), 1 / coeff),))
+        return self * inverse
+
+    def __pow__(self, exp):
+        if not isinstance(exp, int):
+            raise DimParseError("power {}".format(exp))
+        if exp < 0:
+            return DimExpr.constant(1) / (self ** -exp)
+        res = DimExpr.constant(1)
+        for i in range(exp):
+            res = res * self
+        return res
+
+    def __repr__(self):
+        return "DimExpr({})".format(str(self))
+
+    def __str__(self):
+        return format_dim_expr(self)
+
+
+def mul_monomial(lhs, rhs):
+    exp_dict = dict(lhs)
+    for name, exp in rhs:
+        exp_dict[name] = exp_dict.get(name, 0) + exp
+    return tuple(sorted((name, exp) for name, exp in exp_dict.items() if exp != 0))
+
+
+def format_term(monomial, coeff):
+    # same layout as sympy's str printer: 3*m*n/(2*k)
+    sign = ''
+    if coeff < 0:
+        sign = '-'
+        coeff = -coeff
+    numer = []
+    denom = []
+    if coeff.numerator != 1 or len(monomial) == 0:
+        numer.append(str(coeff.numerator))
+    if coeff.denominator != 1:
+        denom.append(str(coeff.denominator))
+    for name, exp in monomial:
+        factor_list = numer if exp > 0 else denom
+        factor_list.append(name if abs(exp) == 1 else "{}**{}".format(name, abs(exp)))
+    res = '*'.join(numer) if len(numer) > 0 else '1'
+    if len(denom) == 1:
+        res += '/' + denom[0]
+    elif len(denom) > 1:
+        res += "/({})".format('*'.join(denom))
+    return sign + res
+
+
+def format_dim_expr(expr):
+    """
+    Print the expression the way sympy does, generated code contains these strings
+    :return: string
+    """
+    terms = list(expr.terms)
+    if len(terms) == 0:
+        return '0'
+    if len(terms) == 2 and terms[0][0] == () and terms[0][1] > 0 and terms[1][1] < 0 and len(terms[1][0]) == 1:
+        # sympy keeps "2 - n" instead of "-n + 2"
+        ordered = terms
+    else:
+        gens = sorted(set(name for monomial, coeff in terms for name, exp in monomial))
+        def lex_key(term):
+            exp_dict = dict(term[0])
+            return tuple(exp_dict.get(name, 0) for name in gens)
+        ordered = sorted(terms, key=lex_key, reverse=True)
+    res = ''
+    for monomial, coeff in ordered:
+        term = format_term(monomial, coeff)
+        if res == '':
+            res = term
+        elif term.startswith('-'):
+            res += " - " + term[1:]
+        else:
+            res += " + " + term
+    return res
+
+
+class DimParser(object):
+    """
+    Recursive descent parser for dimension strings: n, `n_1`+1, p*(2*k-k)/k, ...
+    """
+    def __init__(self, text):
+        self.tokens = []
+        pos = 0
+        text = text.rstrip()
+        while pos < len(text):
+            match = _token_pattern.match(text, pos)
+            if match is None or match.end() == pos:
+                raise DimParseError("unexpected {}".format(text[pos:]))
+            self.tokens.append((match.group(1), match.group(2), match.group(3)))
+            pos = match.end()
+        self.index = 0
+
+    def peek_op(self):
+        if self.index < len(self.tokens):
+            return self.tokens[self.index][2]
+        return None
+
+    def parse(self):
+        res = self.parse_sum()
+        if self.index != len(self.tokens):
+            raise DimParseError("unexpected token")
+        return res
+
+    def parse_sum(self):
+        res = self.parse_product()
+        while self.peek_op() in ('+', '-'):
+            op = self.tokens[self.index][2]
+            self.index += 1
+            rhs = self.parse_product()
+            res = res + rhs if op == '+' else res - rhs
+        return res
+
+    def parse_product(self):
+        res = self.parse_unary()
+        while self.peek_op() in ('*', '/'):
+            op = self.tokens[self.index][2]
+            self.index += 1
+            rhs = self.parse_unary()
+            res = res * rhs if op == '*' else res / rhs
+        return res
+
+    def parse_unary(self):
+        if self.peek_op() in ('+', '-'):
+            op = self.tokens[self.index][2]
+            self.index += 1
+            res = self.parse_unary()
+            return -res if op == '-' else res
+        return self.parse_power()
+
+    def parse_power(self):
+        base = self.parse_atom()
+        if self.peek_op() in ('**', '^'):
+            self.index += 1
+            exp = self.parse_unary()
+            if not exp.is_constant() or exp.constant_value().denominator != 1:
+                raise DimParseError("power {}".format(exp))
+            return base ** int(exp.constant_value())
+        return base
+
+    def parse_atom(self):
+        if self.index >= len(self.tokens):
+            raise DimParseError("unexpected end")
+        number, name, op = self.tokens[self.index]
+        self.index += 1
+        if number is not None:
+            return DimExpr.constant(int(number))
+        if name is not None:
+            return DimExpr.symbol(name)
+        if op == '(':
+            res = self.parse_sum()
+            if self.peek_op() != ')':
+                raise DimParseError("missing )")
+            self.index += 1
+            return res
+        raise DimParseError("unexpected {}".format(op))
+
+
+@lru_cache(maxsize=4096)
+def parse_dim(value):
+    if isinstance(value, int):
+        return DimExpr.constant(value)
+    try:
+        return DimParser(value).parse()
+    except (DimParseError, ZeroDivisionError):
+        return None
+
+
+def to_dim_expr(value):
+    """
+    Convert a dimension (int, string, DimExpr) to DimExpr
+    :return: DimExpr, None if the value is not supported
+    """
+    if isinstance(value, DimExpr):
+        return value
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, str)):
+        return parse_dim(value)
+    if isinstance(value, Fraction):
+        return DimExpr.constant(value)
+    return None
@@ -1,9 +1,12 @@
 from enum import Enum, IntFlag
 from tatsu._version import __version__
+import os
 import sys
 import keyword
-from sympy import *
+import tempfile
 import regex as re
+from functools import lru_cache
+from .la_dims import to_dim_expr
 
 
 DEBUG_MODE = False
@@ -40,18 +43,43 @@ def is_keyword(name, parser_type=ParserTypeEnum.DEFAULT):
 
 
 def is_same_expr(lhs, rhs):
-    return sympify('{} == {}'.format(lhs, rhs))
+    # trivial cases don't need the dimension algebra
+    if lhs == rhs:
+        return True
+    if isinstance(lhs, int) and isinstance(rhs, int):
+        return False
+    return is_same_dims(lhs, rhs)
+
+
+@lru_cache(maxsize=4096)
+def is_same_dims(lhs, rhs):
+    lhs_expr = to_dim_expr(lhs)
+    rhs_expr = to_dim_expr(rhs)
+    if lhs_expr is not None and rhs_expr is not None:
+        return lhs_expr is rhs_expr
+    # sympy handles what the dimension algebra can't parse
+    from sympy import sympify
+    return bool(sympify('{} == {}'.format(lhs, rhs)))
 
 
 def mul_dims(lhs, rhs):
+    lhs_expr = to_dim_expr(lhs)
+    rhs_expr = to_dim_expr(rhs)
+    if lhs_expr is not None and rhs_expr is not None:
+        return lhs_expr * rhs_expr
     if not isinstance(lhs, str) and not isinstance(rhs, str):
         res = lhs * rhs
     else:
         res = "{}*{}".format(lhs, rhs)
+    from sympy import sympify
     return sympify(res)
 
 
 def simpify_dims(dims):
+    dims_expr = to_dim_expr(dims)
+    if dims_expr is not None:
+        return dims_expr
+    from sympy import sympify
     return sympify(dims)
 
 
@@ -74,6 +102,42 @@ def save_to_file(content, file_name):
         print("IO Error!:{}".format(e))
 
 
+def get_umask():
+    # the umask can only be read by setting it
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+_umask = get_umask()
+
+
+def get_file_mode(file_name):
+    """
+    :return: permissions of file_name, or those open() gives a new file
+    """
+    try:
+        return os.stat(file_name).st_mode & 0o7777
+    except OSError:
+        return 0o666 & ~_umask
+
+
+def save_to_file_atomic(content, file_name):
+    # write next to the target first so readers never see a partial file
+    dir_name = os.path.dirname(os.path.abspath(file_name))
+    fd, tmp_name = tempfile.mkstemp(dir=dir_name, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+        # mkstemp creates the file readable by the owner only
+        os.chmod(tmp_name, get_file_mode(file_name))
+        os.replace(tmp_name, file_name)
+    except IOError:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+        raise
+
+
 def read_from_file(file_name):
     try:
         file = open(file_name, 'r')
@@ -114,3 +178,30 @@ def split_sub_string(identifier):
                     results[i] = convert_dict[results[i]]
         return results
     return identifier.split('_')
+
+
+def replace_names(content, rename_dict):
+    """
+    Replace the names in content in a single pass, the longest name wins where several start at one position
+    :param rename_dict: name -> new name
+    :return: new content
+    """
+    if len(rename_dict) == 0:
+        return content
+    lengths = sorted({len(name) for name in rename_dict}, reverse=True)
+    starts = re.compile('[{}]'.format(''.join(re.escape(c) for c in {name[0] for name in rename_dict})))
+    pieces = []
+    last = 0
+    match = starts.search(content)
+    while match is not None:
+        pos = match.start()
+        for length in lengths:
+            new_name = rename_dict.get(content[pos:pos + length])
+            if new_name is not None:
+                pieces.append(content[last:pos])
+                pieces.append(new_name)
+                last = pos + length
+                break
+        match = starts.search(content, max(last, pos + 1))
+    pieces.append(content[last:])
+    return ''.join(pieces)
@@ -0,0 +1,162 @@
+import json
+import time
+import threading
+import tracemalloc
+
+_active = None  # profiler collecting in this process, None when profiling is off
+
+
+class PhaseStats(object):
+    __slots__ = ('calls', 'seconds', 'self_seconds', 'allocated')
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.self_seconds = 0.0  # visitor methods: without the nested methods
+        self.allocated = 0       # phases: bytes still allocated at the end of the phase
+
+
+class _NullPhase(object):
+    # returned when profiling is off
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_null_phase = _NullPhase()
+
+
+class _Phase(object):
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.memory = tracemalloc.get_traced_memory()[0] if self.profiler.memory else 0
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        seconds = time.perf_counter() - self.start
+        stats = self.profiler.get_stats(self.profiler.phases, self.name)
+        stats.calls += 1
+        stats.seconds += seconds
+        if self.profiler.memory:
+            stats.allocated += tracemalloc.get_traced_memory()[0] - self.memory
+        return False
+
+
+class LaProfiler(object):
+    """
+    Wall time, calls and allocated memory of the compile phases, and time of the visitor methods,
+    collected from every compile while the profiler is active:
+
+        with LaProfiler() as profiler:
+            compile_la_content(content)
+        print(profiler.format_table())
+
+    Tracing the allocations slows the compile down, use memory=False for the time only.
+    """
+    def __init__(self, memory=True):
+        self.memory = memory
+        self.phases = {}    # name -> PhaseStats
+        self.visitors = {}  # walker or visitor method -> PhaseStats
+        self.lock = threading.Lock()
+        self.local = threading.local()  # stack of the visitor methods running in the thread
+        self.started_tracing = False
+        self.previous = None
+
+    def __enter__(self):
+        global _active
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+        self.previous = _active
+        _active = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        global _active
+        _active = self.previous
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+        return False
+
+    def get_stats(self, table, name):
+        stats = table.get(name)
+        if stats is None:
+            with self.lock:
+                stats = table.setdefault(name, PhaseStats())
+        return stats
+
+    def phase(self, name):
+        return _Phase(self, name)
+
+    def call(self, name, func, *args, **kwargs):
+        """
+        Run a visitor method, its time is added to name
+        """
+        stack = getattr(self.local, 'stack', None)
+        if stack is None:
+            stack = self.local.stack = []
+        stack.append(0.0)  # time in the nested methods
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            nested = stack.pop()
+            if stack:
+                stack[-1] += seconds
+            stats = self.get_stats(self.visitors, name)
+            stats.calls += 1
+            stats.seconds += seconds
+            stats.self_seconds += seconds - nested
+
+    def to_dict(self, visitors=20):
+        """
+        :param visitors: number of visitor methods, the ones with the most time of their own
+        :return: dict with the phases and the visitor methods
+        """
+        hottest = sorted(self.visitors.items(), key=lambda item: item[1].self_seconds, reverse=True)[:visitors]
+        return {'phases': [{'name': name, 'calls': stats.calls, 'seconds': stats.seconds, 'allocated': stats.allocated}
+                           for name, stats in self.phases.items()],
+                'visitors': [{'name': name, 'calls': stats.calls, 'seconds': stats.seconds,
+                              'self_seconds': stats.self_seconds} for name, stats in hottest]}
+
+    def format_json(self, visitors=20):
+        return json.dumps(self.to_dict(visitors), indent=2)
+
+    def format_table(self, visitors=20):
+        data = self.to_dict(visitors)
+        lines = ["{:<40} {:>8} {:>10} {:>12}".format('phase', 'calls', 'seconds', 'allocated')]
+        for stats in data['phases']:
+            allocated = "{:.1f} KiB".format(stats['allocated'] / 1024) if self.memory else '-'
+            lines.append("{:<40} {:>8} {:>10.4f} {:>12}".format(stats['name'], stats['calls'], stats['seconds'],
+                                                                allocated))
+        if len(data['visitors']) > 0:
+            lines.append('')
+            lines.append("{:<40} {:>8} {:>10} {:>12}".format('visitor method', 'calls', 'seconds', 'self'))
+            for stats in data['visitors']:
+                lines.append("{:<40} {:>8} {:>10.4f} {:>12.4f}".format(stats['name'], stats['calls'],
+                                                                       stats['seconds'], stats['self_seconds']))
+        return '\n'.join(lines)
+
+
+def get_profiler():
+    """
+    :return: active LaProfiler, None when profiling is off
+    """
+    return _active
+
+
+def profile_phase(name):
+    """
+    Context manager adding the time of the block to the phase name of the active profiler
+    """
+    if _active is None:
+        return _null_phase
+    return _active.phase(name)
@@ -1,8 +1,5 @@
 from .la_helper import *
 from .la_logger import *
-if not DEBUG_PARSER:
-    from ..la_local_parsers.init_parser import grammarinitParser, grammarinitModelBuilderSemantics
-    from ..la_local_parsers.default_parser import grammardefaultParser, grammardefaultModelBuilderSemantics
 import pickle
 import tatsu
 import time
@@ -10,12 +7,57 @@ from appdirs import *
 from os import listdir
 from pathlib import Path
 import hashlib
+import functools
 import importlib
 import importlib.util
 import threading
 import shutil
 import regex as re
 from datetime import datetime
+from tatsu.exceptions import FailedLeftRecursion
+
+
+class LinearMemoMixin(object):
+    """
+    tatsu drops the left recursion errors from the memo table by scanning the whole table every time a left
+    recursive rule grows. The table grows with the input, so parsing gets quadratic. The keys of those errors
+    are remembered instead.
+    """
+    def _clear_memoization_caches(self):
+        super()._clear_memoization_caches()
+        self._recursion_error_keys = []
+
+    def _memoize(self, key, memo):
+        if isinstance(memo, FailedLeftRecursion):
+            self._recursion_error_keys.append(key)
+        return super()._memoize(key, memo)
+
+    def _clear_recursion_errors(self):
+        memos = self._memos
+        for key in self._recursion_error_keys:
+            if isinstance(memos.get(key), FailedLeftRecursion):
+                del memos[key]
+        self._recursion_error_keys = []
+
+
+_linear_classes = {}  # generated parser class -> subclass with LinearMemoMixin
+
+
+def linear_memo_parser(parser_class, semantics):
+    if parser_class not in _linear_classes:
+        _linear_classes[parser_class] = type(parser_class.__name__, (LinearMemoMixin, parser_class), {})
+    return _linear_classes[parser_class](semantics=semantics)
+
+
+@functools.lru_cache(maxsize=128)
+def alternation_pattern(patterns):
+    """
+    One regex for a list of patterns tried in order, instead of one parser option per pattern: the options made
+    every identifier cost a pass over all the multi-letter symbols
+    :param patterns: tuple of escaped symbols, longest first
+    :return: compiled pattern
+    """
+    return re.compile('|'.join(patterns), re.MULTILINE | re.UNICODE)
 
 
 class ParserManager(object):
@@ -26,8 +68,34 @@ class ParserManager(object):
             self.grammar_dir = self.parser_file_manager.grammar_dir
             self.save_threads = self.parser_file_manager.save_threads
         else:
-            self.init_parser = grammarinitParser(semantics=grammarinitModelBuilderSemantics())
-            self.default_parser = grammardefaultParser(semantics=grammardefaultModelBuilderSemantics())
+            self.init_parser = self.new_parser('init')
+            self.default_parser = self.new_parser('default')
+        self.lock = threading.Lock()
+        self.idle_parsers = {'init': [], 'default': []}  # parsers given back by compiler contexts
+
+    def new_parser(self, kind):
+        if kind == 'init':
+            from ..la_local_parsers.init_parser import grammarinitParser, grammarinitModelBuilderSemantics
+            return linear_memo_parser(grammarinitParser, grammarinitModelBuilderSemantics())
+        from ..la_local_parsers.default_parser import grammardefaultParser, grammardefaultModelBuilderSemantics
+        return linear_memo_parser(grammardefaultParser, grammardefaultModelBuilderSemantics())
+
+    def acquire_parser(self, kind):
+        """
+        Parser instance for the exclusive use of one compiler context, parsers aren't thread-safe
+        :param kind: 'init' or 'default'
+        :return: parser, None when the parsers are generated from the grammar files (DEBUG_PARSER)
+        """
+        if DEBUG_PARSER:
+            return None
+        with self.lock:
+            if len(self.idle_parsers[kind]) > 0:
+                return self.idle_parsers[kind].pop()
+        return self.new_parser(kind)
+
+    def release_parser(self, kind, parser):
+        with self.lock:
+            self.idle_parsers[kind].append(parser)
 
     def get_parser(self, key, grammar, extra_dict={}):
         if DEBUG_PARSER:
@@ -47,20 +115,27 @@ class ParserManager(object):
             self.parser_file_manager.reload()
 
     def modify_default_parser(self, extra_dict):
-        self.default_parser.new_id_list = []
-        self.default_parser.new_func_list = []
-        self.default_parser.builtin_list = []
-        self.default_parser.const_e = False
+        self.configure_parser(self.default_parser, extra_dict)
+
+    def configure_parser(self, parser, extra_dict):
+        parser.new_id_list = []
+        parser.new_id_pattern = None
+        parser.new_func_list = []
+        parser.new_func_pattern = None
+        parser.builtin_list = []
+        parser.const_e = False
         if "ids" in extra_dict:
-            self.default_parser.new_id_list = extra_dict["ids"]
+            parser.new_id_list = extra_dict["ids"]
+            parser.new_id_pattern = alternation_pattern(tuple(parser.new_id_list))
         if 'funcs' in extra_dict:
-            self.default_parser.new_func_list = extra_dict["funcs"]
+            parser.new_func_list = extra_dict["funcs"]
+            parser.new_func_pattern = alternation_pattern(tuple(parser.new_func_list))
         if 'pkg' in extra_dict:
-            funcs_list = extra_dict["pkg"]
+            funcs_list = list(extra_dict["pkg"])
             if 'e' in funcs_list:
-                self.default_parser.const_e = True
+                parser.const_e = True
                 funcs_list.remove('e')
-            self.default_parser.builtin_list = funcs_list
+            parser.builtin_list = funcs_list
 
 
 class ParserFileManager(object):
@@ -416,7 +491,9 @@ class ParserFileManager(object):
             **kwargs
         )
         self.new_id_list = []
+        self.new_id_pattern = None
         self.new_func_list = []
+        self.new_func_pattern = None
         self.builtin_list = []
         self.const_e = False"""
                 def_parser = def_parser.replace(original_class, new_class)
@@ -456,9 +533,8 @@ class ParserFileManager(object):
                 with self._option():
                     with self._group():
                         with self._choice():
-                            for new_id in self.new_id_list:
-                                with self._option():
-                                    self._pattern(new_id)
+                            with self._option():
+                                self._pattern(self.new_id_pattern)
                             self._error('no available options')
                     self.name_last_node('const')
                 with self._option():
@@ -470,9 +546,8 @@ class ParserFileManager(object):
                                         with self._choice():
                                             with self._option():
                                                 self._KEYWORDS_()
-                                            for new_id in self.new_id_list:
-                                                with self._option():
-                                                    self._pattern(new_id)
+                                            with self._option():
+                                                self._pattern(self.new_id_pattern)
                                             self._error('no available options')
                                 self._pattern('[A-Za-z\\p{Ll}\\p{Lu}\\p{Lo}]\\p{M}*')
                                 self.name_last_node('value')
@@ -515,9 +590,8 @@ class ParserFileManager(object):
     def _func_id_(self):  # noqa
         if len(self.new_func_list) > 0:
             with self._choice():
-                for new_id in self.new_func_list:
-                    with self._option():
-                        self._pattern(new_id)
+                with self._option():
+                    self._pattern(self.new_func_pattern)
                 self._error('no available options')
         else:
             # default
@@ -582,7 +656,7 @@ def recreate_local_parser_cache():
     """
     ### WARNING: This will delete and re-create the cache and 'la_local_parsers' directories.
     import iheartla.la_parser.parser
-    PM = iheartla.la_parser.parser._parser_manager
+    PM = iheartla.la_parser.parser.get_parser_manager()
 
     print( '## Clearing the cache dir:', PM.cache_dir )
     shutil.rmtree( PM.cache_dir )
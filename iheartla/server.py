@@ -0,0 +1,213 @@
+import os
+import sys
+import json
+import time
+import threading
+import socketserver
+from tatsu.exceptions import FailedParse, FailedCut
+from .la_parser.parser import compile_backends, create_parser, ParserTypeEnum
+from .la_parser.session import CompileSession
+from .la_tools.la_msg import LaMsg
+from .la_tools.la_cache import CompileCache
+from .la_tools.la_helper import is_new_tatsu_version
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+# compile errors
+LA_PARSE_ERROR = -32000
+LA_TYPE_ERROR = -32001
+
+BACKEND_DICT = {"numpy": ParserTypeEnum.NUMPY, "eigen": ParserTypeEnum.EIGEN, "latex": ParserTypeEnum.LATEX,
+                "mathjax": ParserTypeEnum.MATHJAX, "matlab": ParserTypeEnum.MATLAB}
+
+
+class CompileError(Exception):
+    def __init__(self, code, message, data=None):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.data = data
+
+
+class CompileServer(object):
+    """
+    Keeps the parsers, type walker and code generators warm and answers JSON-RPC 2.0 requests.
+    Every client thread compiles with its own compiler context; compiles of the same document are serialized.
+    Methods: compile {source, backends, func_name, document}, close {document}, stats, ping, shutdown
+    Compiles with a document name go through a session for that document, so only edited blocks are parsed.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.compile_time = 0
+        self.start_time = time.time()
+        self.shutdown_event = threading.Event()
+        self.sessions = {}  # document -> CompileSession
+
+    def warm_up(self):
+        create_parser()
+        self.compile("""a = b
+        where
+        b: ℝ""", ["numpy"])
+
+    def compile(self, source, backends=None, func_name=None, document=None):
+        if backends is None:
+            backends = ["numpy"]
+        parser_type = ParserTypeEnum.INVALID
+        for backend in backends:
+            if backend not in BACKEND_DICT:
+                raise CompileError(INVALID_PARAMS, "Unknown backend: {}".format(backend))
+            parser_type = parser_type | BACKEND_DICT[backend]
+        start = time.time()
+        try:
+            if document is None:
+                results = compile_backends(source, parser_type, func_name=func_name)
+            else:
+                with self.lock:
+                    if document not in self.sessions:
+                        self.sessions[document] = CompileSession()
+                    session = self.sessions[document]
+                results = session.compile(source, parser_type, func_name=func_name)
+        except FailedParse as e:
+            line_info = e.tokenizer.line_info(e.pos) if is_new_tatsu_version() else e.buf.line_info(e.pos)
+            data = {"type": "FailedParse", "line": line_info.line, "col": line_info.col}
+            raise CompileError(LA_PARSE_ERROR, LaMsg.getInstance().get_parse_error(e), data)
+        except FailedCut as e:
+            raise CompileError(LA_PARSE_ERROR, "FailedCut: {}".format(str(e)), {"type": "FailedCut"})
+        except AssertionError as e:
+            raise CompileError(LA_TYPE_ERROR, "{}".format(e.args[0] if e.args else e), {"type": "AssertionError"})
+        except Exception as e:
+            raise CompileError(INTERNAL_ERROR, "Exception: {}".format(str(e)), {"type": type(e).__name__})
+        finally:
+            with self.lock:
+                self.compile_time += time.time() - start
+        outputs = {}
+        for backend in backends:
+            outputs[backend] = results[BACKEND_DICT[backend]]
+        return {"outputs": outputs, "time": time.time() - start}
+
+    def get_stats(self):
+        stats = {"requests": self.requests, "compile_time": self.compile_time, "uptime": time.time() - self.start_time}
+        cache = CompileCache.getInstance()
+        if cache.enabled:
+            stats["cache"] = cache.get_stats()
+        if len(self.sessions) > 0:
+            stats["documents"] = len(self.sessions)
+        return stats
+
+    def dispatch(self, method, params):
+        if method == "compile":
+            if not isinstance(params, dict) or not isinstance(params.get("source"), str):
+                raise CompileError(INVALID_PARAMS, "compile needs a source string")
+            return self.compile(params["source"], params.get("backends"), params.get("func_name"), params.get("document"))
+        elif method == "close":
+            if not isinstance(params, dict) or not isinstance(params.get("document"), str):
+                raise CompileError(INVALID_PARAMS, "close needs a document string")
+            with self.lock:
+                self.sessions.pop(params["document"], None)
+            return None
+        elif method == "stats":
+            return self.get_stats()
+        elif method == "ping":
+            return "pong"
+        elif method == "shutdown":
+            self.shutdown_event.set()
+            return None
+        raise CompileError(METHOD_NOT_FOUND, "Method not found: {}".format(method))
+
+    def handle_request(self, request):
+        """
+        :param request: decoded JSON-RPC request
+        :return: response dict, or None for notifications
+        """
+        with self.lock:
+            self.requests += 1
+        if not isinstance(request, dict) or request.get("jsonrpc") != "2.0" or not isinstance(request.get("method"), str):
+            return self.error_response(None, CompileError(INVALID_REQUEST, "Invalid request"))
+        req_id = request.get("id")
+        try:
+            result = self.dispatch(request["method"], request.get("params", {}))
+        except CompileError as e:
+            return self.error_response(req_id, e) if "id" in request else None
+        if "id" not in request:
+            return None
+        return {"jsonrpc": "2.0", "id": req_id, "result": result}
+
+    def handle_line(self, line):
+        """
+        :return: encoded response line, or None
+        """
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            response = self.error_response(None, CompileError(PARSE_ERROR, "Parse error: {}".format(e)))
+        else:
+            response = self.handle_request(request)
+        if response is None:
+            return None
+        return json.dumps(response, ensure_ascii=False)
+
+    def error_response(self, req_id, err):
+        error = {"code": err.code, "message": err.message}
+        if err.data is not None:
+            error["data"] = err.data
+        return {"jsonrpc": "2.0", "id": req_id, "error": error}
+
+    def serve_stdio(self, in_file=None, out_file=None):
+        # one request per line
+        in_file = in_file or sys.stdin
+        out_file = out_file or sys.stdout
+        for line in in_file:
+            if line.strip() == '':
+                continue
+            response = self.handle_line(line)
+            if response is not None:
+                out_file.write(response + '\n')
+                out_file.flush()
+            if self.shutdown_event.is_set():
+                break
+
+    def serve_socket(self, socket_path):
+        compile_server = self
+
+        class RequestHandler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    line = line.decode('utf-8')
+                    if line.strip() == '':
+                        continue
+                    response = compile_server.handle_line(line)
+                    if response is not None:
+                        self.wfile.write((response + '\n').encode('utf-8'))
+                        self.wfile.flush()
+                    if compile_server.shutdown_event.is_set():
+                        threading.Thread(target=self.server.shutdown).start()
+                        break
+
+        class UnixServer(socketserver.ThreadingUnixStreamServer):
+            daemon_threads = True
+
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        with UnixServer(socket_path, RequestHandler) as server:
+            try:
+                server.serve_forever()
+            finally:
+                os.remove(socket_path)
+
+
+def serve(socket_path=None):
+    """
+    used for command line: --serve [--socket path]
+    """
+    server = CompileServer()
+    server.warm_up()
+    if socket_path:
+        print("iheartla server listening on {}".format(socket_path), file=sys.stderr)
+        server.serve_socket(socket_path)
+    else:
+        server.serve_stdio()
@@ -3,7 +3,8 @@ import sys
 import importlib
 from importlib import reload
 sys.path.append('./')
-from iheartla.la_parser.parser import parse_la, ParserTypeEnum, compile_la_content
+from iheartla.la_parser.parser import parse_la, ParserTypeEnum, compile_la_content, compile_backends, \
+    get_codegen_options, set_codegen_options
 from iheartla.la_tools.la_helper import TEST_MATLAB, save_to_file
 import subprocess
 from time import sleep
@@ -82,6 +83,22 @@ class BasePythonTest(unittest.TestCase):
         BasePythonTest.cnt += 1
         return TestFuncInfo(getattr(module, func_name), eig_file_name, eig_test_name, eig_func_name, mat_file_name, mat_func_name)
 
+    def gen_numpy_func(self, parse_str, **options):
+        """
+        Numpy code with the code generator options changed for this compile only, e.g. cse=False
+        :return: (code, func)
+        """
+        old_options = get_codegen_options(ParserTypeEnum.NUMPY)
+        set_codegen_options(ParserTypeEnum.NUMPY, **options)
+        try:
+            code = compile_backends(parse_str, ParserTypeEnum.NUMPY)[ParserTypeEnum.NUMPY]
+        finally:
+            for cur_type, cur_options in old_options.items():
+                set_codegen_options(cur_type, **cur_options)
+        namespace = {}
+        exec(code, namespace)
+        return code, namespace['myExpression']
+
     def assertDMatrixEqual(self, A, B):
         # dense matrix comparision
         assert A.shape == B.shape
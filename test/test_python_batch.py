@@ -0,0 +1,63 @@
+import sys
+sys.path.append('./')
+from test.base_python_test import *
+import os
+import tempfile
+from iheartla.batch import compile_files
+from iheartla.la_tools.la_helper import read_from_file
+from iheartla.la_parser.parser import get_codegen_options, set_codegen_options
+
+
+class TestBatch(BasePythonTest):
+    def test_batch_compile(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        la_files = []
+        for name, la_str in [("good", "y = A x\nwhere\nA: ℝ^(2×2)\nx: ℝ^2"),
+                             ("bad", "y = A x\nwhere\nA: ℝ^(2×2)\nx: ℝ^3"),
+                             ("other", "a = b + c\nwhere\nb: ℝ\nc: ℝ")]:
+            la_file = os.path.join(tmp_dir.name, "{}.la".format(name))
+            save_to_file(la_str, la_file)
+            la_files.append(la_file)
+        results = compile_files(la_files, ParserTypeEnum.NUMPY | ParserTypeEnum.EIGEN, jobs=2)
+        # one bad file doesn't stop the others
+        self.assertEqual([result.la_file for result in results], la_files)
+        self.assertIsNone(results[0].error)
+        self.assertIn("Dimension mismatch", results[1].error)
+        self.assertIsNone(results[2].error)
+        for suffix in ['.py', '.cpp']:
+            self.assertTrue(os.path.exists(os.path.join(tmp_dir.name, "good" + suffix)))
+            self.assertFalse(os.path.exists(os.path.join(tmp_dir.name, "bad" + suffix)))
+        self.assertEqual(len([f for f in os.listdir(tmp_dir.name) if f.endswith('.tmp')]), 0)
+        tmp_dir.cleanup()
+
+    def test_batch_options(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        la_files = []
+        for name in ["first", "second"]:
+            la_file = os.path.join(tmp_dir.name, "{}.la".format(name))
+            save_to_file("y = (A + B) x + (A + B) z\nwhere\nA: ℝ^(2×2)\nB: ℝ^(2×2)\nx: ℝ^2\nz: ℝ^2", la_file)
+            la_files.append(la_file)
+        options = get_codegen_options(ParserTypeEnum.NUMPY)[ParserTypeEnum.NUMPY]
+        # the worker processes use the options of the parent
+        set_codegen_options(ParserTypeEnum.NUMPY, cse=False)
+        try:
+            results = compile_files(la_files, ParserTypeEnum.NUMPY, jobs=2)
+        finally:
+            set_codegen_options(ParserTypeEnum.NUMPY, **options)
+        for result in results:
+            self.assertIsNone(result.error)
+            self.assertNotIn("cse_", read_from_file(result.outputs[0]))
+        tmp_dir.cleanup()
+
+    def test_batch_file_mode(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        la_file = os.path.join(tmp_dir.name, "mode.la")
+        save_to_file("a = b + c\nwhere\nb: ℝ\nc: ℝ", la_file)
+        # new outputs get the permissions open() would give them, existing ones keep theirs
+        compile_files([la_file], ParserTypeEnum.NUMPY | ParserTypeEnum.EIGEN)
+        self.assertEqual(os.stat(os.path.join(tmp_dir.name, "mode.py")).st_mode & 0o777,
+                         os.stat(la_file).st_mode & 0o777)
+        os.chmod(os.path.join(tmp_dir.name, "mode.cpp"), 0o640)
+        compile_files([la_file], ParserTypeEnum.EIGEN)
+        self.assertEqual(os.stat(os.path.join(tmp_dir.name, "mode.cpp")).st_mode & 0o777, 0o640)
+        tmp_dir.cleanup()
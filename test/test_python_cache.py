@@ -0,0 +1,74 @@
+import sys
+sys.path.append('./')
+from test.base_python_test import *
+import tempfile
+from iheartla.la_tools.la_cache import CompileCache
+from iheartla.la_parser.parser import get_codegen_options, set_codegen_options
+
+
+class TestCache(BasePythonTest):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = CompileCache.getInstance()
+        self.cache_dir = self.cache.cache_dir
+        self.cache.set_enabled(True, self.tmp_dir.name)
+
+    def tearDown(self):
+        self.cache.set_enabled(False, self.cache_dir)
+        self.tmp_dir.cleanup()
+
+    def test_cache_hit(self):
+        la_str = """y = A x
+        where
+        A: ℝ^(2×2)
+        x: ℝ^2"""
+        parse_type = ParserTypeEnum.NUMPY | ParserTypeEnum.EIGEN
+        hits, misses = self.cache.hits, self.cache.misses
+        first = compile_la_content(la_str, parse_type)
+        self.assertEqual(self.cache.misses, misses + 1)
+        second = compile_la_content(la_str, parse_type)
+        self.assertEqual(self.cache.hits, hits + 1)
+        self.assertEqual(first, second)
+        # different backends use a different entry
+        compile_la_content(la_str, ParserTypeEnum.NUMPY)
+        self.assertEqual(self.cache.misses, misses + 2)
+
+    def test_cache_eviction(self):
+        self.cache.max_size = 1
+        compile_la_content("""a = b + c
+        where
+        b: scalar
+        c: scalar""", ParserTypeEnum.NUMPY)
+        evictions = self.cache.evictions
+        compile_la_content("""a = b - c
+        where
+        b: scalar
+        c: scalar""", ParserTypeEnum.NUMPY)
+        self.assertEqual(self.cache.evictions, evictions + 1)
+        self.assertEqual(self.cache.get_stats()['entries'], 1)
+        self.cache.max_size = 64 * 1024 * 1024
+
+    def test_cache_options(self):
+        la_str = """y = (A + B) x + (A + B) z
+        where
+        A: ℝ^(2×2)
+        B: ℝ^(2×2)
+        x: ℝ^2
+        z: ℝ^2"""
+        first = compile_la_content(la_str, ParserTypeEnum.NUMPY)
+        self.assertIn("cse_0 = A + B", first[0])
+        options = get_codegen_options(ParserTypeEnum.NUMPY)[ParserTypeEnum.NUMPY]
+        misses = self.cache.misses
+        # the options of the code generators are part of the key
+        set_codegen_options(ParserTypeEnum.NUMPY, cse=False)
+        try:
+            second = compile_la_content(la_str, ParserTypeEnum.NUMPY)
+            self.assertEqual(self.cache.misses, misses + 1)
+            self.assertNotIn("cse_0", second[0])
+            set_codegen_options(ParserTypeEnum.NUMPY, sparse_format='csr')
+            compile_la_content(la_str, ParserTypeEnum.NUMPY)
+            self.assertEqual(self.cache.misses, misses + 2)
+        finally:
+            set_codegen_options(ParserTypeEnum.NUMPY, **options)
+        self.assertEqual(compile_la_content(la_str, ParserTypeEnum.NUMPY), first)
+        self.assertEqual(self.cache.misses, misses + 2)
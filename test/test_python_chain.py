@@ -0,0 +1,56 @@
+import sys
+sys.path.append('./')
+from test.base_python_test import *
+import numpy as np
+from iheartla.la_parser.ir_chain import get_dim_size
+from iheartla.la_tools.la_dims import DimExpr
+
+
+class TestMatrixChain(BasePythonTest):
+    def test_chain_vector(self):
+        la_str = """v = Uᵀ M U c
+        y = x zᵀ A c
+        where
+        U ∈ ℝ^(n×k)
+        M ∈ ℝ^(n×n)
+        c ∈ ℝ^k
+        x ∈ ℝ^n
+        z ∈ ℝ^n
+        A ∈ ℝ^(n×k)"""
+        code, func = self.gen_numpy_func(la_str)
+        self.assertIn("v = U.T @ (M @ (U @ c))", code)
+        self.assertIn("y = (x).reshape(n, 1) @ (z.T.reshape(1, n) @ (A @ c))", code)
+        written_code, written_func = self.gen_numpy_func(la_str, reorder_products=False)
+        self.assertIn("v = U.T @ M @ U @ c", written_code)
+        args = [np.random.randn(6, 4), np.random.randn(6, 6), np.random.randn(4), np.random.randn(6),
+                np.random.randn(6), np.random.randn(6, 4)]
+        ret = func(*args)
+        written_ret = written_func(*args)
+        np.testing.assert_allclose(ret.v, written_ret.v, rtol=1e-10)
+        np.testing.assert_allclose(ret.y, written_ret.y, rtol=1e-10)
+        # same order for every backend
+        self.assertIn("U.transpose() * (M * (U * c))", compile_backends(la_str, ParserTypeEnum.EIGEN)[ParserTypeEnum.EIGEN])
+        self.assertIn("U' * (M * (U * c))", compile_backends(la_str, ParserTypeEnum.MATLAB)[ParserTypeEnum.MATLAB])
+
+    def test_chain_size_hints(self):
+        la_str = """Y = 2 A B C
+        where
+        A ∈ ℝ^(n×m)
+        B ∈ ℝ^(m×n)
+        C ∈ ℝ^(n×m)"""
+        # the same cost without hints, kept as written
+        self.assertIn("Y = 2 * A @ B @ C", self.gen_numpy_func(la_str)[0])
+        code, func = self.gen_numpy_func(la_str, size_hints={'n': 1000, 'm': 10})
+        self.assertIn("Y = (2 * A) @ (B @ C)", code)
+        self.assertIn("Y = 2 * A @ B @ C", self.gen_numpy_func(la_str, size_hints={'n': 10, 'm': 1000})[0])
+        A, B, C = np.random.randn(5, 3), np.random.randn(3, 5), np.random.randn(5, 3)
+        np.testing.assert_allclose(func(A, B, C).Y, 2 * A @ B @ C, rtol=1e-10)
+
+    def test_dim_size(self):
+        self.assertEqual(get_dim_size(3, {}), 3)
+        self.assertEqual(get_dim_size('n', {'n': 7}), 7)
+        self.assertEqual(get_dim_size('n+m', {'n': 7, 'm': 2}), 9)
+        self.assertEqual(get_dim_size('2*(n-1)', {'n': 7}), 12)
+        self.assertEqual(get_dim_size('n*k/2', {'n': 7, 'k': 4}), 14)
+        self.assertEqual(get_dim_size('n+', {'n': 7}), 100)
+        self.assertEqual(get_dim_size(DimExpr.symbol('n') * 2 + DimExpr.constant(1), {'n': 7}), 15)
@@ -0,0 +1,45 @@
+import sys
+sys.path.append('./')
+from test.base_python_test import *
+from concurrent.futures import ThreadPoolExecutor
+from iheartla.la_parser.parser import CompilerContext, get_context, get_codegen, get_parser_manager, compile_backends
+
+
+class TestContext(BasePythonTest):
+    sources = ["""y = A x
+    where
+    A: ℝ^(2×2)
+    x: ℝ^2""",
+               """`if` = `return` + a
+    where
+    `return`: ℝ
+    a: ℝ""",
+               """B_ij = A_ij + i j
+    where
+    A: ℝ^(n×m)""",
+               """y_i = A_i x + b_i
+    where
+    A_i ∈ ℝ^(m×n)
+    x ∈ ℝ^n
+    b_i ∈ ℝ^m"""]
+
+    def test_context_threads(self):
+        parser_type = ParserTypeEnum.NUMPY | ParserTypeEnum.EIGEN
+        expected = [compile_backends(source, parser_type) for source in self.sources]
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(lambda source: compile_backends(source, parser_type), self.sources * 3))
+        self.assertEqual(results, expected * 3)
+
+    def test_context_with(self):
+        default_gen = get_codegen(ParserTypeEnum.NUMPY)
+        with CompilerContext() as context:
+            self.assertIs(get_context(), context)
+            self.assertIsNot(get_codegen(ParserTypeEnum.NUMPY), default_gen)
+            content = compile_la_content(self.sources[0], ParserTypeEnum.NUMPY)
+        self.assertIsNot(get_context(), context)
+        self.assertEqual(context.compile(self.sources[0], ParserTypeEnum.NUMPY)[ParserTypeEnum.NUMPY], content[0])
+        parsers = list(context.parsers.values())
+        context.close()
+        idle_parsers = get_parser_manager().idle_parsers
+        for parser in parsers:
+            self.assertIn(parser, idle_parsers['init'] + idle_parsers['default'])
@@ -0,0 +1,99 @@
+import sys
+sys.path.append('./')
+from test.base_python_test import *
+import numpy as np
+import cppyy
+cppyy.add_include_path(eigen_path)
+
+
+class TestCSE(BasePythonTest):
+    def assert_same_as_repeated(self, la_str, *args, count=1):
+        cse_code, cse_func = self.gen_numpy_func(la_str)
+        code, func = self.gen_numpy_func(la_str, cse=False)
+        self.assertIn("cse_{} = ".format(count - 1), cse_code)
+        self.assertNotIn("cse_{} = ".format(count), cse_code)
+        self.assertNotIn("cse_", code)
+        cse_ret = vars(cse_func(*args))
+        ret = vars(func(*args))
+        for key in ret:
+            np.testing.assert_allclose(cse_ret[key], ret[key], rtol=1e-10, atol=1e-12)
+
+    def test_cse_statement(self):
+        la_str = """n = (b-a)×(c-a)/‖(b-a)×(c-a)‖
+        where
+        a: ℝ^3
+        b: ℝ^3
+        c: ℝ^3"""
+        self.assert_same_as_repeated(la_str, np.random.randn(3), np.random.randn(3), np.random.randn(3))
+        # b-a and c-a repeat only inside the reused cross product, they need no temporaries
+        for parser_type in [ParserTypeEnum.EIGEN, ParserTypeEnum.MATLAB]:
+            code = compile_backends(la_str, parser_type)[parser_type]
+            self.assertIn("cse_0 = ", code)
+            self.assertNotIn("cse_1", code)
+
+    def test_cse_summation(self):
+        la_str = """s = ∑_i (p_i-x_i)ᵀn_i n_iᵀ(p_i-x_i)
+        where
+        x_i: ℝ^3
+        n_i: ℝ^3
+        p_i: ℝ^3"""
+        self.assert_same_as_repeated(la_str, np.random.randn(5, 3), np.random.randn(5, 3), np.random.randn(5, 3))
+
+    def test_cse_vectorized(self):
+        # a summation lowered to a single array expression has no loop body to hold the temporary
+        la_str = """s = ∑_i (a_i + b_i)(a_i + b_i)
+        where
+        a ∈ ℝ^n
+        b ∈ ℝ^n"""
+        code, func = self.gen_numpy_func(la_str)
+        self.assertIn("np.sum(", code)
+        self.assertNotIn("cse_", code)
+        a, b = np.random.randn(10), np.random.randn(10)
+        self.assertAlmostEqual(func(a, b).s, np.sum((a + b) ** 2))
+
+    def test_cse_summations(self):
+        # summations over the same index and range share a buffer with one element per index
+        la_str = """y = ∑_i x_i×n_i + ∑_i (x_i×n_i)ᵀp_i n_i
+        where
+        x_i: ℝ^3
+        n_i: ℝ^3
+        p_i: ℝ^3"""
+        x, n, p = np.random.randn(5, 3), np.random.randn(5, 3), np.random.randn(5, 3)
+        self.assert_same_as_repeated(la_str, x, n, p)
+        code, func = self.gen_numpy_func(la_str)
+        self.assertEqual(code.count("np.cross("), 1)
+        self.assertIn("cse_0.append(np.cross(x[i-1], n[i-1]))", code)
+        # eigen test
+        func_info = self.gen_func_info(la_str)
+        with open(func_info.eig_file_name) as f:
+            self.assertEqual(f.read().count(".cross("), 1)
+        cppyy.include(func_info.eig_file_name)
+        func_list = ["bool {}(){{".format(func_info.eig_test_name),
+                     "    std::vector<Eigen::Matrix<double, 3, 1>> x, n, p;",
+                     "    Eigen::Matrix<double, 3, 1> A;",
+                     "    for(int i=0; i<4; i++){",
+                     "        x.push_back(Eigen::Matrix<double, 3, 1>(i, 1, 2));",
+                     "        n.push_back(Eigen::Matrix<double, 3, 1>(1, -i, 3));",
+                     "        p.push_back(Eigen::Matrix<double, 3, 1>(2, 0, i));",
+                     "    }",
+                     "    A.setZero();",
+                     "    for(int i=0; i<4; i++){",
+                     "        Eigen::Matrix<double, 3, 1> c = x[i].cross(n[i]);",
+                     "        A += c + c.dot(p[i]) * n[i];",
+                     "    }",
+                     "    Eigen::Matrix<double, 3, 1> B = {}(x, n, p).y;".format(func_info.eig_func_name),
+                     "    return ((A - B).norm() < {});".format(self.eps),
+                     "}"]
+        cppyy.cppdef('\n'.join(func_list))
+        self.assertTrue(getattr(cppyy.gbl, func_info.eig_test_name)())
+
+    def test_cse_summations_range(self):
+        # different index ranges and conditions keep their own temporaries
+        la_str = """y = ∑_i (a_i + b_i) x_i + ∑_j (a_j + b_j) z_j + ∑_(i for i ≠ 1) (a_i + b_i) x_i
+        where
+        a ∈ ℝ^n
+        b ∈ ℝ^n
+        x_i ∈ ℝ^3
+        z_j ∈ ℝ^3"""
+        code, func = self.gen_numpy_func(la_str)
+        self.assertNotIn(".append(", code)
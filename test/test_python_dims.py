@@ -3,6 +3,7 @@ sys.path.append('./')
 from test.base_python_test import *
 import numpy as np
 import cppyy
+from iheartla.la_tools.la_helper import is_same_expr, mul_dims, simpify_dims
 cppyy.add_include_path(eigen_path)
 
 
@@ -144,4 +145,21 @@ class TestDims(BasePythonTest):
                      "    return ((B - R).norm() == 0);",
                      "}"]
         cppyy.cppdef('\n'.join(func_list))
-        self.assertTrue(getattr(cppyy.gbl, func_info.eig_test_name)())
\ No newline at end of file
+        self.assertTrue(getattr(cppyy.gbl, func_info.eig_test_name)())
+
+    def test_dim_expr(self):
+        self.assertTrue(is_same_expr('p', 'p*(2*k-k)/k'))
+        self.assertTrue(is_same_expr(simpify_dims('p+1'), '(p+1)'))
+        self.assertTrue(is_same_expr(simpify_dims('n+m+2'), 'm+(n+2)'))
+        self.assertFalse(is_same_expr('n', 'm'))
+        self.assertFalse(is_same_expr(simpify_dims('n+1'), 'n'))
+        # same strings as sympy prints, they end up in the generated code
+        self.assertEqual(str(simpify_dims('n+m+2')), 'm + n + 2')
+        self.assertEqual(str(simpify_dims('2-n')), '2 - n')
+        self.assertEqual(str(mul_dims('c', 'a')), 'a*c')
+        self.assertEqual(str(mul_dims(2, 2)), '4')
+        # computed dims stay symbolic like sympy integers
+        self.assertFalse(isinstance(mul_dims(2, 2), int))
+        self.assertTrue(mul_dims(2, 2) == 4)
+        # unsupported expressions go through sympy
+        self.assertEqual(str(simpify_dims('1/(n+1)')), '1/(n + 1)')
@@ -0,0 +1,55 @@
+import sys
+sys.path.append('./')
+from test.base_python_test import *
+import os
+import zlib
+import pickle
+import tempfile
+from pathlib import Path
+from iheartla.la_parser.parser import parse_ir_node, walk_model, compile_la_file
+from iheartla.la_parser.ir_archive import dump_ir, load_ir, IRArchiveError, IR_MAGIC
+
+
+class TestIRArchive(BasePythonTest):
+    la_str = """y_i = A_i x + b_i
+    z = ∑_i y_i
+    where
+    A_i ∈ ℝ^(m×n)
+    x ∈ ℝ^n
+    b_i ∈ ℝ^m"""
+
+    def test_ir_round_trip(self):
+        type_walker, start_node = parse_ir_node(self.la_str)
+        data = dump_ir(type_walker, start_node)
+        for parser_type in [ParserTypeEnum.NUMPY, ParserTypeEnum.EIGEN, ParserTypeEnum.LATEX,
+                            ParserTypeEnum.MATHJAX, ParserTypeEnum.MATLAB]:
+            expected = walk_model(parser_type, type_walker, start_node)
+            walker_state, loaded_node = load_ir(data)
+            self.assertEqual(walk_model(parser_type, walker_state, loaded_node), expected)
+
+    def test_ir_version(self):
+        data = dump_ir(*parse_ir_node(self.la_str))
+        with self.assertRaises(IRArchiveError):
+            load_ir(data[:len(IR_MAGIC) + 2] + b'0' * 64 + data[len(IR_MAGIC) + 66:])
+        with self.assertRaises(IRArchiveError):
+            load_ir(b'"""' + data)
+
+    def test_ir_untrusted(self):
+        # a file with the right header that calls anything but the IR classes is rejected
+        header = dump_ir(*parse_ir_node(self.la_str))[:len(IR_MAGIC) + 66]
+
+        class Payload(object):
+            def __reduce__(self):
+                return os.system, ('echo unsafe',)
+        with self.assertRaises(IRArchiveError):
+            load_ir(header + zlib.compress(pickle.dumps(Payload())))
+
+    def test_ir_file(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            la_file = Path(tmp_dir) / 'sequence.la'
+            la_file.write_text(self.la_str)
+            compile_la_file(str(la_file), ParserTypeEnum.NUMPY, emit_ir=True)
+            expected = la_file.with_suffix('.py').read_text()
+            la_file.with_suffix('.py').unlink()
+            compile_la_file(str(la_file.with_suffix('.lair')), ParserTypeEnum.NUMPY)
+            self.assertEqual(la_file.with_suffix('.py').read_text(), expected)
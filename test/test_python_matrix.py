@@ -5,6 +5,7 @@ import numpy as np
 import scipy
 from scipy import sparse
 import cppyy
+from iheartla.la_parser.parser import get_codegen
 cppyy.add_include_path(eigen_path)
 
 
@@ -573,6 +574,65 @@ class TestMatrix(BasePythonTest):
         cppyy.cppdef('\n'.join(func_list))
         self.assertTrue(getattr(cppyy.gbl, func_info.eig_test_name)())
 
+    def test_sparse_matrix_support(self):
+        # only the diagonals and the set are visited, the first matching condition wins
+        la_str = """A_ij = { 2 if i = j
+        -1 if i = j + 1
+        x_j if j - 1 = i
+        3 if ( i , j ) ∈ E
+        0 otherwise
+
+        where
+        x: ℝ ^ n
+        A: ℝ ^ (n × n)
+        E: { ℤ × ℤ } index
+        """
+        func_info = self.gen_func_info(la_str)
+        self.assertNotIn("for j in range", compile_la_content(la_str, ParserTypeEnum.NUMPY)[0])
+        x = np.array([1, 2, 3, 4])
+        E = [(0, 3), (1, 1)]
+        B = np.array([[2, 2, 0, 3], [-1, 2, 3, 0], [0, -1, 2, 4], [0, 0, -1, 2]])
+        self.assertSMatrixEqual(func_info.numpy_func(x, E).A, scipy.sparse.coo_matrix(B))
+        # eigen test
+        cppyy.include(func_info.eig_file_name)
+        func_list = ["bool {}(){{".format(func_info.eig_test_name),
+                     "    Eigen::Matrix<double, 4, 1> x;",
+                     "    x << 1, 2, 3, 4;",
+                     "    std::set< std::tuple< int, int > > E;",
+                     "    E.insert(std::make_tuple(0, 3));",
+                     "    E.insert(std::make_tuple(1, 1));",
+                     "    Eigen::Matrix<double, 4, 4> C;",
+                     "    C << 2, 2, 0, 3, -1, 2, 3, 0, 0, -1, 2, 4, 0, 0, -1, 2;",
+                     "    Eigen::SparseMatrix<double> B = {}(x, E).A;".format(func_info.eig_func_name),
+                     "    return C.isApprox(B.toDense());",
+                     "}"]
+        cppyy.cppdef('\n'.join(func_list))
+        self.assertTrue(getattr(cppyy.gbl, func_info.eig_test_name)())
+
+    def test_sparse_matrix_csr(self):
+        la_str = """G_ij = { P_ij if ( i , j ) ∈ E
+        0 otherwise
+
+        G_ij += { 1 if i = j
+        0 otherwise
+
+        where
+        P: ℝ ^ (3 × 3): a matrix
+        G: ℝ ^ (3 × 3): a matrix
+        E: { ℤ × ℤ } index
+        """
+        code = compile_la_content(la_str, ParserTypeEnum.NUMPY, sparse_format='csr')[0]
+        self.assertNotIn("coo_matrix", code)
+        # only for that compile
+        self.assertEqual(get_codegen(ParserTypeEnum.NUMPY).sparse_format, 'coo')
+        self.assertIn("The sparse format can only be coo or csr", compile_la_content(la_str, ParserTypeEnum.NUMPY, sparse_format='csc'))
+        namespace = {}
+        exec(code, namespace)
+        P = np.array([[1, 2, 3], [4, 5, 6], [7, 8, 9]])
+        G = namespace['myExpression'](P, [(0, 1), (1, 1)]).G
+        self.assertTrue(scipy.sparse.isspmatrix_csr(G))
+        self.assertSMatrixEqual(G, scipy.sparse.coo_matrix(np.array([[1, 2, 0], [0, 6, 0], [0, 0, 1]])))
+
     def test_sparse_block_matrix_1(self):
         # sparse matrix in block matrix
         la_str = """[ A   0₂,₂
@@ -0,0 +1,65 @@
+import sys
+sys.path.append('./')
+from test.base_python_test import *
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+from iheartla.la_parser.parser import parse_ir_node, walk_backends, get_codegen_options, set_codegen_options
+from iheartla.la_parser.ir_archive import dump_ir
+from iheartla.batch import backend_pool
+
+
+class TestParallel(BasePythonTest):
+    la_str = """C = A^2 + B^2
+    y_i = M_i x + b_i
+    where
+    A: ℝ^(2×2)
+    B: ℝ^(2×2)
+    M_i ∈ ℝ^(m×n)
+    x ∈ ℝ^n
+    b_i ∈ ℝ^m"""
+    backends = ParserTypeEnum.NUMPY | ParserTypeEnum.EIGEN | ParserTypeEnum.LATEX | ParserTypeEnum.MATHJAX | \
+        ParserTypeEnum.MATLAB
+
+    def test_emission_side_effect_free(self):
+        type_walker, start_node = parse_ir_node(self.la_str)
+        ir_data = dump_ir(type_walker, start_node)
+        first = walk_backends(self.backends, type_walker, start_node)
+        self.assertEqual(dump_ir(type_walker, start_node), ir_data)
+        # temporaries of one backend don't shift the names of the next one
+        matlab_only = walk_backends(ParserTypeEnum.MATLAB, *parse_ir_node(self.la_str))
+        self.assertEqual(matlab_only[ParserTypeEnum.MATLAB], first[ParserTypeEnum.MATLAB])
+
+    def test_emission_pools(self):
+        type_walker, start_node = parse_ir_node(self.la_str)
+        expected = walk_backends(self.backends, type_walker, start_node)
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            self.assertEqual(walk_backends(self.backends, type_walker, start_node, executor=executor), expected)
+        with mock.patch('os.cpu_count', return_value=4):
+            with backend_pool(self.backends) as executor:
+                self.assertEqual(walk_backends(self.backends, type_walker, start_node, executor=executor), expected)
+            self.assertIsNone(backend_pool(ParserTypeEnum.NUMPY))
+        # a single worker would only add the start-up and pickling cost
+        with mock.patch('os.cpu_count', return_value=1):
+            self.assertIsNone(backend_pool(self.backends))
+
+    def test_emission_pool_options(self):
+        # the worker threads generate the code with the options of the caller's code generators
+        type_walker, start_node = parse_ir_node("""y = (A + B)x + (A + B)z
+        where
+        A ∈ ℝ^(n×n)
+        B ∈ ℝ^(n×n)
+        x ∈ ℝ^n
+        z ∈ ℝ^n""")
+        old_options = get_codegen_options(self.backends)
+        set_codegen_options(self.backends, cse=False, size_hints={'n': 5000})
+        try:
+            expected = walk_backends(self.backends, type_walker, start_node)
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                self.assertEqual(walk_backends(self.backends, type_walker, start_node, executor=executor), expected)
+                # and leave the workers' own options alone
+                self.assertTrue(executor.submit(get_codegen_options, ParserTypeEnum.NUMPY).result()[
+                                    ParserTypeEnum.NUMPY]['cse'])
+        finally:
+            for cur_type, options in old_options.items():
+                set_codegen_options(cur_type, **options)
+        self.assertNotIn("cse_", expected[ParserTypeEnum.NUMPY])
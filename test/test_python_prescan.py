@@ -0,0 +1,58 @@
+import sys
+sys.path.append('./')
+from test.base_python_test import *
+from iheartla.la_parser.parser import parse_single_pass, parse_ir_node, get_default_parser, walk_model
+
+
+class TestPrescan(BasePythonTest):
+    def assertSamePasses(self, la_str):
+        # single pass result must match the init parser + default parser result
+        single = parse_single_pass(la_str)
+        self.assertIsNotNone(single)
+        single_res = [walk_model(t, single[0], single[1]) for t in [ParserTypeEnum.NUMPY, ParserTypeEnum.EIGEN]]
+        model = get_default_parser().parse(la_str, parseinfo=True)
+        type_walker, start_node = parse_ir_node(la_str, model)
+        double_res = [walk_model(t, type_walker, start_node) for t in [ParserTypeEnum.NUMPY, ParserTypeEnum.EIGEN]]
+        self.assertEqual(single_res, double_res)
+
+    def test_prescan_multi_letter(self):
+        self.assertSamePasses("""from linearalgebra: tr
+        y_i = (a_i)ᵀ x + w_i
+        `E` = tr(A B) + abc
+        where
+        a_i: ℝ^n: the measurement vectors
+        w_i: ℝ: measurement noise
+        abc: ℝ
+        A: ℝ^(n×n)
+        B: ℝ^(n×n)
+        x: ℝ^n""")
+
+    def test_prescan_function(self):
+        self.assertSamePasses("""g = f
+        b = g(a) + h_1(a)
+        where
+        a: ℝ
+        f: ℝ → ℝ
+        h_i: ℝ → ℝ""")
+
+    def test_prescan_multi_line(self):
+        self.assertSamePasses("""G_ij = { P_ij + J_ij  if  ( i , j ) ∈ E
+        0 otherwise
+
+        b = min_(i ∈ ℝ) 3i+c
+        s.t.
+        i > 4
+        where
+        P: ℝ ^ (4 × 4): a matrix
+        J: ℝ ^ (4 × 4): a matrix
+        G: ℝ ^ (10 × 10): a matrix
+        E: { ℤ × ℤ } index
+        c: ℝ""")
+
+    def test_prescan_fallback(self):
+        # unbalanced brackets are left to the init parser
+        la_str = """A = [a b
+        where
+        a: ℝ
+        b: ℝ"""
+        self.assertIsNone(parse_single_pass(la_str))
@@ -0,0 +1,31 @@
+import sys
+sys.path.append('./')
+from test.base_python_test import *
+import json
+from iheartla.la_tools.la_profiler import LaProfiler, get_profiler
+
+
+class TestProfiler(BasePythonTest):
+    la_str = """y_i = A_i x + b_i
+    where
+    A_i ∈ ℝ^(m×n)
+    x ∈ ℝ^n
+    b_i ∈ ℝ^m"""
+
+    def test_profiler_phases(self):
+        parser_type = ParserTypeEnum.NUMPY | ParserTypeEnum.EIGEN
+        expected = compile_la_content(self.la_str, parser_type)
+        with LaProfiler() as profiler:
+            self.assertIs(get_profiler(), profiler)
+            self.assertEqual(compile_la_content(self.la_str, parser_type), expected)
+        self.assertIsNone(get_profiler())
+        self.assertEqual(list(profiler.phases.keys()), ["prescan", "pre walk", "parser lookup", "parse", "walk",
+                                                        "codegen numpy", "codegen eigen"])
+        self.assertGreater(profiler.phases["parse"].allocated, 0)
+        self.assertEqual(profiler.visitors["TypeWalker.walk_Start"].calls, 1)
+        self.assertEqual(profiler.visitors["CodeGenNumpy.visit_assignment"].calls, 1)
+        data = json.loads(profiler.format_json(visitors=5))
+        self.assertEqual(len(data["visitors"]), 5)
+        for stats in data["visitors"]:
+            self.assertLessEqual(stats["self_seconds"], stats["seconds"])
+        self.assertIn("codegen eigen", profiler.format_table())
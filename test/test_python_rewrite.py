@@ -0,0 +1,116 @@
+import sys
+sys.path.append('./')
+from test.base_python_test import *
+import numpy as np
+import cppyy
+from iheartla.la_parser.parser import parse_ir_node, walk_backends
+from iheartla.la_parser.ir_archive import dump_ir
+cppyy.add_include_path(eigen_path)
+
+
+class TestRewrite(BasePythonTest):
+    def assert_same_as_written(self, la_str, *args):
+        code, func = self.gen_numpy_func(la_str)
+        written_code, written_func = self.gen_numpy_func(la_str, rewrite_rules=[])
+        ret = vars(func(*args))
+        written_ret = vars(written_func(*args))
+        for key in written_ret:
+            np.testing.assert_allclose(ret[key], written_ret[key], rtol=1e-10, atol=1e-12)
+        return code, written_code
+
+    def test_rewrite_inverse(self):
+        la_str = """x = (A⁻¹)b
+        y = A⁻¹ B b
+        where
+        A ∈ ℝ^(n×n)
+        B ∈ ℝ^(n×n)
+        b ∈ ℝ^n"""
+        A = np.random.randn(6, 6) + 6 * np.eye(6)
+        code, written_code = self.assert_same_as_written(la_str, A, np.random.randn(6, 6), np.random.randn(6))
+        self.assertIn("np.linalg.inv(A)", written_code)
+        self.assertIn("x = np.linalg.solve(A, b)", code)
+        self.assertIn("y = np.linalg.solve(A, (B @ b))", code)
+        self.assertIn("y = (A\\(B * b));", compile_backends(la_str, ParserTypeEnum.MATLAB)[ParserTypeEnum.MATLAB])
+
+    def test_rewrite_trace_norm(self):
+        la_str = """from linearalgebra: tr
+        y = tr(A B)
+        t = tr(AᵀB)
+        w = ‖b‖²
+        f = ‖A‖²
+        where
+        A ∈ ℝ^(n×n)
+        B ∈ ℝ^(n×n)
+        b ∈ ℝ^n"""
+        code, written_code = self.assert_same_as_written(la_str, np.random.randn(5, 5), np.random.randn(5, 5),
+                                                         np.random.randn(5))
+        self.assertNotIn("np.trace", code)
+        self.assertNotIn("np.linalg.norm", code)
+        matlab = compile_backends(la_str, ParserTypeEnum.MATLAB)[ParserTypeEnum.MATLAB]
+        self.assertIn("y = sum(A(:).*reshape(B', [], 1));", matlab)
+        self.assertIn("w = dot(b,b);", matlab)
+
+    def test_rewrite_diag_transpose(self):
+        la_str = """from linearalgebra: diag
+        z = diag(b)A
+        u = A diag(b)
+        q = (A B C)ᵀb
+        w = diag(b)A + diag(b)A
+        where
+        A ∈ ℝ^(n×n)
+        B ∈ ℝ^(n×n)
+        C ∈ ℝ^(n×n)
+        b ∈ ℝ^n"""
+        code, written_code = self.assert_same_as_written(la_str, np.random.randn(5, 5), np.random.randn(5, 5),
+                                                         np.random.randn(5, 5), np.random.randn(5))
+        self.assertNotIn("np.diag", code)
+        self.assertIn("q = C.T @ (B.T @ (A.T @ b))", code)
+        # the scaling created by the rewrite is a common subexpression like the written operators
+        self.assertEqual(code.count("np.multiply((b).reshape(n, 1), A)"), 2)
+        # Eigen multiplies by a diagonal view already
+        eigen = compile_backends(la_str, ParserTypeEnum.EIGEN)[ParserTypeEnum.EIGEN]
+        self.assertIn("(b).asDiagonal() * A", eigen)
+        self.assertIn("C.transpose() * (B.transpose() * (A.transpose() * b))", eigen)
+
+    def test_rewrite_eigen(self):
+        la_str = """from linearalgebra: tr, diag
+        x = A⁻¹ B b
+        y = tr(A B)
+        w = ‖b‖²
+        z = diag(b)A + diag(b)A
+        q = (A B C)ᵀb
+        where
+        A ∈ ℝ^(n×n)
+        B ∈ ℝ^(n×n)
+        C ∈ ℝ^(n×n)
+        b ∈ ℝ^n"""
+        func_info = self.gen_func_info(la_str)
+        cppyy.include(func_info.eig_file_name)
+        func_list = ["bool {}(){{".format(func_info.eig_test_name),
+                     "    Eigen::MatrixXd A(3, 3), B(3, 3), C(3, 3);",
+                     "    A << 4, 1, 0, 1, 5, 2, 0, 2, 6;",
+                     "    B << 1, 2, 3, 4, 5, 6, 7, 8, 10;",
+                     "    C << 2, 0, 1, 1, 3, 0, 0, 1, 4;",
+                     "    Eigen::VectorXd b(3);",
+                     "    b << 1, -2, 3;",
+                     "    {} ret = {}(A, B, C, b);".format(func_info.eig_func_name + "ResultType", func_info.eig_func_name),
+                     "    Eigen::MatrixXd D = b.asDiagonal();",
+                     "    return ((ret.x - A.inverse() * B * b).norm() < {}) &&".format(self.eps),
+                     "        (std::abs(ret.y - (A * B).trace()) < {}) &&".format(self.eps),
+                     "        (std::abs(ret.w - b.squaredNorm()) < {}) &&".format(self.eps),
+                     "        ((ret.z - 2 * D * A).norm() < {}) &&".format(self.eps),
+                     "        ((ret.q - (A * B * C).transpose() * b).norm() < {});".format(self.eps),
+                     "}"]
+        cppyy.cppdef('\n'.join(func_list))
+        self.assertTrue(getattr(cppyy.gbl, func_info.eig_test_name)())
+
+    def test_rewrite_keeps_ir(self):
+        la_str = """x = (A⁻¹)b
+        w = ‖b‖²
+        where
+        A ∈ ℝ^(n×n)
+        b ∈ ℝ^n"""
+        type_walker, start_node = parse_ir_node(la_str)
+        ir_data = dump_ir(type_walker, start_node)
+        walk_backends(ParserTypeEnum.NUMPY | ParserTypeEnum.EIGEN | ParserTypeEnum.LATEX, type_walker, start_node)
+        self.assertEqual(dump_ir(type_walker, start_node), ir_data)
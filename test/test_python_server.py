@@ -0,0 +1,77 @@
+import sys
+sys.path.append('./')
+from test.base_python_test import *
+import io
+import os
+import json
+import socket
+import tempfile
+import threading
+from iheartla.server import CompileServer, LA_TYPE_ERROR, METHOD_NOT_FOUND, PARSE_ERROR
+
+
+class TestServer(BasePythonTest):
+    la_str = """y = A x
+    where
+    A: ℝ^(2×2)
+    x: ℝ^2"""
+
+    def request(self, req_id, method, params=None):
+        return json.dumps({"jsonrpc": "2.0", "id": req_id, "method": method, "params": params or {}})
+
+    def test_server_stdio(self):
+        server = CompileServer()
+        in_file = io.StringIO('\n'.join([self.request(1, "compile", {"source": self.la_str, "backends": ["numpy", "eigen"]}),
+                                         self.request(2, "compile", {"source": self.la_str.replace("x: ℝ^2", "x: ℝ^3")}),
+                                         self.request(3, "unknown"),
+                                         "{not json"]))
+        out_file = io.StringIO()
+        server.serve_stdio(in_file, out_file)
+        responses = [json.loads(line) for line in out_file.getvalue().splitlines()]
+        self.assertEqual(len(responses), 4)
+        outputs = responses[0]["result"]["outputs"]
+        self.assertEqual([outputs["numpy"], outputs["eigen"]], compile_la_content(self.la_str, ParserTypeEnum.NUMPY | ParserTypeEnum.EIGEN))
+        self.assertEqual(responses[1]["error"]["code"], LA_TYPE_ERROR)
+        self.assertIn("Dimension mismatch", responses[1]["error"]["message"])
+        self.assertEqual(responses[2]["error"]["code"], METHOD_NOT_FOUND)
+        self.assertEqual(responses[3]["error"]["code"], PARSE_ERROR)
+
+    def test_server_socket(self):
+        server = CompileServer()
+        tmp_dir = tempfile.TemporaryDirectory()
+        socket_path = os.path.join(tmp_dir.name, "iheartla.sock")
+        server_thread = threading.Thread(target=server.serve_socket, args=(socket_path,))
+        server_thread.start()
+        while not os.path.exists(socket_path):
+            sleep(0.01)
+        results = {}
+
+        def client(index):
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.connect(socket_path)
+                sock.sendall((self.request(index, "compile", {"source": self.la_str}) + '\n').encode('utf-8'))
+                results[index] = json.loads(sock.makefile('r', encoding='utf-8').readline())
+        clients = [threading.Thread(target=client, args=(i,)) for i in range(4)]
+        for c in clients:
+            c.start()
+        for c in clients:
+            c.join()
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(socket_path)
+            sock.sendall((self.request(10, "shutdown") + '\n').encode('utf-8'))
+            sock.makefile('r', encoding='utf-8').readline()
+        server_thread.join()
+        tmp_dir.cleanup()
+        self.assertEqual(len(set(r["result"]["outputs"]["numpy"] for r in results.values())), 1)
+        self.assertEqual(sorted(r["id"] for r in results.values()), [0, 1, 2, 3])
+
+    def test_server_document(self):
+        server = CompileServer()
+        source = self.la_str.replace("y = A x", "y = A x\nz = x + x")
+        first = server.compile(self.la_str, ["numpy"], document="doc")
+        second = server.compile(source, ["numpy"], document="doc")
+        self.assertEqual(first["outputs"]["numpy"], compile_la_content(self.la_str, ParserTypeEnum.NUMPY)[0])
+        self.assertEqual(second["outputs"]["numpy"], compile_la_content(source, ParserTypeEnum.NUMPY)[0])
+        self.assertEqual(server.sessions["doc"].reused, 2)
+        self.assertEqual(server.dispatch("close", {"document": "doc"}), None)
+        self.assertEqual(server.sessions, {})
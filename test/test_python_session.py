@@ -0,0 +1,63 @@
+import sys
+sys.path.append('./')
+from test.base_python_test import *
+from iheartla.la_parser.parser import compile_backends
+from iheartla.la_parser.session import CompileSession
+
+
+class TestSession(BasePythonTest):
+    la_str = """y = A x
+z_i = x_i + 1
+w = ∑_i z_i
+where
+A: ℝ^(2×2)
+x: ℝ^2"""
+
+    def test_session_edits(self):
+        parser_type = ParserTypeEnum.NUMPY | ParserTypeEnum.EIGEN | ParserTypeEnum.LATEX
+        session = CompileSession()
+        self.assertEqual(session.compile(self.la_str, parser_type), compile_backends(self.la_str, parser_type))
+        self.assertEqual((session.parsed, session.reused), (4, 0))
+        # changed statement, unchanged blocks move down a line
+        edits = [self.la_str.replace("z_i = x_i + 1", "v = 2\nz_i = x_i + v"),
+                 self.la_str.replace("x: ℝ^2", "x: ℝ^2: input"),
+                 self.la_str]
+        for content in edits:
+            self.assertEqual(session.compile(content, parser_type), compile_backends(content, parser_type))
+        self.assertEqual((session.parsed, session.reused), (0, 4))
+        # same content
+        session.compile(self.la_str, parser_type)
+        self.assertEqual((session.parsed, session.reused), (0, 4))
+
+    def test_session_error(self):
+        session = CompileSession()
+        session.compile(self.la_str, ParserTypeEnum.NUMPY)
+        content = self.la_str.replace("y = A x", "y = A x\nt = A + x")
+        with self.assertRaises(AssertionError) as session_err:
+            session.compile(content, ParserTypeEnum.NUMPY)
+        with self.assertRaises(AssertionError) as err:
+            compile_backends(content, ParserTypeEnum.NUMPY)
+        self.assertEqual(session_err.exception.args, err.exception.args)
+        self.assertGreater(session.reused, 0)
+
+    def test_session_parser_config(self):
+        # the same statement parses differently once the multi-letter symbol is gone
+        session = CompileSession()
+        for content in ["c = ab\nwhere\nab: ℝ", "c = ab\nwhere\na: ℝ\nb: ℝ"]:
+            self.assertEqual(session.compile(content, ParserTypeEnum.NUMPY), compile_backends(content, ParserTypeEnum.NUMPY))
+            self.assertEqual(session.reused, 0)
+
+    def test_session_repeated_pieces(self):
+        # every occurrence of the same text reports its own position
+        session = CompileSession()
+        for content in ["y = A x\nt = A + x\nz = A x\nt = A + x\nwhere\nA: ℝ^(2×2)\nx: ℝ^2",
+                        "y = A x\nwhere\nA: ℝ^(2×2)\nx: ℝ^2\n\nz = A x\nwhere\nA: ℝ^(2×2)\nx: ℝ^2"]:
+            for cur_content in [content, "\n" + content]:
+                with self.assertRaises(AssertionError) as session_err:
+                    session.compile(cur_content, ParserTypeEnum.LATEX)
+                with self.assertRaises(AssertionError) as err:
+                    compile_backends(cur_content, ParserTypeEnum.LATEX)
+                self.assertEqual(session_err.exception.args, err.exception.args)
+        content = "y = A x\n‖x‖\n‖x‖\nwhere\nA: ℝ^(2×2)\nx: ℝ^2"
+        self.assertEqual(session.compile(content, ParserTypeEnum.LATEX), compile_backends(content, ParserTypeEnum.LATEX))
+        self.assertEqual((session.parsed, session.reused), (1, 3))
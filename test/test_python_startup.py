@@ -0,0 +1,66 @@
+import sys
+sys.path.append('./')
+from test.base_python_test import *
+import os
+import time
+import tempfile
+from pathlib import Path
+
+ROOT_DIR = str(Path(__file__).resolve().parent.parent)
+# wall time budgets in seconds, a few times what a laptop needs so only regressions trip them
+HELP_BUDGET = 2.0
+COMPILE_BUDGET = 6.0
+IMPORT_BUDGET = 1.5
+# loaded on first use only
+LAZY_MODULES = ['sympy', 'wx', 'iheartla.la_local_parsers', 'iheartla.la_parser.codegen_']
+
+
+class TestStartup(BasePythonTest):
+    def run_python(self, args):
+        env = dict(os.environ)
+        env['PYTHONPATH'] = ROOT_DIR
+        start = time.time()
+        ret = subprocess.run([sys.executable] + args, capture_output=True, text=True, env=env, cwd=tempfile.gettempdir())
+        return ret, time.time() - start
+
+    def test_import_time(self):
+        ret, seconds = self.run_python(['-X', 'importtime', '-c', 'import iheartla.la_parser.parser'])
+        self.assertEqual(ret.returncode, 0, ret.stderr)
+        imported = {}
+        for line in ret.stderr.splitlines():
+            if line.startswith('import time:') and '|' in line:
+                _, cumulative, name = line.split('|')
+                if cumulative.strip().isdigit():
+                    imported[name.strip()] = int(cumulative.strip())
+        for name in imported:
+            for lazy in LAZY_MODULES:
+                self.assertFalse(name == lazy or name.startswith(lazy + '.') or (lazy.endswith('_') and name.startswith(lazy)),
+                                 "{} is imported at startup".format(name))
+        self.assertLess(imported['iheartla.la_parser.parser'] / 1e6, IMPORT_BUDGET)
+
+    def test_startup_budget(self):
+        ret, seconds = self.run_python(['-m', 'iheartla', '--help'])
+        self.assertEqual(ret.returncode, 0, ret.stderr)
+        self.assertLess(seconds, HELP_BUDGET)
+        tmp_dir = tempfile.TemporaryDirectory()
+        la_file = os.path.join(tmp_dir.name, 'trivial.la')
+        save_to_file("a = b + c\nwhere\nb: ℝ\nc: ℝ", la_file)
+        ret, seconds = self.run_python(['-m', 'iheartla', '-o', 'numpy', la_file])
+        self.assertEqual(ret.returncode, 0, ret.stdout)
+        self.assertTrue(os.path.exists(os.path.join(tmp_dir.name, 'trivial.py')))
+        self.assertLess(seconds, COMPILE_BUDGET)
+        tmp_dir.cleanup()
+
+    def test_call_after(self):
+        from unittest import mock
+        from iheartla.la_parser.parser import call_after
+        wx = mock.MagicMock()
+        func = mock.Mock()
+        with mock.patch.dict(sys.modules, {'wx': wx}):
+            call_after(func, 1, 'tex')
+        wx.CallAfter.assert_called_once_with(func, 1, 'tex')
+        func.assert_not_called()
+        # without wx the GUI callback is dropped
+        with mock.patch.dict(sys.modules, {'wx': None}):
+            call_after(func, 1, 'tex')
+        func.assert_not_called()
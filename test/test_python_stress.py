@@ -0,0 +1,25 @@
+import sys
+sys.path.append('./')
+from test.base_python_test import *
+from unittest import mock
+from benchmark.bench_stress import generate_program
+from iheartla.la_local_parsers.default_parser import grammardefaultParser
+
+
+class TestStress(BasePythonTest):
+    def count_patterns(self, kind, size):
+        # regex matches done by the parser, a stand-in for the parse time that doesn't depend on the machine
+        original = grammardefaultParser._pattern
+        with mock.patch.object(grammardefaultParser, '_pattern', autospec=True, side_effect=original) as pattern:
+            compile_la_content(generate_program(kind, size), ParserTypeEnum.NUMPY)
+        return pattern.call_count
+
+    def test_linear_parse(self):
+        for kind in ['params', 'multi', 'funcs']:
+            small = self.count_patterns(kind, 10)
+            large = self.count_patterns(kind, 40)
+            self.assertLess(large, small * 4.5, kind)
+
+    def test_stress_programs(self):
+        for kind in ['params', 'statements', 'multi', 'funcs', 'sums', 'literal']:
+            self.assertIsInstance(compile_la_content(generate_program(kind, 5), ParserTypeEnum.NUMPY), list, kind)
@@ -0,0 +1,230 @@
+import sys
+sys.path.append('./')
+from test.base_python_test import *
+import numpy as np
+import cppyy
+from iheartla.la_parser.parser import parse_ir_node
+from iheartla.la_parser.la_types import MatrixStructureEnum, MatrixType
+cppyy.add_include_path(eigen_path)
+
+
+class TestStructure(BasePythonTest):
+    def test_structure_type(self):
+        la_str = """y = Lᵀ b
+        where
+        L ∈ ℝ^(n×n) lower triangular banded(2)
+        P ∈ ℝ^(n×n) SPD
+        D ∈ ℝ^(n×n) upper triangular lower triangular
+        b ∈ ℝ^n"""
+        type_walker, start_node = parse_ir_node(la_str)
+        l_type = type_walker.symtable['L']
+        self.assertTrue(l_type.has_structure(MatrixStructureEnum.STRUCT_LOWER_TRIANGULAR))
+        self.assertEqual(l_type.bandwidth, 2)
+        self.assertTrue(type_walker.symtable['P'].has_structure(MatrixStructureEnum.STRUCT_SYMMETRIC))
+        self.assertTrue(type_walker.symtable['D'].is_diagonal_structure())
+        self.assertEqual(type_walker.symtable['D'].bandwidth, 0)
+        transpose_type = start_node.stat.stmts[0].right.value.left.la_type
+        self.assertTrue(transpose_type.has_structure(MatrixStructureEnum.STRUCT_UPPER_TRIANGULAR))
+        self.assertFalse(transpose_type.has_structure(MatrixStructureEnum.STRUCT_LOWER_TRIANGULAR))
+
+    def test_structure_interned(self):
+        la_str = """y = A b
+        where
+        A ∈ ℝ^(n×n) SPD: the matrix
+        B ∈ ℝ^(n×n) SPD
+        b ∈ ℝ^n"""
+        type_walker, start_node = parse_ir_node(la_str)
+        a_type = type_walker.symtable['A']
+        self.assertIs(a_type, type_walker.symtable['B'])
+        self.assertEqual(type_walker.desc_dict['A'], ' the matrix')
+        general_type = a_type.replace(structure=MatrixStructureEnum.STRUCT_GENERAL)
+        self.assertTrue(a_type.has_structure(MatrixStructureEnum.STRUCT_POSITIVE_DEFINITE))
+        self.assertIs(general_type, MatrixType(rows=a_type.rows, cols=a_type.cols))
+        self.assertTrue(general_type.is_same_type(a_type.replace(sparse=True)))
+        with self.assertRaises(AttributeError):
+            a_type.rows = 3
+
+    def test_structure_square(self):
+        # equal sizes written differently are square
+        code, func = self.gen_numpy_func("""y = P⁻¹ b
+        where
+        P ∈ ℝ^((n+n)×(2n)) SPD
+        b ∈ ℝ^(2n)
+        n ∈ ℤ""")
+        self.assertIn("scipy.linalg.cho_factor(P)", code)
+        P = np.random.randn(6, 6)
+        P = P @ P.T + 6 * np.eye(6)
+        b = np.random.randn(6)
+        np.testing.assert_allclose(func(P, b, 3).y, np.linalg.solve(P, b), rtol=1e-10)
+
+    def test_structure_solve(self):
+        la_str = """s = L \\ b
+        u = S \\ b
+        v = P⁻¹ B
+        w = W \\ b
+        q = Uᵀ⁻¹
+        d = |U|
+        where
+        L ∈ ℝ^(n×n) lower triangular
+        U ∈ ℝ^(n×n) upper triangular
+        S ∈ ℝ^(n×n) symmetric
+        P ∈ ℝ^(n×n) positive definite
+        W ∈ ℝ^(n×n) banded(1)
+        B ∈ ℝ^(n×n)
+        b ∈ ℝ^n"""
+        code, func = self.gen_numpy_func(la_str)
+        self.assertIn("s = scipy.linalg.solve_triangular(L, b, lower=True)", code)
+        self.assertIn("u = scipy.linalg.solve(S, b, assume_a='sym')", code)
+        self.assertIn("v = scipy.linalg.cho_solve(scipy.linalg.cho_factor(P), B)", code)
+        self.assertIn("scipy.linalg.solve_banded((1, 1), ", code)
+        self.assertIn("q = scipy.linalg.solve_triangular(U.T, np.eye(n), lower=True)", code)
+        self.assertIn("d = np.prod(np.diagonal(U))", code)
+        n = 6
+        L = np.tril(np.random.randn(n, n)) + n * np.eye(n)
+        U = np.triu(np.random.randn(n, n)) + n * np.eye(n)
+        S = np.random.randn(n, n)
+        S = S + S.T
+        P = S + 4 * n * np.eye(n)
+        W = np.triu(np.tril(np.random.randn(n, n), 1), -1) + 4 * np.eye(n)
+        B = np.random.randn(n, n)
+        b = np.random.randn(n)
+        ret = func(L, U, S, P, W, B, b)
+        np.testing.assert_allclose(ret.s, np.linalg.solve(L, b), rtol=1e-10)
+        np.testing.assert_allclose(ret.u, np.linalg.solve(S, b), rtol=1e-8)
+        np.testing.assert_allclose(ret.v, np.linalg.solve(P, B), rtol=1e-10)
+        np.testing.assert_allclose(ret.w, np.linalg.solve(W, b), rtol=1e-10)
+        np.testing.assert_allclose(ret.q, np.linalg.inv(U.T), rtol=1e-10, atol=1e-12)
+        self.assertAlmostEqual(ret.d, np.linalg.det(U))
+        eigen = compile_backends(la_str, ParserTypeEnum.EIGEN)[ParserTypeEnum.EIGEN]
+        self.assertIn("L.triangularView<Eigen::Lower>().solve(b)", eigen)
+        self.assertIn("P.llt().solve(B)", eigen)
+        self.assertIn("S.ldlt().solve(b)", eigen)
+        matlab = compile_backends(la_str, ParserTypeEnum.MATLAB)[ParserTypeEnum.MATLAB]
+        self.assertIn("linsolve(P, B, struct('SYM', true, 'POSDEF', true))", matlab)
+        self.assertIn("P = P + P' + 2 * n * eye(n);", matlab)
+
+    def test_structure_diagonal(self):
+        la_str = """from linearalgebra: tr
+        x = D⁻¹ b
+        y = D B Dᵀ
+        t = tr(D) + |D|
+        where
+        D ∈ ℝ^(n×n) diagonal
+        B ∈ ℝ^(n×n)
+        b ∈ ℝ^n"""
+        code, func = self.gen_numpy_func(la_str)
+        # the diagonal matrix is passed as the vector on its diagonal
+        self.assertIn("assert D.shape == (n,)", code)
+        self.assertIn("x = b / D", code)
+        self.assertNotIn("np.diag(", code)
+        d, B, b = np.random.randn(5) + 3, np.random.randn(5, 5), np.random.randn(5)
+        ret = func(d, B, b)
+        np.testing.assert_allclose(ret.x, b / d, rtol=1e-10)
+        np.testing.assert_allclose(ret.y, np.diag(d) @ B @ np.diag(d), rtol=1e-10)
+        self.assertAlmostEqual(ret.t, np.sum(d) + np.prod(d))
+        # the same for Eigen and MATLAB
+        eigen = compile_backends(la_str, ParserTypeEnum.EIGEN)[ParserTypeEnum.EIGEN]
+        self.assertIn("const Eigen::VectorXd & D", eigen)
+        self.assertIn("D.asDiagonal() * B", eigen)
+        self.assertIn("D.sum() + D.prod()", eigen)
+        matlab = compile_backends(la_str, ParserTypeEnum.MATLAB)[ParserTypeEnum.MATLAB]
+        self.assertIn("D = reshape(D,[],1);", matlab)
+        self.assertIn("x = (b ./ D);", matlab)
+        self.assertIn("t = sum(D) + prod(D);", matlab)
+        self.assertNotIn("diag(", matlab)
+        # other uses need the dense matrix
+        code, func = self.gen_numpy_func("""y = D⁻¹ b + D b
+        z = D_1,1
+        where
+        D ∈ ℝ^(n×n) diagonal
+        b ∈ ℝ^n""")
+        self.assertIn("D = np.diag(D)", code)
+        ret = func(d, b)
+        np.testing.assert_allclose(ret.y, b / d + d * b, rtol=1e-10)
+        self.assertAlmostEqual(ret.z, d[0])
+
+    def test_structure_diagonal_eigen(self):
+        la_str = """from linearalgebra: tr
+        x = D⁻¹ b
+        y = D B Dᵀ
+        t = tr(D) + |D|
+        where
+        D ∈ ℝ^(n×n) diagonal
+        B ∈ ℝ^(n×n)
+        b ∈ ℝ^n"""
+        func_info = self.gen_func_info(la_str)
+        cppyy.include(func_info.eig_file_name)
+        func_list = ["bool {}(){{".format(func_info.eig_test_name),
+                     "    Eigen::VectorXd d(3);",
+                     "    d << 2, -1, 4;",
+                     "    Eigen::MatrixXd B(3, 3);",
+                     "    B << 1, 2, 3, 4, 5, 6, 7, 8, 10;",
+                     "    Eigen::VectorXd b(3);",
+                     "    b << 1, -2, 3;",
+                     "    {} ret = {}(d, B, b);".format(func_info.eig_func_name + "ResultType", func_info.eig_func_name),
+                     "    Eigen::MatrixXd D = d.asDiagonal();",
+                     "    return ((ret.x - D.inverse() * b).norm() < {}) &&".format(self.eps),
+                     "        ((ret.y - D * B * D).norm() < {}) &&".format(self.eps),
+                     "        (std::abs(ret.t - (D.trace() + D.determinant())) < {});".format(self.eps),
+                     "}"]
+        cppyy.cppdef('\n'.join(func_list))
+        self.assertTrue(getattr(cppyy.gbl, func_info.eig_test_name)())
+        # other uses need the dense matrix
+        func_info = self.gen_func_info("""y = D⁻¹ b + D b
+        z = D_1,1
+        where
+        D ∈ ℝ^(n×n) diagonal
+        b ∈ ℝ^n""")
+        cppyy.include(func_info.eig_file_name)
+        func_list = ["bool {}(){{".format(func_info.eig_test_name),
+                     "    Eigen::VectorXd d(3);",
+                     "    d << 2, -1, 4;",
+                     "    Eigen::VectorXd b(3);",
+                     "    b << 1, -2, 3;",
+                     "    {} ret = {}(d, b);".format(func_info.eig_func_name + "ResultType", func_info.eig_func_name),
+                     "    return ((ret.y - (b.cwiseQuotient(d) + d.cwiseProduct(b))).norm() < {}) &&".format(self.eps),
+                     "        (std::abs(ret.z - d(0)) < {});".format(self.eps),
+                     "}"]
+        cppyy.cppdef('\n'.join(func_list))
+        self.assertTrue(getattr(cppyy.gbl, func_info.eig_test_name)())
+
+    def test_structure_derived(self):
+        # expressions only keep the structure every such matrix has
+        la_str = """x = (A + B)⁻¹ b
+        y = (A + Aᵀ)⁻¹ b
+        z = (-P)⁻¹ b
+        w = (P - B)⁻¹ b
+        v = (A + L) \\ b
+        u = (P + P) \\ b
+        where
+        A ∈ ℝ^(n×n) lower triangular
+        L ∈ ℝ^(n×n) lower triangular
+        B ∈ ℝ^(n×n)
+        P ∈ ℝ^(n×n) SPD
+        b ∈ ℝ^n"""
+        code, func = self.gen_numpy_func(la_str)
+        self.assertIn("x = np.linalg.solve((A + B), b)", code)
+        self.assertIn("y = np.linalg.solve((A + A.T), b)", code)
+        self.assertIn("z = scipy.linalg.solve((-P), b, assume_a='sym')", code)
+        self.assertIn("w = np.linalg.solve((P - B), b)", code)
+        self.assertIn("v = scipy.linalg.solve_triangular((A + L), b, lower=True)", code)
+        self.assertIn("u = scipy.linalg.cho_solve(scipy.linalg.cho_factor((P + P)), b)", code)
+        n = 6
+        A = np.tril(np.random.randn(n, n)) + n * np.eye(n)
+        L = np.tril(np.random.randn(n, n)) + n * np.eye(n)
+        B = np.random.randn(n, n)
+        P = np.random.randn(n, n)
+        P = P @ P.T + n * np.eye(n)
+        b = np.random.randn(n)
+        ret = func(A, L, B, P, b)
+        np.testing.assert_allclose(ret.x, np.linalg.solve(A + B, b), rtol=1e-8)
+        np.testing.assert_allclose(ret.y, np.linalg.solve(A + A.T, b), rtol=1e-8)
+        np.testing.assert_allclose(ret.z, np.linalg.solve(-P, b), rtol=1e-8)
+        np.testing.assert_allclose(ret.w, np.linalg.solve(P - B, b), rtol=1e-8)
+        np.testing.assert_allclose(ret.v, np.linalg.solve(A + L, b), rtol=1e-8)
+        np.testing.assert_allclose(ret.u, np.linalg.solve(2 * P, b), rtol=1e-8)
+        eigen = compile_backends(la_str, ParserTypeEnum.EIGEN)[ParserTypeEnum.EIGEN]
+        self.assertIn("(A + B).colPivHouseholderQr().solve(b)", eigen)
+        self.assertIn("(A + A.transpose()).colPivHouseholderQr().solve(b)", eigen)
+        self.assertIn("(-P).ldlt().solve(b)", eigen)
+        self.assertIn("(P - B).colPivHouseholderQr().solve(b)", eigen)
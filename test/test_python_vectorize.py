@@ -0,0 +1,103 @@
+import sys
+sys.path.append('./')
+from test.base_python_test import *
+import numpy as np
+
+
+class TestVectorize(BasePythonTest):
+    def assert_same_as_loop(self, la_str, *args, marker="np.sum("):
+        vectorized_code, vectorized_func = self.gen_numpy_func(la_str)
+        loop_code, loop_func = self.gen_numpy_func(la_str, vectorize=False)
+        self.assertIn(marker, vectorized_code)
+        self.assertNotIn("for i in range", vectorized_code)
+        self.assertIn("for i in range", loop_code)
+        vectorized_ret = vars(vectorized_func(*args))
+        loop_ret = vars(loop_func(*args))
+        self.assertEqual(vectorized_ret.keys(), loop_ret.keys())
+        for key in loop_ret:
+            np.testing.assert_allclose(vectorized_ret[key], loop_ret[key], rtol=1e-10, atol=1e-12)
+
+    def test_vectorize_scalar_sum(self):
+        la_str = """s = ∑_i (a_i b_i + exp(a_i)/c)
+        where
+        a ∈ ℝ^n
+        b ∈ ℝ^n
+        c ∈ ℝ"""
+        self.assert_same_as_loop(la_str, np.random.randn(50), np.random.randn(50), 3.0)
+
+    def test_vectorize_weighted_sum(self):
+        la_str = """s = ∑_i w_i (p_i - c) / ||p_i||
+        where
+        w_i ∈ ℝ
+        p_i ∈ ℝ^3
+        c ∈ ℝ^3"""
+        self.assert_same_as_loop(la_str, np.random.randn(50), np.random.randn(50, 3), np.random.randn(3))
+
+    def test_vectorize_outer_product(self):
+        la_str = """S = ∑_i x_i x_iᵀ
+        where
+        x_i ∈ ℝ^3"""
+        self.assert_same_as_loop(la_str, np.random.randn(50, 3))
+
+    def test_vectorize_batched_product(self):
+        la_str = """C = ∑_i (A_i B_iᵀ + A_i A_iᵀ)
+        y = ∑_i A_i x_i
+        where
+        A_i ∈ ℝ^(2×3)
+        B_i ∈ ℝ^(2×3)
+        x_i ∈ ℝ^3"""
+        self.assert_same_as_loop(la_str, np.random.randn(50, 2, 3), np.random.randn(50, 2, 3), np.random.randn(50, 3))
+
+    def test_vectorize_matrix_definition(self):
+        la_str = """K_ij = exp(-(x_i - x_j)²/σ)
+        T_ij = A_ji + B_ij + i j
+        P_ij = x_i y_j
+        where
+        x ∈ ℝ^n
+        y ∈ ℝ^m
+        σ ∈ ℝ
+        A ∈ ℝ^(n×n)
+        B ∈ ℝ^(n×n)"""
+        self.assert_same_as_loop(la_str, np.random.randn(20), np.random.randn(10), 2.0, np.random.randn(20, 20),
+                                 np.random.randn(20, 20), marker="K[:, :] = ")
+
+    def test_vectorize_diagonal(self):
+        la_str = """D = A
+        D_ii = c + x_i
+        where
+        A ∈ ℝ^(n×n)
+        c ∈ ℝ
+        x ∈ ℝ^n"""
+        self.assert_same_as_loop(la_str, np.random.randn(20, 20), 2.0, np.random.randn(20), marker="np.fill_diagonal(D, ")
+
+    def test_vectorize_sparse_diagonal(self):
+        # the values of a sparse diagonal are computed at once, its indices already are
+        la_str = """L_ii = c + x_i
+        where
+        c ∈ ℝ
+        x ∈ ℝ^n"""
+        code, func = self.gen_numpy_func(la_str)
+        self.assertIn("[:] = c + x\n", code)
+        self.assertNotIn("for i in range", code)
+        loop_code, loop_func = self.gen_numpy_func(la_str, vectorize=False)
+        self.assertIn("for i in range", loop_code)
+        x = np.random.randn(20)
+        np.testing.assert_allclose(func(2.0, x).L.toarray(), loop_func(2.0, x).L.toarray(), rtol=1e-10)
+        np.testing.assert_allclose(func(2.0, x).L.toarray(), np.diag(2.0 + x), rtol=1e-10)
+
+    def test_vectorize_fallback(self):
+        # conditions keep the loop
+        la_str = """s = ∑_(i for i>1) a_i
+        where
+        a_i ∈ ℝ"""
+        code, func = self.gen_numpy_func(la_str)
+        self.assertIn("for i in range", code)
+        self.assertAlmostEqual(func(np.array([1.0, 2.0, 3.0])).s, 5.0)
+        # and so do summations in a definition
+        la_str = """D = A
+        D_ii = ∑_j A_ij
+        where
+        A ∈ ℝ^(2×2)"""
+        code, func = self.gen_numpy_func(la_str)
+        self.assertIn("for i in range", code)
+        np.testing.assert_allclose(func(np.array([[1.0, 2.0], [3.0, 4.0]])).D, [[3.0, 2.0], [3.0, 7.0]])